@@ -59,7 +59,8 @@ const Dashboard = () => {
         }
       }
 
-      return await getOrderStats(startDate, endDate);
+      // Periodo precedente nella stessa richiesta (un solo download Shopify)
+      return await getOrderStats(startDate, endDate, ['previous']);
     },
   });
 
@@ -101,6 +102,10 @@ const Dashboard = () => {
 
   console.log('pieData:', pieData);
 
+  // Variazione ordini rispetto al periodo precedente di pari durata
+  const previousTotal = stats.ranges?.previous?.total_orders;
+  const ordersDelta = previousTotal ? ((stats.total_orders - previousTotal) / previousTotal) * 100 : null;
+
   return (
     <div className="space-y-6">
       {/* Selettore Periodo */}
@@ -197,6 +202,11 @@ const Dashboard = () => {
           <div className="card-body">
             <p className="text-xs font-medium text-base-content/60 uppercase tracking-wide">Totale Ordini</p>
             <p className="text-3xl font-bold text-base-content mt-2">{stats.total_orders.toLocaleString('it-IT')}</p>
+            {ordersDelta !== null && (
+              <p className={`text-xs ${ordersDelta >= 0 ? 'text-green-600' : 'text-red-600'}`}>
+                {ordersDelta >= 0 ? '+' : ''}{ordersDelta.toFixed(1)}% vs periodo precedente
+              </p>
+            )}
           </div>
         </div>
 
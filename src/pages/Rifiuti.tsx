@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import rifiutiService from '../services/rifiutiService';
 
 const Rifiuti = () => {
@@ -12,7 +12,8 @@ const Rifiuti = () => {
   const [showPreviewModal, setShowPreviewModal] = useState<boolean>(false);
   const [taggingProgress, setTaggingProgress] = useState<{status: 'processing' | 'updating' | 'success', current: number, total: number} | null>(null);
 
-  const { data, isLoading, error, refetch } = useQuery({
+  const queryClient = useQueryClient();
+  const { data, isLoading, error } = useQuery({
     queryKey: ['rifiuti', daysBack],
     queryFn: () => rifiutiService.getRifiuti(daysBack),
   });
@@ -62,8 +63,8 @@ const Rifiuti = () => {
       // Passa allo stato di aggiornamento dati
       setTaggingProgress({ status: 'updating', current: orderIds.length, total: orderIds.length });
       
-      // Ricarica i dati immediatamente
-      await refetch();
+      // Ricarica i dati immediatamente, senza lo snapshot precedente al tagging
+      queryClient.setQueryData(['rifiuti', daysBack], await rifiutiService.getRifiuti(daysBack, true));
       
       // Ora che i dati sono aggiornati, passa a success
       setTaggingProgress({ status: 'success', current: orderIds.length, total: orderIds.length });
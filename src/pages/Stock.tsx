@@ -38,6 +38,13 @@ const Stock = () => {
 
   return (
     <div className="space-y-6">
+      {/* Avviso dati parziali (una sorgente non ha risposto in tempo) */}
+      {data.partial && (
+        <div className="alert alert-warning">
+          <span>Dati parziali: {data.warnings?.join(', ')}</span>
+        </div>
+      )}
+
       {/* Stats Cards */}
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
         <div className="card bg-base-100 shadow-sm hover:shadow-md transition-shadow">
@@ -35,6 +35,12 @@ export interface GLSParcelShopResponse {
 
 const LAMBDA_URL = 'https://i5g7wtxgec.execute-api.eu-central-1.amazonaws.com/prod/parcel-shop';
 
+// Campi usati dalla pagina Parcel Shop: la Lambda restituisce solo questi (fields=)
+const PARCEL_SHOP_FIELDS = [
+  'expedicion', 'referencia', 'destinatario', 'direccion', 'localidad',
+  'cp_dst', 'fecha', 'pod', 'phone',
+];
+
 export const fetchGLSParcelShopData = async (daysBack: number = 15) => {
   try {
     const response = await fetch(LAMBDA_URL, {
@@ -43,7 +49,8 @@ export const fetchGLSParcelShopData = async (daysBack: number = 15) => {
         'Content-Type': 'application/json',
       },
       body: JSON.stringify({
-        days_back: daysBack
+        days_back: daysBack,
+        fields: PARCEL_SHOP_FIELDS.join(',')
       })
     });
 
@@ -2,6 +2,7 @@ export interface RefundOrder {
   id: string;
   name: string;
   created_at: string;
+  updated_at?: string;
   tags: string[];
   note: string | null;
   customer: {
@@ -33,6 +34,14 @@ interface RefundOrdersMetadata {
   period_days: number;
   total_orders: number;
   required_tags: string[];
+  // Sincronizzazione della coda lato Lambda (full | incremental | webhook | scan)
+  sync?: {
+    mode: 'full' | 'incremental' | 'webhook' | 'scan';
+    orders_fetched: number;
+    updated?: number;
+    dropped?: number;
+    since?: string;
+  };
 }
 
 export interface RefundOrdersResponse {
@@ -42,9 +51,12 @@ export interface RefundOrdersResponse {
 
 const LAMBDA_URL = 'https://i5g7wtxgec.execute-api.eu-central-1.amazonaws.com/prod/refunds';
 
-export const fetchRefundOrders = async () => {
+/**
+ * @param forceFull Riscansiona tutti gli ordini taggati invece dei soli modificati
+ */
+export const fetchRefundOrders = async (forceFull = false) => {
   try {
-    const response = await fetch(LAMBDA_URL, {
+    const response = await fetch(forceFull ? `${LAMBDA_URL}?full=1` : LAMBDA_URL, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
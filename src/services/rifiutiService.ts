@@ -55,8 +55,9 @@ export interface BulkTagResponse {
 const API_BASE_URL = 'https://i5g7wtxgec.execute-api.eu-central-1.amazonaws.com/prod';
 
 const rifiutiService = {
-  async getRifiuti(daysBack: number = 7): Promise<RifiutiResponse> {
-    const response = await fetch(`${API_BASE_URL}/rifiuti?days_back=${daysBack}`);
+  // fresh: ricalcola invece di usare lo snapshot della Lambda (es. dopo il tagging)
+  async getRifiuti(daysBack: number = 7, fresh: boolean = false): Promise<RifiutiResponse> {
+    const response = await fetch(`${API_BASE_URL}/rifiuti?days_back=${daysBack}${fresh ? '&fresh=1' : ''}`);
 
     if (!response.ok) {
       throw new Error(`Errore nel recupero rifiuti: ${response.statusText}`);
@@ -55,23 +55,43 @@ export interface OrderStats {
   metadata: {
     start_date: string;
     end_date: string;
-    generated_at: string;
-    total_orders_fetched: number;
+    generated_at?: string;
+    total_orders_fetched?: number;
+    source?: 'rollup' | 'shopify';
   };
+  // Periodi di confronto richiesti con compare/ranges (stessa struttura, senza ranges)
+  ranges?: Record<string, Omit<OrderStats, 'ranges'>>;
+}
+
+export type ComparePeriod = 'previous' | 'last_year';
+
+export interface NamedRange {
+  start_date: string;
+  end_date: string;
 }
 
 /**
  * Recupera statistiche ordini Shopify
  * @param startDate Data inizio YYYY-MM-DD (opzionale, default: 30 giorni fa)
  * @param endDate Data fine YYYY-MM-DD (opzionale, default: oggi)
+ * @param compare Periodi di confronto (previous, last_year) calcolati nella stessa richiesta
+ * @param ranges Altri periodi con nome, restituiti in `ranges` insieme ai confronti
  */
 export async function getOrderStats(
   startDate?: string,
-  endDate?: string
+  endDate?: string,
+  compare?: ComparePeriod[],
+  ranges?: Record<string, NamedRange>
 ): Promise<OrderStats> {
   const params = new URLSearchParams();
   if (startDate) params.append('start_date', startDate);
   if (endDate) params.append('end_date', endDate);
+  if (compare && compare.length > 0) params.append('compare', compare.join(','));
+  if (ranges && Object.keys(ranges).length > 0) {
+    params.append('ranges', Object.entries(ranges)
+      .map(([name, range]) => `${name}:${range.start_date}:${range.end_date}`)
+      .join(','));
+  }
 
   const url = `${LAMBDA_ORDER_STATS_URL}${params.toString() ? '?' + params.toString() : ''}`;
   
@@ -89,6 +109,74 @@ export async function getOrderStats(
   return await response.json();
 }
 
+// Cubo ordini: dimensioni e granularità accettate da /order-stats/cube
+export type CubeDimension = 'tag' | 'fulfillment' | 'financial' | 'payment';
+export type CubeGranularity = 'day' | 'week' | 'month';
+
+export interface OrderCubeQuery {
+  groupBy?: CubeDimension[];
+  granularity?: CubeGranularity;
+  startDate?: string;
+  endDate?: string;
+  filters?: Partial<Record<CubeDimension, string[]>>;
+}
+
+export interface OrderCubeRow {
+  period?: string;
+  tag?: string;
+  fulfillment?: string;
+  financial?: string;
+  payment?: string;
+  count: number;
+  revenue: number;
+}
+
+export interface OrderCubeResult {
+  rows: OrderCubeRow[];
+  group_by: CubeDimension[];
+  granularity: CubeGranularity | null;
+  filters: Partial<Record<CubeDimension, string[]>>;
+  dimensions: Record<CubeDimension, string[]>;
+  metadata: {
+    start_date: string | null;
+    end_date: string | null;
+    generated_at: string;
+    total_orders_fetched: number;
+    source: 'rollup' | 'shopify';
+    query_ms: number;
+  };
+}
+
+/**
+ * Interroga il cubo ordini (conteggi e fatturato raggruppati) senza
+ * nuove aggregazioni lato Lambda per ogni vista della dashboard
+ */
+export async function getOrderCube(query: OrderCubeQuery = {}): Promise<OrderCubeResult> {
+  const params = new URLSearchParams();
+  if (query.groupBy && query.groupBy.length > 0) params.append('group_by', query.groupBy.join(','));
+  if (query.granularity) params.append('granularity', query.granularity);
+  if (query.startDate) params.append('start_date', query.startDate);
+  if (query.endDate) params.append('end_date', query.endDate);
+  Object.entries(query.filters || {}).forEach(([dimension, values]) => {
+    if (values && values.length > 0) params.append(dimension, values.join(','));
+  });
+
+  const url = `${LAMBDA_ORDER_STATS_URL}/cube${params.toString() ? '?' + params.toString() : ''}`;
+
+  const response = await fetch(url, {
+    method: 'GET',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+  });
+
+  if (!response.ok) {
+    throw new Error(`Errore nella query del cubo ordini: ${response.statusText}`);
+  }
+
+  return await response.json();
+}
+
 /**
  * Marca un ordine Shopify come evaso (fulfilled)
  * @param orderId ID interno Shopify dell'ordine (es: "gid://shopify/Order/7249466851669")
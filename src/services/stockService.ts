@@ -10,6 +10,11 @@ interface StockItem {
   media_vendite_giornaliere: number;
   giorni_autonomia: number;
   urgenza: 'CRITICO' | 'ORDINARE' | 'OK';
+  // Solo con previsione domanda attiva (METODO_PREVISIONE)
+  vendite_previste_giornaliere?: number;
+  trend_vendite?: number;
+  giorni_autonomia_prevista?: number;
+  fabbisogno_previsto?: number;
 }
 
 interface OrdineFornitoreItem {
@@ -19,6 +24,7 @@ interface OrdineFornitoreItem {
   quantita: number;
   urgenza: 'CRITICO' | 'ORDINARE';
   giorni_autonomia: number;
+  quantita_prevista?: number;
 }
 
 interface StockSummary {
@@ -29,20 +35,56 @@ interface StockSummary {
   sku_critici: number;
   sku_da_ordinare: number;
   totale_pezzi_ordine: number;
+  totale_pezzi_ordine_previsto?: number;
+}
+
+interface SourceMetrics {
+  status: 'ok' | 'timeout' | 'error';
+  ms: number;
+  error?: string;
+}
+
+export interface ScenarioParams {
+  giorni_target_scorta?: number;
+  giorni_transito?: number;
+  soglia_critica?: number;
+  soglia_allarme?: number;
+  moltiplicatore_crescita_vendite?: number;
+}
+
+export interface ScenarioRequest extends ScenarioParams {
+  nome?: string;
+}
+
+interface ScenarioResult {
+  nome: string;
+  parametri: Required<ScenarioParams>;
+  ordine_fornitore: OrdineFornitoreItem[];
+  summary: StockSummary;
 }
 
 export interface StockResponse {
   stock: StockItem[];
   ordine_fornitore: OrdineFornitoreItem[];
   summary: StockSummary;
+  partial?: boolean;
+  warnings?: string[];
+  sources?: Record<string, SourceMetrics>;
+  scenari?: ScenarioResult[];
   timestamp: string;
 }
 
 const LAMBDA_URL = 'https://i5g7wtxgec.execute-api.eu-central-1.amazonaws.com/prod/stock';
 
-export const fetchStockData = async (): Promise<StockResponse> => {
+export const fetchStockData = async (scenarios?: ScenarioRequest[]): Promise<StockResponse> => {
   try {
-    const response = await fetch(LAMBDA_URL);
+    const response = scenarios?.length
+      ? await fetch(LAMBDA_URL, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ scenarios }),
+        })
+      : await fetch(LAMBDA_URL);
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -27,8 +27,21 @@ if os.path.exists(env_file):
                 k, v = line.split("=", 1)
                 os.environ.setdefault(k.strip(), v.strip())
 
-GLS_SOAP_ENDPOINT     = "https://wsclientes.asmred.com/b2b.asmx"
-GLS_CUSTOMER_ENDPOINT = "https://ws-customer.gls-spain.es/b2b.asmx"
+GLS_SOAP_ENDPOINT     = os.environ.get("GLS_SOAP_ENDPOINT", "https://wsclientes.asmred.com/b2b.asmx")
+GLS_CUSTOMER_ENDPOINT = os.environ.get("GLS_CUSTOMER_ENDPOINT", "https://ws-customer.gls-spain.es/b2b.asmx")
+
+
+def find_first(element, *paths, namespaces=None):
+    """
+    Primo elemento trovato tra i percorsi (con e senza namespace).
+    Non usare `find(a) or find(b)`: un Element senza figli (es. <Resultado
+    return="-70"/>) è falsy e verrebbe scartato.
+    """
+    for path in paths:
+        found = element.find(path, namespaces)
+        if found is not None:
+            return found
+    return None
 
 
 # ---------------------------------------------------------------------------
@@ -81,13 +94,10 @@ def lookup(referenza: str):
             print("❌ GetExpCliResult non trovato nella risposta")
             return
 
-        exp_elem = (
-            result_elem.find(".//{http://www.asmred.com/}exp") or
-            result_elem.find(".//exp")
-        )
+        exp_elem = find_first(result_elem, ".//{http://www.asmred.com/}exp", ".//exp")
         if exp_elem is None and result_elem.text and result_elem.text.strip():
             inner = ET.fromstring(result_elem.text.strip())
-            exp_elem = inner.find(".//{http://www.asmred.com/}exp") or inner.find(".//exp")
+            exp_elem = find_first(inner, ".//{http://www.asmred.com/}exp", ".//exp")
 
         if exp_elem is None:
             print(f"⚠️  Nessuna spedizione trovata per referenza {referenza}")
@@ -154,10 +164,7 @@ def anula(albaran: str):
 
     try:
         root = ET.fromstring(response.text)
-        resultado = (
-            root.find(".//{http://www.asmred.com/}Resultado") or
-            root.find(".//Resultado")
-        )
+        resultado = find_first(root, ".//{http://www.asmred.com/}Resultado", ".//Resultado")
         if resultado is not None:
             code = resultado.get("return", "0")
             msg  = resultado.text or ""
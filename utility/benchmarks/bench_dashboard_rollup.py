@@ -0,0 +1,90 @@
+"""
+Benchmark dei rollup giornalieri di lambda_dashboard_stats (order_rollup).
+
+Simula Shopify con FakeShopifyOrders (latenza fissa per pagina) e confronta,
+per negozi di età crescente, una richiesta su tutto lo storico:
+- download completo + calculate_order_stats (percorso senza rollup)
+- refresh dei rollup (sweep updated_at + giorni mutabili) + somma delle righe giorno
+
+Verifica che le statistiche coincidano, anche dopo aver modificato alcuni
+ordini vecchi (tag RESO aggiunto, rimborso) che lo sweep deve raccogliere.
+
+Uso:
+    python benchmarks/bench_dashboard_rollup.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_dashboard_stats as dashboard
+import order_rollup
+from synthetic import generate_dashboard_orders, FakeShopifyOrders
+
+ORDERS_PER_DAY = 60
+LATENCY = 0.02
+
+
+def comparable(stats):
+    return {key: value for key, value in stats.items() if key != 'metadata'}
+
+
+def full_download(start_date, end_date):
+    orders = dashboard.fetch_all_orders(start_date=start_date, end_date=end_date)
+    return dashboard.calculate_order_stats(orders, start_date, end_date)
+
+
+def from_rollup(rollup, start_date, end_date):
+    dashboard.refresh_rollup(rollup)
+    counters, orders_by_date = rollup.counters(start_date, end_date)
+    return dashboard.finalize_stats(counters, orders_by_date, start_date, end_date)
+
+
+def touch_old_orders(nodes, count=25):
+    """Modifica ordini vecchi come farebbe il negozio (reso registrato dopo settimane)"""
+    now = (datetime.utcnow() + timedelta(seconds=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    for node in nodes[:count * 40:40]:
+        node['tags'] = ['RESO']
+        node['refunds'] = [{'id': 'gid://shopify/Refund/x'}]
+        node['updatedAt'] = now
+
+
+def main():
+    print(f"{'giorni':>7} {'ordini':>7} {'download completo (ms)':>23} {'rollup a caldo (ms)':>20} "
+          f"{'chiamate':>9}  parità  dopo sweep")
+    for days in (90, 365, 730):
+        nodes = generate_dashboard_orders(days * ORDERS_PER_DAY, days=days)
+        start_date = nodes[0]['createdAt'][:10]
+        end_date = datetime.utcnow().strftime('%Y-%m-%d')
+        fake = FakeShopifyOrders(nodes, latency=LATENCY)
+        rollup = order_rollup.OrderRollup(':memory:')
+
+        with mock.patch.object(dashboard.requests, 'post', fake.post), \
+                mock.patch.object(dashboard, 'START_DATE_ORDERS', start_date), \
+                mock.patch('builtins.print'):
+            t_start = time.perf_counter()
+            expected = full_download(start_date, end_date)
+            t_full = time.perf_counter() - t_start
+
+            from_rollup(rollup, start_date, end_date)  # primo caricamento
+            fake.calls = 0
+            t_start = time.perf_counter()
+            got = from_rollup(rollup, start_date, end_date)
+            t_rollup = time.perf_counter() - t_start
+            calls = fake.calls
+
+            touch_old_orders(nodes)
+            swept = from_rollup(rollup, start_date, end_date)
+            expected_after = full_download(start_date, end_date)
+
+        same = comparable(got) == comparable(expected)
+        same_after = comparable(swept) == comparable(expected_after)
+        print(f"{days:>7} {len(nodes):>7} {t_full * 1000:>23.0f} {t_rollup * 1000:>20.0f} {calls:>9}  "
+              f"{'✅' if same else '❌':>5}  {'✅' if same_after else '❌':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark della previsione domanda (demand_forecast) su matrice SKU × giorno.
+
+Confronta il fit vettoriale (pesi del filtro @ matrice) con la ricorsione
+SES/Holt scritta SKU per SKU e verifica che livello, trend, autonomia e
+fabbisogno coincidano. Controlla anche che con domanda piatta autonomia e
+fabbisogno siano quelli di stock_engine. Obiettivo: < 100 ms per
+500 SKU × 90 giorni (previsione completa).
+
+Uso:
+    python benchmarks/bench_demand_forecast.py
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+import demand_forecast
+import stock_engine
+from synthetic import generate_daily_sales
+
+GIORNI_TARGET = 45
+GIORNI_TRANSITO = 21
+ALPHA = 0.3
+BETA = 0.1
+PHI = 0.9
+TARGET_MS = 100
+
+
+def loop_forecast(rows, netto, method):
+    """Ricorsione classica SKU per SKU e giorno per giorno"""
+    horizon = GIORNI_TARGET + GIORNI_TRANSITO
+    result = []
+    for row, stock in zip(rows, netto):
+        level, trend = float(row[0]), 0.0
+        for value in row[1:]:
+            if method == 'ses':
+                level = ALPHA * value + (1 - ALPHA) * level
+            else:
+                previous = level
+                level = ALPHA * value + (1 - ALPHA) * (level + PHI * trend)
+                trend = BETA * (level - previous) + (1 - BETA) * PHI * trend
+        demand = []
+        damped = 0.0
+        for h in range(1, horizon + 1):
+            damped += PHI ** h
+            demand.append(max(level + damped * trend, 0.0))
+
+        remaining, autonomia = float(stock), math.inf
+        for day, qty in enumerate(demand):
+            if qty > 0 and remaining < qty:
+                autonomia = day + remaining / qty
+                break
+            remaining -= qty
+        else:
+            if demand[-1] > 0:
+                autonomia = horizon + remaining / demand[-1]
+
+        grezzo = (sum(demand) - stock) if any(demand) else 0.0
+        fabbisogno = max(10, math.ceil(grezzo / 10) * 10) if grezzo > 0 else 0
+        result.append((level, trend, autonomia, fabbisogno))
+    return result
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def vector_forecast(matrix, netto, method):
+    return demand_forecast.forecast(
+        matrix, netto, GIORNI_TARGET, GIORNI_TRANSITO, method=method, alpha=ALPHA, beta=BETA, phi=PHI
+    )
+
+
+def same(expected, got):
+    level, trend, autonomia, fabbisogno = (np.array(col, dtype=float) for col in zip(*expected))
+    return (
+        np.allclose(level, got['livello'])
+        and np.allclose(trend, got['trend'])
+        and np.allclose(autonomia, got['giorni_autonomia'])
+        and np.array_equal(fabbisogno.astype(np.int64), got['fabbisogno'])
+    )
+
+
+def flat_parity():
+    """Domanda costante: autonomia e fabbisogno come stock_engine"""
+    rng = np.random.default_rng(0)
+    media = rng.uniform(0, 8, 2000) * (rng.random(2000) > 0.3)
+    netto = rng.integers(-5, 400, 2000)
+    matrix = np.repeat(media[:, None], 30, axis=1)
+
+    got = vector_forecast(matrix, netto, 'ses')
+    autonomia = stock_engine.autonomy_days(netto, media)
+    fabbisogno = stock_engine.replenishment_need(media, autonomia, GIORNI_TARGET, GIORNI_TRANSITO)
+    return np.allclose(got['giorni_autonomia'], autonomia) and np.array_equal(got['fabbisogno'], fabbisogno)
+
+
+def main():
+    print(f"{'SKU × giorni':>14} {'metodo':>6} {'loop (ms)':>10} {'vettoriale (ms)':>16} {'speedup':>8}  parità  obiettivo")
+    for n_skus, days in ((500, 90), (5000, 90), (20000, 180)):
+        skus, rows = generate_daily_sales(n_skus, days)
+        matrix = np.array(rows, dtype=float)
+        netto = np.random.default_rng(1).integers(-5, 400, n_skus)
+
+        for method in demand_forecast.METODI:
+            demand_forecast.filter_weights.cache_clear()
+            t_loop, expected = timed(lambda: loop_forecast(rows, netto.tolist(), method), repeat=1)
+            # Include il calcolo dei pesi (primo fit dopo l'avvio del container)
+            t_vector, got = timed(lambda: (demand_forecast.filter_weights.cache_clear(),
+                                           vector_forecast(matrix, netto, method))[1])
+            target = '✅' if t_vector * 1000 < TARGET_MS else '❌'
+            target = target if (n_skus, days) == (500, 90) else ''
+            print(f"{f'{n_skus} × {days}':>14} {method:>6} {t_loop * 1000:>10.1f} {t_vector * 1000:>16.2f} "
+                  f"{t_loop / t_vector:>7.0f}x  {'✅' if same(expected, got) else '❌':>5}  {target}")
+
+    print(f"\nDomanda piatta = stock_engine: {'✅' if flat_parity() else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
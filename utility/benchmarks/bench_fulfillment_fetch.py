@@ -0,0 +1,45 @@
+"""
+Benchmark paginazione ordini non evasi (lambda_fulfillment_check).
+
+Simula Shopify con FakeShopifyOrders (latenza fissa per pagina) e misura
+get_unfulfilled_orders_shopify con 1k-5k ordini, sequenziale e a shard.
+
+Uso:
+    python benchmarks/bench_fulfillment_fetch.py [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_fulfillment_check as lfc
+from synthetic import generate_order_nodes, FakeShopifyOrders
+
+
+def run(n_orders, shards, latency):
+    nodes = generate_order_nodes(n_orders, days=30)
+    fake = FakeShopifyOrders(nodes, latency=latency)
+    with mock.patch.object(lfc.requests, 'post', fake.post), mock.patch('builtins.print'):
+        t_start = time.perf_counter()
+        orders = lfc.get_unfulfilled_orders_shopify(days_back=31, shards=shards)
+        elapsed = time.perf_counter() - t_start
+    return len(orders), fake.calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05, help='Latenza simulata per richiesta (s)')
+    args = parser.parse_args()
+
+    print(f"{'ordini':>8} {'shard':>6} {'richieste':>10} {'tempo (s)':>10}")
+    for n_orders in (1000, 2000, 5000):
+        for shards in (1, 4, 8):
+            fetched, calls, elapsed = run(n_orders, shards, args.latency)
+            print(f"{fetched:>8} {shards:>6} {calls:>10} {elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark dell'estrazione SKU dalle spedizioni GLS "CON RETORNO":
+extract_sku_lines (un solo Series.str.extractall sulla colonna 'observacion')
+rispetto al percorso precedente (DataFrame di una riga per spedizione,
+iterrows, regex compilate per ogni taglia a ogni SKU).
+
+Le pagine sono generate da synthetic.generate_gls_search_page con il volume
+di una ricerca a 4 e a 30 giorni; la parità è verificata sui totali per
+(data, SKU).
+
+Uso:
+    python benchmarks/bench_gls_returns.py
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+
+import extract_sku_con_retorno as gls_returns
+from synthetic import generate_gls_search_page
+
+# Spedizioni per pagina di ricerca (circa 180 al giorno)
+PAGES = {'4 giorni': 720, '30 giorni': 5400}
+
+
+def legacy_normalize_sku(sku):
+    sizes = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
+    for prefix in ('SLIP', 'PER'):
+        for size in sizes:
+            pattern = f'{prefix}{size}\\.'
+            if re.search(pattern, sku):
+                sku = re.sub(pattern, f'{prefix}.{size}.', sku)
+                break
+    return sku
+
+
+def legacy_parse_observacion(observacion):
+    skus = defaultdict(int)
+    for item in [i.strip() for i in observacion.split(',') if i.strip()]:
+        if 'x' in item.lower():
+            sku_part, qty_part = item.lower().rsplit('x', 1)
+            try:
+                qty = int(qty_part.strip())
+            except ValueError:
+                qty = 1
+            sku = legacy_normalize_sku(sku_part.strip().upper().replace(' ', ''))
+        else:
+            qty = 1
+            sku = legacy_normalize_sku(item.upper().replace(' ', ''))
+        if gls_returns.is_valid_sku(sku):
+            skus[sku] = qty
+    return dict(skus)
+
+
+def legacy_lines(df):
+    """extract_sku_from_returns_with_dates prima di extract_sku_lines"""
+    lines = []
+    returns_df = df[df['retorno'].str.upper().str.contains('CON RETORNO', na=False)].copy()
+    for _, row in returns_df.iterrows():
+        observacion = str(row.get('observacion', '')).strip()
+        date_str = datetime.strptime(str(row.get('Fecha')), "%d/%m/%Y").strftime("%Y-%m-%d")
+        if not observacion:
+            continue
+        mini_df = pd.DataFrame([row])
+        mini_returns = mini_df[mini_df['retorno'].str.upper().str.contains('CON RETORNO', na=False)].copy()
+        for _, mini_row in mini_returns.iterrows():
+            for sku, qty in legacy_parse_observacion(str(mini_row.get('observacion', '')).strip()).items():
+                lines.append({"sku": sku, "quantity": qty, "date": date_str})
+    return lines
+
+
+def totals(lines):
+    counter = Counter()
+    for line in lines:
+        counter[(line['date'], line['sku'])] += line['quantity']
+    return counter
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def main():
+    client = gls_returns.GLSExtranetClient()
+    print(f"{'pagina':>10} {'spedizioni':>11} {'CON RETORNO':>12} {'precedente (ms)':>16} {'extractall (ms)':>16}  parità")
+    for label, n_rows in PAGES.items():
+        with mock.patch('builtins.print'):
+            df = client.parse_shipments(generate_gls_search_page(n_rows, days=int(label.split()[0])))
+            t_legacy, expected = timed(lambda: legacy_lines(df), repeat=1)
+            t_new, lines = timed(lambda: gls_returns.extract_sku_lines(df))
+
+        same = totals(lines.to_dict('records')) == totals(expected)
+        print(f"{label:>10} {n_rows:>11} {len(df):>12} {t_legacy * 1000:>16.1f} {t_new * 1000:>16.1f}  {'✅' if same else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Lambda end to end contro i server finti locali (fakes/), senza GLS né
+Shopify di produzione.
+
+Avvia Shopify (GraphQL + REST), SOAP GLS, Google Sheets e un'extranet GLS
+per tipo di pagina risultati (envios per rifiuti, tabella gr per almacenado
+e parcel shop, griglia CON RETORNO per le vendite GLS dello stock), punta le
+Lambda agli endpoint locali e:
+1. esegue una volta ogni handler, comprese le scritture (evasione con
+   GrabaServicios e fulfillmentCreate, tag RIFIUTO, webhook fulfillments/create)
+2. esegue il mix di letture delle dashboard con N richieste concorrenti:
+   throughput, p50/p95, risposte non 200, guasti iniettati e THROTTLED
+
+Gli handler girano in thread nello stesso processo (moduli e store
+condivisi, GIL): il throughput è un limite inferiore rispetto a container
+Lambda separati, ma latenza, errori e rate limit a monte sono quelli
+configurati.
+
+Uso:
+    python benchmarks/bench_handlers_e2e.py
+    python benchmarks/bench_handlers_e2e.py --latency 0.2 --error-rate 0.05 --throttle-rate 0.1
+    python benchmarks/bench_handlers_e2e.py --concurrency 1,8,32 --rounds 3 --orders 5000
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'fakes'))
+
+from fake_gls_extranet import FakeGLSExtranet
+from fake_gls_soap import FakeGLSSoap
+from fake_google_sheets import FakeGoogleSheets
+from fake_shopify import FakeShopify
+from synthetic import (generate_shop_orders, generate_gls_envios_page, generate_gls_gr_page,
+                       generate_gls_search_page, generate_sheet_values)
+
+WEBHOOK_SECRET = 'e2e-secret'
+
+
+def start_servers(args):
+    """Server finti avviati e variabili d'ambiente delle Lambda (prima dell'import)"""
+    faults = {'latency': args.latency, 'jitter': args.latency / 2, 'error_rate': args.error_rate,
+              'throttle_rate': args.throttle_rate, 'seed': 42}
+    nodes = generate_shop_orders(args.orders, days=30)
+    magazzino, arrivo = generate_sheet_values(500)
+    servers = {
+        'shopify': FakeShopify(nodes, **faults),
+        'gls_soap': FakeGLSSoap(**faults),
+        'extranet_envios': FakeGLSExtranet(generate_gls_envios_page(args.shipments, days=4), **faults),
+        'extranet_gr': FakeGLSExtranet(generate_gls_gr_page(args.shipments, days=15), **faults),
+        'extranet_retorno': FakeGLSExtranet(generate_gls_search_page(args.shipments, days=10), **faults),
+        'sheets': FakeGoogleSheets({'Magazzino': magazzino, 'InArrivo': arrivo}),
+    }
+    for server in servers.values():
+        server.start()
+
+    # Spedizioni della tabella gr note al SOAP (azione get_agenzia di almacenado)
+    for i in range(50):
+        servers['gls_soap'].add_shipment(61000000 + i, referencia=str(10000 + i))
+
+    soap_endpoint = servers['gls_soap'].url + 'b2b.asmx'
+    os.environ.update({
+        'DATA_DIR': tempfile.mkdtemp(prefix='bench-e2e-'),
+        'ENABLE_SNAPSHOTS': 'false',
+        'SHOPIFY_GRAPHQL_URL': servers['shopify'].graphql_url,
+        'SHOPIFY_REST_URL': servers['shopify'].rest_url,
+        'SHOPIFY_ACCESS_TOKEN': 'shpat_e2e',
+        'SHOPIFY_GRAPHQL_TOKEN': 'shpat_e2e',
+        'SHOPIFY_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'GLS_SOAP_ENDPOINT': soap_endpoint,
+        'GLS_CUSTOMER_ENDPOINT': soap_endpoint,
+        'GLS_EXTRANET_URL': servers['extranet_gr'].url.rstrip('/'),
+        'GLS_USERNAME': FakeGLSExtranet.USERNAME,
+        'GLS_PASSWORD': FakeGLSExtranet.PASSWORD,
+        'GLS_UID': 'uid-e2e',
+        'GLS_UID_CLIENTE': 'uid-e2e',
+        # Cookie scaduto: lo stock rifà il login e salva i cookie in /tmp
+        'GLS_COOKIES_JSON': json.dumps({'ASP.NET_SessionId': 'scaduto'}),
+        'AWS_LAMBDA_FUNCTION_NAME': 'bench-handlers-e2e',
+        'GOOGLE_SHEETS_API_ENDPOINT': servers['sheets'].url,
+        'GOOGLE_DRIVE_API_ENDPOINT': servers['sheets'].url + 'drive/v3/',
+    })
+    return servers, nodes
+
+
+def build_scenarios(servers, nodes):
+    """(letture concorrenti, scritture eseguite una volta): nome → (handler, evento)"""
+    # Import dopo le variabili d'ambiente: gli endpoint sono letti all'import
+    import extract_sku_con_retorno
+    import lambda_almacenado
+    import lambda_dashboard_stats
+    import lambda_fulfill_order
+    import lambda_fulfillment_check
+    import lambda_parcel_shop
+    import lambda_refunds
+    import lambda_rifiuti_get
+    import lambda_rifiuti_tag
+    import lambda_shopify_webhooks
+    import lambda_stock_api
+    import webhook_replay
+
+    lambda_rifiuti_get.GLS_EXTRANET_URL = servers['extranet_envios'].url.rstrip('/')
+    extract_sku_con_retorno.GLS_EXTRANET_URL = servers['extranet_retorno'].url.rstrip('/')
+
+    def get(params=None):
+        return {'httpMethod': 'GET', 'queryStringParameters': params or {}}
+
+    def post(body):
+        return {'httpMethod': 'POST', 'body': json.dumps(body)}
+
+    reads = {
+        'rifiuti': (lambda_rifiuti_get.lambda_handler, get({'days_back': '4'})),
+        'almacenado': (lambda_almacenado.lambda_handler, post({'days_back': 15})),
+        'parcel-shop': (lambda_parcel_shop.lambda_handler, post({'days_back': 15})),
+        'fulfillment-check': (lambda_fulfillment_check.lambda_handler, get({'days': '4'})),
+        'refunds': (lambda_refunds.lambda_handler, get()),
+        'order-stats': (lambda_dashboard_stats.lambda_handler,
+                        get(lambda_dashboard_stats.default_dashboard_views()[0])),
+        'stock': (lambda_stock_api.lambda_handler, get()),
+    }
+
+    open_orders = [node for node in reversed(nodes) if node['displayFulfillmentStatus'] == 'UNFULFILLED']
+    to_fulfill, already_at_gls, to_tag = open_orders[0], open_orders[1], open_orders[2:4]
+    # Spedizione già registrata oggi per questo albaran: GrabaServicios risponde -70
+    servers['gls_soap'].add_shipment(69000000, referencia=already_at_gls['name'],
+                                     albaran=already_at_gls['name'].replace('#ES', ''))
+
+    def fulfill_event(node):
+        return post({
+            'orderId': node['id'],
+            'orderName': node['name'],
+            'customerName': 'Nome Cognome',
+            'shippingAddress': node['shippingAddress'],
+            'items': [{'sku': edge['node']['sku'], 'quantity': edge['node']['quantity'],
+                       'title': edge['node']['title']} for edge in node['lineItems']['edges']],
+            'totalPrice': node['totalPriceSet']['shopMoney']['amount'],
+            'financialStatus': node['displayFinancialStatus'],
+            'email': 'cliente@example.com',
+        })
+
+    webhook = {'topic': 'fulfillments/create', 'webhook_id': 'e2e-1',
+               'payload': {'order_id': int(to_fulfill['id'].rsplit('/', 1)[1])}}
+    writes = {
+        'almacenado get_agenzia': (lambda_almacenado.lambda_handler,
+                                   post({'action': 'get_agenzia', 'expedicion': '61000001'})),
+        'fulfill-order': (lambda_fulfill_order.lambda_handler, fulfill_event(to_fulfill)),
+        'fulfill-order -70': (lambda_fulfill_order.lambda_handler, fulfill_event(already_at_gls)),
+        'rifiuti-tag': (lambda_rifiuti_tag.lambda_handler, post({'order_ids': [n['id'] for n in to_tag]})),
+        'webhook fulfillments/create': (
+            lambda_shopify_webhooks.lambda_handler,
+            webhook_replay.webhook_event(webhook, WEBHOOK_SECRET, lambda_shopify_webhooks.sign)
+        ),
+    }
+    return reads, writes
+
+
+def outcome(response):
+    """Esito leggibile: stato HTTP + errore/avvisi del body"""
+    status = response.get('statusCode')
+    try:
+        body = json.loads(response.get('body') or '{}')
+    except ValueError:
+        return str(status)
+    if not isinstance(body, dict):
+        return str(status)
+    if body.get('success') is False or body.get('error'):
+        return f"{status} {str(body.get('error'))[:70]}"
+    if body.get('warnings'):
+        return f"{status} {', '.join(body['warnings'])[:70]}"
+    return str(status)
+
+
+def snapshot_counters(servers):
+    return {name: sum(server.requests.values()) for name, server in servers.items()}
+
+
+def run_once(name, handler, event, servers):
+    before = snapshot_counters(servers)
+    t_start = time.perf_counter()
+    try:
+        with mock.patch('builtins.print'):
+            result = outcome(handler(json.loads(json.dumps(event)), None))
+    except Exception as e:
+        result = f"eccezione {type(e).__name__}: {e}"
+    elapsed = (time.perf_counter() - t_start) * 1000
+    after = snapshot_counters(servers)
+    calls = ', '.join(f"{server} {after[server] - before[server]}"
+                      for server in servers if after[server] != before[server])
+    print(f"{name:<28} {elapsed:>7.0f} {result[:48]:<48} {calls}")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_concurrent(reads, servers, concurrency, rounds):
+    """Mix di letture (`rounds` volte ogni handler) con `concurrency` richieste in parallelo"""
+    jobs = list(reads) * rounds
+    faults_before = sum(sum(server.faults.values()) for server in servers.values() if hasattr(server, 'faults'))
+    throttled_before = servers['shopify'].throttled
+
+    def job(name):
+        handler, event = reads[name]
+        t_start = time.perf_counter()
+        try:
+            ok = handler(json.loads(json.dumps(event)), None).get('statusCode') == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - t_start, ok
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor, mock.patch('builtins.print'):
+        results = list(executor.map(job, jobs))
+    elapsed = time.perf_counter() - t_start
+    latencies = [latency * 1000 for latency, _ in results]
+    faults = sum(sum(server.faults.values()) for server in servers.values() if hasattr(server, 'faults'))
+    print(f"{concurrency:>11} {len(jobs):>9} {len(jobs) / elapsed:>8.2f} {statistics.median(latencies):>8.0f} "
+          f"{percentile(latencies, 0.95):>8.0f} {sum(1 for _, ok in results if not ok):>7} "
+          f"{faults - faults_before:>7} {servers['shopify'].throttled - throttled_before:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=3000, help='Ordini nella Shopify finta')
+    parser.add_argument('--shipments', type=int, default=600, help='Spedizioni per pagina GLS')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latenza per richiesta dei server (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Frazione di errori 5xx')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Frazione di richieste rifiutate')
+    parser.add_argument('--concurrency', default='1,4,16', help='Livelli di concorrenza (lista)')
+    parser.add_argument('--rounds', type=int, default=2, help='Esecuzioni di ogni lettura per livello')
+    args = parser.parse_args()
+
+    servers, nodes = start_servers(args)
+    logging.disable(logging.CRITICAL)
+    try:
+        with mock.patch('builtins.print'):
+            reads, writes = build_scenarios(servers, nodes)
+        print(f"🧪 {args.orders} ordini, {args.shipments} spedizioni per pagina, latenza {args.latency}s, "
+              f"errori {args.error_rate:.0%}, throttling {args.throttle_rate:.0%}")
+        print(f"\n{'handler':<28} {'ms':>7} {'esito':<48} richieste ai server")
+        for name, (handler, event) in {**reads, **writes}.items():
+            run_once(name, handler, event, servers)
+
+        print(f"\n{'concorrenza':>11} {'richieste':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'non 200':>7} {'guasti':>7} {'THROTTLED':>10}")
+        for level in [int(value) for value in args.concurrency.split(',')]:
+            run_concurrent(reads, servers, level, args.rounds)
+
+        print("\nRichieste per operazione:")
+        for name, server in servers.items():
+            print(f"   {name:<17} {dict(server.requests)}")
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark della serializzazione JSON per colonne (json_columns) rispetto al
+percorso per riga.
+
+Due uscite da 5000 righe:
+- spedizioni: DataFrame con testi, numeri, date e valori mancanti
+  (NaN/NaT/None/inf). Prima: df.to_dict('records') + clean_for_json
+  ricorsivo (com'era in lambda_almacenado) + json.dumps.
+- stock: la response di lambda_stock_api (stock + ordine fornitore +
+  previsione). Prima: dict per riga (stock_rows / supplier_order_rows,
+  colonne della previsione aggiunte riga per riga) + json.dumps.
+
+Dopo: json_columns.Records + dumps, sia con json (token per colonna) sia con
+orjson se è installato. Verifica che il JSON letto dal client sia identico a
+quello del percorso precedente (con i NaN/NaT a null).
+
+Uso:
+    python benchmarks/bench_json_columns.py
+    python benchmarks/bench_json_columns.py --rows 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pandas as pd
+
+import json_columns
+import lambda_stock_api as api
+from synthetic import generate_shipment_columns, generate_stock_inputs
+
+REPEAT = 5
+
+
+def clean_for_json(obj):
+    """Pulizia ricorsiva valore per valore, com'era in lambda_almacenado"""
+    if isinstance(obj, dict):
+        return {k: clean_for_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [clean_for_json(item) for item in obj]
+    elif isinstance(obj, float) and (np.isnan(obj) or np.isinf(obj)):
+        return None
+    elif hasattr(obj, 'isnull') and obj.isnull():
+        return None
+    else:
+        return obj
+
+
+def legacy_shipments(df):
+    """to_dict('records') + clean_for_json + json.dumps (date come isoformat)"""
+    rows = clean_for_json(df.to_dict('records'))
+    for row in rows:
+        for key in ('fecha', 'actualizacion'):
+            if row[key] is not None and row[key] is not pd.NaT:
+                value = row[key]
+                row[key] = value.date().isoformat() if key == 'fecha' else value.isoformat()
+            else:
+                row[key] = None
+    return json.dumps({'shipments': rows}, ensure_ascii=False)
+
+
+def legacy_stock(columns, previsione):
+    """Dict per riga come prima di json_columns (attach_forecast riga per riga)"""
+    stock_list = api.stock_engine.stock_rows(columns)
+    ordine_list = api.stock_engine.supplier_order_rows(columns)
+    fields = zip(
+        np.round(previsione['livello'], 2).tolist(),
+        np.round(previsione['trend'], 3).tolist(),
+        api.stock_engine.autonomy_for_json(previsione['giorni_autonomia']),
+        previsione['fabbisogno'].tolist(),
+    )
+    for row, (livello, trend, giorni, fabbisogno) in zip(stock_list, fields):
+        row["vendite_previste_giornaliere"] = livello
+        row["trend_vendite"] = trend
+        row["giorni_autonomia_prevista"] = giorni
+        row["fabbisogno_previsto"] = fabbisogno
+    quantita = previsione['fabbisogno'][api.stock_engine.supplier_order_index(columns)].tolist()
+    for row, qty in zip(ordine_list, quantita):
+        row["quantita_prevista"] = qty
+    return json.dumps({'stock': stock_list, 'ordine_fornitore': ordine_list}, ensure_ascii=False)
+
+
+def columns_stock(columns, previsione):
+    stock_list = api.stock_engine.stock_records(columns)
+    ordine_list = api.stock_engine.supplier_order_records(columns)
+    api.attach_forecast(stock_list, ordine_list, columns, previsione)
+    return json_columns.dumps({'stock': stock_list, 'ordine_fornitore': ordine_list})
+
+
+def columns_shipments(df):
+    return json_columns.dumps({'shipments': json_columns.Records.from_frame(df)})
+
+
+def stock_inputs(n_rows):
+    medie, magazzino, arrivo, arretrati = generate_stock_inputs(n_rows)
+    weighted_avg = pd.DataFrame({"sku": list(medie), "media_pesata": list(medie.values())})
+    with mock.patch('builtins.print'):
+        columns = api.build_stock_data(weighted_avg, arrivo, magazzino, arretrati)
+    rng = np.random.default_rng(42)
+    n = len(columns['sku'])
+    livello = rng.uniform(0, 8, n)
+    giorni = np.where(livello > 0.5, columns['magazzino_netto'] / np.maximum(livello, 1e-9), np.inf)
+    previsione = {
+        'livello': livello,
+        'trend': rng.normal(0, 0.1, n),
+        'giorni_autonomia': giorni,
+        'fabbisogno': rng.integers(0, 20, n) * 10,
+    }
+    return columns, previsione
+
+
+def best_ms(fn):
+    timings = []
+    result = None
+    for _ in range(REPEAT):
+        t_start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - t_start) * 1000)
+    return min(timings), result
+
+
+def backends():
+    """(nome, orjson da usare): json sempre, orjson solo se installato"""
+    variants = [('json_columns + json', None)]
+    if json_columns.orjson is not None:
+        variants.append(('json_columns + orjson', json_columns.orjson))
+    return variants
+
+
+def run(label, legacy, current):
+    t_legacy, expected = best_ms(legacy)
+    print(f"\n{label}")
+    print(f"{'variante':<28} {'ms':>8} {'x':>6} {'KB':>8}  parità")
+    print(f"{'per riga + json.dumps':<28} {t_legacy:>8.1f} {1:>6.1f} {len(expected.encode()) / 1024:>8.1f}")
+    parsed = json.loads(expected)
+    for name, backend in backends():
+        with mock.patch.object(json_columns, 'orjson', backend):
+            t_current, body = best_ms(current)
+        same = json.loads(body) == parsed
+        print(f"{name:<28} {t_current:>8.1f} {t_legacy / t_current:>6.1f} {len(body.encode()) / 1024:>8.1f}  "
+              f"{'✅' if same else '❌'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000, help='Righe per uscita (spedizioni e SKU)')
+    args = parser.parse_args()
+
+    df = pd.DataFrame(generate_shipment_columns(args.rows))
+    missing = int(df.isna().sum().sum()) + int(np.isinf(df['kgs']).sum())
+    run(f"📦 spedizioni: {len(df)} righe × {len(df.columns)} colonne, {missing} valori NaN/NaT/None/inf",
+        lambda: legacy_shipments(df), lambda: columns_shipments(df))
+
+    columns, previsione = stock_inputs(args.rows)
+    n_ordine = len(api.stock_engine.supplier_order_index(columns))
+    run(f"📊 stock: {len(columns['sku'])} SKU + {n_ordine} righe ordine fornitore, con previsione",
+        lambda: legacy_stock(columns, previsione), lambda: columns_stock(columns, previsione))
+
+
+if __name__ == '__main__':
+    main()
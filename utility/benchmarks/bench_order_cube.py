@@ -0,0 +1,134 @@
+"""
+Benchmark del cubo OLAP ordini (order_cube) di lambda_dashboard_stats.
+
+Costruisce il cubo dalle colonne di order_frame e misura alcune query
+tipiche della dashboard (fatturato per financial status per settimana, resi
+per tag per mese, ordini per giorno filtrati...), confrontandole con un
+raggruppamento Python ordine per ordine sugli stessi nodi.
+
+Verifica che:
+- il totale per tag coincida con order_frame.counters (orders_by_tag, total_revenue)
+- gli ordini per giorno coincidano con orders_by_date
+- ogni query coincida con il raggruppamento ordine per ordine
+- aggiornare solo gli ultimi giorni dia lo stesso cubo del ricalcolo completo
+
+Uso:
+    python benchmarks/bench_order_cube.py
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import order_cube
+import order_frame
+from synthetic import generate_dashboard_orders
+
+DAYS = 730
+SIZES = (50_000, 500_000)
+
+QUERIES = {
+    'fatturato × financial × settimana': dict(group_by=['financial'], granularity='week'),
+    'ordini × tag × mese': dict(group_by=['tag'], granularity='month'),
+    'resi/cambi × fulfillment': dict(group_by=['tag', 'fulfillment'], filters={'tag': ['RESO', 'CAMBIO']}),
+    'ordini pagati per giorno': dict(filters={'payment': ['fully_paid']}, granularity='day'),
+    'tutte le dimensioni × mese': dict(group_by=list(order_cube.DIMENSIONS), granularity='month'),
+}
+
+
+def period_of(day_iso, granularity):
+    if granularity == 'week':
+        day = date.fromisoformat(day_iso)
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == 'month':
+        return day_iso[:7]
+    return day_iso
+
+
+def python_query(columns, group_by=(), filters=None, granularity=None):
+    """Stesso raggruppamento, ordine per ordine sulle colonne"""
+    filters = filters or {}
+    codes = {name: order_cube._cell_codes(columns, name).tolist() for name in order_cube.DIMENSIONS}
+    days = [order_frame._iso_day(day) if day >= 0 else None for day in columns['day'].tolist()]
+    groups = {}
+    for i, status in enumerate(columns['status'].tolist()):
+        if status != order_frame.COUNTED or days[i] is None:
+            continue
+        values = {name: order_cube.DIMENSIONS[name][codes[name][i]] for name in order_cube.DIMENSIONS}
+        if any(values[name] not in allowed for name, allowed in filters.items()):
+            continue
+        key = ((period_of(days[i], granularity),) if granularity else ()) + tuple(values[n] for n in group_by)
+        count, revenue = groups.get(key, (0, 0.0))
+        amount = columns['revenue'][i]
+        groups[key] = (count + 1, revenue + (0.0 if amount != amount else float(amount)))
+    return groups
+
+
+def as_groups(rows, group_by, granularity):
+    return {
+        ((row['period'],) if granularity else ()) + tuple(row[n] for n in group_by): (row['count'], row['revenue'])
+        for row in rows
+    }
+
+
+def same_groups(expected, got):
+    return expected.keys() == got.keys() and all(
+        expected[key][0] == got[key][0] and abs(expected[key][1] - got[key][1]) < 0.01 for key in expected
+    )
+
+
+def build(columns, days):
+    cube = order_cube.OrderCube()
+    cube.replace_days(days, columns)
+    return cube
+
+
+def main():
+    for n_orders in SIZES:
+        columns = order_frame.order_columns(generate_dashboard_orders(n_orders, days=DAYS))
+        dated = columns['day'][columns['day'] >= 0]
+        days = [order_frame._iso_day(day) for day in range(int(dated.min()), int(dated.max()) + 1)]
+
+        t_start = time.perf_counter()
+        cube = build(columns, days)
+        t_build = time.perf_counter() - t_start
+        print(f"\n{n_orders} ordini, {cube.n_days} giorni: cubo costruito in {t_build * 1000:.0f} ms "
+              f"({(cube.count.nbytes + cube.revenue.nbytes) / 1e6:.1f} MB)")
+
+        # Parità con le statistiche
+        totals, orders_by_date = order_frame.counters(columns)
+        by_tag = {row['tag']: row for row in cube.query(group_by=['tag'])}
+        by_day = {row['period']: row['count'] for row in cube.query(granularity='day')}
+        same_tags = all(by_tag[tag]['count'] == totals['orders_by_tag'][tag] for tag in order_frame.TAG_CLASSES)
+        same_revenue = abs(sum(row['revenue'] for row in by_tag.values()) - totals['total_revenue']) < 0.05
+        print(f"   parità counters: tag {'✅' if same_tags else '❌'}  fatturato {'✅' if same_revenue else '❌'}  "
+              f"per giorno {'✅' if by_day == orders_by_date else '❌'}")
+
+        print(f"   {'query':<36} {'cubo (ms)':>10} {'ciclo (ms)':>11} {'righe':>6}  parità")
+        for name, query in QUERIES.items():
+            t_start = time.perf_counter()
+            rows = cube.query(**query)
+            t_cube = time.perf_counter() - t_start
+            t_start = time.perf_counter()
+            expected = python_query(columns, **query)
+            t_loop = time.perf_counter() - t_start
+            got = as_groups(rows, query.get('group_by', []), query.get('granularity'))
+            print(f"   {name:<36} {t_cube * 1000:>10.2f} {t_loop * 1000:>11.0f} {len(rows):>6}  "
+                  f"{'✅' if same_groups(expected, got) else '❌':>5}")
+
+        # Aggiornamento incrementale: ultimi 3 giorni ricalcolati su un cubo costruito senza di loro
+        recent = days[-3:]
+        older = columns['day'] < order_frame.day_number(recent[0])
+        partial = build(order_frame._subset(columns, older), days[:-3])
+        t_start = time.perf_counter()
+        partial.replace_days(recent, columns)
+        t_update = time.perf_counter() - t_start
+        same = (partial.first_day == cube.first_day and (partial.count == cube.count).all()
+                and abs(partial.revenue - cube.revenue).max() < 1e-6)
+        print(f"   aggiornamento ultimi 3 giorni: {t_update * 1000:.1f} ms  {'✅' if same else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark delle statistiche ordini di lambda_dashboard_stats: ciclo Python
+ordine per ordine (versione precedente di calculate_order_stats) contro
+colonne NumPy + bincount (order_frame).
+
+Verifica che contatori, percentuali e timeline coincidano (fatturato a meno
+di arrotondamenti della somma) e misura separatamente:
+- conversione dei nodi in colonne (una visita Python per ordine, come il ciclo)
+- aggregazione bincount sul totale e per giorno
+- ricostruzione dalle righe già classificate salvate da order_rollup
+  (niente nodi da rileggere: è il percorso dei ricalcoli dei rollup)
+
+Uso:
+    python benchmarks/bench_order_stats.py
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_dashboard_stats as dashboard
+import order_frame
+from synthetic import generate_dashboard_orders
+
+
+def legacy_counters(orders):
+    """Ciclo di calculate_order_stats prima di order_frame"""
+    stats = order_frame.empty_counters()
+    orders_by_date = {}
+    for edge in orders:
+        order = edge.get('node', {})
+        if order.get('cancelledAt'):
+            stats['cancelled_orders'] += 1
+            continue
+        order_tags = order.get('tags', [])
+        if isinstance(order_tags, str):
+            order_tags = [t.strip() for t in order_tags.split(',')]
+        if any(t.upper() == 'TEST' for t in order_tags):
+            continue
+        stats['total_orders'] += 1
+        created_at = order.get('createdAt', '')
+        if created_at:
+            order_date = created_at.split('T')[0]
+            orders_by_date[order_date] = orders_by_date.get(order_date, 0) + 1
+        tags = order.get('tags', [])
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(',')]
+        tag_found = False
+        for tag in tags:
+            tag_upper = tag.upper()
+            if 'RESO' in tag_upper:
+                stats['orders_by_tag']['RESO'] += 1
+                tag_found = True
+                break
+            elif 'CAMBIO' in tag_upper:
+                stats['orders_by_tag']['CAMBIO'] += 1
+                tag_found = True
+                break
+            elif 'RIFIUT' in tag_upper:
+                stats['orders_by_tag']['RIFIUTO'] += 1
+                tag_found = True
+                break
+        if not tag_found:
+            stats['orders_by_tag']['other'] += 1
+        fulfillment = order.get('displayFulfillmentStatus', 'UNFULFILLED')
+        if fulfillment in stats['fulfillment_status']:
+            stats['fulfillment_status'][fulfillment] += 1
+        financial = order.get('displayFinancialStatus', 'PENDING')
+        if financial in stats['financial_status']:
+            stats['financial_status'][financial] += 1
+        if order.get('fullyPaid'):
+            stats['payment_status']['fully_paid'] += 1
+        elif order.get('unpaid'):
+            stats['payment_status']['unpaid'] += 1
+        else:
+            stats['payment_status']['partially_paid'] += 1
+        refunds = order.get('refunds', [])
+        if refunds and len(refunds) > 0:
+            stats['orders_with_refunds'] += 1
+        shop_money = order.get('currentTotalPriceSet', {}).get('shopMoney', {})
+        try:
+            stats['total_revenue'] += float(shop_money.get('amount', '0'))
+            if stats['currency'] == 'EUR':
+                stats['currency'] = shop_money.get('currencyCode', 'EUR')
+        except (ValueError, TypeError):
+            pass
+    return stats, orders_by_date
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def same_stats(expected, got):
+    revenue_ok = abs(expected['total_revenue'] - got['total_revenue']) <= 0.011
+    strip = lambda stats: {k: v for k, v in stats.items() if k != 'total_revenue'}
+    return revenue_ok and strip(expected) == strip(got)
+
+
+def main():
+    print(f"{'ordini':>9} {'ciclo (ms)':>11} {'colonne (ms)':>13} {'bincount (ms)':>14} "
+          f"{'per giorno (ms)':>16} {'da righe (ms)':>14} {'speedup righe':>14}  parità")
+    for n_orders in (100_000, 1_000_000):
+        nodes = generate_dashboard_orders(n_orders, days=730)
+        # Qualche ordine con tag in stringa e importo non leggibile
+        nodes[0]['tags'] = 'Reso, VIP'
+        nodes[1]['currentTotalPriceSet'] = {'shopMoney': {'amount': 'n/a'}}
+        edges = [{'node': node} for node in nodes]
+        start_date = nodes[0]['createdAt'][:10]
+        end_date = datetime.utcnow().strftime('%Y-%m-%d')
+
+        t_legacy, (legacy_stats, legacy_dates) = timed(lambda: legacy_counters(edges), repeat=1)
+        order_frame.tag_info.cache_clear()
+        t_columns, columns = timed(lambda: order_frame.order_columns(edges))
+        t_counters, (stats, orders_by_date) = timed(lambda: order_frame.counters(columns))
+        t_daily, by_day = timed(lambda: order_frame.daily_counters(columns))
+        records = order_frame.column_records(columns)
+        t_records, (stats_records, _) = timed(
+            lambda: order_frame.counters(order_frame.columns_from_records(records))
+        )
+
+        expected = dashboard.finalize_stats(legacy_stats, legacy_dates, start_date, end_date)
+        got = dashboard.finalize_stats(stats, orders_by_date, start_date, end_date)
+        daily_total = order_frame.empty_counters()
+        for counters in by_day.values():
+            order_frame.merge_counters(daily_total, counters)
+        ok = (
+            same_stats(expected, got)
+            and same_stats(legacy_counters(edges)[0], daily_total)
+            and {day: c['total_orders'] for day, c in by_day.items() if c['total_orders']} == legacy_dates
+            and same_stats(legacy_counters(edges)[0], stats_records)
+        )
+        print(f"{n_orders:>9} {t_legacy * 1000:>11.0f} {t_columns * 1000:>13.0f} {t_counters * 1000:>14.1f} "
+              f"{t_daily * 1000:>16.1f} {t_records * 1000:>14.0f} {t_legacy / t_records:>13.1f}x  "
+              f"{'✅' if ok else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
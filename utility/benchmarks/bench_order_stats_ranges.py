@@ -0,0 +1,100 @@
+"""
+Benchmark dei periodi multipli di lambda_dashboard_stats (compare / ranges).
+
+Senza rollup (ENABLE_ORDER_ROLLUP=false), confronta per periodi di durata
+crescente:
+- una richiesta per periodo (corrente, precedente, anno scorso): tre download
+- una richiesta con compare=previous,last_year: una sola paginazione sugli
+  intervalli uniti (corrente + precedente contigui, anno scorso in OR)
+
+Shopify è simulato con FakeShopifyOrders (latenza fissa per pagina). Le pagine
+scaricate restano circa le stesse (gli ordini sono quelli), cambiano le
+scansioni e le invocazioni Lambda. Verifica che le statistiche di ogni periodo
+coincidano con quelle della richiesta singola.
+
+Uso:
+    python benchmarks/bench_order_stats_ranges.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_dashboard_stats as dashboard
+import snapshots
+from synthetic import generate_dashboard_orders, FakeShopifyOrders
+
+ORDERS_PER_DAY = 60
+HISTORY_DAYS = 500
+LATENCY = 0.02
+COMPARE = 'previous,last_year'
+
+
+def request(params):
+    response = dashboard.lambda_handler({'queryStringParameters': params}, None)
+    assert response['statusCode'] == 200, response['body']
+    return json.loads(response['body'])
+
+
+class ScanCounter:
+    """Conta le paginazioni (chiamate a fetch_all_orders) di lambda_dashboard_stats"""
+
+    def __init__(self):
+        self.scans = 0
+        self._fetch = dashboard.fetch_all_orders
+
+    def __call__(self, *args, **kwargs):
+        self.scans += 1
+        return self._fetch(*args, **kwargs)
+
+
+def comparable(stats):
+    return {key: value for key, value in stats.items() if key not in ('metadata', 'ranges')}
+
+
+def main():
+    nodes = generate_dashboard_orders(HISTORY_DAYS * ORDERS_PER_DAY, days=HISTORY_DAYS)
+    fake = FakeShopifyOrders(nodes, latency=LATENCY)
+    end = datetime.utcnow()
+
+    print(f"{'giorni':>7} {'3 richieste (ms)':>17} {'scansioni':>10} {'pagine':>7} "
+          f"{'compare (ms)':>13} {'scansioni':>10} {'pagine':>7}  parità")
+    for days in (7, 30, 90):
+        start_date = (end - timedelta(days=days)).strftime('%Y-%m-%d')
+        end_date = end.strftime('%Y-%m-%d')
+        params = {'start_date': start_date, 'end_date': end_date}
+        ranges = dashboard.parse_ranges({'compare': COMPARE}, start_date, end_date)
+
+        counter = ScanCounter()
+        with mock.patch.object(dashboard.requests, 'post', fake.post), \
+                mock.patch.object(dashboard, 'fetch_all_orders', counter), \
+                mock.patch.object(dashboard, 'ENABLE_ORDER_ROLLUP', False), \
+                mock.patch.object(snapshots, 'ENABLE_SNAPSHOTS', False), \
+                mock.patch('builtins.print'):
+            fake.calls = 0
+            t_start = time.perf_counter()
+            separate = {
+                name: request({'start_date': start, 'end_date': stop})
+                for name, (start, stop) in ranges.items()
+            }
+            t_separate = time.perf_counter() - t_start
+            calls_separate, scans_separate = fake.calls, counter.scans
+
+            fake.calls = counter.scans = 0
+            t_start = time.perf_counter()
+            combined = request({**params, 'compare': COMPARE})
+            t_combined = time.perf_counter() - t_start
+            calls_combined, scans_combined = fake.calls, counter.scans
+
+        got = {dashboard.MAIN_RANGE: combined, **combined['ranges']}
+        same = all(comparable(got[name]) == comparable(separate[name]) for name in ranges)
+        print(f"{days:>7} {t_separate * 1000:>17.0f} {scans_separate:>10} {calls_separate:>7} "
+              f"{t_combined * 1000:>13.0f} {scans_combined:>10} {calls_combined:>7}  {'✅' if same else '❌':>5}")
+
+
+if __name__ == '__main__':
+    main()
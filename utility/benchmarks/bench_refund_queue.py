@@ -0,0 +1,101 @@
+"""
+Benchmark della coda rimborsi incrementale di lambda_refunds (refund_queue).
+
+Simula Shopify con FakeShopifyOrders (latenza fissa per pagina) e una
+giornata di aggiornamenti della pagina Rimborsi: tra un refresh e l'altro
+alcuni ordini entrano in coda (tag RESO + DA RIMBORSARE), altri ne escono
+(rimborso fatto, tag rimosso) e altri vengono modificati senza toccare i tag.
+
+Confronta, per backlog crescenti:
+- scansione completa dei tag a ogni refresh (percorso senza coda)
+- sincronizzazione incrementale updated_at + coda locale
+
+e verifica che a ogni refresh la coda coincida con la scansione completa
+(stessi ordini, stesso ordine, stessi dati).
+
+Uso:
+    python benchmarks/bench_refund_queue.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_refunds as refunds
+import refund_queue
+from synthetic import generate_dashboard_orders, FakeShopifyOrders
+
+HISTORY_DAYS = 730
+ORDERS_PER_DAY = 60
+LATENCY = 0.02
+REFRESHES = 8
+CHANGES_PER_REFRESH = 15
+QUEUE_TAGS = ['RESO', 'DA RIMBORSARE']
+# Minuti tra le modifiche del negozio e il refresh della pagina
+SYNC_AHEAD = 1
+
+
+def tag_backlog(nodes, share, rng):
+    """Mette in coda una quota degli ordini (resi in attesa di rimborso)"""
+    for node in rng.sample(nodes, int(len(nodes) * share)):
+        node['tags'] = list(QUEUE_TAGS)
+
+
+def simulate_changes(nodes, rng, count, clock):
+    """Modifiche del negozio tra due refresh: ordini che entrano, escono o cambiano"""
+    stamp = clock.strftime('%Y-%m-%dT%H:%M:%SZ')
+    for node in rng.sample(nodes, count):
+        action = rng.choice(('enter', 'leave', 'edit'))
+        if action == 'enter':
+            node['tags'] = list(QUEUE_TAGS)
+        elif action == 'leave':
+            node['tags'] = ['RESO', 'RIMBORSATO']
+        else:
+            node['note'] = f"modificato {stamp}"
+        node['updatedAt'] = stamp
+
+
+def main():
+    print(f"{'backlog':>8} {'scansione (ms)':>15} {'chiamate':>9} {'incrementale (ms)':>18} {'chiamate':>9}  parità")
+    for share in (0.005, 0.02, 0.05):
+        rng = random.Random(7)
+        nodes = generate_dashboard_orders(HISTORY_DAYS * ORDERS_PER_DAY, days=HISTORY_DAYS)
+        tag_backlog(nodes, share, rng)
+        fake = FakeShopifyOrders(nodes, latency=LATENCY)
+        queue = refund_queue.RefundQueue(':memory:')
+
+        clock = datetime.utcnow()
+        t_scan = t_sync = 0.0
+        calls_scan = calls_sync = 0
+        same = True
+        with mock.patch.object(refunds.requests, 'post', fake.post), mock.patch('builtins.print'):
+            refunds.sync_refund_queue(queue, QUEUE_TAGS, now=clock)  # primo caricamento completo
+            for _ in range(REFRESHES):
+                clock += timedelta(minutes=30)
+                simulate_changes(nodes, rng, CHANGES_PER_REFRESH, clock)
+
+                fake.calls = 0
+                t_start = time.perf_counter()
+                expected = refunds.fetch_orders_with_tags(QUEUE_TAGS)
+                t_scan += time.perf_counter() - t_start
+                calls_scan += fake.calls
+
+                fake.calls = 0
+                t_start = time.perf_counter()
+                refunds.sync_refund_queue(queue, QUEUE_TAGS, now=clock + timedelta(minutes=SYNC_AHEAD))
+                got = queue.orders()
+                t_sync += time.perf_counter() - t_start
+                calls_sync += fake.calls
+
+                same = same and got == expected
+
+        print(f"{len(expected):>8} {t_scan / REFRESHES * 1000:>15.0f} {calls_scan / REFRESHES:>9.1f} "
+              f"{t_sync / REFRESHES * 1000:>18.0f} {calls_sync / REFRESHES:>9.1f}  {'✅' if same else '❌':>5}")
+
+
+if __name__ == '__main__':
+    main()
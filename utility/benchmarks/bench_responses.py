@@ -0,0 +1,161 @@
+"""
+Benchmark delle risposte compatte (responses) sulle liste di spedizioni GLS.
+
+Le spedizioni vengono dal parser di lambda_almacenado su una tabella gr
+sintetica (stessi 24 campi per riga di /almacenado e /parcel-shop). Confronta:
+- json.dumps(indent=2)          body di /parcel-shop prima di responses
+- json.dumps                    body di /almacenado prima di responses
+- compatto                      responses.json_response
+- compatto + fields             i 9 campi usati dalla pagina Parcel Shop
+- + gzip / br                   Accept-Encoding su HTTP API (br solo con brotli installato)
+- + limit=200                   prima pagina a cursore (handler con snapshot,
+                                in una cartella temporanea: la pagina arriva dallo snapshot)
+
+Per ogni variante: byte trasferiti, tempo lato Lambda (serializzazione,
+proiezione, compressione) e tempo di parse lato client (decompressione +
+json.loads, come proxy di response.json() nel browser). Le righe sintetiche
+si ripetono molto più di quelle vere: i rapporti di gzip/br sono ottimistici,
+quelli di fields e limit no.
+
+Uso:
+    python benchmarks/bench_responses.py
+    python benchmarks/bench_responses.py --rows 12000
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Snapshot delle varianti paginate in una cartella temporanea
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bench-responses-')
+os.environ.pop('SNAPSHOT_STORE', None)
+
+import lambda_almacenado
+import responses
+import snapshots
+from synthetic import generate_gls_gr_page
+
+PARCEL_SHOP_FIELDS = 'expedicion,referencia,destinatario,direccion,localidad,cp_dst,fecha,pod,phone'
+REPEAT = 5
+
+
+def build_result(rows):
+    with redirect_stdout(StringIO()):
+        shipments = lambda_almacenado.GLSExtranetClient().parse_shipments(generate_gls_gr_page(rows))
+    return {
+        'metadata': {'extraction_date': '2026-10-19T08:00:00', 'period': '05/10/2026 - 19/10/2026',
+                     'total_shipments': len(shipments), 'status_filter': 'NO ENTREGADO con Reembolso != 0'},
+        'shipments': shipments,
+    }
+
+
+def best_ms(fn):
+    timings = []
+    result = None
+    for _ in range(REPEAT):
+        t_start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - t_start) * 1000)
+    return min(timings), result
+
+
+def client_parse(response):
+    """Decompressione (come fa il browser con Content-Encoding) + json.loads"""
+    body = response['body']
+    encoding = (response.get('headers') or {}).get('Content-Encoding')
+    if response.get('isBase64Encoded'):
+        raw = base64.b64decode(body)
+        if encoding == 'gzip':
+            raw = gzip.decompress(raw)
+        elif encoding == 'br':
+            raw = responses.brotli.decompress(raw)
+        return json.loads(raw)
+    return json.loads(body)
+
+
+def transfer_bytes(response):
+    body = response['body']
+    return len(base64.b64decode(body)) if response.get('isBase64Encoded') else len(body.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=6000, help='Righe della tabella gr (circa metà diventano spedizioni)')
+    args = parser.parse_args()
+
+    result = build_result(args.rows)
+    print(f"📦 {len(result['shipments'])} spedizioni, {len(result['shipments'][0])} campi per spedizione\n")
+
+    def legacy(indent):
+        return lambda: {'statusCode': 200, 'headers': dict(responses.CORS_HEADERS),
+                        'body': json.dumps(result, indent=indent, ensure_ascii=False)}
+
+    def compute(event, context):
+        return responses.json_response(result)
+
+    # limit/cursor solo su risposte da snapshot (come /almacenado e /parcel-shop)
+    paged_handler = responses.shaped(collections=['shipments'])(snapshots.materialized('bench-responses')(compute))
+
+    def shaped(params, accept_encoding=None):
+        if 'limit' in params or 'cursor' in params:
+            handler = paged_handler
+        else:
+            handler = responses.shaped(collections=['shipments'])(compute)
+        # Evento HTTP API (payload 2.0): l'unico compresso senza COMPRESS_REST_RESPONSES
+        event = {'version': '2.0', 'httpMethod': 'POST', 'body': json.dumps({'days_back': 14, **params}),
+                 'headers': {'Accept-Encoding': accept_encoding} if accept_encoding else {}}
+        def call():
+            with redirect_stdout(StringIO()):
+                return handler(event, None)
+        return call
+
+    variants = [
+        ('json.dumps(indent=2)', legacy(2)),
+        ('json.dumps', legacy(None)),
+        ('compatto', shaped({})),
+        ('compatto + fields', shaped({'fields': PARCEL_SHOP_FIELDS})),
+        ('compatto + gzip', shaped({}, 'gzip, deflate')),
+        ('fields + gzip', shaped({'fields': PARCEL_SHOP_FIELDS}, 'gzip, deflate')),
+    ]
+    if responses.brotli is not None:
+        variants.append(('fields + br', shaped({'fields': PARCEL_SHOP_FIELDS}, 'gzip, deflate, br')))
+    variants.append(('fields + gzip + limit=200', shaped({'fields': PARCEL_SHOP_FIELDS, 'limit': 200}, 'gzip')))
+
+    print(f"{'variante':<28} {'KB':>9} {'x':>6} {'lambda ms':>10} {'client ms':>10}")
+    baseline = None
+    for name, build in variants:
+        lambda_ms, response = best_ms(build)
+        client_ms, _ = best_ms(lambda: client_parse(response))
+        size = transfer_bytes(response)
+        baseline = baseline or size
+        print(f"{name:<28} {size / 1024:>9.1f} {baseline / size:>6.1f} {lambda_ms:>10.1f} {client_ms:>10.1f}")
+
+    # La proiezione non deve perdere né alterare i valori dei campi richiesti
+    projected = client_parse(shaped({'fields': PARCEL_SHOP_FIELDS}, 'gzip')())
+    fields = PARCEL_SHOP_FIELDS.split(',')
+    expected = [{name: item[name] for name in fields} for item in result['shipments']]
+    print(f"\n{'✅' if projected['shipments'] == expected else '❌'} fields: valori identici alla risposta completa")
+
+    # Le pagine a cursore ricompongono la lista completa
+    pages, cursor = [], None
+    while True:
+        params = {'fields': PARCEL_SHOP_FIELDS, 'limit': 500, **({'cursor': cursor} if cursor else {})}
+        page = client_parse(shaped(params)())
+        pages.extend(page['shipments'])
+        cursor = page['page']['next_cursor']
+        if not cursor:
+            break
+    print(f"{'✅' if pages == expected else '❌'} cursore: {len(pages)} spedizioni in "
+          f"{-(-len(expected) // 500)} pagine, lista ricomposta identica")
+
+
+if __name__ == '__main__':
+    main()
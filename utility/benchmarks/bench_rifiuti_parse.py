@@ -0,0 +1,110 @@
+"""
+Benchmark del parsing della ricerca MiraEnvios in lambda_rifiuti_get:
+parse_shipments con lxml/XPath (tabelle non DEVOLUCION scartate prima di
+estrarre il testo) rispetto al percorso precedente con BeautifulSoup
+(find_all su tutte le tabelle e tutte le celle).
+
+Senza argomenti usa pagine generate da synthetic.generate_gls_envios_page
+col volume di una ricerca a 4 e a 30 giorni; si possono passare pagine
+registrate (HTML salvato della risposta di search_shipments). La parità è
+verificata sulle devoluciones ADIBODY ES restituite dalla Lambda.
+
+Uso:
+    python benchmarks/bench_rifiuti_parse.py
+    python benchmarks/bench_rifiuti_parse.py registrazioni/envios-4.html registrazioni/envios-30.html
+"""
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bs4 import BeautifulSoup
+
+import lambda_rifiuti_get as rifiuti
+from synthetic import generate_gls_envios_page
+
+# Spedizioni per pagina di ricerca (circa 180 al giorno)
+PAGES = {'4 giorni': 720, '30 giorni': 5400}
+# Budget del parsing: la Lambda deve restare nei 29s di API Gateway insieme
+# a login, ricerca GLS e arricchimento Shopify
+PARSE_BUDGET_MS = 1000
+
+
+def legacy_parse_shipments(html_content):
+    """parse_shipments con BeautifulSoup, prima di lxml/XPath"""
+    soup = BeautifulSoup(html_content, 'lxml')
+    envios_div = soup.find('div', id='envios')
+    if not envios_div:
+        return []
+    shipments = []
+    for table in envios_div.find_all('table', class_=['tb', 'atb']):
+        rows = table.find_all('tr')
+        if len(rows) < 5:
+            continue
+        shipment = {}
+        row1_ths = rows[0].find_all(['th', 'td'])
+        if len(row1_ths) >= 2:
+            shipment['expedicion'] = row1_ths[0].get_text(strip=True)
+            shipment['referencia'] = row1_ths[1].get_text(strip=True)
+        if len(row1_ths) >= 4:
+            shipment['estado'] = row1_ths[2].get_text(strip=True)
+        row2_tds = rows[1].find_all('td')
+        if len(row2_tds) >= 6:
+            shipment['fecha'] = row2_tds[0].get_text(strip=True)
+            shipment['servicio'] = row2_tds[1].get_text(strip=True)
+        row3_tds = rows[2].find_all('td')
+        if len(row3_tds) >= 1:
+            shipment['destinatario'] = row3_tds[0].get_text(strip=True)
+        row4_tds = rows[3].find_all('td')
+        if len(row4_tds) >= 2:
+            shipment['localidad'] = row4_tds[1].get_text(strip=True)
+        shipments.append(shipment)
+    return shipments
+
+
+def adibody_returns(shipments):
+    """Filtro della Lambda sulle spedizioni estratte"""
+    return [
+        s for s in shipments
+        if s.get('servicio', '').upper() == 'DEVOLUCION' and 'ADIBODY ES' in s.get('destinatario', '').upper()
+    ]
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = {}
+        for path in sys.argv[1:]:
+            with open(path, encoding='utf-8') as f:
+                pages[os.path.basename(path)] = f.read()
+    else:
+        pages = {label: generate_gls_envios_page(n, days=int(label.split()[0])) for label, n in PAGES.items()}
+
+    client = rifiuti.GLSExtranetClient()
+    print(f"{'pagina':>12} {'KB':>6} {'spedizioni':>11} {'rientri':>8} "
+          f"{'BeautifulSoup (ms)':>19} {'lxml (ms)':>10}  budget  parità")
+    for label, html in pages.items():
+        with mock.patch('builtins.print'):
+            t_legacy, legacy = timed(lambda: legacy_parse_shipments(html), repeat=1)
+            t_new, devoluciones = timed(lambda: client.parse_shipments(html, servicio='DEVOLUCION'))
+
+        expected = adibody_returns(legacy)
+        same = adibody_returns(devoluciones) == expected
+        within = t_new * 1000 <= PARSE_BUDGET_MS
+        print(f"{label:>12} {len(html) // 1024:>6} {len(legacy):>11} {len(expected):>8} "
+              f"{t_legacy * 1000:>19.1f} {t_new * 1000:>10.1f}  {'✅' if within else '❌':>6}  {'✅' if same else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
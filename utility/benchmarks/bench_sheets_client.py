@@ -0,0 +1,99 @@
+"""
+Benchmark e verifica di sheets_client contro l'endpoint finto locale.
+
+Confronta il percorso precedente (build() a ogni invocazione + due
+values().get) con il client condiviso (servizio in cache, un batchGet,
+dati riusati finché la revisione del foglio non cambia) e verifica che una
+modifica al foglio invalidi la cache.
+
+Uso:
+    python benchmarks/bench_sheets_client.py [--skus 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'fakes'))
+
+from fake_google_sheets import FakeGoogleSheets
+
+
+def sheet_rows(n_skus, qty):
+    rows = [['MODELO', 'TALLA', 'SKU', 'CANTIDAD']]
+    rows += [[f"SLIP {i}", 'M', f"SLIP.M.{i}", str(qty)] for i in range(n_skus)]
+    return rows
+
+
+def legacy_read(service_factory, sheet_id, parse):
+    """Percorso precedente: servizio nuovo e una get per foglio"""
+    service = service_factory()
+    values = [
+        service.spreadsheets().values().get(spreadsheetId=sheet_id, range=r).execute().get('values', [])
+        for r in ('Magazzino!A:D', 'InArrivo!A:D')
+    ]
+    return parse(*values)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skus', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+
+    fake = FakeGoogleSheets({
+        'Magazzino': sheet_rows(args.skus, 10),
+        'InArrivo': sheet_rows(args.skus, 5),
+    }).start()
+    os.environ['GOOGLE_SHEETS_API_ENDPOINT'] = fake.url
+    os.environ['GOOGLE_DRIVE_API_ENDPOINT'] = fake.url + 'drive/v3/'
+    os.environ.pop('GOOGLE_CREDENTIALS_JSON', None)
+
+    import sheets_client
+    from googleapiclient.discovery import build
+    from lambda_stock_api import parse_stock_sheets, GOOGLE_SHEET_ID
+
+    def legacy_service():
+        return build('sheets', 'v4', credentials=sheets_client._load_credentials(),
+                     client_options={'api_endpoint': fake.url})
+
+    ranges = ['Magazzino!A:D', 'InArrivo!A:D']
+    try:
+        t_start = time.perf_counter()
+        for _ in range(args.calls):
+            expected = legacy_read(legacy_service, GOOGLE_SHEET_ID, parse_stock_sheets)
+        legacy = (time.perf_counter() - t_start) / args.calls
+
+        fake.requests.clear()
+        t_start = time.perf_counter()
+        first = sheets_client.read_parsed(GOOGLE_SHEET_ID, ranges, parse_stock_sheets)
+        cold = time.perf_counter() - t_start
+
+        t_start = time.perf_counter()
+        with mock.patch('builtins.print'):
+            for _ in range(args.calls):
+                warm_result = sheets_client.read_parsed(GOOGLE_SHEET_ID, ranges, parse_stock_sheets)
+        warm = (time.perf_counter() - t_start) / args.calls
+        warm_requests = dict(fake.requests)
+
+        assert first == expected and warm_result == expected, "Dati diversi dal percorso precedente"
+
+        # Modifica del foglio: la revisione cambia e la cache va invalidata
+        fake.update_sheet('Magazzino', sheet_rows(args.skus, 99))
+        updated, _ = sheets_client.read_parsed(GOOGLE_SHEET_ID, ranges, parse_stock_sheets)
+        assert set(updated.values()) == {99}, "Cache non invalidata dopo modifica del foglio"
+    finally:
+        fake.stop()
+
+    print(f"SKU per foglio: {args.skus}")
+    print(f"Precedente (build + 2 get):   {legacy * 1000:8.1f} ms/chiamata")
+    print(f"Client condiviso, a freddo:    {cold * 1000:8.1f} ms")
+    print(f"Client condiviso, foglio invariato: {warm * 1000:8.1f} ms/chiamata")
+    print(f"Richieste a regime ({args.calls + 1} letture): {warm_requests}")
+    print("✅ Invalidazione su modifica del foglio verificata")
+
+
+if __name__ == '__main__':
+    main()
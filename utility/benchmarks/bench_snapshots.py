@@ -0,0 +1,86 @@
+"""
+Benchmark degli snapshot materializzati (snapshots) su /order-stats e /refunds.
+
+Shopify è simulato con FakeShopifyOrders (latenza fissa per pagina), senza
+rollup né coda rimborsi: ogni calcolo rifà il download completo, come gli
+endpoint prima degli snapshot. Per ogni endpoint misura:
+- richiesta senza snapshot (calcolo completo, salvataggio)
+- stessa richiesta servita dallo snapshot
+- ?fresh=1 (ricalcolo forzato)
+- refresh programmato ({"snapshot_refresh": true}) seguito dalla vista di default
+
+Gli snapshot vanno in una cartella temporanea (LocalSnapshotStore). Verifica
+che il body servito dallo snapshot coincida con quello calcolato.
+
+Uso:
+    python benchmarks/bench_snapshots.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_dashboard_stats as dashboard
+import lambda_refunds as refunds
+import snapshots
+from synthetic import generate_dashboard_orders, FakeShopifyOrders
+
+ORDERS_PER_DAY = 60
+HISTORY_DAYS = 120
+LATENCY = 0.05
+
+
+def timed_request(handler, params, fake):
+    fake.calls = 0
+    t_start = time.perf_counter()
+    response = handler({'httpMethod': 'GET', 'queryStringParameters': params}, None)
+    elapsed = time.perf_counter() - t_start
+    assert response['statusCode'] == 200, response['body']
+    return elapsed, fake.calls, response
+
+
+def comparable(response):
+    """Body senza metadata (data di estrazione, durata)"""
+    return {key: value for key, value in json.loads(response['body']).items() if key != 'metadata'}
+
+
+def main():
+    nodes = generate_dashboard_orders(HISTORY_DAYS * ORDERS_PER_DAY, days=HISTORY_DAYS)
+    for node in nodes[::8]:
+        node['tags'] = list(refunds.REQUIRED_TAGS)
+    fake = FakeShopifyOrders(nodes, latency=LATENCY)
+    endpoints = {
+        'order-stats': (dashboard.lambda_handler, dashboard.default_dashboard_views()[0]),
+        'refunds': (refunds.lambda_handler, {}),
+    }
+
+    print(f"{'endpoint':<12} {'caso':<22} {'ms':>9} {'chiamate':>9} {'età (s)':>8}  parità")
+    with tempfile.TemporaryDirectory() as root, \
+            mock.patch.object(snapshots, '_store', snapshots.LocalSnapshotStore(root)), \
+            mock.patch.object(snapshots, 'ENABLE_SNAPSHOTS', True), \
+            mock.patch.object(dashboard.requests, 'post', fake.post), \
+            mock.patch.object(dashboard, 'ENABLE_ORDER_ROLLUP', False), \
+            mock.patch.object(refunds, 'ENABLE_REFUND_QUEUE', False):
+        for name, (handler, params) in endpoints.items():
+            with mock.patch('builtins.print'):
+                cases = [
+                    ('senza snapshot', timed_request(handler, params, fake)),
+                    ('da snapshot', timed_request(handler, params, fake)),
+                    ('fresh=1', timed_request(handler, {**params, 'fresh': '1'}, fake)),
+                ]
+                handler({snapshots.REFRESH_EVENT_KEY: True}, None)
+                cases.append(('dopo refresh', timed_request(handler, params, fake)))
+
+            computed = comparable(cases[0][1][2])
+            for label, (elapsed, calls, response) in cases:
+                same = comparable(response) == computed
+                age = response['headers'].get('X-Snapshot-Age', '-')
+                print(f"{name:<12} {label:<22} {elapsed * 1000:>9.1f} {calls:>9} {age:>8}  {'✅' if same else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark allocazione stock per priorità (stock_allocation) rispetto al
+controllo indipendente per ordine di categorize_order.
+
+Uso:
+    python benchmarks/bench_stock_allocation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lambda_fulfillment_check import categorize_order, parse_sku
+from stock_allocation import allocate_stock
+from synthetic import generate_order_nodes, generate_stock_dict, nodes_to_fulfillment_orders
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def main():
+    stock_dict = generate_stock_dict(max_qty=40)
+    print(f"{'ordini':>8} {'righe':>8} {'allocazione (ms)':>17} {'triage completo (ms)':>21} {'GREEN indip.':>13} {'GREEN alloc.':>13}")
+    for n_orders in (1000, 5000, 20000):
+        orders = nodes_to_fulfillment_orders(generate_order_nodes(n_orders, days=30))
+        n_lines = sum(len(o['line_items']) for o in orders)
+
+        t_alloc, allocations = timed(lambda: allocate_stock(orders, stock_dict, parse_sku))
+        t_full, _ = timed(lambda: [
+            categorize_order(o, stock_dict, a)
+            for o, a in zip(orders, allocate_stock(orders, stock_dict, parse_sku))
+        ])
+
+        independent = sum(categorize_order(o, stock_dict)[1]['can_fulfill'] for o in orders)
+        allocated = sum(a['allocated'] for a in allocations)
+        print(f"{n_orders:>8} {n_lines:>8} {t_alloc * 1000:>17.1f} {t_full * 1000:>21.1f} {independent:>13} {allocated:>13}")
+
+
+if __name__ == '__main__':
+    main()
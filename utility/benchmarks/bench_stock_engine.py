@@ -0,0 +1,162 @@
+"""
+Benchmark del motore di riassortimento (stock_engine) rispetto alla versione
+precedente di build_stock_data (DataFrame.apply riga per riga + iterrows).
+
+Verifica anche che stock, ordine fornitore e summary coincidano, e misura la
+valutazione di più scenari di parametri (matrice scenario × SKU) rispetto a
+un ricalcolo completo per scenario.
+
+Uso:
+    python benchmarks/bench_stock_engine.py
+"""
+import math
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pandas as pd
+
+import lambda_stock_api as api
+from synthetic import generate_stock_inputs
+
+
+def legacy_response(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders):
+    """build_stock_data + assemblaggio response come prima di stock_engine"""
+    df = weighted_avg.copy()
+    missing_skus = (set(magazzino_attuale) | set(arrivo_fornitore)) - set(df["sku"])
+    if missing_skus:
+        df = pd.concat([df, pd.DataFrame([{"sku": s, "media_pesata": 0} for s in missing_skus])], ignore_index=True)
+
+    df["magazzino_attuale"] = df["sku"].map(magazzino_attuale).fillna(0).astype(int)
+    df["in_arrivo"] = df["sku"].map(arrivo_fornitore).fillna(0).astype(int)
+    df["totale_disponibile"] = df["magazzino_attuale"] + df["in_arrivo"]
+    df["ordini_arretrati"] = df["sku"].map(backorders).fillna(0).astype(int)
+    df["magazzino_netto"] = df["totale_disponibile"] - df["ordini_arretrati"]
+    df["giorni_autonomia"] = df.apply(
+        lambda row: row["magazzino_netto"] / row["media_pesata"] if row["media_pesata"] > 0 else float('inf'),
+        axis=1
+    )
+    df["autonomia_tra_transito"] = df["giorni_autonomia"] - api.GIORNI_TRANSITO
+
+    def calcola_fabbisogno(row):
+        if row["media_pesata"] <= 0:
+            return 0
+        grezzo = max(0, (api.GIORNI_TARGET_SCORTA - row["autonomia_tra_transito"]) * row["media_pesata"])
+        return max(10, math.ceil(grezzo / 10) * 10) if grezzo > 0 else 0
+
+    df["fabbisogno"] = df.apply(calcola_fabbisogno, axis=1).astype(int)
+    df["urgenza"] = df["giorni_autonomia"].apply(
+        lambda g: "CRITICO" if g < api.SOGLIA_CRITICA else ("ORDINARE" if g < api.SOGLIA_ALLARME else "OK")
+    )
+    df[["modelo", "talla"]] = df["sku"].apply(lambda x: pd.Series(api.parse_sku(x)))
+    df["order"] = df["sku"].map({sku: i for i, sku in enumerate(magazzino_attuale)})
+    df = df.sort_values("order", na_position='last').drop(columns=["order"])
+
+    stock = {
+        row["sku"]: (int(row["magazzino_netto"]), round(float(row["media_pesata"]), 2), row["urgenza"],
+                     round(float(row["giorni_autonomia"]), 1) if row["giorni_autonomia"] != float('inf') else 999)
+        for _, row in df.iterrows()
+    }
+    df_ordine = df[df["urgenza"].isin(["CRITICO", "ORDINARE"])]
+    ordine = {row["sku"]: int(row["fabbisogno"]) for _, row in df_ordine.iterrows()}
+    return stock, ordine, int(df_ordine["fabbisogno"].sum())
+
+
+def engine_response(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders):
+    columns = api.build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders)
+    return (
+        api.stock_engine.stock_rows(columns),
+        api.stock_engine.supplier_order_rows(columns),
+        api.stock_engine.summarize(columns),
+    )
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def main():
+    print(f"{'SKU':>8} {'apply+iterrows (ms)':>20} {'stock_engine (ms)':>18} {'speedup':>8}  parità")
+    for n_skus in (1000, 10000):
+        medie, magazzino, arrivo, arretrati = generate_stock_inputs(n_skus)
+        weighted_avg = pd.DataFrame({"sku": list(medie), "media_pesata": list(medie.values())})
+        args = (weighted_avg, arrivo, magazzino, arretrati)
+
+        with mock.patch('builtins.print'):
+            t_legacy, (stock, ordine, pezzi) = timed(lambda: legacy_response(*args), repeat=1)
+            t_engine, (stock_rows, ordine_rows, summary) = timed(lambda: engine_response(*args))
+
+        same = (
+            {r["sku"]: (r["magazzino_netto"], r["media_vendite_giornaliere"], r["urgenza"], r["giorni_autonomia"])
+             for r in stock_rows} == stock
+            and {r["sku"]: r["quantita"] for r in ordine_rows} == ordine
+            and summary["totale_pezzi_ordine"] == pezzi
+            and [r["sku"] for r in stock_rows][:len(magazzino)] == list(magazzino)
+        )
+        print(f"{n_skus:>8} {t_legacy * 1000:>20.1f} {t_engine * 1000:>18.1f} {t_legacy / t_engine:>7.0f}x  {'✅' if same else '❌'}")
+
+    bench_scenarios()
+
+
+def scenario_list(n_scenarios):
+    """Scenari di esempio: transito e moltiplicatore crescenti"""
+    return [
+        {
+            "nome": f"S{i}",
+            "giorni_target_scorta": api.GIORNI_TARGET_SCORTA,
+            "giorni_transito": api.GIORNI_TRANSITO + 2 * i,
+            "soglia_critica": api.SOGLIA_CRITICA,
+            "soglia_allarme": api.GIORNI_TARGET_SCORTA + api.GIORNI_TRANSITO + 2 * i,
+            "moltiplicatore_crescita_vendite": 1 + 0.05 * i,
+        }
+        for i in range(n_scenarios)
+    ]
+
+
+def scenarios_one_by_one(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders, scenarios):
+    """Un build_stock_data completo per scenario (parametri patchati nel modulo)"""
+    results = []
+    for scenario in scenarios:
+        with mock.patch.multiple(
+            api,
+            GIORNI_TARGET_SCORTA=scenario["giorni_target_scorta"],
+            GIORNI_TRANSITO=scenario["giorni_transito"],
+            SOGLIA_CRITICA=scenario["soglia_critica"],
+            SOGLIA_ALLARME=scenario["soglia_allarme"],
+            MOLTIPLICATORE_CRESCITA_VENDITE=scenario["moltiplicatore_crescita_vendite"],
+        ):
+            columns = api.build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders)
+        results.append(api.stock_engine.supplier_order_rows(columns))
+    return results
+
+
+def scenarios_matrix(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders, scenarios):
+    columns = api.build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders)
+    return [result["ordine_fornitore"].rows() for result in api.scenario_results(columns, scenarios)]
+
+
+def bench_scenarios(n_skus=10000, n_scenarios=10):
+    medie, magazzino, arrivo, arretrati = generate_stock_inputs(n_skus)
+    weighted_avg = pd.DataFrame({"sku": list(medie), "media_pesata": list(medie.values())})
+    args = (weighted_avg, arrivo, magazzino, arretrati, scenario_list(n_scenarios))
+
+    with mock.patch('builtins.print'):
+        t_loop, expected = timed(lambda: scenarios_one_by_one(*args))
+        t_matrix, got = timed(lambda: scenarios_matrix(*args))
+
+    print(f"\n{n_scenarios} scenari × {n_skus} SKU")
+    print(f"{'ricalcolo per scenario (ms)':>28} {'matrice (ms)':>13} {'speedup':>8}  parità")
+    print(f"{t_loop * 1000:>28.1f} {t_matrix * 1000:>13.1f} {t_loop / t_matrix:>7.1f}x  {'✅' if got == expected else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
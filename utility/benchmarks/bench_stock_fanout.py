@@ -0,0 +1,77 @@
+"""
+Benchmark del fan-out sorgenti di lambda_stock_api: latenza end-to-end con
+sorgenti simulate (sleep) rispetto alla somma delle latenze in sequenza, e
+risposta parziale quando GLS supera la deadline.
+
+Uso:
+    python benchmarks/bench_stock_fanout.py
+"""
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_stock_api as api
+from synthetic import generate_sales_lines, generate_stock_inputs
+
+# Latenze tipiche misurate in produzione (secondi)
+LATENCIES = {'sheets': 0.4, 'shopify_orders': 1.2, 'gls_returns': 2.0, 'backorders': 0.8}
+
+
+def slow(seconds, value):
+    def fn(*args, **kwargs):
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def run_handler(latencies, deadlines):
+    _, magazzino, arrivo, arretrati = generate_stock_inputs(500)
+    shopify_lines = generate_sales_lines(3000, n_skus=500)
+    gls_lines = [
+        {'sku': line['sku'], 'quantity': line['current_quantity'], 'date': line['created_at'][:10]}
+        for line in generate_sales_lines(200, n_skus=500, gls_share=0, seed=7)
+    ]
+    patches = [
+        mock.patch.object(api, 'open_sales_ledger', lambda: None),
+        mock.patch.object(api, 'load_stock_sheets', slow(latencies['sheets'], (magazzino, arrivo))),
+        mock.patch.object(api, 'fetch_shopify_orders', slow(latencies['shopify_orders'], shopify_lines)),
+        mock.patch.object(api, 'get_gls_returns_skus', slow(latencies['gls_returns'], gls_lines)),
+        mock.patch.object(api, 'fetch_backorders', slow(latencies['backorders'], arretrati)),
+        mock.patch.object(api, 'ENABLE_GLS_CHECKS', True),
+        mock.patch.object(api, 'SOURCE_DEADLINES', deadlines),
+        mock.patch('builtins.print'),
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        t_start = time.perf_counter()
+        result = api.lambda_handler({}, None)
+        return time.perf_counter() - t_start, result
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+
+
+def main():
+    sequential = sum(LATENCIES.values())
+
+    elapsed, result = run_handler(LATENCIES, {name: 10 for name in LATENCIES})
+    body = json.loads(result['body'])
+    print(f"Somma sorgenti in sequenza:     {sequential * 1000:7.0f} ms")
+    print(f"Fan-out (sorgente più lenta {max(LATENCIES.values()) * 1000:.0f} ms): {elapsed * 1000:7.0f} ms"
+          f"  partial={body['partial']}")
+
+    deadlines = {**{name: 10 for name in LATENCIES}, 'gls_returns': 1.0}
+    elapsed, result = run_handler({**LATENCIES, 'gls_returns': 5.0}, deadlines)
+    body = json.loads(result['body'])
+    print(f"GLS lento (5 s, deadline 1 s):  {elapsed * 1000:7.0f} ms"
+          f"  status={result['statusCode']} partial={body['partial']} warnings={body['warnings']}")
+    print(f"Metriche sorgenti: {body['sources']}")
+
+
+if __name__ == '__main__':
+    main()
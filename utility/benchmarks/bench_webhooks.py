@@ -0,0 +1,177 @@
+"""
+Benchmark dei webhook Shopify (lambda_shopify_webhooks) sugli store locali.
+
+Simula Shopify con FakeShopifyOrders e qualche ora di attività del negozio
+(ordini nuovi, cancellati, spediti, resi da rimborsare e rimborsati) in
+passi da 15 minuti. A ogni passo le stesse modifiche:
+- arrivano come webhook firmati (via webhook_replay, con duplicati e
+  consegne fuori ordine) a un rollup ordini e a una coda rimborsi; le letture
+  di dashboard e Rimborsi saltano il polling (riallineamento ogni ora)
+- oppure vengono raccolte col polling a ogni lettura (percorso senza webhook)
+
+Confronta le chiamate Shopify delle letture e verifica a ogni passo che gli
+store alimentati dai webhook coincidano con gli ordini veri.
+
+Uso:
+    python benchmarks/bench_webhooks.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import lambda_dashboard_stats as dashboard
+import lambda_refunds as refunds
+import lambda_shopify_webhooks as webhooks
+import order_rollup
+import refund_queue
+import webhook_replay
+from synthetic import generate_dashboard_orders, order_webhook_payload, FakeShopifyOrders
+
+HISTORY_DAYS = 120
+ORDERS_PER_DAY = 60
+LATENCY = 0.02
+STEPS = 16
+STEP_MINUTES = 15
+CHANGES_PER_STEP = 12
+QUEUE_TAGS = ['RESO', 'DA RIMBORSARE']
+
+
+class Shop:
+    """Ordini veri del negozio e webhook generati dalle modifiche"""
+
+    def __init__(self, nodes, rng):
+        self.nodes = nodes
+        self.rng = rng
+        self.next_id = 9000000
+        self.sent = []
+
+    def _webhook(self, topic, payload):
+        webhook = {'topic': topic, 'webhook_id': f"wh-{len(self.sent)}", 'payload': payload}
+        self.sent.append(webhook)
+        return webhook
+
+    def change(self, clock):
+        """Una modifica casuale, restituisce i webhook che Shopify invierebbe"""
+        stamp = clock.strftime('%Y-%m-%dT%H:%M:%SZ')
+        action = self.rng.choice(('create', 'queue', 'refunded', 'cancel', 'fulfill'))
+        if action == 'create':
+            self.next_id += 1
+            node = {
+                'id': f"gid://shopify/Order/{self.next_id}", 'createdAt': stamp, 'updatedAt': stamp,
+                'cancelledAt': None, 'tags': [], 'currentTotalPriceSet': {'shopMoney': {'amount': '49.90'}},
+                'displayFulfillmentStatus': 'UNFULFILLED', 'displayFinancialStatus': 'PAID',
+                'fullyPaid': True, 'unpaid': False, 'refunds': [],
+            }
+            self.nodes.append(node)
+            return [self._webhook('orders/create', order_webhook_payload(node))]
+
+        # Il payload REST non distingue ON_HOLD da UNFULFILLED: solo ordini senza blocco
+        node = self.rng.choice([n for n in self.nodes[-3000:] if n['displayFulfillmentStatus'] != 'ON_HOLD'])
+        previous = order_webhook_payload(node)
+        node['updatedAt'] = stamp
+        if action == 'queue':
+            node['tags'] = list(QUEUE_TAGS)
+        elif action == 'refunded':
+            node['tags'] = ['RESO', 'RIMBORSATO']
+            node['refunds'] = [{'id': f"gid://shopify/Refund/{self.next_id}"}]
+            node['displayFinancialStatus'] = 'REFUNDED'
+        elif action == 'cancel':
+            node['cancelledAt'] = stamp
+        else:
+            node['displayFulfillmentStatus'] = 'FULFILLED'
+            order_id = int(node['id'].rsplit('/', 1)[1])
+            return [self._webhook('fulfillments/create', {'id': order_id * 10, 'order_id': order_id})]
+
+        topic = 'orders/cancelled' if action == 'cancel' else 'orders/updated'
+        sent = [self._webhook(topic, order_webhook_payload(node))]
+        if self.rng.random() < 0.2:
+            sent.append(sent[0])                                          # duplicato
+        if self.rng.random() < 0.2:
+            sent.append({'topic': 'orders/updated', 'webhook_id': f"wh-old-{len(self.sent)}",
+                         'payload': previous})                            # fuori ordine
+        return sent
+
+
+def truth(nodes, start_date, end_date):
+    stats = dashboard.calculate_order_stats(
+        [n for n in nodes if start_date <= n['createdAt'][:10] <= end_date], start_date, end_date)
+    queue = {(n['id'], tuple(sorted(n['tags']))) for n in nodes if refund_queue.has_tags(n, QUEUE_TAGS)}
+    return stats, queue
+
+
+def store_view(rollup, queue, start_date, end_date):
+    stats = dashboard.finalize_stats(*rollup.counters(start_date, end_date), start_date, end_date)
+    return stats, {(o['id'], tuple(sorted(o['tags']))) for o in queue.orders()}
+
+
+def main():
+    rng = random.Random(3)
+    nodes = generate_dashboard_orders(HISTORY_DAYS * ORDERS_PER_DAY, days=HISTORY_DAYS)
+    for node in rng.sample(nodes, len(nodes) // 50):
+        node['tags'] = list(QUEUE_TAGS)
+    shop = Shop(nodes, rng)
+    fake = FakeShopifyOrders(nodes, latency=LATENCY)
+    start_date = nodes[0]['createdAt'][:10]
+
+    fed = (order_rollup.OrderRollup(':memory:'), refund_queue.RefundQueue(':memory:'))
+    polled = (order_rollup.OrderRollup(':memory:'), refund_queue.RefundQueue(':memory:'))
+    clock = datetime.utcnow()
+    calls = {'webhook': 0, 'polling': 0}
+    delivered = 0
+    t_webhooks = 0.0
+    outcomes = {}
+    same_steps = 0
+
+    with mock.patch.object(dashboard.requests, 'post', fake.post), \
+            mock.patch.object(dashboard, 'START_DATE_ORDERS', start_date), \
+            mock.patch.object(webhooks, 'START_DATE_ORDERS', start_date), \
+            mock.patch.object(webhooks, 'SHOPIFY_WEBHOOK_SECRET', webhook_replay.REPLAY_SECRET), \
+            mock.patch.dict(webhooks._stores, {'rollup': fed[0], 'refund_queue': fed[1]}, clear=True), \
+            mock.patch('builtins.print'):
+        for rollup, queue in (fed, polled):
+            dashboard.refresh_rollup(rollup, now=clock)
+            refunds.sync_refund_queue(queue, QUEUE_TAGS, now=clock)
+
+        for _ in range(STEPS):
+            clock += timedelta(minutes=STEP_MINUTES)
+            batch = [webhook for _ in range(CHANGES_PER_STEP) for webhook in shop.change(clock)]
+
+            fake.calls = 0
+            t_start = time.perf_counter()
+            for outcome, count in webhook_replay.replay(batch).items():
+                outcomes[outcome] = outcomes.get(outcome, 0) + count
+            t_webhooks += time.perf_counter() - t_start
+            delivered += len(batch)
+
+            # Letture (dashboard + Rimborsi) poco dopo le modifiche
+            read_at = clock + timedelta(minutes=1)
+            for mode, (rollup, queue) in (('webhook', fed), ('polling', polled)):
+                fake.calls = 0
+                dashboard.refresh_rollup(rollup, now=read_at)
+                refunds.sync_refund_queue(queue, QUEUE_TAGS, now=read_at)
+                calls[mode] += fake.calls
+
+            end_date = read_at.strftime('%Y-%m-%d')
+            expected = truth(nodes, start_date, end_date)
+            got = store_view(*fed, start_date, end_date)
+            same_steps += all(
+                {k: v for k, v in a.items() if k != 'metadata'} == {k: v for k, v in b.items() if k != 'metadata'}
+                if isinstance(a, dict) else a == b
+                for a, b in zip(expected, got)
+            )
+
+    print(f"{delivered} webhook in {STEPS} passi da {STEP_MINUTES} minuti: "
+          f"{t_webhooks / delivered * 1000:.1f} ms per webhook")
+    print("   esiti: " + ", ".join(f"{outcome} {count}" for outcome, count in sorted(outcomes.items())))
+    print(f"   chiamate Shopify delle letture: polling {calls['polling']}, webhook {calls['webhook']}")
+    print(f"   store alimentati dai webhook = ordini veri: {same_steps}/{STEPS} passi "
+          f"{'✅' if same_steps == STEPS else '❌'}")
+
+
+if __name__ == '__main__':
+    main()
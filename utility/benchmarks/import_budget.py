@@ -0,0 +1,114 @@
+"""
+Budget di import per ogni handler Lambda (cold start).
+
+Per ogni modulo lancia un interprete pulito con `python -X importtime`,
+legge il tempo cumulativo di import del modulo handler e fallisce (exit 1)
+se supera il budget. Adatto alla CI:
+
+    python benchmarks/import_budget.py            # tutti gli handler
+    python benchmarks/import_budget.py --top 5    # mostra anche gli import più costosi
+    python benchmarks/import_budget.py --runs 5   # mediana su 5 esecuzioni
+
+Il budget misura solo l'import del modulo: pandas, numpy, bs4 e le librerie
+Google devono restare caricati in modo ritardato (lazy_imports) finché un
+percorso non li usa davvero.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+UTILITY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Budget in millisecondi (import cumulativo del modulo, requests incluso)
+BUDGETS_MS = {
+    'lambda_stock_api': 250,
+    'lambda_fulfillment_check': 200,
+    'lambda_almacenado': 200,
+    'lambda_parcel_shop': 200,
+    'lambda_rifiuti_get': 200,
+    'lambda_rifiuti_tag': 200,
+    'lambda_dashboard_stats': 200,
+    'lambda_refunds': 200,
+    'lambda_fulfill_order': 200,
+    'lambda_shopify_webhooks': 200,
+}
+
+# Moduli che non devono comparire tra gli import a freddo
+FORBIDDEN_AT_IMPORT = ['pandas', 'numpy', 'bs4', 'googleapiclient', 'google.oauth2']
+
+
+def measure(module):
+    """
+    Returns:
+        tuple (ms cumulativi del modulo, lista (ms, nome) di tutti gli import)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=UTILITY_DIR, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import di {module} fallito:\n{result.stderr[-2000:]}")
+
+    entries = []
+    total_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        top_level = len(name) - len(name.lstrip()) == 1
+        name = name.strip()
+        entries.append((int(cumulative_us) / 1000, name))
+        if name == module and top_level:
+            total_us = int(cumulative_us)
+    if total_us is None:
+        raise RuntimeError(f"Riga importtime per {module} non trovata")
+    return total_us / 1000, entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='*', help='Handler da misurare (default: tutti)')
+    parser.add_argument('--runs', type=int, default=3, help='Esecuzioni per modulo (si usa la mediana)')
+    parser.add_argument('--top', type=int, default=0, help='Mostra gli N import più costosi')
+    args = parser.parse_args()
+
+    modules = args.modules or list(BUDGETS_MS)
+    failures = []
+
+    print(f"{'modulo':<28} {'mediana (ms)':>13} {'budget (ms)':>12}  esito")
+    for module in modules:
+        samples = []
+        entries = []
+        for _ in range(args.runs):
+            total_ms, entries = measure(module)
+            samples.append(total_ms)
+        median_ms = statistics.median(samples)
+        budget = BUDGETS_MS.get(module, 200)
+
+        loaded = {name for _, name in entries}
+        eager = [m for m in FORBIDDEN_AT_IMPORT if m in loaded]
+        ok = median_ms <= budget and not eager
+        if not ok:
+            failures.append(module)
+
+        status = '✅' if ok else '❌'
+        if eager:
+            status += f" import non ritardati: {', '.join(eager)}"
+        print(f"{module:<28} {median_ms:>13.1f} {budget:>12}  {status}")
+
+        if args.top:
+            nested = sorted((e for e in entries if e[1] != module), reverse=True)[:args.top]
+            for ms, name in nested:
+                print(f"    {ms:>8.1f} ms  {name}")
+
+    if failures:
+        print(f"\n❌ Budget superato: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Tutti gli handler rispettano il budget di import")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark delle aggregazioni: statistiche ordini della dashboard, media
+pesata vendite, dati stock e categorizzazione degli ordini da evadere.
+"""
+import json
+
+import pytest
+
+import lambda_dashboard_stats
+import lambda_fulfillment_check
+import lambda_stock_api
+import stock_allocation
+from conftest import RECORDED, read_recorded
+from lazy_imports import lazy_import
+from synthetic import (
+    generate_dashboard_orders, generate_order_nodes, generate_sales_lines, generate_stock_dict, generate_stock_inputs,
+    graphql_orders_pages, nodes_to_fulfillment_orders,
+)
+
+pd = lazy_import('pandas')
+
+
+def order_pages(size, generate):
+    """Body delle pagine GraphQL orders (registrate o generate da `size` ordini)"""
+    if size == RECORDED:
+        return read_recorded('orders_pages.json')
+    return graphql_orders_pages(generate(size))
+
+
+def page_nodes(pages):
+    return [edge['node'] for body in pages for edge in json.loads(body)['data']['orders']['edges']]
+
+
+@pytest.mark.recording('orders_pages.json')
+def bench_decode_orders_pages(benchmark, size):
+    pages = order_pages(size, lambda n: generate_dashboard_orders(n, days=365))
+    benchmark(page_nodes, pages)
+
+
+@pytest.mark.recording('orders_pages.json')
+def bench_calculate_order_stats(benchmark, size):
+    nodes = page_nodes(order_pages(size, lambda n: generate_dashboard_orders(n, days=365)))
+    days = sorted(node['createdAt'][:10] for node in nodes)
+    benchmark(lambda_dashboard_stats.calculate_order_stats, nodes, days[0], days[-1])
+
+
+def bench_calculate_weighted_average(benchmark, size):
+    sku_data = generate_sales_lines(size, days=12)
+    benchmark(lambda_stock_api.calculate_weighted_average, sku_data, days=10)
+
+
+def bench_build_stock_data(benchmark, size):
+    medie, magazzino, arrivo, arretrati = generate_stock_inputs(size)
+    weighted_avg = pd.DataFrame({'sku': list(medie), 'media_pesata': list(medie.values())})
+    benchmark(lambda_stock_api.build_stock_data, weighted_avg, arrivo, magazzino, arretrati)
+
+
+@pytest.mark.recording('orders_pages.json')
+def bench_categorize_orders(benchmark, size):
+    nodes = page_nodes(order_pages(size, lambda n: generate_order_nodes(n, days=30)))
+    orders = nodes_to_fulfillment_orders(nodes)
+    stock_dict = generate_stock_dict(max_qty=40)
+
+    def categorize_all():
+        allocations = stock_allocation.allocate_stock(orders, stock_dict, lambda_fulfillment_check.parse_sku)
+        return [lambda_fulfillment_check.categorize_order(o, stock_dict, a) for o, a in zip(orders, allocations)]
+
+    benchmark(categorize_all)
+
@@ -0,0 +1,113 @@
+"""
+Benchmark dei parser: pagine MiraEnvios (envios, gr, griglia gv), risposte
+SOAP GLS, valori dei fogli Google ed estrazione SKU dalle osservazioni.
+"""
+from unittest import mock
+
+import pytest
+
+import extract_sku_con_retorno as gls_returns
+import lambda_almacenado
+import lambda_fulfill_order
+import lambda_fulfillment_check
+import lambda_parcel_shop
+import lambda_rifiuti_get
+import lambda_stock_api
+from conftest import RECORDED, read_recorded
+from synthetic import (
+    generate_gls_envios_page, generate_gls_gr_page, generate_gls_search_page, generate_sheet_values,
+    soap_getexpcli_response, soap_grabaservicios_response,
+)
+
+GLS_ORDER = {
+    'orderId': 'gid://shopify/Order/1000001', 'orderName': '#ES10001', 'customerName': 'Nombre Apellido',
+    'shippingAddress': {'address1': 'Calle Mayor 1', 'city': 'Sevilla', 'zip': '41001', 'country': 'ES',
+                        'phone': '600000000'},
+    'items': [{'sku': 'SLIP.M.BE', 'quantity': 2, 'title': 'Slip'}],
+    'totalPrice': '39.90', 'financialStatus': 'pending', 'email': 'cliente@example.com',
+}
+
+
+def page(size, recording, generate):
+    return read_recorded(recording) if size == RECORDED else generate(size)
+
+
+def sheet_values(size):
+    if size == RECORDED:
+        values = read_recorded('sheets_values.json')
+        return values['magazzino'], values['arrivo']
+    return generate_sheet_values(size)
+
+
+@pytest.mark.recording('envios.html')
+def bench_rifiuti_envios_parse_shipments(benchmark, size):
+    html = page(size, 'envios.html', lambda n: generate_gls_envios_page(n, days=30))
+    client = lambda_rifiuti_get.GLSExtranetClient()
+    benchmark(client.parse_shipments, html, servicio='DEVOLUCION')
+
+
+@pytest.mark.recording('gr.html')
+def bench_almacenado_gr_parse_shipments(benchmark, size):
+    html = page(size, 'gr.html', generate_gls_gr_page)
+    client = lambda_almacenado.GLSExtranetClient()
+    benchmark(client.parse_shipments, html)
+
+
+@pytest.mark.recording('gr.html')
+def bench_parcel_shop_gr_parse_shipments(benchmark, size):
+    html = page(size, 'gr.html', generate_gls_gr_page)
+    client = lambda_parcel_shop.GLSExtranetClient()
+    # Il telefono arriva da Shopify riga per riga: qui si misura solo il parsing
+    with mock.patch.object(client, 'get_phone_from_shopify', lambda referencia: None):
+        benchmark(client.parse_shipments, html)
+
+
+@pytest.mark.recording('gv.html')
+def bench_con_retorno_gv_parse_shipments(benchmark, size):
+    html = page(size, 'gv.html', generate_gls_search_page)
+    client = gls_returns.GLSExtranetClient()
+    benchmark(client.parse_shipments, html)
+
+
+@pytest.mark.recording('gv.html')
+def bench_con_retorno_extract_sku_lines(benchmark, size):
+    html = page(size, 'gv.html', generate_gls_search_page)
+    df = gls_returns.GLSExtranetClient().parse_shipments(html)
+    benchmark(gls_returns.extract_sku_lines, df)
+
+
+@pytest.mark.recording('getexpcli.xml')
+def bench_fulfill_getexpcli_tracking(benchmark, size, soap_post):
+    body = page(size, 'getexpcli.xml', soap_getexpcli_response)
+    with mock.patch.object(lambda_fulfill_order.requests, 'post', soap_post(body)):
+        result = benchmark(lambda_fulfill_order.get_gls_tracking_by_reference, '#ES10001')
+    assert result['success']
+
+
+@pytest.mark.recording('getexpcli.xml')
+def bench_almacenado_getexpcli_codplaza(benchmark, size, soap_post):
+    body = page(size, 'getexpcli.xml', soap_getexpcli_response)
+    client = lambda_almacenado.GLSExtranetClient()
+    with mock.patch.object(lambda_almacenado.requests, 'post', soap_post(body)):
+        assert benchmark(client.get_codplaza_org_from_soap, '61000001', 'uid')
+
+
+@pytest.mark.recording('grabaservicios.xml')
+@pytest.mark.sizes(1)
+def bench_fulfill_grabaservicios(benchmark, size, soap_post):
+    body = page(size, 'grabaservicios.xml', soap_grabaservicios_response)
+    with mock.patch.object(lambda_fulfill_order.requests, 'post', soap_post(body)):
+        result = benchmark(lambda_fulfill_order.create_gls_shipment, GLS_ORDER)
+    assert result['success']
+
+
+@pytest.mark.recording('sheets_values.json')
+def bench_stock_parse_sheets(benchmark, size):
+    magazzino, arrivo = sheet_values(size)
+    benchmark(lambda_stock_api.parse_stock_sheets, magazzino, arrivo)
+
+
+@pytest.mark.recording('sheets_values.json')
+def bench_fulfillment_parse_magazzino(benchmark, size):
+    magazzino, _ = sheet_values(size)
+    benchmark(lambda_fulfillment_check.parse_magazzino_values, magazzino)
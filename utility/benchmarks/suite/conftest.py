@@ -0,0 +1,104 @@
+"""
+Suite pytest-benchmark dei percorsi caldi di parsing e aggregazione.
+
+Ogni benchmark gira su fixture sintetiche scalabili (synthetic.py, 1k e 10k
+righe di default, fino a 100k con --bench-sizes) e, se presente, sulla
+registrazione anonimizzata corrispondente in BENCH_FIXTURES_DIR (default
+suite/fixtures) con id "recorded":
+
+    envios.html            ricerca MiraEnvios, layout div "envios" (rifiuti)
+    gr.html                ricerca MiraEnvios con tabella "gr" nel commento
+    gv.html                ricerca MiraEnvios, griglia gv-row (SKU con retorno)
+    getexpcli.xml          risposta SOAP GetExpCli
+    grabaservicios.xml     risposta SOAP GrabaServicios
+    orders_pages.json      lista dei body delle pagine GraphQL orders
+    sheets_values.json     {"magazzino": [...], "arrivo": [...]} da batchGet
+
+I tempi minimi (meno rumorosi della mediana) sono confrontati con
+baselines/*/0001_baseline.json: la run fallisce se un benchmark diventa più
+lento di 2,5 volte (+150%). Il margine assorbe il rumore delle macchine
+condivise; le regressioni da intercettare (es. tornare a BeautifulSoup o a
+iterrows) sono di un ordine di grandezza. Le dimensioni non presenti nella
+baseline non sono confrontate.
+
+Uso (da utility/benchmarks/suite):
+    python -m pytest
+    python -m pytest --bench-sizes=1000,10000,100000 -k envios
+    # nuova baseline (dopo aver rimosso baselines/<macchina>/0001_baseline.json)
+    python -m pytest -o addopts="" --benchmark-storage=file://baselines --benchmark-save=baseline \
+        --benchmark-min-rounds=3 --benchmark-max-time=0.5 --benchmark-disable-gc --benchmark-warmup=on
+"""
+import json
+import logging
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+SUITE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SUITE_DIR, '..'))
+sys.path.insert(0, os.path.join(SUITE_DIR, '..', '..'))
+
+FIXTURES_DIR = os.environ.get('BENCH_FIXTURES_DIR', os.path.join(SUITE_DIR, 'fixtures'))
+DEFAULT_SIZES = '1000,10000'
+RECORDED = 'recorded'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-sizes', default=DEFAULT_SIZES,
+                     help='Righe delle fixture sintetiche, separate da virgola (es. 1000,10000,100000)')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'recording(name): file registrato in BENCH_FIXTURES_DIR')
+    config.addinivalue_line('markers', 'sizes(*sizes): dimensioni fisse al posto di --bench-sizes')
+
+
+def pytest_generate_tests(metafunc):
+    """Parametro `size`: dimensioni sintetiche + "recorded" se la registrazione esiste"""
+    if 'size' not in metafunc.fixturenames:
+        return
+    fixed = metafunc.definition.get_closest_marker('sizes')
+    if fixed:
+        sizes = list(fixed.args)
+    else:
+        sizes = [int(size) for size in metafunc.config.getoption('bench_sizes').split(',') if size]
+    recording = metafunc.definition.get_closest_marker('recording')
+    if recording and os.path.exists(recorded_path(recording.args[0])):
+        sizes.append(RECORDED)
+    metafunc.parametrize('size', sizes)
+
+
+def recorded_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def read_recorded(name):
+    """Contenuto della registrazione (JSON decodificato per i file .json)"""
+    with open(recorded_path(name), encoding='utf-8') as f:
+        return json.load(f) if name.endswith('.json') else f.read()
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    """Le funzioni misurate stampano e loggano a ogni chiamata: silenziate"""
+    logging.disable(logging.CRITICAL)
+    with mock.patch('builtins.print'):
+        yield
+    logging.disable(logging.NOTSET)
+
+
+class SoapResponse:
+    """Risposta requests con il body SOAP della fixture"""
+
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+        self.ok = True
+
+
+@pytest.fixture
+def soap_post():
+    """Factory di un requests.post finto che risponde sempre con `text`"""
+    return lambda text: (lambda *args, **kwargs: SoapResponse(text))
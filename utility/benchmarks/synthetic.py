@@ -0,0 +1,571 @@
+"""
+Generatori di dati sintetici per i benchmark delle Lambda.
+
+I dati imitano la forma delle risposte reali (Shopify GraphQL, Google Sheets,
+pagine GLS) ma sono generati in locale, senza chiamate di rete.
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'fakes'))
+
+from fake_shopify import ShopifyOrders, query_cost
+
+MODELOS = ['SLIP', 'PER', 'BRA', 'TOP', 'CUL']
+TALLAS = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
+COLORES = ['BE', 'BL', 'NE', 'RO']
+# Il foglio Magazzino usa 2XL/3XL dove lo SKU usa XXL/XXXL
+SHEET_TALLAS = {'XXL': '2XL', 'XXXL': '3XL'}
+
+
+def random_sku(rng):
+    """SKU nel formato MODELO.TALLA.COLOR (es. SLIP.M.BL)"""
+    return f"{rng.choice(MODELOS)}.{rng.choice(TALLAS)}.{rng.choice(COLORES)}"
+
+
+def generate_order_nodes(n_orders, days=30, max_items=4, seed=42):
+    """
+    Genera nodi ordine come restituiti dalla query GraphQL di lambda_fulfillment_check.
+
+    Returns:
+        Lista di nodi ordinati per createdAt crescente
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    nodes = []
+    for i in range(n_orders):
+        created = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        items = [
+            {'node': {'title': 'Articolo', 'sku': random_sku(rng), 'quantity': rng.randint(1, 3)}}
+            for _ in range(rng.randint(1, max_items))
+        ]
+        nodes.append({
+            'id': f"gid://shopify/Order/{1000000 + i}",
+            'name': f"#ES{10000 + i}",
+            'createdAt': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'tags': [],
+            'displayFinancialStatus': rng.choice(['PAID', 'PENDING', 'PENDING', 'PAID']),
+            'note': rng.choice(['', '', '', 'Consegnare al mattino']),
+            'customer': {'firstName': 'Nome', 'lastName': 'Cognome', 'phone': '600000000', 'email': 'x@example.com'},
+            'shippingAddress': {'address1': 'Calle 1', 'address2': '', 'city': 'Sevilla', 'zip': '41001', 'phone': '600000000'},
+            'totalPriceSet': {'shopMoney': {'amount': f"{rng.uniform(20, 90):.2f}"}},
+            'lineItems': {'edges': items},
+        })
+    nodes.sort(key=lambda n: n['createdAt'])
+    return nodes
+
+
+DASHBOARD_TAGS = [[], [], [], [], ['RESO'], ['CAMBIO'], ['RIFIUTATO'], ['TEST'], ['VIP']]
+
+
+def generate_dashboard_orders(n_orders, days=365, seed=42):
+    """
+    Nodi ordine come restituiti dalla query di lambda_dashboard_stats
+    (tag, stati fulfillment/financial, flag pagamento, rimborsi, cancellati).
+
+    Returns:
+        Lista di nodi ordinati per createdAt crescente, updatedAt = createdAt + 0-3 giorni
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    nodes = []
+    for i in range(n_orders):
+        created = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        updated = min(now, created + timedelta(seconds=rng.uniform(0, 3 * 86400)))
+        fully_paid = rng.random() < 0.7
+        nodes.append({
+            'id': f"gid://shopify/Order/{2000000 + i}",
+            'createdAt': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'updatedAt': updated.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'cancelledAt': updated.strftime('%Y-%m-%dT%H:%M:%SZ') if rng.random() < 0.03 else None,
+            'tags': rng.choice(DASHBOARD_TAGS),
+            'currentTotalPriceSet': {'shopMoney': {'amount': f"{rng.uniform(20, 90):.2f}"}},
+            'displayFulfillmentStatus': rng.choice(['FULFILLED', 'FULFILLED', 'FULFILLED', 'UNFULFILLED', 'ON_HOLD']),
+            'displayFinancialStatus': rng.choice(['PAID', 'PAID', 'PENDING', 'REFUNDED', 'PARTIALLY_REFUNDED']),
+            'fullyPaid': fully_paid,
+            'unpaid': not fully_paid and rng.random() < 0.8,
+            'refunds': [{'id': f"gid://shopify/Refund/{i}"}] if rng.random() < 0.08 else [],
+        })
+    nodes.sort(key=lambda n: n['createdAt'])
+    return nodes
+
+
+SHOP_TAGS = DASHBOARD_TAGS + [['RESO', 'DA RIMBORSARE'], ['MANCA MODELLO']]
+
+
+def generate_shop_orders(n_orders, days=30, seed=42):
+    """
+    Nodi ordine con i campi letti da tutte le Lambda (righe, cliente e
+    indirizzo, stati, tag, rimborsi), per la Shopify finta dei test end to
+    end. I nomi #ES{10000 + i} coincidono con le referenze delle pagine GLS
+    generate qui sopra.
+
+    Returns:
+        Lista di nodi ordinati per createdAt crescente
+    """
+    rng = random.Random(seed)
+    nodes = generate_order_nodes(n_orders, days=days, seed=seed)
+    now = datetime.now()
+    for node in nodes:
+        created = datetime.strptime(node['createdAt'], '%Y-%m-%dT%H:%M:%SZ')
+        updated = min(now, created + timedelta(seconds=rng.uniform(0, 3 * 86400)))
+        fully_paid = node['displayFinancialStatus'] == 'PAID'
+        node.update({
+            'updatedAt': updated.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'cancelledAt': None,
+            'tags': list(rng.choice(SHOP_TAGS)),
+            'phone': node['customer']['phone'],
+            'currentTotalPriceSet': {'shopMoney': {**node['totalPriceSet']['shopMoney'], 'currencyCode': 'EUR'}},
+            'displayFulfillmentStatus': rng.choice(['FULFILLED', 'FULFILLED', 'UNFULFILLED']),
+            'fullyPaid': fully_paid,
+            'unpaid': not fully_paid,
+            'refunds': [],
+        })
+    return nodes
+
+
+def order_webhook_payload(node, utc_offset_hours=2):
+    """
+    Nodo di generate_dashboard_orders → payload REST di un webhook orders/*
+    come lo invia Shopify (orari nel fuso del negozio, tag in una stringa,
+    stati in minuscolo, total_outstanding per i flag di pagamento).
+    """
+    shop_tz = timezone(timedelta(hours=utc_offset_hours))
+
+    def local(timestamp):
+        if not timestamp:
+            return None
+        utc = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        return utc.astimezone(shop_tz).isoformat()
+
+    order_id = int(node['id'].rsplit('/', 1)[1])
+    amount = node['currentTotalPriceSet']['shopMoney']['amount']
+    if node['fullyPaid']:
+        outstanding = '0.00'
+    elif node['unpaid']:
+        outstanding = amount
+    else:
+        outstanding = f"{float(amount) / 2:.2f}"
+    fulfillment = {'FULFILLED': 'fulfilled', 'PARTIALLY_FULFILLED': 'partial'}.get(node['displayFulfillmentStatus'])
+    return {
+        'id': order_id,
+        'admin_graphql_api_id': node['id'],
+        'name': f"#ES{order_id}",
+        'created_at': local(node['createdAt']),
+        'updated_at': local(node['updatedAt']),
+        'cancelled_at': local(node.get('cancelledAt')),
+        'tags': ', '.join(node.get('tags') or []),
+        'note': node.get('note'),
+        'current_total_price': amount,
+        'currency': 'EUR',
+        'total_outstanding': outstanding,
+        'financial_status': node['displayFinancialStatus'].lower(),
+        'fulfillment_status': fulfillment,
+        'refunds': [
+            {'id': int(refund['id'].rsplit('/', 1)[1]), 'admin_graphql_api_id': refund['id'],
+             'created_at': local(node['updatedAt']), 'note': None}
+            for refund in node.get('refunds') or []
+        ],
+    }
+
+
+class FakeResponse:
+    """Risposta minima compatibile con l'uso di requests.Response nelle Lambda"""
+
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class FakeShopifyOrders(ShopifyOrders):
+    """
+    Sostituto in-process di requests.post per le query GraphQL Shopify.
+
+    Le query vengono interpretate da fakes/fake_shopify.ShopifyOrders
+    (first/after/reverse, filtri created_at/updated_at/tag/name, order(id:)),
+    con una latenza fissa per richiesta e senza rate limit.
+    """
+
+    def __init__(self, nodes, latency=0.05):
+        super().__init__(nodes)
+        self.latency = latency
+        self.calls = 0
+
+    def post(self, url, json=None, headers=None, timeout=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        payload = self.execute(json['query'], json.get('variables'))
+        payload['extensions'] = {'cost': {
+            'requestedQueryCost': query_cost(json['query']),
+            'throttleStatus': {'maximumAvailable': 2000.0, 'currentlyAvailable': 2000, 'restoreRate': 100.0},
+        }}
+        return FakeResponse(payload)
+
+
+def nodes_to_fulfillment_orders(nodes):
+    """Converte nodi GraphQL nel formato ordine usato da categorize_order"""
+    return [
+        {
+            'id': n['id'],
+            'name': n['name'],
+            'created_at': n['createdAt'],
+            'note': n['note'],
+            'shipping_address': n['shippingAddress'],
+            'line_items': [edge['node'] for edge in n['lineItems']['edges']],
+        }
+        for n in nodes
+    ]
+
+
+def generate_stock_dict(max_qty=200, seed=42):
+    """Stock {(MODELO COLOR, TALLA): quantità} come da foglio Magazzino"""
+    rng = random.Random(seed)
+    return {
+        (f"{m} {c}", SHEET_TALLAS.get(t, t)): rng.randint(0, max_qty)
+        for m in MODELOS for c in COLORES for t in TALLAS
+    }
+
+
+def generate_sku_catalog(n_skus):
+    """Catalogo di `n_skus` SKU distinti (MODELO.TALLA.COLOR, modelli numerati)"""
+    skus = []
+    variants = [(t, c) for t in TALLAS for c in COLORES]
+    i = 0
+    while len(skus) < n_skus:
+        base = f"{MODELOS[i % len(MODELOS)]}{i // len(MODELOS)}"
+        skus.extend(f"{base}.{t}.{c}" for t, c in variants)
+        i += 1
+    return skus[:n_skus]
+
+
+def generate_stock_inputs(n_skus, seed=42):
+    """
+    Input di build_stock_data per `n_skus` SKU.
+
+    Returns:
+        tuple (medie {SKU: media_pesata}, magazzino {SKU: qty}, arrivo {SKU: qty}, arretrati {SKU: qty})
+        Circa un terzo degli SKU non vende, un quarto ha merce in arrivo.
+    """
+    rng = random.Random(seed)
+    skus = generate_sku_catalog(n_skus)
+    medie = {sku: rng.uniform(0.1, 8) for sku in skus if rng.random() > 0.33}
+    magazzino = {sku: rng.randint(0, 400) for sku in skus}
+    arrivo = {sku: rng.randint(10, 200) for sku in skus if rng.random() < 0.25}
+    arretrati = {sku: rng.randint(1, 5) for sku in skus if rng.random() < 0.05}
+    return medie, magazzino, arrivo, arretrati
+
+
+def generate_daily_sales(n_skus, days=90, seed=42):
+    """
+    Vendite giornaliere SKU × giorno (colonna 0 = giorno più vecchio), come
+    SalesLedger.daily_matrix: base 0-8 pezzi/giorno, trend lineare tra -50%
+    e +100% sulla finestra, rumore di Poisson approssimato; ~20% SKU fermi.
+
+    Returns:
+        tuple (lista SKU, lista di righe di interi)
+    """
+    rng = random.Random(seed)
+    skus = generate_sku_catalog(n_skus)
+    rows = []
+    for _ in skus:
+        if rng.random() < 0.2:
+            rows.append([0] * days)
+            continue
+        base = rng.uniform(0.2, 8)
+        growth = rng.uniform(-0.5, 1.0)
+        rows.append([
+            max(0, round(rng.gauss(rate, rate ** 0.5)))
+            for rate in (base * (1 + growth * day / max(days - 1, 1)) for day in range(days))
+        ])
+    return skus, rows
+
+
+def generate_sales_lines(n_lines, n_skus=500, days=10, gls_share=0.1, seed=42):
+    """
+    Righe vendita come sku_data di lambda_stock_api: Shopify con "created_at"
+    ISO (offset +01:00/+02:00 come l'Admin API), una quota GLS con "date" YYYY-MM-DD.
+    """
+    rng = random.Random(seed)
+    skus = generate_sku_catalog(n_skus)
+    now = datetime.now().replace(microsecond=0)
+    lines = []
+    for _ in range(n_lines):
+        created = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        line = {'sku': rng.choice(skus), 'current_quantity': rng.randint(1, 3)}
+        if rng.random() < gls_share:
+            line['date'] = created.strftime('%Y-%m-%d')
+        else:
+            line['created_at'] = created.strftime('%Y-%m-%dT%H:%M:%S') + rng.choice(['+01:00', '+02:00'])
+        lines.append(line)
+    return lines
+
+
+# Colonne della griglia spedizioni dell'extranet GLS (pagina di ricerca)
+GLS_COLUMNS = [
+    'Expedicion', 'Referencia', 'estado', 'Pod', 'Fecha', 'Servicio', 'Horario',
+    'bultos', 'Kgs', 'Reembolso', 'Destinatario', 'dac', 'retorno', 'Direccion',
+    'Localidad', 'cp_dst', 'cp_org', 'nombre_org', 'localidad_org', 'fechaActualizacion',
+    'observacion'
+]
+
+
+def random_observacion(rng):
+    """Osservazione spedizione nei formati scritti a mano dal magazzino"""
+    sku = random_sku(rng)
+    modelo, talla, color = sku.split('.')
+    return rng.choice([
+        f"{sku}x{rng.randint(1, 3)}",
+        f"{sku}x{rng.randint(1, 2)}, {random_sku(rng)}x1",
+        f"{modelo} {talla} .{color}",
+        f"{modelo}{talla}.{color}x1",
+        f"{sku} x 2",
+        sku,
+        "Dejar en portería",
+        "",
+    ])
+
+
+def generate_gls_search_page(n_rows, days=30, returns_share=0.3, seed=42):
+    """
+    HTML della griglia spedizioni GLS (righe gv-row / gv-alternating) degli
+    ultimi `days` giorni; circa `returns_share` delle spedizioni sono CON RETORNO.
+    """
+    rng = random.Random(seed)
+    today = datetime.now()
+    header = ''.join(f'<th scope="col"><a href="#">{c}</a></th>' for c in GLS_COLUMNS)
+    rows = []
+    for i in range(n_rows):
+        con_retorno = rng.random() < returns_share
+        values = {c: '' for c in GLS_COLUMNS}
+        values.update({
+            'Expedicion': str(61000000 + i),
+            'Referencia': f"ES{10000 + i}",
+            'estado': rng.choice(['ENTREGADO', 'EN REPARTO', 'GRABADO']),
+            'Fecha': (today - timedelta(days=rng.randint(0, days - 1))).strftime('%d/%m/%Y'),
+            'Servicio': 'BUSINESS PARCEL',
+            'bultos': '1',
+            'Kgs': '0,5',
+            'Reembolso': f"{rng.choice([0, 0, 29.9, 39.9]):.2f}".replace('.', ','),
+            'Destinatario': 'NOMBRE APELLIDO',
+            'retorno': 'CON RETORNO' if con_retorno else 'SIN RETORNO',
+            'Localidad': 'SEVILLA',
+            'cp_dst': '41001',
+            'observacion': random_observacion(rng) if con_retorno else '',
+        })
+        css = 'gv-row' if i % 2 == 0 else 'gv-alternating'
+        cells = ''.join(f'<td><span>{values[c]}</span></td>' for c in GLS_COLUMNS)
+        rows.append(f'<tr class="{css}">{cells}</tr>')
+    return (
+        '<html><body><table id="ctl00_MainContent_gvExpediciones">'
+        f'<tr class="gv-header">{header}</tr>{"".join(rows)}</table></body></html>'
+    )
+
+
+def generate_gls_envios_page(n_shipments, days=4, returns_share=0.15, seed=42):
+    """
+    HTML della ricerca MiraEnvios come la legge lambda_rifiuti_get: nel div
+    "envios" una tabella tb/atb di 5 righe per spedizione, tra moduli e
+    campi nascosti come nella pagina vera. Circa `returns_share` delle
+    spedizioni sono DEVOLUCION, metà delle quali verso ADIBODY ES.
+    """
+    rng = random.Random(seed)
+    today = datetime.now()
+    viewstate = 'x' * 20000
+    tables = []
+    for i in range(n_shipments):
+        devolucion = rng.random() < returns_share
+        destinatario = 'ADIBODY ES' if devolucion and rng.random() < 0.5 else 'NOMBRE APELLIDO'
+        estado = rng.choice(['ENTREGADO', 'EN REPARTO', 'GRABADO', 'ENTREGADO'])
+        fecha = (today - timedelta(days=rng.randint(0, days - 1))).strftime('%d/%m/%Y')
+        css = 'tb' if i % 2 == 0 else 'atb'
+        tables.append(
+            f'<table class="{css}" cellspacing="0" width="100%">'
+            f'<tr><th><a href="Expedicion.aspx?codexp={61000000 + i}">{61000000 + i}</a></th>'
+            f'<th>ES{10000 + i}</th><th><span class="estado">{estado}</span></th><th>&nbsp;</th></tr>'
+            f'<tr><td>{fecha}</td><td>{"DEVOLUCION" if devolucion else "BUSINESS PARCEL"}</td>'
+            f'<td>1</td><td>0,5</td><td>{"0,00" if devolucion else "29,90"}</td><td>{rng.choice(["", "18:00"])}</td></tr>'
+            f'<tr><td> {destinatario} </td><td>CALLE MAYOR {rng.randint(1, 99)}</td></tr>'
+            f'<tr><td>41001</td><td>SEVILLA</td></tr>'
+            f'<tr><td colspan="2"><input type="checkbox" name="sel{i}" /> Observaciones: Dejar en portería</td></tr>'
+            '</table>'
+        )
+    return (
+        '<html><head><title>MiraEnvios</title></head><body>'
+        f'<form method="post"><input type="hidden" name="__VIEWSTATE" value="{viewstate}" />'
+        '<table class="filtros"><tr><td>Fecha desde</td><td><input name="fechadesde" /></td></tr></table>'
+        f'<div id="envios">{"".join(tables)}</div></form></body></html>'
+    )
+
+
+GLS_GR_STATES = ['ENTREGADO', 'EN REPARTO', 'ALMACENADO', 'EN PARCELSHOP', 'AUSENTE', 'GRABADO']
+
+
+def generate_shipment_columns(n_rows, days=14, missing_share=0.1, seed=42):
+    """
+    Colonne di un DataFrame di spedizioni come quello del parse GLS
+    (numeri, date e testi), con una quota `missing_share` di valori mancanti
+    (NaN, None, date assenti → NaT) e qualche Kgs infinito.
+
+    Returns:
+        dict {colonna: lista di valori}
+    """
+    rng = random.Random(seed)
+    today = datetime(2026, 10, 19, 8, 0)
+
+    def maybe(value):
+        return None if rng.random() < missing_share else value
+
+    kgs = [rng.choice([0.5, 1.0, 2.5]) if rng.random() >= missing_share else float('nan') for _ in range(n_rows)]
+    for i in range(0, n_rows, 997):
+        kgs[i] = float('inf')
+    return {
+        'expedicion': [str(61000000 + i) for i in range(n_rows)],
+        'referencia': [maybe(str(10000 + i)) for i in range(n_rows)],
+        'estado': [rng.choice(GLS_GR_STATES) for _ in range(n_rows)],
+        'fecha': [maybe(today.replace(hour=0, minute=0) - timedelta(days=rng.randint(0, days - 1))) for _ in range(n_rows)],
+        'bultos': [rng.randint(1, 3) for _ in range(n_rows)],
+        'kgs': kgs,
+        'reembolso': [rng.choice([0.0, 29.9, 39.9]) for _ in range(n_rows)],
+        'destinatario': [maybe('NOMBRE APELLIDO') for _ in range(n_rows)],
+        'direccion': [f"CALLE MAYOR {rng.randint(1, 99)}" for _ in range(n_rows)],
+        'localidad': [rng.choice(['SEVILLA', 'MÁLAGA', 'A CORUÑA']) for _ in range(n_rows)],
+        'pod': [maybe(f"Entregado a \"{rng.choice(['VECINO', 'PORTERÍA'])}\"") for _ in range(n_rows)],
+        'actualizacion': [maybe(today - timedelta(minutes=rng.randint(0, days * 1440))) for _ in range(n_rows)],
+    }
+
+
+def generate_gls_gr_page(n_rows, days=14, seed=42):
+    """
+    HTML della ricerca MiraEnvios con la tabella completa id="gr" dentro un
+    commento (lambda_almacenado, lambda_parcel_shop), tra la griglia visibile
+    e il viewstate. Circa metà delle spedizioni ha un Reembolso diverso da 0.
+    """
+    rng = random.Random(seed)
+    today = datetime.now()
+    header = ''.join(f'<th>{c}</th>' for c in GLS_COLUMNS)
+    rows = []
+    for i in range(n_rows):
+        values = {c: '' for c in GLS_COLUMNS}
+        values.update({
+            'Expedicion': str(61000000 + i),
+            'Referencia': str(10000 + i),
+            'estado': rng.choice(GLS_GR_STATES),
+            'Fecha': (today - timedelta(days=rng.randint(0, days - 1))).strftime('%d/%m/%Y'),
+            'Servicio': 'BUSINESS PARCEL',
+            'Horario': rng.choice(['', '18:00']),
+            'bultos': '1',
+            'Kgs': '0,5',
+            'Reembolso': rng.choice(['0,00', '0,00', '29,90 €', '39,90 €']),
+            'Destinatario': 'NOMBRE APELLIDO',
+            'retorno': 'SIN RETORNO',
+            'Direccion': f"CALLE MAYOR {rng.randint(1, 99)}",
+            'Localidad': 'SEVILLA',
+            'cp_dst': '41001',
+            'cp_org': '08001',
+            'nombre_org': 'ADIBODY',
+            'localidad_org': 'BARCELONA',
+            'fechaActualizacion': today.strftime('%d/%m/%Y %H:%M'),
+        })
+        rows.append('<tr>' + ''.join(f'<td>{values[c]}</td>' for c in GLS_COLUMNS) + '</tr>')
+    return (
+        '<html><body><form method="post">'
+        f'<input type="hidden" name="__VIEWSTATE" value="{"x" * 20000}" />'
+        '<table id="gvVisible"><tr><th>Expedicion</th></tr></table>'
+        f'<!-- <table id="gr"><tr>{header}</tr>{"".join(rows)}</table> -->'
+        '</form></body></html>'
+    )
+
+
+def soap_getexpcli_response(n_events, seed=42):
+    """Risposta SOAP GetExpCli (una spedizione con `n_events` eventi di tracking)"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=10)
+    events = ''.join(
+        f"<tracking><fecha>{(start + timedelta(minutes=17 * i)).strftime('%d/%m/%Y %H:%M:%S')}</fecha>"
+        f"<tipo>ESTADO</tipo><codigo>{rng.randint(0, 20)}</codigo>"
+        f"<evento>{rng.choice(['EN REPARTO', 'EN DELEGACION', 'ALMACENADO', 'AUSENTE'])}</evento>"
+        f"<plaza>{rng.randint(100, 999)}</plaza><nombreplaza>SEVILLA</nombreplaza></tracking>"
+        for i in range(n_events)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/soap-envelope"><soap:Body>'
+        '<GetExpCliResponse xmlns="http://www.asmred.com/"><GetExpCliResult><expediciones xmlns=""><exp>'
+        '<expedicion>61000001</expedicion><albaran>10001</albaran><codbar>61000001000001</codbar>'
+        '<codplaza_org>771</codplaza_org><codplaza_dst>412</codplaza_dst><estado>EN REPARTO</estado>'
+        f'<tracking_list>{events}</tracking_list>'
+        '</exp></expediciones></GetExpCliResult></GetExpCliResponse></soap:Body></soap:Envelope>'
+    )
+
+
+def soap_grabaservicios_response(n_envios=1, seed=42):
+    """Risposta SOAP GrabaServicios con `n_envios` spedizioni registrate"""
+    rng = random.Random(seed)
+    envios = ''.join(
+        f'<Envio codbarras="{61000000000000 + i}" codexp="{61000000 + i}" uid="{rng.getrandbits(64):016x}">'
+        '<Resultado return="0" /><Errores /><Referencias>'
+        f'<Referencia tipo="C">{10000 + i}</Referencia><Referencia tipo="0">{10000 + i}</Referencia>'
+        '</Referencias></Envio>'
+        for i in range(n_envios)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap12:Envelope xmlns:soap12="http://www.w3.org/2003/05/soap-envelope"><soap12:Body>'
+        '<GrabaServiciosResponse xmlns="http://www.asmred.com/"><GrabaServiciosResult>'
+        f'<Servicios>{envios}</Servicios>'
+        '</GrabaServiciosResult></GrabaServiciosResponse></soap12:Body></soap12:Envelope>'
+    )
+
+
+def generate_sheet_values(n_skus, seed=42):
+    """
+    Valori grezzi (batchGet, colonne A:D) dei fogli Magazzino e InArrivo per
+    `n_skus` SKU: MODELO, TALLA, SKU, CANTIDAD con riga TOTAL e qualche cella
+    vuota o non numerica come nel foglio vero.
+
+    Returns:
+        tuple (valori Magazzino, valori InArrivo)
+    """
+    rng = random.Random(seed)
+    header = ['MODELO', 'TALLA', 'SKU', 'CANTIDAD']
+    magazzino, arrivo = [header], [header]
+    for sku in generate_sku_catalog(n_skus):
+        modelo, talla, color = sku.split('.')
+        row = [f"{modelo} {color}", talla, sku, str(rng.randint(0, 400))]
+        if rng.random() < 0.01:
+            row[3] = rng.choice(['', '-', 'n/d'])
+        magazzino.append(row)
+        if rng.random() < 0.25:
+            arrivo.append([row[0], talla, sku, str(rng.randint(10, 200))])
+    magazzino.append(['', '', 'TOTAL', '0'])
+    return magazzino, arrivo
+
+
+def graphql_orders_pages(nodes, page_size=250):
+    """Body JSON delle pagine della query orders (come le restituisce Shopify)"""
+    pages = []
+    for start in range(0, len(nodes), page_size):
+        chunk = nodes[start:start + page_size]
+        has_next = start + page_size < len(nodes)
+        pages.append(json.dumps({
+            'data': {'orders': {
+                'edges': [{'cursor': str(start + i + 1), 'node': node} for i, node in enumerate(chunk)],
+                'pageInfo': {'hasNextPage': has_next, 'endCursor': str(start + len(chunk))},
+            }},
+            'extensions': {'cost': {'requestedQueryCost': 252, 'actualQueryCost': len(chunk) + 2,
+                                    'throttleStatus': {'maximumAvailable': 2000.0, 'currentlyAvailable': 1748,
+                                                       'restoreRate': 100.0}}},
+        }))
+    return pages
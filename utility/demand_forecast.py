@@ -0,0 +1,157 @@
+"""
+Previsione della domanda per SKU (lambda_stock_api).
+
+Smoothing esponenziale semplice (ses) o di Holt con trend smorzato (holt) su
+tutti gli SKU insieme, a partire dalla matrice vendite SKU × giorno del registro
+(sales_ledger.daily_matrix, colonna 0 = giorno più vecchio).
+
+Lo smorzamento (phi < 1) evita che un trend negativo di pochi giorni azzeri
+la domanda prevista a 60 giorni: il trend si estingue invece di proseguire
+all'infinito.
+
+Con parametri fissi entrambi i modelli sono filtri lineari sulle vendite:
+livello e trend finali sono una combinazione pesata dei giorni della
+finestra. I pesi si calcolano una volta per (giorni, metodo, alpha, beta)
+facendo girare la ricorsione sulla base canonica; il fit di tutti gli SKU è
+poi un solo prodotto matrice @ pesi.
+
+Dalla domanda prevista giorno per giorno derivano autonomia (giorni coperti
+dal magazzino netto) e quantità da ordinare, con lo stesso arrotondamento di
+stock_engine. Con domanda piatta i risultati coincidono con quelli della
+media pesata.
+"""
+from functools import lru_cache
+
+import stock_engine
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+METODI = ('ses', 'holt')
+
+
+@lru_cache(maxsize=32)
+def filter_weights(days, method='ses', alpha=0.3, beta=0.1, phi=0.9):
+    """
+    Pesi (livello, trend) dei giorni della finestra, dal più vecchio al più recente.
+
+    Inizializzazione: livello = primo giorno, trend = 0.
+
+    Returns:
+        tuple di array float (days,): level = matrice @ pesi_livello,
+        trend = matrice @ pesi_trend (zeri per ses)
+    """
+    if method not in METODI:
+        raise ValueError(f"Metodo previsione non valido: {method} (ammessi: {', '.join(METODI)})")
+    if not 0 < alpha <= 1 or not 0 <= beta <= 1 or not 0 < phi <= 1:
+        raise ValueError(f"Parametri smoothing fuori range: alpha={alpha}, beta={beta}, phi={phi}")
+
+    # Riga k = contributo del giorno k a livello/trend correnti
+    basis = np.eye(days)
+    level = basis[0].copy()
+    trend = np.zeros(days)
+    for t in range(1, days):
+        if method == 'ses':
+            level = alpha * basis[t] + (1 - alpha) * level
+        else:
+            previous = level
+            level = alpha * basis[t] + (1 - alpha) * (level + phi * trend)
+            trend = beta * (level - previous) + (1 - beta) * phi * trend
+
+    level.flags.writeable = False
+    trend.flags.writeable = False
+    return level, trend
+
+
+def fit(matrix, method='ses', alpha=0.3, beta=0.1, phi=0.9):
+    """
+    Livello e trend finali per ogni SKU.
+
+    Args:
+        matrix: Vendite SKU × giorno (colonna 0 = giorno più vecchio)
+
+    Returns:
+        tuple di array float (n_sku,) (livello, trend)
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.shape[1] == 0:
+        zeros = np.zeros(matrix.shape[0])
+        return zeros, zeros.copy()
+    level_weights, trend_weights = filter_weights(
+        matrix.shape[1], method, float(alpha), float(beta), float(phi)
+    )
+    return matrix @ level_weights, matrix @ trend_weights
+
+
+def project(level, trend, horizon, phi=0.9):
+    """
+    Domanda prevista per i prossimi `horizon` giorni: array (n_sku, horizon),
+    mai negativa. Giorno h = livello + (phi + phi^2 + ... + phi^h) * trend.
+    """
+    steps = np.cumsum(np.power(float(phi), np.arange(1, horizon + 1)))
+    return np.maximum(level[:, None] + trend[:, None] * steps, 0.0)
+
+
+def projected_autonomy(magazzino_netto, demand):
+    """
+    Giorni coperti dal magazzino netto con la domanda prevista.
+
+    Oltre l'orizzonte si prosegue al ritmo dell'ultimo giorno previsto; inf se
+    lo SKU non vende più. Un netto negativo (arretrati) non copre nessun
+    giorno e dà un'autonomia negativa al ritmo del primo giorno, come
+    stock_engine.autonomy_days.
+    """
+    netto = np.asarray(magazzino_netto, dtype=float)
+    n_skus, horizon = demand.shape
+    rows = np.arange(n_skus)
+
+    cumulative = np.cumsum(demand, axis=1)
+    covered = (cumulative <= netto[:, None]).sum(axis=1)
+    before = np.where(covered > 0, cumulative[rows, np.maximum(covered - 1, 0)], 0.0)
+    rate = demand[rows, np.minimum(covered, horizon - 1)]
+
+    out = np.full(n_skus, np.inf)
+    np.divide(netto - before, rate, out=out, where=rate > 0)
+    out += covered
+    return out
+
+
+def order_quantity(magazzino_netto, demand, giorni_target, giorni_transito, moltiplicatore=1):
+    """
+    Pezzi da ordinare per coprire transito + target con la domanda prevista.
+
+    fabbisogno grezzo = (domanda cumulata su transito + target - magazzino netto)
+    * moltiplicatore, arrotondato come stock_engine.replenishment_need.
+    """
+    netto = np.asarray(magazzino_netto, dtype=float)
+    horizon = int(np.ceil(giorni_target + giorni_transito))
+    if demand.shape[1] < horizon:
+        raise ValueError(f"Orizzonte previsione {demand.shape[1]} < transito + target ({horizon})")
+
+    needed = demand[:, :horizon].sum(axis=1)
+    grezzo = np.where(demand[:, :horizon].any(axis=1), (needed - netto) * moltiplicatore, 0.0)
+    return stock_engine.round_need(grezzo)
+
+
+def forecast(matrix, magazzino_netto, giorni_target, giorni_transito, moltiplicatore=1,
+             method='ses', alpha=0.3, beta=0.1, phi=0.9, horizon=None):
+    """
+    Fit + proiezione + autonomia + fabbisogno in un colpo.
+
+    Args:
+        matrix: Vendite SKU × giorno, righe allineate a magazzino_netto
+        horizon: Giorni di proiezione (default transito + target)
+
+    Returns:
+        dict {livello, trend, domanda (n_sku, horizon), giorni_autonomia, fabbisogno}
+    """
+    horizon = horizon or int(np.ceil(giorni_target + giorni_transito))
+    level, trend = fit(matrix, method, alpha, beta, phi)
+    demand = project(level, trend, horizon, phi)
+    return {
+        'livello': level,
+        'trend': trend,
+        'domanda': demand,
+        'giorni_autonomia': projected_autonomy(magazzino_netto, demand),
+        'fabbisogno': order_quantity(magazzino_netto, demand, giorni_target, giorni_transito, moltiplicatore),
+    }
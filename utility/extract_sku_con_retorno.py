@@ -5,20 +5,25 @@ e identificare gli SKU coinvolti nei resi.
 Utile per calcolare gli SKU che tornano in stock ma non sono tracciati in Shopify.
 """
 import requests
-from bs4 import BeautifulSoup, Comment
 from datetime import datetime, timedelta
 import re
-from collections import defaultdict
-import pandas as pd
 from pathlib import Path
 import json
 import sys
 import os
 
+import sku_codec
+from lazy_imports import lazy_import
+
+bs4 = lazy_import('bs4')
+pd = lazy_import('pandas')
+
 # Aggiungi il path parent per importare config
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 # from config.settings import SHOPIFY_GRAPHQL_URL, SHOPIFY_ACCESS_TOKEN  # Non più necessario
 
+GLS_EXTRANET_URL = os.environ.get("GLS_EXTRANET_URL", "https://extranet.gls-spain.es")
+
 
 class GLSExtranetClient:
     def __init__(self, cookies=None):
@@ -29,7 +34,7 @@ class GLSExtranetClient:
             cookies: Dict con i cookies dalla tua sessione browser (opzionale)
         """
         self.session = requests.Session()
-        self.base_url = "https://extranet.gls-spain.es"
+        self.base_url = GLS_EXTRANET_URL
         self.login_url = f"{self.base_url}/extranet/login.aspx?ReturnUrl=~/default.aspx"
         self.search_url = f"{self.base_url}/Extranet/MiraEnvios/Miraenvios.aspx"
         
@@ -60,7 +65,7 @@ class GLSExtranetClient:
         
         # Prima richiesta per ottenere ViewState
         response = self.session.get(self.login_url)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = bs4.BeautifulSoup(response.content, 'html.parser')
         
         viewstate = {}
         for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
@@ -180,7 +185,7 @@ class GLSExtranetClient:
         if response.status_code != 200:
             raise Exception(f"Errore caricamento pagina: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = bs4.BeautifulSoup(response.content, 'html.parser')
         
         viewstate = {}
         for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
@@ -368,6 +373,80 @@ def parse_sku_from_text(text):
 
 
 
+# Un elemento dell'osservazione (separati da virgola): SKU e, dopo l'ultima
+# 'x', la quantità (es. "SLIP.S.BLx2"). Senza 'x' la quantità è 1.
+OBSERVACION_ITEM_PATTERN = re.compile(r'(?P<sku>[^,]*?)(?:[xX](?P<qty>[^,xX]*))?(?:,|$)')
+
+# Caratteri che escludono uno SKU
+INVALID_SKU_CHARS_PATTERN = re.compile(r'[-:;()\[\]{}|\\/?<>!@#$%^&*+=]')
+
+QTY_PATTERN = re.compile(r'[+-]?\d+')
+
+
+def extract_sku_lines(df):
+    """
+    Estrae (data, SKU, quantità) da tutte le spedizioni "CON RETORNO" in un
+    solo passaggio vettoriale sulla colonna 'observacion'
+    
+    Args:
+        df: DataFrame delle spedizioni (parse_shipments)
+        
+    Returns:
+        DataFrame con colonne shipment (indice riga in df), date (YYYY-MM-DD),
+        sku, quantity; uno SKU ripetuto nella stessa spedizione conta una volta
+        (vale l'ultima quantità)
+    """
+    columns = ['shipment', 'date', 'sku', 'quantity']
+    if df.empty or 'retorno' not in df or 'observacion' not in df:
+        return pd.DataFrame(columns=columns)
+    
+    # Filtra spedizioni con "CON RETORNO" e osservazione non vuota
+    returns_df = df[df['retorno'].str.upper().str.contains('CON RETORNO', na=False)]
+    observacion = returns_df['observacion'].astype(str).str.strip()
+    observacion = observacion[observacion != '']
+    if observacion.empty:
+        return pd.DataFrame(columns=columns)
+    
+    items = observacion.str.extractall(OBSERVACION_ITEM_PATTERN)
+    
+    # Pulisci e normalizza SKU (spazi, punto mancante dopo il modello)
+    sku = (
+        items['sku'].str.upper()
+        .str.replace(' ', '', regex=False)
+        .str.replace(sku_codec.MISSING_DOT_PATTERN, r'\1.\2.', regex=True)
+    )
+    valid = (
+        sku.str.contains('SLIP|PER', regex=True)
+        & (sku.str.len() <= 20)
+        & ~sku.str.contains(INVALID_SKU_CHARS_PATTERN)
+        & sku.map({s: sku_codec.is_valid(s) for s in sku.unique()})
+    )
+    
+    # Quantità dopo la 'x': intero, altrimenti 1
+    qty_text = items['qty'].str.strip()
+    is_number = qty_text.str.fullmatch(QTY_PATTERN).fillna(False).astype(bool)
+    quantity = pd.Series(1, index=items.index, dtype='int64')
+    quantity[is_number] = qty_text[is_number].astype('int64')
+    
+    lines = pd.DataFrame({
+        'shipment': items.index.get_level_values(0),
+        'sku': sku.to_numpy(),
+        'quantity': quantity.to_numpy(),
+    })[valid.to_numpy()]
+    lines = lines.drop_duplicates(['shipment', 'sku'], keep='last')
+    
+    # Converti data da formato DD/MM/YYYY a YYYY-MM-DD (oggi se mancante)
+    fecha = returns_df['Fecha'] if 'Fecha' in returns_df else pd.Series('', index=returns_df.index)
+    dates = (
+        pd.to_datetime(fecha.astype(str), format='%d/%m/%Y', errors='coerce')
+        .dt.strftime('%Y-%m-%d')
+        .fillna(datetime.now().strftime('%Y-%m-%d'))
+    )
+    lines.insert(1, 'date', dates.reindex(lines['shipment']).to_numpy())
+    
+    return lines.reset_index(drop=True)
+
+
 def extract_sku_from_returns(df):
     """
     Estrae SKU dalle spedizioni con "CON RETORNO" direttamente dalla colonna 'observacion'
@@ -378,26 +457,8 @@ def extract_sku_from_returns(df):
     Returns:
         Dict con SKU e quantità totali
     """
-    sku_totals = defaultdict(int)
-    
-    # Filtra spedizioni con "CON RETORNO"
-    returns_df = df[df['retorno'].str.upper().str.contains('CON RETORNO', na=False)].copy()
-    
-    for idx, row in returns_df.iterrows():
-        observacion = str(row.get('observacion', '')).strip()
-        
-        if not observacion:
-            print(f"  ⚠️ Nessuna osservazione per spedizione {row.get('Expedicion', idx)}")
-            continue
-        
-        # Parse SKU dalla osservazione
-        skus_in_shipment = parse_skus_from_observacion(observacion)
-        
-        for sku, qty in skus_in_shipment.items():
-            if sku:
-                sku_totals[sku] += qty
-    
-    return dict(sku_totals)
+    lines = extract_sku_lines(df)
+    return {sku: int(qty) for sku, qty in lines.groupby('sku', sort=False)['quantity'].sum().items()}
 
 
 def parse_skus_from_observacion(observacion):
@@ -415,47 +476,21 @@ def parse_skus_from_observacion(observacion):
     Returns:
         Dict con SKU: quantità
     """
-    skus = defaultdict(int)
-    
-    # Split per virgola
-    items = [item.strip() for item in observacion.split(',') if item.strip()]
+    skus = {}
     
-    for item in items:
-        item = item.strip()
+    for match in OBSERVACION_ITEM_PATTERN.finditer(observacion):
+        sku = normalize_sku(match.group('sku').upper().replace(' ', ''))
+        if not is_valid_sku(sku):
+            continue
         
-        # Cerca 'x' per separare SKU da quantità
-        if 'x' in item.lower():
-            # Trova l'ultimo 'x' (per casi come "SLIP.XL.BLx1")
-            parts = item.lower().rsplit('x', 1)
-            if len(parts) == 2:
-                sku_part = parts[0].strip()
-                qty_part = parts[1].strip()
-                
-                # Prova a convertire qty in int
-                try:
-                    qty = int(qty_part)
-                except ValueError:
-                    qty = 1
-                
-                # Pulisci SKU (rimuovi spazi extra, etc.)
-                sku = sku_part.upper().replace(' ', '')
-                
-                # Normalizza SKU (corregge errori comuni)
-                sku = normalize_sku(sku)
-                
-                # Valida SKU
-                if is_valid_sku(sku):
-                    skus[sku] = qty
+        qty_part = match.group('qty')
+        if qty_part is None:
+            skus[sku] = 1
         else:
-            # Nessun 'x', assume qty=1
-            sku = item.upper().replace(' ', '')
-            # Normalizza SKU (corregge errori comuni)
-            sku = normalize_sku(sku)
-            # Valida SKU
-            if is_valid_sku(sku):
-                skus[sku] = 1
-    
-    return dict(skus)
+            qty_part = qty_part.strip()
+            skus[sku] = int(qty_part) if QTY_PATTERN.fullmatch(qty_part) else 1
+    
+    return skus
 
 
 def normalize_sku(sku):
@@ -468,30 +503,8 @@ def normalize_sku(sku):
     Returns:
         str: SKU normalizzato
     """
-    if not sku:
-        return sku
-    
-    # Correggi pattern SLIPM -> SLIP.M, SLIPS -> SLIP.S, ecc.
-    import re
-    
-    # Pattern: SLIP seguito direttamente da taglia (senza punto)
     # Es: SLIPM.BE -> SLIP.M.BE, SLIPXL.BL -> SLIP.XL.BL
-    sizes = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
-    for size in sizes:
-        # Pattern: SLIP + taglia senza punto prima
-        pattern = f'SLIP{size}\\.'
-        if re.search(pattern, sku):
-            sku = re.sub(pattern, f'SLIP.{size}.', sku)
-            break
-    
-    # Stesso per PER
-    for size in sizes:
-        pattern = f'PER{size}\\.'
-        if re.search(pattern, sku):
-            sku = re.sub(pattern, f'PER.{size}.', sku)
-            break
-    
-    return sku
+    return sku_codec.normalize(sku)
 
 
 def is_valid_sku(sku):
@@ -516,10 +529,11 @@ def is_valid_sku(sku):
         return False
     
     # Non deve contenere caratteri strani
-    if any(char in sku for char in ['-', ':', ';', '(', ')', '[', ']', '{', '}', '|', '\\', '/', '?', '<', '>', '!', '@', '#', '$', '%', '^', '&', '*', '+', '=']):
+    if INVALID_SKU_CHARS_PATTERN.search(sku):
         return False
     
-    return True
+    # Formato MODELO.TALLA.COLOR con le stesse regole della Stock API
+    return sku_codec.is_valid(sku)
 
 
 def main():
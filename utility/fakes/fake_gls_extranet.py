@@ -0,0 +1,243 @@
+"""
+Extranet GLS finta (extranet.gls-spain.es) per test locali dei client
+GLSExtranetClient (lambda_rifiuti_get, lambda_almacenado, lambda_parcel_shop,
+extract_sku_con_retorno).
+
+Riproduce il giro ASP.NET delle pagine vere:
+- GET  /extranet/login.aspx         modulo con __VIEWSTATE/__EVENTVALIDATION
+- POST /extranet/login.aspx         credenziali → cookie .ASPXAUTH e redirect
+                                    a ReturnUrl (errate: redirect a Login.aspx)
+- GET  /Extranet/MiraEnvios/Miraenvios.aspx   modulo di ricerca (senza
+                                    sessione: redirect a Login.aspx)
+- POST /Extranet/MiraEnvios/Miraenvios.aspx   postback → pagina risultati
+- GET  /Extranet/MiraEnvios/expedicion.aspx   dettaglio agenzia destino
+
+I percorsi non distinguono maiuscole come IIS. Un postback con
+__EVENTVALIDATION non emesso dal server riceve 500 (validazione ASP.NET).
+La pagina risultati è `search_page`: HTML fisso o funzione (campi del
+modulo) → HTML, es. i generatori di benchmarks/synthetic.py.
+
+Uso:
+    server = FakeGLSExtranet(search_page=lambda form: html, latency=0.2).start()
+    os.environ['GLS_EXTRANET_URL'] = server.url.rstrip('/')
+    os.environ['GLS_USERNAME'], os.environ['GLS_PASSWORD'] = FakeGLSExtranet.USERNAME, FakeGLSExtranet.PASSWORD
+"""
+import secrets
+from html import escape
+from urllib.parse import urlparse, parse_qs, quote
+
+from fake_http import FakeHTTPServer, FakeRequestHandler
+
+LOGIN_PATH = '/extranet/login.aspx'
+SEARCH_PATH = '/extranet/miraenvios/miraenvios.aspx'
+DETAIL_PATH = '/extranet/miraenvios/expedicion.aspx'
+DEFAULT_PATH = '/default.aspx'
+
+SESSION_COOKIE = 'ASP.NET_SessionId'
+AUTH_COOKIE = '.ASPXAUTH'
+
+EMPTY_RESULTS = '<html><body><form method="post"><div id="envios"></div></form></body></html>'
+
+
+class FakeGLSExtranet(FakeHTTPServer):
+    USERNAME = 'extranet-test'
+    PASSWORD = 'extranet-test'
+
+    def __init__(self, search_page=None, users=None, agencies=None, viewstate_size=20000, **kwargs):
+        """
+        Args:
+            search_page: HTML dei risultati o funzione (campi del modulo) → HTML
+            users: Dict {utente: password} (default USERNAME/PASSWORD)
+            agencies: Dict {codexp: {'direccion', 'telefono', 'horario'}} per
+                expedicion.aspx (spedizioni assenti: agenzia generica)
+            viewstate_size: Lunghezza del __VIEWSTATE nei moduli (byte)
+            **kwargs: Latenza e guasti (vedi FakeHTTPServer)
+        """
+        self.search_page = search_page if search_page is not None else EMPTY_RESULTS
+        self.users = users or {self.USERNAME: self.PASSWORD}
+        self.agencies = agencies or {}
+        self.viewstate_size = viewstate_size
+        self.logins = 0
+        self.searches = []
+        self._auth_tokens = set()
+        self._validation_tokens = set()
+        super().__init__(**kwargs)
+
+    def issue_form_state(self):
+        """Campi nascosti ASP.NET di un modulo (EVENTVALIDATION valida per un postback)"""
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._validation_tokens.add(token)
+        return {
+            '__VIEWSTATE': '/wEPDwUK' + 'x' * max(0, self.viewstate_size - 8),
+            '__VIEWSTATEGENERATOR': 'CA0B0334',
+            '__EVENTVALIDATION': token,
+        }
+
+    def consume_form_state(self, form):
+        with self._lock:
+            token = form.get('__EVENTVALIDATION')
+            if token in self._validation_tokens:
+                self._validation_tokens.discard(token)
+                return True
+        return False
+
+    def is_authenticated(self, cookies):
+        with self._lock:
+            return cookies.get(AUTH_COOKIE) in self._auth_tokens
+
+    def login(self, username, password):
+        """Token .ASPXAUTH per credenziali valide, None altrimenti"""
+        if self.users.get(username) != password:
+            return None
+        token = secrets.token_hex(24)
+        with self._lock:
+            self._auth_tokens.add(token)
+            self.logins += 1
+        return token
+
+    def expire_sessions(self):
+        """Invalida tutte le sessioni (come un riavvio dell'extranet)"""
+        with self._lock:
+            self._auth_tokens.clear()
+
+    def results_page(self, form):
+        with self._lock:
+            self.searches.append(form)
+        if callable(self.search_page):
+            return self.search_page(form)
+        return self.search_page
+
+    def send_error_page(self, handler, operation):
+        handler.send(500, "<html><head><title>Runtime Error</title></head><body>"
+                          "<h1>Server Error in '/' Application.</h1></body></html>")
+
+    def send_throttled(self, handler, operation):
+        handler.send(503, '<html><body><h1>Server Too Busy</h1></body></html>', headers={'Retry-After': '1'})
+
+    def _handler_class(self):
+        fake = self
+
+        def hidden_fields(state):
+            return ''.join(
+                f'<input type="hidden" name="{name}" id="{name}" value="{value}" />'
+                for name, value in state.items()
+            )
+
+        def login_page(error=False):
+            message = '<span class="error">Usuario o contraseña incorrectos</span>' if error else ''
+            return (
+                '<html><head><title>GLS Extranet - Login</title></head><body>'
+                f'<form method="post" action="Login.aspx">{hidden_fields(fake.issue_form_state())}'
+                '<input name="usuario" type="text" /><input name="pass" type="password" />'
+                f'<input type="image" name="Button1" src="entrar.gif" />{message}</form></body></html>'
+            )
+
+        def search_form():
+            return (
+                '<html><head><title>MiraEnvios</title></head><body>'
+                f'<form method="post" action="Miraenvios.aspx">{hidden_fields(fake.issue_form_state())}'
+                '<input name="fechadesde" /><input name="fechahasta" /><select name="cliente"></select>'
+                '<input type="image" name="btBuscar" src="buscar.gif" /></form></body></html>'
+            )
+
+        def detail_page(codexp):
+            agency = fake.agencies.get(codexp) or {
+                'direccion': 'CALLE PINO SIBERIA 28, 41016 SEVILLA',
+                'telefono': '954981710',
+                'horario': 'L-V 09:00-14:00 / 16:00-19:00',
+            }
+            return (
+                f'<html><body><form method="post">{hidden_fields(fake.issue_form_state())}'
+                f'<input name="plzDstDireccion" type="text" value="{escape(agency["direccion"])}" />'
+                f'<input name="plzDstTelefono" type="text" value="{escape(agency["telefono"])}" />'
+                f'<input name="plzDstHorario" type="text" value="{escape(agency["horario"])}" />'
+                '</form></body></html>'
+            )
+
+        class Handler(FakeRequestHandler):
+            def _session_headers(self, cookies):
+                if SESSION_COOKIE in cookies:
+                    return {}
+                return {'Set-Cookie': f"{SESSION_COOKIE}={secrets.token_hex(12)}; path=/; HttpOnly"}
+
+            def _login_redirect(self):
+                self.redirect(f"/Extranet/Login.aspx?ReturnUrl={quote(urlparse(self.path).path, safe='')}")
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.lower()
+                query = parse_qs(parsed.query)
+                cookies = self.cookies()
+                session = self._session_headers(cookies)
+
+                if path == LOGIN_PATH:
+                    if not fake.inject(self, 'login_form'):
+                        self.send(200, login_page(error='error' in query), headers=session)
+                elif path == DEFAULT_PATH:
+                    if not fake.inject(self, 'default'):
+                        self.send(200, '<html><body><h1>Bienvenido a la Extranet GLS</h1></body></html>')
+                elif path == SEARCH_PATH:
+                    if fake.inject(self, 'search_form'):
+                        return
+                    if not fake.is_authenticated(cookies):
+                        self._login_redirect()
+                    else:
+                        self.send(200, search_form(), headers=session)
+                elif path == DETAIL_PATH:
+                    if fake.inject(self, 'detail'):
+                        return
+                    if not fake.is_authenticated(cookies):
+                        self._login_redirect()
+                    else:
+                        self.send(200, detail_page(query.get('codexp', [''])[0]))
+                else:
+                    self.send(404, '<html><body><h1>404 - Not Found</h1></body></html>')
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.lower()
+                form = self.read_form()
+                cookies = self.cookies()
+
+                if path == LOGIN_PATH:
+                    if fake.inject(self, 'login'):
+                        return
+                    if not fake.consume_form_state(form):
+                        fake.send_error_page(self, 'login')
+                        return
+                    token = fake.login(form.get('usuario'), form.get('pass'))
+                    if token is None:
+                        self.redirect('/Extranet/Login.aspx?error=1')
+                        return
+                    return_url = parse_qs(parsed.query).get('ReturnUrl', ['/default.aspx'])[0]
+                    self.redirect(
+                        '/' + return_url.lstrip('~/'),
+                        headers={'Set-Cookie': f"{AUTH_COOKIE}={token}; path=/; HttpOnly"}
+                    )
+                elif path == SEARCH_PATH:
+                    if fake.inject(self, 'search'):
+                        return
+                    if not fake.is_authenticated(cookies):
+                        self._login_redirect()
+                    elif not fake.consume_form_state(form):
+                        fake.send_error_page(self, 'search')
+                    else:
+                        self.send(200, fake.results_page(form))
+                else:
+                    self.send(404, '<html><body><h1>404 - Not Found</h1></body></html>')
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import time
+
+    demo = FakeGLSExtranet(latency=0.1).start()
+    print(f"🧪 Fake GLS extranet in ascolto su {demo.url} "
+          f"(utente {FakeGLSExtranet.USERNAME} / {FakeGLSExtranet.PASSWORD})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        demo.stop()
@@ -0,0 +1,208 @@
+"""
+Web service SOAP GLS finto (b2b.asmx) per test locali di lambda_fulfill_order,
+anula_gls e dell'azione get_agenzia di lambda_almacenado.
+
+Un solo server risponde per entrambi gli endpoint veri (qualunque percorso
+che finisce con b2b.asmx):
+- wsclientes.asmred.com:   GrabaServicios, Anula  → GLS_SOAP_ENDPOINT
+- ws-customer.gls-spain.es: GetExpCli             → GLS_CUSTOMER_ENDPOINT
+
+L'operazione si riconosce dall'elemento nel Body (SOAP 1.1 o 1.2). Le
+spedizioni registrate restano in memoria per albaran:
+- GrabaServicios con un albaran già attivo risponde -70 come GLS
+- Anula annulla (0), -1 se già annullata, -3 se sconosciuta
+- GetExpCli cerca per expedicion, codbarras o referenza (anche spedizioni
+  precaricate con add_shipment, es. quelle delle pagine extranet finte)
+
+Uso:
+    server = FakeGLSSoap(latency=0.3).start()
+    os.environ['GLS_SOAP_ENDPOINT'] = server.url + 'b2b.asmx'
+    os.environ['GLS_CUSTOMER_ENDPOINT'] = server.url + 'b2b.asmx'
+"""
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from fake_http import FakeHTTPServer, FakeRequestHandler
+
+ASM_NS = 'http://www.asmred.com/'
+OPERATIONS = ('GrabaServicios', 'GetExpCli', 'Anula')
+OPERATION_RE = re.compile(r'<(?:\w+:)?(' + '|'.join(OPERATIONS) + r')\b')
+
+SOAP_ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<soap12:Envelope xmlns:soap12="http://www.w3.org/2003/05/soap-envelope"><soap12:Body>'
+    '{body}</soap12:Body></soap12:Envelope>'
+)
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def find_local(element, name):
+    """Primo discendente con nome locale `name` (namespace qualsiasi)"""
+    return next((child for child in element.iter() if local_name(child.tag) == name), None)
+
+
+def text_local(element, name):
+    found = find_local(element, name)
+    return (found.text or '').strip() if found is not None else ''
+
+
+class FakeGLSSoap(FakeHTTPServer):
+    def __init__(self, first_expedicion=62000000, codplaza_org='771', **kwargs):
+        """
+        Args:
+            first_expedicion: Numero della prima spedizione registrata
+            codplaza_org: Agenzia di origine delle spedizioni registrate
+            **kwargs: Latenza e guasti (vedi FakeHTTPServer)
+        """
+        self.next_expedicion = first_expedicion
+        self.codplaza_org = codplaza_org
+        self.shipments = {}
+        super().__init__(**kwargs)
+
+    def add_shipment(self, expedicion, referencia='', albaran=None, codplaza_org=None, estado='GRABADO'):
+        """Registra una spedizione esistente (visibile a GetExpCli e Anula)"""
+        shipment = {
+            'expedicion': str(expedicion),
+            'codbarras': f"61{int(expedicion):012d}",
+            'albaran': str(albaran if albaran is not None else referencia),
+            'referencia': referencia,
+            'codplaza_org': codplaza_org or self.codplaza_org,
+            'estado': estado,
+            'fecha': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'anulada': False,
+        }
+        with self._lock:
+            self.shipments[shipment['albaran']] = shipment
+        return shipment
+
+    def graba_servicios(self, root):
+        envios = []
+        for envio in (element for element in root.iter() if local_name(element.tag) == 'Envio'):
+            albaran = text_local(envio, 'Albaran')
+            referencia = next(
+                ((ref.text or '').strip() for ref in envio.iter()
+                 if local_name(ref.tag) == 'Referencia' and ref.get('tipo') == 'C'),
+                albaran
+            )
+            with self._lock:
+                existing = self.shipments.get(albaran)
+                duplicate = existing is not None and not existing['anulada']
+                if not duplicate:
+                    expedicion = self.next_expedicion
+                    self.next_expedicion += 1
+            if duplicate:
+                envios.append(
+                    '<Envio codbarras="" codexp="" uid=""><Resultado return="-70" />'
+                    f'<Errores><Error>Ya existe un envio con el albaran {escape(albaran)}</Error></Errores></Envio>'
+                )
+                continue
+            shipment = self.add_shipment(expedicion, referencia=referencia, albaran=albaran)
+            envios.append(
+                f'<Envio codbarras="{shipment["codbarras"]}" codexp="{shipment["expedicion"]}" '
+                f'uid="{int(expedicion):016x}"><Resultado return="0" /><Errores />'
+                f'<Referencias><Referencia tipo="C">{escape(referencia)}</Referencia></Referencias></Envio>'
+            )
+        return (
+            f'<GrabaServiciosResponse xmlns="{ASM_NS}"><GrabaServiciosResult>'
+            f'<Servicios>{"".join(envios)}</Servicios>'
+            '</GrabaServiciosResult></GrabaServiciosResponse>'
+        )
+
+    def anula(self, root):
+        albaran = text_local(root, 'Albaran')
+        with self._lock:
+            shipment = self.shipments.get(albaran)
+            if shipment is None:
+                code, message = '-3', 'No existe el envio'
+            elif shipment['anulada']:
+                code, message = '-1', 'El envio ya esta borrado'
+            else:
+                shipment['anulada'] = True
+                shipment['estado'] = 'ANULADA'
+                code, message = '0', ''
+        return (
+            f'<AnulaResponse xmlns="{ASM_NS}"><AnulaResult><Servicios><Envio>'
+            f'<Resultado return="{code}">{message}</Resultado></Envio></Servicios></AnulaResult></AnulaResponse>'
+        )
+
+    def get_exp_cli(self, root):
+        codigo = text_local(root, 'codigo')
+        key = codigo.lstrip('#').upper()
+        with self._lock:
+            matches = [
+                dict(shipment) for shipment in self.shipments.values()
+                if codigo in (shipment['expedicion'], shipment['codbarras'])
+                or key and key in (shipment['referencia'].lstrip('#').upper(), shipment['albaran'].upper())
+            ]
+        exps = ''.join(
+            '<exp>'
+            f'<expedicion>{shipment["expedicion"]}</expedicion><albaran>{escape(shipment["albaran"])}</albaran>'
+            f'<codbar>{shipment["codbarras"]}</codbar><codplaza_org>{shipment["codplaza_org"]}</codplaza_org>'
+            f'<codplaza_dst>412</codplaza_dst><estado>{shipment["estado"]}</estado>'
+            f'<tracking_list><tracking><fecha>{shipment["fecha"]}</fecha><tipo>ESTADO</tipo><codigo>0</codigo>'
+            f'<evento>{shipment["estado"]}</evento></tracking></tracking_list>'
+            '</exp>'
+            for shipment in matches
+        )
+        return (
+            f'<GetExpCliResponse xmlns="{ASM_NS}"><GetExpCliResult>'
+            f'<expediciones xmlns="">{exps}</expediciones>'
+            '</GetExpCliResult></GetExpCliResponse>'
+        )
+
+    def send_error_page(self, handler, operation):
+        handler.send(500, SOAP_ENVELOPE.format(body=(
+            '<soap12:Fault><soap12:Code><soap12:Value>soap12:Receiver</soap12:Value></soap12:Code>'
+            '<soap12:Reason><soap12:Text xml:lang="es">Server was unable to process request.</soap12:Text>'
+            '</soap12:Reason></soap12:Fault>'
+        )), content_type='application/soap+xml; charset=utf-8')
+
+    def send_throttled(self, handler, operation):
+        handler.send(503, '<html><body><h1>Service Unavailable</h1></body></html>', headers={'Retry-After': '1'})
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(FakeRequestHandler):
+            def do_POST(self):
+                body = self.read_body().decode('utf-8', errors='replace')
+                if not urlparse(self.path).path.lower().endswith('/b2b.asmx'):
+                    self.send(404, '<html><body><h1>404 - Not Found</h1></body></html>')
+                    return
+                match = OPERATION_RE.search(body)
+                operation = match.group(1) if match else 'unknown'
+                if fake.inject(self, operation):
+                    return
+                try:
+                    root = ET.fromstring(body)
+                except ET.ParseError:
+                    match = None
+                if match is None:
+                    fake.send_error_page(self, operation)
+                    return
+                result = {
+                    'GrabaServicios': fake.graba_servicios,
+                    'GetExpCli': fake.get_exp_cli,
+                    'Anula': fake.anula,
+                }[operation](root)
+                self.send(200, SOAP_ENVELOPE.format(body=result), content_type='text/xml; charset=utf-8')
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import time
+
+    demo = FakeGLSSoap(latency=0.2).start()
+    print(f"🧪 Fake GLS SOAP in ascolto su {demo.url}b2b.asmx")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        demo.stop()
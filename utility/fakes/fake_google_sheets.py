@@ -0,0 +1,114 @@
+"""
+Endpoint Google Sheets/Drive finto per test locali di sheets_client.
+
+Serve:
+- GET /v4/spreadsheets/{id}/values:batchGet?ranges=...   (Sheets API v4)
+- GET /v4/spreadsheets/{id}/values/{range}               (Sheets API v4)
+- GET /drive/v3/files/{id}?fields=version,modifiedTime   (Drive API v3)
+
+I fogli sono dict {nome_foglio: righe}; update_sheet() incrementa la versione
+come farebbe Drive dopo una modifica. Conta le richieste per endpoint.
+
+Uso:
+    server = FakeGoogleSheets({'Magazzino': [...], 'InArrivo': [...]}).start()
+    os.environ['GOOGLE_SHEETS_API_ENDPOINT'] = server.url
+    os.environ['GOOGLE_DRIVE_API_ENDPOINT'] = server.url + 'drive/v3/'
+"""
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class FakeGoogleSheets:
+    def __init__(self, sheets, host='127.0.0.1', port=0):
+        self.sheets = dict(sheets)
+        self.version = 1
+        self.modified_time = datetime.now(timezone.utc).isoformat()
+        self.requests = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def update_sheet(self, name, rows):
+        """Sostituisce un foglio e incrementa la revisione"""
+        self.sheets[name] = rows
+        self.version += 1
+        self.modified_time = datetime.now(timezone.utc).isoformat()
+
+    def _values(self, range_name):
+        # "Magazzino!A:D" -> foglio "Magazzino" (colonne ignorate)
+        return self.sheets.get(range_name.split('!')[0], [])
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = unquote(parsed.path)
+                query = parse_qs(parsed.query)
+
+                if path.startswith('/v4/spreadsheets/') and path.endswith('/values:batchGet'):
+                    fake.requests['batchGet'] += 1
+                    ranges = query.get('ranges', [])
+                    self._send(200, {
+                        'spreadsheetId': path.split('/')[3],
+                        'valueRanges': [
+                            {'range': r, 'majorDimension': 'ROWS', 'values': fake._values(r)}
+                            for r in ranges
+                        ],
+                    })
+                elif path.startswith('/v4/spreadsheets/') and '/values/' in path:
+                    fake.requests['get'] += 1
+                    range_name = path.split('/values/', 1)[1]
+                    self._send(200, {'range': range_name, 'majorDimension': 'ROWS',
+                                     'values': fake._values(range_name)})
+                elif path.startswith('/drive/v3/files/'):
+                    fake.requests['drive'] += 1
+                    self._send(200, {'version': str(fake.version), 'modifiedTime': fake.modified_time})
+                else:
+                    self._send(404, {'error': {'code': 404, 'message': f'Not found: {path}'}})
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import time
+
+    demo = FakeGoogleSheets({
+        'Magazzino': [['MODELO', 'TALLA', 'SKU', 'CANTIDAD'], ['SLIP BL', 'M', 'SLIP.M.BL', '10']],
+        'InArrivo': [['MODELO', 'TALLA', 'SKU', 'CANTIDAD'], ['SLIP BL', 'M', 'SLIP.M.BL', '5']],
+    }).start()
+    print(f"🧪 Fake Google Sheets in ascolto su {demo.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        demo.stop()
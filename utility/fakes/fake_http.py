@@ -0,0 +1,134 @@
+"""
+Base comune dei server finti locali (GLS extranet, GLS SOAP, Shopify).
+
+Ogni server gira in un thread (ThreadingHTTPServer, richieste concorrenti)
+e può iniettare per ogni richiesta:
+- latency / jitter: attesa fissa + casuale (secondi) prima di rispondere
+- error_rate: frazione di richieste che ricevono un errore del server
+- throttle_rate: frazione di richieste rifiutate per rate limit
+
+La forma dell'errore e del rifiuto dipende dal protocollo (send_error_page /
+send_throttled nelle sottoclassi). Conta le richieste per operazione
+(`requests`) e i guasti iniettati (`faults`).
+"""
+import random
+import threading
+import time
+from collections import Counter
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive come i server veri: requests.Session riusa le connessioni
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def redirect(self, location, headers=None):
+        self.send(302, b'', headers={'Location': location, **(headers or {})})
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def read_form(self):
+        """Body application/x-www-form-urlencoded → dict (primo valore per campo)"""
+        fields = parse_qs(self.read_body().decode('utf-8'), keep_blank_values=True)
+        return {name: values[0] for name, values in fields.items()}
+
+    def cookies(self):
+        cookie = SimpleCookie(self.headers.get('Cookie') or '')
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+
+class FakeHTTPServer:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=None,
+                 host='127.0.0.1', port=0):
+        """
+        Args:
+            latency: Attesa fissa per richiesta (secondi)
+            jitter: Attesa casuale aggiuntiva, uniforme in [0, jitter]
+            error_rate: Frazione di richieste con errore del server (0-1)
+            throttle_rate: Frazione di richieste rifiutate per rate limit (0-1)
+            seed: Seme per guasti e jitter riproducibili
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = Counter()
+        self.faults = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def inject(self, handler, operation):
+        """
+        Conta la richiesta, applica la latenza e gli eventuali guasti.
+        Va chiamata dopo aver letto il body: la connessione resta aperta.
+
+        Returns:
+            True se la risposta (errore o rifiuto) è già stata inviata
+        """
+        with self._lock:
+            self.requests[operation] += 1
+            roll = self._rng.random()
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if roll < self.error_rate:
+            with self._lock:
+                self.faults['error'] += 1
+            self.send_error_page(handler, operation)
+            return True
+        if roll < self.error_rate + self.throttle_rate:
+            with self._lock:
+                self.faults['throttle'] += 1
+            self.send_throttled(handler, operation)
+            return True
+        return False
+
+    def send_error_page(self, handler, operation):
+        handler.send(500, 'Internal Server Error', content_type='text/plain')
+
+    def send_throttled(self, handler, operation):
+        handler.send(503, 'Service Unavailable', content_type='text/plain', headers={'Retry-After': '1'})
+
+    def _handler_class(self):
+        raise NotImplementedError
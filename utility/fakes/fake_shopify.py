@@ -0,0 +1,441 @@
+"""
+Admin API Shopify finta per test locali delle Lambda (GraphQL + REST orders).
+
+ShopifyOrders interpreta le query e mutation che le Lambda inviano davvero
+(orders con first/after/reverse e filtri created_at/updated_at/tag/name/
+fulfillment_status, order(id:), fulfillmentOrders, tagsAdd,
+fulfillmentCreate) su nodi ordine in memoria, es. quelli di
+benchmarks/synthetic.py. È usata anche in-process da synthetic.FakeShopifyOrders.
+
+FakeShopify la espone via HTTP con il rate limit di Shopify:
+- POST /admin/api/{versione}/graphql.json: bucket di costo (maximumAvailable,
+  restoreRate al secondo), errori THROTTLED quando il costo richiesto supera
+  i punti disponibili, MAX_COST_EXCEEDED oltre il costo massimo per query,
+  extensions.cost.throttleStatus in ogni risposta
+- GET /admin/api/{versione}/orders.json: paginazione con header Link
+  (page_info), 429 per il throttling iniettato
+
+Il costo richiesto segue il modello usato nelle Lambda: ogni connection
+costa 2 + first, moltiplicato per il first delle connection che la
+contengono (orders(first: 50) { lineItems(first: 15) } → 52 + 50 × 17).
+
+Uso:
+    server = FakeShopify(nodes, latency=0.15).start()
+    os.environ['SHOPIFY_GRAPHQL_URL'] = server.graphql_url
+    os.environ['SHOPIFY_REST_URL'] = server.rest_url
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs, urlencode
+
+from fake_http import FakeHTTPServer, FakeRequestHandler
+
+API_VERSION = '2024-04'
+MUTATION_COST = 10
+
+
+def numeric_id(gid):
+    return str(gid).rsplit('/', 1)[-1]
+
+
+def query_cost(query):
+    """Costo richiesto stimato dai first: delle connection annidate"""
+    cost = 0
+    stack = []  # (profondità graffe, moltiplicatore all'interno della connection)
+    depth = 0
+    pending = None
+    for token in re.finditer(r'\{|\}|\bfirst:\s*(\d+)', query):
+        text = token.group(0)
+        if text == '{':
+            depth += 1
+            if pending is not None:
+                stack.append((depth, pending))
+                pending = None
+        elif text == '}':
+            if stack and stack[-1][0] == depth:
+                stack.pop()
+            depth -= 1
+        else:
+            first = int(token.group(1))
+            multiplier = stack[-1][1] if stack else 1
+            cost += multiplier * (first + 2)
+            pending = multiplier * first
+    return max(cost, 1)
+
+
+class ShopifyOrders:
+    """Query e mutation delle Lambda sui nodi ordine in memoria"""
+
+    FIRST_RE = re.compile(r'orders\(first:\s*(\d+)')
+    AFTER_RE = re.compile(r'orders\([^)]*after:\s*"(\d+)"')
+    FILTER_RE = re.compile(r'query:\s*"([^"]*)"')
+    GTE_RE = re.compile(r"created_at:>=('[^']+'|[^\s)]+)")
+    LT_RE = re.compile(r"created_at:<(?!=)('[^']+'|[^\s)]+)")
+    LTE_RE = re.compile(r"created_at:<=('[^']+'|[^\s)]+)")
+    UPDATED_RE = re.compile(r"updated_at:>'([^']+)'")
+    ORDER_ID_RE = re.compile(r'order\(id:\s*(?:"([^"]+)"|\$(\w+))\)')
+    TAG_RE = re.compile(r"tag:(?:'([^']+)'|([^\s)]+))")
+    NAME_RE = re.compile(r'name:(#?[\w-]+)')
+    FULFILLMENT_RE = re.compile(r'fulfillment_status:(\w+)')
+    REVERSE_RE = re.compile(r'reverse:\s*true')
+    TAGS_ADD_RE = re.compile(r'tagsAdd\(id:\s*(?:"([^"]+)"|\$(\w+)),\s*tags:\s*(?:\[([^\]]*)\]|\$(\w+))')
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self._selected = {}
+        self._by_id = None
+        self._lock = threading.RLock()
+
+    # ---------------------------------------------------------------- lettura
+
+    def order_by_id(self, order_id):
+        with self._lock:
+            if self._by_id is None or len(self._by_id) != len(self.nodes):
+                self._by_id = {node['id']: node for node in self.nodes}
+            return self._by_id.get(order_id)
+
+    @staticmethod
+    def _created_in(node, bounds):
+        """
+        Vincoli created_at di un gruppo [(op, valore)]: le date senza ora si
+        confrontano con il giorno UTC, gli istanti quotati con createdAt
+        """
+        created = node['createdAt']
+        for op, value in bounds:
+            key = created if value.startswith("'") else created[:10]
+            value = value.strip("'")
+            if not (key >= value if op == '>=' else key <= value if op == '<=' else key < value):
+                return False
+        return True
+
+    def _matches(self, node, spans, updated, tags, names, fulfillment):
+        return (
+            any(self._created_in(node, bounds) for bounds in spans)
+            and (not updated or node.get('updatedAt', '') > updated)
+            and (not tags or tags <= {tag.upper() for tag in node.get('tags') or ()})
+            and (not names or node.get('name', '').lstrip('#').upper() in names)
+            and (not fulfillment or node.get('displayFulfillmentStatus', 'UNFULFILLED') in fulfillment)
+        )
+
+    def select(self, query_filter, reverse=False):
+        """Nodi che soddisfano il filtro di ricerca (ordine di createdAt)"""
+        updated = self.UPDATED_RE.search(query_filter)
+        tags = {(quoted or bare).upper() for quoted, bare in self.TAG_RE.findall(query_filter)}
+        names = {name.lstrip('#').upper() for name in self.NAME_RE.findall(query_filter)}
+        fulfillment = {status.upper() for status in self.FULFILLMENT_RE.findall(query_filter)}
+
+        # Intervalli di creazione "(created_at:>=A created_at:<B) OR (...)"
+        spans = [
+            [(op, value) for op, regex in (('>=', self.GTE_RE), ('<', self.LT_RE), ('<=', self.LTE_RE))
+             for value in regex.findall(group)]
+            for group in query_filter.split(' OR ')
+        ]
+
+        selected = [
+            node for node in self.nodes
+            if self._matches(node, spans, updated.group(1) if updated else None, tags, names, fulfillment)
+        ]
+        if reverse:
+            selected.reverse()
+        return selected
+
+    def orders(self, query):
+        first = int(self.FIRST_RE.search(query).group(1))
+        after = self.AFTER_RE.search(query)
+        match = self.FILTER_RE.search(query)
+        query_filter = match.group(1) if match else ''
+        reverse = bool(self.REVERSE_RE.search(query))
+
+        # Selezione riusata per le pagine successive della stessa paginazione
+        key = (query_filter, reverse)
+        with self._lock:
+            if not after:
+                self._selected.pop(key, None)
+            selected = self._selected.get(key)
+            if selected is None:
+                selected = self._selected[key] = self.select(query_filter, reverse)
+        offset = int(after.group(1)) if after else 0
+        page = selected[offset:offset + first]
+        end = offset + len(page)
+        return {'orders': {
+            'pageInfo': {'hasNextPage': end < len(selected), 'endCursor': str(end)},
+            'edges': [{'cursor': str(offset + i + 1), 'node': n} for i, n in enumerate(page)],
+        }}
+
+    def fulfillment_orders(self, node):
+        """Un fulfillment order per ordine: CLOSED se evaso, OPEN altrimenti"""
+        status = 'CLOSED' if node.get('displayFulfillmentStatus') == 'FULFILLED' else 'OPEN'
+        fo_id = f"gid://shopify/FulfillmentOrder/{numeric_id(node['id'])}"
+        return {'edges': [{'node': {'id': fo_id, 'status': status}}]}
+
+    def order(self, query, variables):
+        match = self.ORDER_ID_RE.search(query)
+        order_id = match.group(1) or (variables or {}).get(match.group(2))
+        node = self.order_by_id(order_id)
+        if node is not None and 'fulfillmentOrders' in query:
+            node = {**node, 'fulfillmentOrders': self.fulfillment_orders(node)}
+        return {'order': node}
+
+    # --------------------------------------------------------------- mutation
+
+    def tags_add(self, query, variables):
+        match = self.TAGS_ADD_RE.search(query)
+        variables = variables or {}
+        order_id = match.group(1) or variables.get(match.group(2))
+        if match.group(3) is not None:
+            tags = [tag.strip().strip('"') for tag in match.group(3).split(',') if tag.strip()]
+        else:
+            tags = variables.get(match.group(4)) or []
+        with self._lock:
+            node = self.order_by_id(order_id)
+            if node is None:
+                return {'tagsAdd': {'node': None, 'userErrors': [
+                    {'field': ['id'], 'message': 'Order does not exist'}]}}
+            existing = node.setdefault('tags', [])
+            existing.extend(tag for tag in tags if tag not in existing)
+            node['updatedAt'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        return {'tagsAdd': {'node': {'id': order_id}, 'userErrors': []}}
+
+    def fulfillment_create(self, variables):
+        fulfillment = (variables or {}).get('fulfillment') or {}
+        fo_ids = [item.get('fulfillmentOrderId') for item in fulfillment.get('lineItemsByFulfillmentOrder') or []]
+        with self._lock:
+            nodes = [self.order_by_id(f"gid://shopify/Order/{numeric_id(fo_id)}") for fo_id in fo_ids]
+            if not nodes or any(node is None for node in nodes):
+                return {'fulfillmentCreate': {'fulfillment': None, 'userErrors': [
+                    {'field': ['fulfillment', 'lineItemsByFulfillmentOrder'],
+                     'message': 'Fulfillment order does not exist.'}]}}
+            if any(node.get('displayFulfillmentStatus') == 'FULFILLED' for node in nodes):
+                return {'fulfillmentCreate': {'fulfillment': None, 'userErrors': [
+                    {'field': ['fulfillment'], 'message': 'Fulfillment order is not in an open state.'}]}}
+            tracking = fulfillment.get('trackingInfo') or {}
+            created = {
+                'id': f"gid://shopify/Fulfillment/{numeric_id(nodes[0]['id'])}",
+                'status': 'SUCCESS',
+                'trackingInfo': [{key: tracking.get(key) for key in ('company', 'number', 'url')}],
+            }
+            for node in nodes:
+                node['displayFulfillmentStatus'] = 'FULFILLED'
+                node['updatedAt'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+                node.setdefault('fulfillments', []).append(created)
+        return {'fulfillmentCreate': {'fulfillment': created, 'userErrors': []}}
+
+    # ------------------------------------------------------------------- API
+
+    def execute(self, query, variables=None):
+        """
+        Esegue una query/mutation GraphQL.
+
+        Returns:
+            Body della risposta ({'data': ...} o {'errors': [...]}), senza extensions
+        """
+        if 'tagsAdd(' in query:
+            return {'data': self.tags_add(query, variables)}
+        if 'fulfillmentCreate(' in query:
+            return {'data': self.fulfillment_create(variables)}
+        if self.ORDER_ID_RE.search(query):
+            return {'data': self.order(query, variables)}
+        if self.FIRST_RE.search(query):
+            return {'data': self.orders(query)}
+        return {'errors': [{'message': 'Operazione non supportata dalla Shopify finta',
+                            'extensions': {'code': 'UNSUPPORTED'}}]}
+
+    def rest_orders(self, params):
+        """
+        GET orders.json: ordini creati da created_at_min in formato REST.
+
+        Returns:
+            tuple (ordini, offset della pagina successiva o None)
+        """
+        limit = min(int(params.get('limit', 50)), 250)
+        offset = int(params.get('page_info', 0))
+        created_min = params.get('created_at_min', '')[:19]
+        with self._lock:
+            selected = [node for node in self.nodes if node['createdAt'][:19] >= created_min]
+        page = selected[offset:offset + limit]
+        orders = [
+            {
+                'id': int(numeric_id(node['id'])),
+                'admin_graphql_api_id': node['id'],
+                'name': node.get('name', ''),
+                'created_at': node['createdAt'].replace('Z', '+00:00'),
+                'tags': ', '.join(node.get('tags') or []),
+                'line_items': [
+                    {'sku': edge['node'].get('sku'), 'title': edge['node'].get('title'),
+                     'quantity': edge['node'].get('quantity'), 'current_quantity': edge['node'].get('quantity')}
+                    for edge in (node.get('lineItems') or {}).get('edges', [])
+                ],
+            }
+            for node in page
+        ]
+        end = offset + len(page)
+        return orders, (end if end < len(selected) else None)
+
+
+class FakeShopify(FakeHTTPServer):
+    def __init__(self, nodes, bucket_size=2000.0, restore_rate=100.0, max_query_cost=1000,
+                 access_token=None, **kwargs):
+        """
+        Args:
+            nodes: Nodi ordine GraphQL (lista condivisa, le mutation la modificano)
+            bucket_size: Punti massimi del bucket GraphQL (maximumAvailable)
+            restore_rate: Punti restituiti al secondo
+            max_query_cost: Costo massimo di una singola query
+            access_token: Se indicato, X-Shopify-Access-Token richiesto (401 altrimenti)
+            **kwargs: Latenza e guasti (vedi FakeHTTPServer)
+        """
+        self.store = ShopifyOrders(nodes)
+        self.bucket_size = bucket_size
+        self.restore_rate = restore_rate
+        self.max_query_cost = max_query_cost
+        self.access_token = access_token
+        self.available = bucket_size
+        self.throttled = 0
+        self._bucket_ts = time.monotonic()
+        super().__init__(**kwargs)
+
+    @property
+    def graphql_url(self):
+        return f"{self.url}admin/api/{API_VERSION}/graphql.json"
+
+    @property
+    def rest_url(self):
+        return f"{self.url}admin/api/{API_VERSION}"
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.bucket_size, self.available + (now - self._bucket_ts) * self.restore_rate)
+        self._bucket_ts = now
+
+    def throttle_status(self):
+        return {
+            'maximumAvailable': float(self.bucket_size),
+            'currentlyAvailable': int(self.available),
+            'restoreRate': float(self.restore_rate),
+        }
+
+    def debit(self, requested):
+        """Scala il costo richiesto dal bucket; False se i punti non bastano"""
+        with self._lock:
+            self._refill()
+            if requested > self.available:
+                self.throttled += 1
+                return False
+            self.available -= requested
+            return True
+
+    def refund(self, points):
+        with self._lock:
+            self.available = min(self.bucket_size, self.available + points)
+
+    def throttled_body(self, requested):
+        with self._lock:
+            self._refill()
+            status = self.throttle_status()
+        return {
+            'errors': [{'message': 'Throttled', 'extensions': {
+                'code': 'THROTTLED', 'documentation': 'https://shopify.dev/api/usage/rate-limits'}}],
+            'extensions': {'cost': {'requestedQueryCost': requested, 'actualQueryCost': None,
+                                    'throttleStatus': status}},
+        }
+
+    def graphql(self, query, variables=None):
+        """Risposta GraphQL con costo e rate limit applicati"""
+        requested = MUTATION_COST if query.lstrip().startswith('mutation') else query_cost(query)
+        if requested > self.max_query_cost:
+            return {'errors': [{
+                'message': f"Query cost is {requested}, which exceeds the single query max cost limit "
+                           f"({self.max_query_cost}).",
+                'extensions': {'code': 'MAX_COST_EXCEEDED', 'cost': requested,
+                               'maxCost': self.max_query_cost},
+            }]}
+        if not self.debit(requested):
+            return self.throttled_body(requested)
+
+        payload = self.store.execute(query, variables)
+        actual = requested
+        orders = (payload.get('data') or {}).get('orders')
+        if orders is not None:
+            first = int(ShopifyOrders.FIRST_RE.search(query).group(1))
+            actual = 2 + round((requested - 2) * len(orders['edges']) / max(first, 1))
+        self.refund(requested - actual)
+        with self._lock:
+            status = self.throttle_status()
+        payload['extensions'] = {'cost': {'requestedQueryCost': requested, 'actualQueryCost': actual,
+                                          'throttleStatus': status}}
+        return payload
+
+    def send_error_page(self, handler, operation):
+        handler.send(503, json.dumps({'errors': 'Service Unavailable'}), content_type='application/json')
+
+    def send_throttled(self, handler, operation):
+        if operation == 'graphql':
+            handler.send(200, json.dumps(self.throttled_body(0)), content_type='application/json')
+        else:
+            handler.send(429, json.dumps({'errors': 'Exceeded 2 calls per second for api client. '
+                                                    'Reduce request rates to resume uninterrupted service.'}),
+                         content_type='application/json', headers={'Retry-After': '2.0'})
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(FakeRequestHandler):
+            def _authorized(self):
+                if fake.access_token and self.headers.get('X-Shopify-Access-Token') != fake.access_token:
+                    self.send(401, json.dumps({'errors': '[API] Invalid API key or access token '
+                                                         '(unrecognized login or wrong password)'}),
+                              content_type='application/json')
+                    return False
+                return True
+
+            def do_POST(self):
+                body = self.read_body()
+                if not urlparse(self.path).path.endswith('/graphql.json'):
+                    self.send(404, json.dumps({'errors': 'Not Found'}), content_type='application/json')
+                    return
+                if fake.inject(self, 'graphql') or not self._authorized():
+                    return
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    self.send(400, json.dumps({'errors': 'Invalid JSON'}), content_type='application/json')
+                    return
+                payload = fake.graphql(request.get('query', ''), request.get('variables'))
+                self.send(200, json.dumps(payload), content_type='application/json')
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if not parsed.path.endswith('/orders.json'):
+                    self.send(404, json.dumps({'errors': 'Not Found'}), content_type='application/json')
+                    return
+                if fake.inject(self, 'rest_orders') or not self._authorized():
+                    return
+                params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+                orders, next_offset = fake.store.rest_orders(params)
+                headers = {'X-Shopify-Shop-Api-Call-Limit': '1/40'}
+                if next_offset is not None:
+                    next_params = {'limit': params.get('limit', 50), 'page_info': next_offset,
+                                   'created_at_min': params.get('created_at_min', '')}
+                    headers['Link'] = f'<{fake.url.rstrip("/")}{parsed.path}?{urlencode(next_params)}>; rel="next"'
+                self.send(200, json.dumps({'orders': orders}), content_type='application/json', headers=headers)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+    from synthetic import generate_order_nodes
+
+    demo = FakeShopify(generate_order_nodes(500), latency=0.1).start()
+    print(f"🧪 Fake Shopify in ascolto su {demo.graphql_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        demo.stop()
@@ -0,0 +1,99 @@
+"""
+Esecuzione concorrente di sorgenti dati indipendenti con deadline per sorgente.
+
+Ogni sorgente è una funzione senza argomenti eseguita in un thread; le
+deadline sono in secondi dall'avvio del fan-out. Una sorgente in ritardo o
+in errore non blocca le altre: il chiamante riceve lo stato di ognuna e
+decide se la risposta può essere parziale.
+
+    results = fan_out({'sheets': load_sheets, 'gls': load_gls}, {'gls': 8})
+    if not results['gls'].ok:
+        ...  # risposta parziale
+
+Un thread oltre la deadline non può essere interrotto: continua in
+background e il suo risultato viene ignorato.
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, NamedTuple, Optional
+
+OK = 'ok'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+
+class SourceResult(NamedTuple):
+    name: str
+    value: Any
+    status: str          # ok | timeout | error
+    elapsed_ms: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    def metrics(self):
+        """Stato e durata per la response / i log"""
+        data = {'status': self.status, 'ms': round(self.elapsed_ms, 1)}
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+def fan_out(sources, deadlines=None, default_deadline=30.0):
+    """
+    Esegue tutte le sorgenti in parallelo.
+
+    Args:
+        sources: Dict {nome: callable senza argomenti}
+        deadlines: Dict {nome: secondi dall'avvio}; default_deadline per le altre
+
+    Returns:
+        Dict {nome: SourceResult} nello stesso ordine di `sources`
+    """
+    deadlines = deadlines or {}
+    if not sources:
+        return {}
+
+    start = time.perf_counter()
+    elapsed = {}
+
+    def run(name, fn):
+        t_start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            elapsed[name] = (time.perf_counter() - t_start) * 1000
+
+    executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='fanout')
+    # Ogni thread riceve una copia del contesto (es. l'invocazione di metrics)
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, run, name, fn)
+        for name, fn in sources.items()
+    }
+    results = {}
+    try:
+        # Attendi prima le sorgenti con la deadline più vicina
+        for name in sorted(futures, key=lambda n: deadlines.get(n, default_deadline)):
+            deadline = deadlines.get(name, default_deadline)
+            remaining = start + deadline - time.perf_counter()
+            try:
+                value = futures[name].result(timeout=max(0.0, remaining))
+                results[name] = SourceResult(name, value, OK, elapsed[name])
+            except FutureTimeout:
+                results[name] = SourceResult(
+                    name, None, TIMEOUT, (time.perf_counter() - start) * 1000,
+                    f"deadline {deadline:g}s superata"
+                )
+            except Exception as e:
+                results[name] = SourceResult(name, None, ERROR, elapsed.get(name, 0.0), str(e))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for result in results.values():
+        icon = '✅' if result.ok else '⚠️'
+        print(f"   {icon} {result.name}: {result.elapsed_ms:.0f} ms ({result.status})")
+
+    return {name: results[name] for name in sources}
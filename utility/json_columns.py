@@ -0,0 +1,255 @@
+"""
+Serializzazione JSON di DataFrame e colonne senza passare da dict per riga.
+
+Il percorso classico era df.to_dict('records') → pulizia ricorsiva dei
+NaN/NaT valore per valore (isinstance + np.isnan + isnull) → json.dumps.
+Qui i valori mancanti diventano null una volta per colonna, con
+operazioni vettoriali:
+- float          NaN e ±inf → null (maschera np.isfinite)
+- datetime64     NaT → null, le altre date in ISO (solo giorno se tutte a
+                 mezzanotte)
+- object / dtype estesi pandas (Int64, string, category...)
+                 None, NaN, NaT, pd.NA → null
+
+Records tiene le righe per colonne ({nome: valori della stessa lunghezza})
+e si mette direttamente nei dict della response:
+
+    stock = json_columns.Records.from_frame(df, ['sku', 'magazzino_netto'])
+    stock.add('urgenza', etichette)
+    body = json_columns.dumps({'stock': stock, 'summary': summary})
+
+dumps usa orjson se è installato (ENABLE_ORJSON=false lo esclude): i
+Records diventano liste di dict Python e orjson li scrive in C. Senza
+orjson ogni colonna è codificata in token JSON e le righe sono composte con
+un template, senza creare i dict; il resto della struttura passa da
+json.dumps. Gli array NumPy e i DataFrame fuori da Records sono accettati
+con la stessa gestione dei mancanti; i float NaN sciolti nei dict restano
+NaN con json e diventano null con orjson.
+"""
+import json
+import math
+import os
+import re
+from datetime import date, datetime
+from json.encoder import encode_basestring
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENABLE_ORJSON = os.environ.get("ENABLE_ORJSON", "True").lower() == "true"
+
+# Segnaposto dei Records nel JSON di json.dumps (\x00 diventa \u0000)
+_PLACEHOLDER = '\x00json_columns:'
+_PLACEHOLDER_RE = re.compile(r'"\\u0000json_columns:(\d+)"')
+
+# dtype NumPy codificati per colonna; gli altri passano valore per valore
+_VECTOR_KINDS = 'biufMU'
+
+
+class Records:
+    """Righe JSON tenute per colonne: {nome: valori}, tutte della stessa lunghezza"""
+
+    def __init__(self, columns=None, length=None):
+        self.columns = {}
+        self.length = length
+        for name, values in (columns or {}).items():
+            self.add(name, values)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Records dalle colonne di un DataFrame (tutte se columns è None)"""
+        names = list(df.columns) if columns is None else list(columns)
+        return cls({str(name): df[name] for name in names}, length=len(df))
+
+    def add(self, name, values):
+        """Aggiunge (o sostituisce) una colonna: array NumPy, Series, Index o lista"""
+        values = as_column(values)
+        if self.length is None:
+            self.length = len(values)
+        elif len(values) != self.length:
+            raise ValueError(f"Colonna {name}: {len(values)} valori invece di {self.length}")
+        self.columns[name] = values
+
+    def __len__(self):
+        return self.length or 0
+
+    def rows(self):
+        """Lista di dict (mancanti già a None), come df.to_dict('records') pulito"""
+        if not self.columns:
+            return [{} for _ in range(len(self))]
+        names = list(self.columns)
+        values = [column_values(column) for column in self.columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def to_json(self):
+        """Array JSON delle righe, composto dai token delle colonne"""
+        if not len(self):
+            return '[]'
+        if not self.columns:
+            return '[' + ','.join(['{}'] * len(self)) + ']'
+        template = '{' + ','.join(
+            encode_basestring(name).replace('%', '%%') + ':%s' for name in self.columns
+        ) + '}'
+        tokens = [column_tokens(column) for column in self.columns.values()]
+        return '[' + ','.join([template % row for row in zip(*tokens)]) + ']'
+
+
+def as_column(values):
+    """
+    Array NumPy 1-D per i dtype nativi, lista Python con i mancanti già a
+    None per il resto
+    """
+    if isinstance(values, (list, tuple)):
+        return _clean(values)
+    if hasattr(values, 'to_numpy') and not hasattr(values, 'columns'):
+        # Series/Index: i dtype estesi (Int64, string, category, datetime con
+        # fuso) non hanno un dtype NumPy equivalente, pd.NA diventa None
+        if isinstance(values.dtype, np.dtype):
+            values = values.to_numpy()
+        elif getattr(getattr(values.dtype, 'numpy_dtype', None), 'kind', None) == 'f':
+            values = values.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            return _clean(values.to_numpy(dtype=object, na_value=None).tolist())
+    values = np.asarray(values)
+    if values.ndim != 1:
+        raise ValueError(f"Colonna con {values.ndim} dimensioni (attesa 1)")
+    return values if values.dtype.kind in _VECTOR_KINDS else _clean(values.tolist())
+
+
+def _clean(values):
+    return [value if type(value) is str else (None if is_missing(value) else value) for value in values]
+
+
+def is_missing(value):
+    """None, NaN, ±inf, NaT o pd.NA"""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, (str, int)):
+        return False
+    dtype = getattr(value, 'dtype', None)
+    if dtype is not None and getattr(value, 'ndim', None) == 0:
+        if dtype.kind == 'f':
+            return not math.isfinite(value)
+        if dtype.kind in 'mM':
+            return bool(np.isnat(value))
+    return type(value).__name__ in ('NaTType', 'NAType')
+
+
+def _datetime_strings(values):
+    """Date ISO (None per NaT): solo il giorno se sono tutte a mezzanotte"""
+    nat = np.isnat(values)
+    days = values.astype('datetime64[D]')
+    unit = 'D' if bool((days == values)[~nat].all()) else 's'
+    strings = np.datetime_as_string(values, unit=unit).tolist()
+    for i in np.flatnonzero(nat).tolist():
+        strings[i] = None
+    return strings
+
+
+def column_values(column):
+    """Valori Python della colonna, con i mancanti a None"""
+    if not isinstance(column, list):
+        column = as_column(column)
+    if isinstance(column, list):
+        return column
+    kind = column.dtype.kind
+    if kind == 'f':
+        values = column.tolist()
+        for i in np.flatnonzero(~np.isfinite(column)).tolist():
+            values[i] = None
+        return values
+    if kind == 'M':
+        return _datetime_strings(column)
+    return column.tolist()
+
+
+def _float_token(value):
+    return float.__repr__(value) if math.isfinite(value) else 'null'
+
+
+def _value_token(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+_TOKENS = {
+    str: encode_basestring,
+    int: int.__repr__,
+    float: _float_token,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+
+
+def column_tokens(column):
+    """Token JSON dei valori della colonna ('null' per i mancanti)"""
+    if isinstance(column, list):
+        if all(type(value) is str for value in column):
+            return list(map(encode_basestring, column))
+        return [_TOKENS.get(type(value), _value_token)(value) for value in column]
+    kind = column.dtype.kind
+    if kind == 'b':
+        return ['true' if value else 'false' for value in column.tolist()]
+    if kind in 'iu':
+        return list(map(int.__repr__, column.tolist()))
+    if kind == 'f':
+        tokens = list(map(float.__repr__, column.tolist()))
+        for i in np.flatnonzero(~np.isfinite(column)).tolist():
+            tokens[i] = 'null'
+        return tokens
+    if kind == 'M':
+        return ['null' if value is None else '"' + value + '"' for value in _datetime_strings(column)]
+    return list(map(encode_basestring, column.tolist()))
+
+
+def _default(obj):
+    """Tipi non JSON nativi: Records, DataFrame, array e scalari NumPy, date"""
+    if isinstance(obj, Records):
+        return obj.rows()
+    if hasattr(obj, 'columns') and hasattr(obj, 'to_numpy'):
+        return Records.from_frame(obj).rows()
+    if hasattr(obj, 'dtype') and getattr(obj, 'ndim', None) == 0:
+        return column_values(np.asarray(obj).reshape(1))[0]
+    if hasattr(obj, 'dtype') and hasattr(obj, 'tolist'):
+        return column_values(obj)
+    if is_missing(obj):
+        return None
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps_json(data):
+    fragments = []
+
+    def default(obj):
+        if isinstance(obj, Records) or (hasattr(obj, 'columns') and hasattr(obj, 'to_numpy')):
+            records = obj if isinstance(obj, Records) else Records.from_frame(obj)
+            fragments.append(records.to_json())
+            return f"{_PLACEHOLDER}{len(fragments) - 1}"
+        return _default(obj)
+
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=default)
+    if fragments:
+        text = _PLACEHOLDER_RE.sub(lambda match: fragments[int(match.group(1))], text)
+    return text
+
+
+def dumps(data):
+    """JSON compatto (UTF-8, senza spazi) di data, con Records/DataFrame/array ovunque"""
+    if orjson is not None and ENABLE_ORJSON:
+        try:
+            return orjson.dumps(
+                data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        except TypeError:
+            # Interi oltre 64 bit, sottoclassi non supportate: li gestisce json
+            pass
+    return _dumps_json(data)
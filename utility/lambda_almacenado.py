@@ -4,21 +4,26 @@ che hanno un Reembolso (contrassegno) diverso da 0
 """
 import requests
 import time
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import re
 from collections import defaultdict
-import pandas as pd
 from pathlib import Path
 import json
 import sys
 import os
 import logging
-import numpy as np
 import xml.etree.ElementTree as ET
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
 
+import metrics
+import responses
+import snapshots
+from lazy_imports import lazy_import
+
+# bs4 serve solo per la tabella spedizioni: l'azione get_agenzia non lo carica
+bs4 = lazy_import('bs4')
+
 # Configurazione logging per CloudWatch
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -27,8 +32,23 @@ logger.setLevel(logging.INFO)
 SHOPIFY_ACCESS_TOKEN = os.environ.get("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL")
 
+# Endpoint GLS (sovrascrivibili per i server finti locali in fakes/)
+GLS_EXTRANET_URL = os.environ.get("GLS_EXTRANET_URL", "https://extranet.gls-spain.es")
+GLS_CUSTOMER_ENDPOINT = os.environ.get("GLS_CUSTOMER_ENDPOINT", "https://ws-customer.gls-spain.es/b2b.asmx")
+
+# Campi nascosti ASP.NET necessari per login e ricerca
+VIEWSTATE_FIELDS = ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']
 
 
+def extract_viewstate(html):
+    """Estrae ViewState e EventValidation con regex (senza parsing HTML completo)"""
+    viewstate = {}
+    for field in VIEWSTATE_FIELDS:
+        match = re.search(rf'<input[^>]*name="{field}"[^>]*value="([^"]*)"', html)
+        if match:
+            viewstate[field] = match.group(1)
+    return viewstate
+
 
 class GLSExtranetClient:
     def __init__(self, cookies=None):
@@ -43,7 +63,7 @@ class GLSExtranetClient:
         adapter = HTTPAdapter(pool_connections=200, pool_maxsize=200)
         self.session.mount('https://', adapter)
         self.session.mount('http://', adapter)
-        self.base_url = "https://extranet.gls-spain.es"
+        self.base_url = GLS_EXTRANET_URL
         self.login_url = f"{self.base_url}/extranet/login.aspx?ReturnUrl=~/default.aspx"
         self.search_url = f"{self.base_url}/Extranet/MiraEnvios/Miraenvios.aspx"
 
@@ -84,21 +104,14 @@ class GLSExtranetClient:
         logger.info(f"🔐 Login con utente: {username}")
 
         # 1. Ottieni la pagina di login per ViewState
-        t_start = time.time()
-        response = self.session.get(self.login_url)
-        logger.info(f"⏱️ GET pagina login: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_login_form'):
+            response = self.session.get(self.login_url)
         if response.status_code != 200:
             logger.error(f"❌ Errore caricamento pagina login: {response.status_code}")
             return False
 
-        soup = BeautifulSoup(response.content, 'lxml')
-
         # Estrai ViewState e altri campi nascosti
-        viewstate = {}
-        for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
-            input_field = soup.find('input', {'name': field})
-            if input_field:
-                viewstate[field] = input_field.get('value', '')
+        viewstate = extract_viewstate(response.text)
 
         # 2. Invia credenziali di login
         login_data = {
@@ -118,13 +131,12 @@ class GLSExtranetClient:
             'Content-Type': 'application/x-www-form-urlencoded'
         })
 
-        t_start = time.time()
-        response = self.session.post(
-            self.login_url,
-            data=login_data,
-            allow_redirects=True
-        )
-        logger.info(f"⏱️ POST login: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_login'):
+            response = self.session.post(
+                self.login_url,
+                data=login_data,
+                allow_redirects=True
+            )
 
         # Verifica se il login è riuscito
         if response.status_code == 200:
@@ -193,19 +205,12 @@ class GLSExtranetClient:
             Response HTML con le spedizioni
         """
         # Ottieni ViewState con una singola richiesta GET
-        t_start = time.time()
-        response = self.session.get(self.search_url)
-        logger.info(f"⏱️ GET ViewState: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_search_form'):
+            response = self.session.get(self.search_url)
         if response.status_code != 200:
             raise Exception(f"Errore caricamento pagina: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        viewstate = {}
-        for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
-            input_field = soup.find('input', {'name': field})
-            if input_field:
-                viewstate[field] = input_field.get('value', '')
+        viewstate = extract_viewstate(response.text)
 
         # Prepara i dati del form
         form_data = {
@@ -231,17 +236,16 @@ class GLSExtranetClient:
         }
 
         logger.info(f"🔍 Ricerca spedizioni dal {date_from} al {date_to}...")
-        t_start = time.time()
-        response = self.session.post(
-            self.search_url,
-            data=form_data,
-            headers={
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Referer': self.search_url,
-                'Origin': self.base_url,
-            }
-        )
-        logger.info(f"⏱️ POST ricerca: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_search'):
+            response = self.session.post(
+                self.search_url,
+                data=form_data,
+                headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Referer': self.search_url,
+                    'Origin': self.base_url,
+                }
+            )
 
         if response.status_code != 200:
             raise Exception(f"Errore ricerca: {response.status_code}")
@@ -263,30 +267,30 @@ class GLSExtranetClient:
             html_content: HTML della risposta
             
         Returns:
-            pandas DataFrame con info spedizioni
+            Lista di dict con info spedizioni
         """
         # OTTIMIZZAZIONE 1: Usa regex per trovare il commento (molto più veloce)
         comment_match = re.search(r'<!--.*?<table[^>]*id=["\']gr["\'].*?</table>.*?-->', html_content, re.DOTALL)
         
         if not comment_match:
             logger.warning("⚠️ Tabella nascosta id='gr' non trovata nei commenti")
-            return pd.DataFrame()
+            return []
         
         # Estrai solo il contenuto della tabella dal commento
         comment_html = comment_match.group(0).replace('<!--', '').replace('-->', '')
         
         # Parsa SOLO il commento (non tutto l'HTML)
-        soup = BeautifulSoup(comment_html, 'lxml')
+        soup = bs4.BeautifulSoup(comment_html, 'lxml')
         table_gr = soup.find('table', id='gr')
         
         if not table_gr:
             logger.warning("⚠️ Tabella id='gr' non trovata")
-            return pd.DataFrame()
+            return []
         
         rows = table_gr.find_all('tr')
         if len(rows) < 2:
             logger.warning("⚠️ Nessuna riga dati nella tabella gr")
-            return pd.DataFrame()
+            return []
         
         # Estrai nomi colonne
         columns = [th.get_text(strip=True) for th in rows[0].find_all('th')]
@@ -296,14 +300,14 @@ class GLSExtranetClient:
             estado_idx = columns.index('estado')
         except ValueError:
             logger.warning("⚠️ Colonna 'estado' non trovata")
-            return pd.DataFrame()
+            return []
         
         # Trova indice colonna 'Reembolso' per filtrare contrassegno != 0
         try:
             reembolso_idx = columns.index('Reembolso')
         except ValueError:
             logger.warning("⚠️ Colonna 'Reembolso' non trovata")
-            return pd.DataFrame()
+            return []
         
         # Trova indici per tutte le colonne necessarie (micro-ottimizzazione)
         column_indices = {}
@@ -376,7 +380,7 @@ class GLSExtranetClient:
             })
 
         logger.info(f"✅ Trovate {len(shipments)} spedizioni non consegnate con Reembolso != 0")
-        return pd.DataFrame(shipments)
+        return shipments
 
     def get_phone_from_shopify(self, order_number):
         """
@@ -444,7 +448,7 @@ class GLSExtranetClient:
         Returns:
             str: codplaza_org oppure None se non trovato
         """
-        url = "https://ws-customer.gls-spain.es/b2b.asmx?wsdl"
+        url = f"{GLS_CUSTOMER_ENDPOINT}?wsdl"
         soap_xml = f'''<?xml version="1.0" encoding="utf-8"?>
 <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
   <soap12:Body>
@@ -591,6 +595,12 @@ class GLSExtranetClient:
             return {}
 
 
+@metrics.instrumented('almacenado')
+@responses.shaped(collections=['shipments'])
+@snapshots.materialized(
+    'almacenado', variants=[{'days_back': 30}],
+    bypass=lambda event, params: 'action' in params
+)
 def lambda_handler(event, context):
     """
     Handler principale della Lambda function
@@ -612,7 +622,7 @@ def lambda_handler(event, context):
 
         # Parse del body se proviene da API Gateway
         if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
+            body = json.loads(responses.request_body(event))
         else:
             body = event
 
@@ -671,11 +681,10 @@ def lambda_handler(event, context):
         html = client.search_shipments(date_from, date_to)
 
         # Parse spedizioni
-        t_start = time.time()
-        df = client.parse_shipments(html)
-        logger.info(f"⏱️ Parsing HTML: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_parse'):
+            shipments_list = client.parse_shipments(html)
 
-        if df.empty:
+        if not shipments_list:
             logger.warning("⚠️ Nessuna spedizione non consegnata con Reembolso != 0 trovata")
             return {
                 'statusCode': 200,
@@ -692,42 +701,21 @@ def lambda_handler(event, context):
             }
 
         # 🔥 Batch Shopify per telefoni
-        order_numbers = df['referencia'].dropna().astype(str).tolist()
-
-        t_start = time.time()
-        phones_map = client.get_phones_from_shopify_batch(order_numbers)
-        df['phone'] = df['referencia'].map(phones_map)
-        logger.info(f"⏱️ Batch Shopify telefoni: {time.time() - t_start:.2f}s")
-
-        logger.info(f"⏱️ Dettagli agenzie extranet parallelo: {time.time() - t_start:.2f}s")
+        order_numbers = [str(s['referencia']) for s in shipments_list if s['referencia'] is not None]
 
-        logger.info(f"✅ Trovate {len(df)} spedizioni totali")
+        with metrics.stage('shopify_phones'):
+            phones_map = client.get_phones_from_shopify_batch(order_numbers)
+            for shipment in shipments_list:
+                shipment['phone'] = phones_map.get(shipment['referencia'])
 
-        shipments_list = df.to_dict('records')
-
-        # 🔥 FIX: Gestisci valori NaN/NaT che non sono validi in JSON
-        def clean_for_json(obj):
-            """Converte valori NaN/NaT in None per JSON valido"""
-            if isinstance(obj, dict):
-                return {k: clean_for_json(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [clean_for_json(item) for item in obj]
-            elif isinstance(obj, float) and (np.isnan(obj) or np.isinf(obj)):
-                return None
-            elif hasattr(obj, 'isnull') and obj.isnull():  # Per pandas NaT
-                return None
-            else:
-                return obj
-
-        # Applica pulizia a tutti i dati
-        shipments_list = clean_for_json(shipments_list)
+        logger.info(f"✅ Trovate {len(shipments_list)} spedizioni totali")
 
         # Restituisci direttamente i dati invece di salvare su S3
         result_data = {
             'metadata': {
                 'extraction_date': datetime.now().isoformat(),
                 'period': f"{date_from} - {date_to}",
-                'total_shipments': len(df),
+                'total_shipments': len(shipments_list),
                 'status_filter': 'NO ENTREGADO con Reembolso != 0'
             },
             'shipments': shipments_list
@@ -735,15 +723,7 @@ def lambda_handler(event, context):
 
         logger.info("✅ Estrazione completata con successo")
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-            },
-            'body': json.dumps(result_data, ensure_ascii=False)
-        }
+        return responses.json_response(result_data)
 
     except Exception as e:
         logger.error(f"❌ Errore durante l'estrazione: {str(e)}")
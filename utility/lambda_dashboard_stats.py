@@ -2,26 +2,64 @@
 Lambda function per ottenere statistiche aggregate degli ordini Shopify.
 Restituisce: totali ordini, resi, cambi, rifiuti, fulfillment e payment status.
 
-Self-contained: include tutto il codice necessario per funzionare autonomamente.
+Le statistiche arrivano dai rollup giornalieri di order_rollup (da pacchettizzare
+insieme a order_frame, lazy_imports e numpy): a ogni richiesta si riscaricano solo gli ultimi giorni
+e gli ordini modificati dopo l'ultimo sweep, poi si sommano le righe giorno.
+Il caricamento iniziale dello storico (da START_DATE_ORDERS) si fa solo nel
+refresh programmato degli snapshot ({"snapshot_refresh": true}): finché lo
+store del container è vuoto le richieste scaricano solo i propri periodi.
+Con DATA_DIR su /tmp ogni container nuovo parte vuoto; con EFS lo store è
+condiviso. Con ENABLE_ORDER_ROLLUP=false si torna al download completo del periodo.
+
+/order-stats/cube (o view=cube) interroga il cubo OLAP del container
+(order_cube, da pacchettizzare anch'esso) con group_by / filtri / granularità
+arbitrari, senza riscaricare gli ordini per ogni nuovo raggruppamento.
 """
 import os
 import json
+import sqlite3
 import time
 import random
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 
+import order_cube
+import order_frame
+import order_rollup
+import metrics
+import snapshots
+
 # ============================================================================
 # CONFIGURAZIONE SHOPIFY
 # ============================================================================
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_SHOP_DOMAIN = os.getenv("SHOPIFY_SHOP_DOMAIN", "db806d-07.myshopify.com")
 SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-01")
-SHOPIFY_GRAPHQL_URL = f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.getenv("SHOPIFY_GRAPHQL_URL") or f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 START_DATE_ORDERS = os.getenv("START_DATE_ORDERS", "2025-02-07")
 SHOPIFY_SKIP_SSL_VERIFY = os.getenv("SHOPIFY_SKIP_SSL_VERIFY", "0") == "1"
 
+# Rollup giornalieri persistenti (order_rollup) invece del download completo
+ENABLE_ORDER_ROLLUP = os.getenv("ENABLE_ORDER_ROLLUP", "True").lower() == "true"
+
+# Margine sullo sweep updated_at (orologi Shopify/Lambda non allineati)
+SWEEP_OVERLAP_MINUTES = 10
+
+# Con i webhook attivi (lambda_shopify_webhooks) il polling si fa solo ogni tanto
+WEBHOOK_RECONCILE_MINUTES = float(os.getenv("WEBHOOK_RECONCILE_MINUTES", "60"))
+
+# Senza rollup, il cubo del container si ricostruisce dopo questo tempo
+CUBE_MAX_AGE_SECONDS = 900
+
+# Snapshot della risposta (snapshots) servito per questo tempo
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("ORDER_STATS_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+
+# Periodi per richiesta: 'current' (start_date/end_date) + confronti
+MAIN_RANGE = 'current'
+COMPARE_PERIODS = ('previous', 'last_year')
+MAX_RANGES = 6
+
 HEADERS = {
     'X-Shopify-Access-Token': SHOPIFY_ACCESS_TOKEN,
     'Content-Type': 'application/json'
@@ -31,11 +69,28 @@ HEADERS = {
 # ============================================================================
 # FETCH ORDERS DA SHOPIFY
 # ============================================================================
+def utc_midnight(day: str, days: int = 0) -> str:
+    """Mezzanotte UTC di day (YYYY-MM-DD) + days giorni, quotata per la search syntax Shopify"""
+    midnight = datetime.strptime(day, '%Y-%m-%d') + timedelta(days=days)
+    return f"'{midnight.strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+
+
 def fetch_all_orders(start_date: str | None = None, end_date: str | None = None, 
-                     max_retries: int = 6, backoff_base: float = 1.5) -> List[Dict]:
+                     max_retries: int = 6, backoff_base: float = 1.5,
+                     updated_since: str | None = None, created_before: str | None = None,
+                     spans: List[tuple] | None = None) -> List[Dict]:
     """
     Scarica tutti gli ordini da start_date (YYYY-MM-DD) (inclusa) e opzionale end_date (inclusa).
     Usa paginazione 250. Gestisce rate limit (THROTTLED) con backoff esponenziale.
+    
+    I giorni sono giorni UTC, come le chiavi dei rollup (createdAt[:10]): i
+    filtri created_at usano la mezzanotte UTC esplicita, perché Shopify
+    valuta le date senza ora nel fuso del negozio.
+    
+    updated_since (ISO) limita agli ordini modificati dopo quell'istante,
+    created_before (YYYY-MM-DD, esclusa) a quelli creati prima del giorno.
+    spans [(start, end), ...] sostituisce start_date/end_date con più intervalli
+    di creazione in OR: una sola paginazione, senza i giorni tra un intervallo e l'altro.
     """
     all_orders = []
     has_next_page = True
@@ -43,9 +98,17 @@ def fetch_all_orders(start_date: str | None = None, end_date: str | None = None,
     start = start_date or START_DATE_ORDERS
 
     # Costruzione filtro query
-    filter_parts = [f"created_at:>={start}"]
-    if end_date:
-        filter_parts.append(f"created_at:<={end_date}")
+    if spans:
+        filter_parts = [" OR ".join(f"(created_at:>={utc_midnight(span_start)} created_at:<{utc_midnight(span_end, 1)})"
+                                    for span_start, span_end in spans)]
+    else:
+        filter_parts = [f"created_at:>={utc_midnight(start)}"]
+        if end_date:
+            filter_parts.append(f"created_at:<{utc_midnight(end_date, 1)}")
+    if created_before:
+        filter_parts.append(f"created_at:<{utc_midnight(created_before)}")
+    if updated_since:
+        filter_parts.append(f"updated_at:>'{updated_since}'")
     query_filter = " ".join(filter_parts)
 
     while has_next_page:
@@ -57,7 +120,9 @@ def fetch_all_orders(start_date: str | None = None, end_date: str | None = None,
             edges {{
               cursor
               node {{
+                id
                 createdAt
+                updatedAt
                 cancelledAt
                 tags
                 currentTotalPriceSet {{ shopMoney {{ amount }} }}
@@ -110,11 +175,325 @@ def fetch_all_orders(start_date: str | None = None, end_date: str | None = None,
     
     return all_orders
 
+# ============================================================================
+# ROLLUP GIORNALIERI
+# ============================================================================
+_order_rollup = None
+
+
+def open_order_rollup(backfill: bool = False):
+    """
+    Store rollup riusato tra invocazioni; None se disabilitato, non apribile
+    o ancora vuoto.
+    
+    Args:
+        backfill: True nel refresh programmato: uno store vuoto viene
+            restituito e refresh_rollup carica tutto lo storico. Nelle
+            richieste API Gateway (29 s) lo storico non si scarica mai.
+    """
+    global _order_rollup
+    if not ENABLE_ORDER_ROLLUP:
+        return None
+    if _order_rollup is None:
+        try:
+            _order_rollup = order_rollup.OrderRollup()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Rollup ordini non disponibile, download completo: {e}")
+            return None
+    if not backfill and _order_rollup.get_state('swept_at') is None:
+        print("🗄️ Rollup ordini vuoto: download dei soli periodi richiesti "
+              "(lo storico lo carica il refresh programmato)")
+        return None
+    return _order_rollup
+
+
+def day_range(start_date: str, end_date: str) -> List[str]:
+    """Giorni ISO da start_date a end_date inclusi"""
+    current = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    days = []
+    while current <= end:
+        days.append(current.strftime('%Y-%m-%d'))
+        current += timedelta(days=1)
+    return days
+
+
+def refresh_rollup(rollup: order_rollup.OrderRollup, now: datetime | None = None) -> int:
+    """
+    Aggiorna i rollup giornalieri:
+    - primo avvio: tutti gli ordini da START_DATE_ORDERS (solo dal refresh
+      programmato, vedi open_order_rollup)
+    - poi: sweep degli ordini più vecchi modificati dopo l'ultimo sweep +
+      ultimi MUTABLE_DAYS giorni riscaricati per intero
+    - niente polling se i webhook aggiornano lo store e l'ultimo sweep ha meno
+      di WEBHOOK_RECONCILE_MINUTES
+    
+    Returns:
+        Numero di ordini scaricati
+    """
+    now = now or datetime.utcnow()
+    today = now.strftime('%Y-%m-%d')
+    mutable_start = (now - timedelta(days=order_rollup.MUTABLE_DAYS - 1)).strftime('%Y-%m-%d')
+    sweep_mark = (now - timedelta(minutes=SWEEP_OVERLAP_MINUTES)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    swept_at = rollup.get_state('swept_at')
+    
+    if swept_at is not None and rollup.get_state('webhook_at'):
+        last_sweep = datetime.strptime(swept_at, '%Y-%m-%dT%H:%M:%SZ') + timedelta(minutes=SWEEP_OVERLAP_MINUTES)
+        if now - last_sweep < timedelta(minutes=WEBHOOK_RECONCILE_MINUTES):
+            print("🗄️ Rollup ordini aggiornati dai webhook, polling saltato")
+            return 0
+    
+    if swept_at is None:
+        print(f"🗄️ Rollup ordini: primo caricamento dal {START_DATE_ORDERS}")
+        edges = fetch_all_orders(start_date=START_DATE_ORDERS)
+        rollup.replace_days(day_range(START_DATE_ORDERS, today), [edge['node'] for edge in edges])
+        rollup.set_state('swept_at', sweep_mark)
+        return len(edges)
+    
+    # Giorni chiusi: solo gli ordini modificati dopo l'ultimo sweep
+    swept = fetch_all_orders(start_date=START_DATE_ORDERS, updated_since=swept_at, created_before=mutable_start)
+    touched = rollup.upsert_orders([edge['node'] for edge in swept])
+    
+    # Giorni mutabili: riscaricati per intero (anche ordini eliminati)
+    recent = fetch_all_orders(start_date=mutable_start)
+    rollup.replace_days(day_range(mutable_start, today), [edge['node'] for edge in recent])
+    rollup.set_state('swept_at', sweep_mark)
+    
+    print(f"🗄️ Rollup ordini: {len(swept)} ordini modificati ({len(touched)} giorni), "
+          f"{len(recent)} ordini negli ultimi {order_rollup.MUTABLE_DAYS} giorni")
+    return len(swept) + len(recent)
+
+
+# ============================================================================
+# PERIODI MULTIPLI
+# ============================================================================
+class InvalidRange(ValueError):
+    pass
+
+
+def parse_day(value: str, name: str) -> datetime:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise InvalidRange(f"{name}: data non valida '{value}' (formato YYYY-MM-DD)")
+
+
+def shift_year(day: datetime, years: int) -> datetime:
+    """Stesso giorno `years` anni dopo (negativo = prima); 29/02 diventa 28/02"""
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+
+def parse_ranges(params: Dict[str, str], start_date: str, end_date: str) -> Dict[str, tuple]:
+    """
+    Periodi richiesti, tutti calcolati dallo stesso download/rollup.
+    
+    Query params opzionali:
+    - compare: previous (stessa durata, subito prima) e/o last_year (stesse date
+      un anno prima), separati da virgola
+    - ranges: periodi con nome, "nome:YYYY-MM-DD:YYYY-MM-DD" separati da virgola
+    
+    Returns:
+        Dict {nome: (start_date, end_date)} con MAIN_RANGE per start_date/end_date
+    
+    Raises:
+        InvalidRange: date non valide, periodo sconosciuto o duplicato
+    """
+    def check(name, start, end):
+        if start > end:
+            raise InvalidRange(f"{name}: data inizio successiva alla data fine")
+        return start, end
+    
+    ranges = {MAIN_RANGE: check(MAIN_RANGE, parse_day(start_date, 'start_date'), parse_day(end_date, 'end_date'))}
+    start, end = ranges[MAIN_RANGE]
+    
+    for name in filter(None, (part.strip() for part in (params.get('compare') or '').split(','))):
+        if name == 'previous':
+            length = end - start + timedelta(days=1)
+            ranges[name] = (start - length, start - timedelta(days=1))
+        elif name == 'last_year':
+            ranges[name] = (shift_year(start, -1), shift_year(end, -1))
+        else:
+            raise InvalidRange(f"compare: periodo sconosciuto '{name}' (ammessi: {', '.join(COMPARE_PERIODS)})")
+    
+    for item in filter(None, (part.strip() for part in (params.get('ranges') or '').split(','))):
+        parts = item.split(':')
+        if len(parts) != 3 or not parts[0]:
+            raise InvalidRange(f"ranges: '{item}' non valido (formato nome:YYYY-MM-DD:YYYY-MM-DD)")
+        name = parts[0]
+        if name in ranges:
+            raise InvalidRange(f"ranges: periodo '{name}' duplicato")
+        ranges[name] = check(name, parse_day(parts[1], name), parse_day(parts[2], name))
+    
+    if len(ranges) > MAX_RANGES:
+        raise InvalidRange(f"Massimo {MAX_RANGES} periodi per richiesta")
+    
+    return {
+        name: (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        for name, (start, end) in ranges.items()
+    }
+
+
+def merge_spans(ranges: Dict[str, tuple]) -> List[tuple]:
+    """
+    Intervalli di date (ISO) da scaricare per coprire tutti i periodi: periodi
+    sovrapposti o contigui (corrente + precedente) diventano un solo intervallo,
+    quelli lontani (anno scorso) restano separati.
+    """
+    spans = []
+    for start, end in sorted(ranges.values()):
+        if spans:
+            last_end = datetime.strptime(spans[-1][1], '%Y-%m-%d')
+            if datetime.strptime(start, '%Y-%m-%d') <= last_end + timedelta(days=1):
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+                continue
+        spans.append((start, end))
+    return spans
+
+
+# ============================================================================
+# CUBO OLAP
+# ============================================================================
+_order_cube = None
+_cube_source = None
+_cube_mark = None
+_cube_built_at = 0.0
+
+
+def load_order_cube(rollup: order_rollup.OrderRollup | None) -> tuple:
+    """
+    Cubo ordini del container:
+    - con rollup: refresh dei rollup, poi solo i giorni ricalcolati dall'ultimo
+      aggiornamento del cubo (il primo giro li prende tutti)
+    - senza: download completo da START_DATE_ORDERS, riusato per CUBE_MAX_AGE_SECONDS
+    
+    Returns:
+        tuple (OrderCube, ordini scaricati)
+    """
+    global _order_cube, _cube_source, _cube_mark, _cube_built_at
+    source = 'rollup' if rollup is not None else 'shopify'
+    if _cube_source != source:
+        _order_cube, _cube_source, _cube_mark, _cube_built_at = None, source, None, 0.0
+    
+    if rollup is not None:
+        fetched = refresh_rollup(rollup)
+        if _order_cube is None:
+            _order_cube = order_cube.OrderCube()
+        days, mark = rollup.days_refreshed_after(_cube_mark)
+        if days:
+            _order_cube.replace_days(days, rollup.order_columns(days))
+        _cube_mark = mark
+        print(f"🧊 Cubo ordini: {len(days)} giorni aggiornati")
+        return _order_cube, fetched
+    
+    if _order_cube is None or time.time() - _cube_built_at > CUBE_MAX_AGE_SECONDS:
+        edges = fetch_all_orders(start_date=START_DATE_ORDERS)
+        cube = order_cube.OrderCube()
+        cube.replace_days(day_range(START_DATE_ORDERS, datetime.utcnow().strftime('%Y-%m-%d')),
+                          order_frame.order_columns(edges))
+        _order_cube, _cube_built_at = cube, time.time()
+        print(f"🧊 Cubo ordini ricostruito da {len(edges)} ordini")
+        return _order_cube, len(edges)
+    return _order_cube, 0
+
+
+def split_param(value: str | None) -> List[str]:
+    """Valori separati da virgola di un query param ('' o assente = nessuno)"""
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def is_cube_request(event: Dict[str, Any]) -> bool:
+    path = event.get('rawPath') or event.get('path') or ''
+    params = event.get('queryStringParameters') or {}
+    return path.rstrip('/').endswith('/cube') or params.get('view') == 'cube'
+
+
+def query_order_cube(params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Query sul cubo ordini.
+    
+    Query params opzionali:
+    - group_by: dimensioni separate da virgola (tag, fulfillment, financial, payment)
+    - granularity: day / week / month (default: tutto il periodo)
+    - start_date, end_date: YYYY-MM-DD (default: tutto lo storico)
+    - tag / fulfillment / financial / payment: valori ammessi separati da virgola
+    
+    Returns:
+        Response API Gateway (400 su query non valida)
+    """
+    group_by = split_param(params.get('group_by'))
+    filters = {name: split_param(params[name]) for name in order_cube.DIMENSIONS if params.get(name)}
+    granularity = params.get('granularity') or None
+    start_date = params.get('start_date') or None
+    end_date = params.get('end_date') or None
+    
+    rollup = open_order_rollup()
+    with metrics.stage('order_cube'):
+        cube, fetched = load_order_cube(rollup)
+    
+    t_start = time.perf_counter()
+    try:
+        rows = cube.query(group_by, filters, granularity, start_date, end_date)
+    except order_cube.InvalidCubeQuery as e:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(e)}, ensure_ascii=False)
+        }
+    query_ms = (time.perf_counter() - t_start) * 1000
+    print(f"🧊 Query cubo: group_by={group_by} granularity={granularity} → {len(rows)} righe in {query_ms:.1f} ms")
+    
+    span = cube.day_span() or (None, None)
+    result = {
+        'rows': rows,
+        'group_by': group_by,
+        'granularity': granularity,
+        'filters': filters,
+        'dimensions': {name: list(values) for name, values in order_cube.DIMENSIONS.items()},
+        'metadata': {
+            'start_date': start_date or span[0],
+            'end_date': end_date or span[1],
+            'generated_at': datetime.now().isoformat(),
+            'total_orders_fetched': fetched,
+            'source': 'rollup' if rollup is not None else 'shopify',
+            'query_ms': round(query_ms, 2)
+        }
+    }
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Allow-Methods': 'GET,OPTIONS'
+        },
+        'body': json.dumps(result, ensure_ascii=False)
+    }
 
 
 # ============================================================================
 # LAMBDA HANDLER
 # ============================================================================
+def default_dashboard_views():
+    """Parametri della vista di default della Dashboard (ultimi 30 giorni + periodo precedente)"""
+    today = datetime.utcnow().date()
+    return [{
+        'start_date': (today - timedelta(days=30)).isoformat(),
+        'end_date': today.isoformat(),
+        'compare': 'previous',
+    }]
+
+
+@metrics.instrumented('order-stats')
+@snapshots.materialized(
+    'order-stats', variants=default_dashboard_views, max_age_seconds=SNAPSHOT_MAX_AGE_SECONDS,
+    bypass=lambda event, params: is_cube_request(event)
+)
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Handler principale della Lambda.
@@ -122,11 +501,20 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Query params opzionali:
     - start_date: YYYY-MM-DD (default: ultimi 30 giorni)
     - end_date: YYYY-MM-DD (default: oggi)
+    - compare / ranges: periodi di confronto (parse_ranges), restituiti in
+      "ranges" con la stessa struttura delle statistiche principali
+    
+    - fresh=1: ignora lo snapshot della risposta
+    
+    Su /order-stats/cube (o view=cube) risponde query_order_cube.
     """
     try:
         # Estrai parametri dalla query string
         params = event.get('queryStringParameters', {}) or {}
         
+        if is_cube_request(event):
+            return query_order_cube(params)
+        
         # Date di default: ultimi 30 giorni
         end_date = params.get('end_date')
         if not end_date:
@@ -136,21 +524,50 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not start_date:
             start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        print(f"📊 Recupero statistiche ordini dal {start_date} al {end_date}")
+        try:
+            ranges = parse_ranges(params, start_date, end_date)
+        except InvalidRange as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': str(e)}, ensure_ascii=False)
+            }
         
-        # Fetch ordini da Shopify
-        orders = fetch_all_orders(start_date=start_date, end_date=end_date)
+        print(f"📊 Recupero statistiche ordini dal {start_date} al {end_date}"
+              + (f" + {len(ranges) - 1} periodi di confronto" if len(ranges) > 1 else ""))
         
-        # Calcola statistiche
-        stats = calculate_order_stats(orders, start_date, end_date)
+        rollup = open_order_rollup(backfill=snapshots.is_refresh(event))
+        if rollup is not None:
+            # Aggiorna i rollup una volta e somma le righe giorno di ogni periodo
+            fetched = refresh_rollup(rollup)
+            results = {
+                name: finalize_stats(*rollup.counters(start, end), start, end)
+                for name, (start, end) in ranges.items()
+            }
+        else:
+            # Un solo download sull'unione dei periodi, poi statistiche per
+            # periodo (anche con un periodo solo: stessi conteggi con o senza compare)
+            orders = fetch_all_orders(spans=merge_spans(ranges))
+            fetched = len(orders)
+            results = calculate_range_stats(orders, ranges)
+        
+        stats = results.pop(MAIN_RANGE)
         
         # Aggiungi metadati
         stats['metadata'] = {
             'start_date': start_date,
             'end_date': end_date,
             'generated_at': datetime.now().isoformat(),
-            'total_orders_fetched': len(orders)
+            'total_orders_fetched': fetched,
+            'source': 'rollup' if rollup is not None else 'shopify'
         }
+        if results:
+            for name, range_stats in results.items():
+                range_stats['metadata'] = {'start_date': ranges[name][0], 'end_date': ranges[name][1]}
+            stats['ranges'] = results
         
         return {
             'statusCode': 200,
@@ -183,7 +600,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 def calculate_order_stats(orders: list, start_date: str, end_date: str) -> Dict[str, Any]:
     """
-    Calcola statistiche aggregate dagli ordini.
+    Calcola statistiche aggregate dagli ordini creati nel periodo (giorno
+    UTC, come calculate_range_stats e i rollup).
     
     Args:
         orders: Lista ordini da Shopify
@@ -193,129 +611,38 @@ def calculate_order_stats(orders: list, start_date: str, end_date: str) -> Dict[
     Returns:
         Dict con statistiche complete
     """
-    stats = {
-        'total_orders': 0,
-        'orders_by_tag': {
-            'RESO': 0,
-            'CAMBIO': 0,
-            'RIFIUTO': 0,
-            'other': 0
-        },
-        'fulfillment_status': {
-            'FULFILLED': 0,
-            'UNFULFILLED': 0,
-            'PARTIALLY_FULFILLED': 0,
-            'SCHEDULED': 0,
-            'ON_HOLD': 0
-        },
-        'financial_status': {
-            'PAID': 0,
-            'PARTIALLY_PAID': 0,
-            'PENDING': 0,
-            'REFUNDED': 0,
-            'VOIDED': 0,
-            'AUTHORIZED': 0,
-            'PARTIALLY_REFUNDED': 0
-        },
-        'payment_status': {
-            'fully_paid': 0,
-            'unpaid': 0,
-            'partially_paid': 0
-        },
-        'cancelled_orders': 0,
-        'orders_with_refunds': 0,
-        'total_revenue': 0.0,
-        'currency': 'EUR'
-    }
+    # Ordini in colonne una volta sola, contatori e ordini per data con bincount
+    stats, orders_by_date = order_frame.range_counters(order_frame.order_columns(orders), start_date, end_date)
     
-    # Dizionario per contare ordini per data
-    orders_by_date = {}
-    
-    for edge in orders:
-        order = edge.get('node', {})
-
-        # Escludi ordini cancellati da tutti i conteggi
-        if order.get('cancelledAt'):
-            stats['cancelled_orders'] += 1
-            continue
+    return finalize_stats(stats, orders_by_date, start_date, end_date)
 
-        # Escludi ordini di test (tag TEST)
-        order_tags = order.get('tags', [])
-        if isinstance(order_tags, str):
-            order_tags = [t.strip() for t in order_tags.split(',')]
-        if any(t.upper() == 'TEST' for t in order_tags):
-            continue
 
-        stats['total_orders'] += 1
-        
-        # Estrai data creazione ordine
-        created_at = order.get('createdAt', '')
-        if created_at:
-            order_date = created_at.split('T')[0]  # Prendi solo YYYY-MM-DD
-            orders_by_date[order_date] = orders_by_date.get(order_date, 0) + 1
-        
-        # Analizza tags
-        tags = order.get('tags', [])
-        if isinstance(tags, str):
-            tags = [t.strip() for t in tags.split(',')]
-        
-        tag_found = False
-        for tag in tags:
-            tag_upper = tag.upper()
-            if 'RESO' in tag_upper:
-                stats['orders_by_tag']['RESO'] += 1
-                tag_found = True
-                break
-            elif 'CAMBIO' in tag_upper:
-                stats['orders_by_tag']['CAMBIO'] += 1
-                tag_found = True
-                break
-            elif 'RIFIUT' in tag_upper:  # Copre RIFIUTO, RIFIUTI, etc.
-                stats['orders_by_tag']['RIFIUTO'] += 1
-                tag_found = True
-                break
-        
-        if not tag_found:
-            stats['orders_by_tag']['other'] += 1
-        
-        # Fulfillment status
-        fulfillment = order.get('displayFulfillmentStatus', 'UNFULFILLED')
-        if fulfillment in stats['fulfillment_status']:
-            stats['fulfillment_status'][fulfillment] += 1
-        
-        # Financial status
-        financial = order.get('displayFinancialStatus', 'PENDING')
-        if financial in stats['financial_status']:
-            stats['financial_status'][financial] += 1
-        
-        # Payment status (boolean flags)
-        if order.get('fullyPaid'):
-            stats['payment_status']['fully_paid'] += 1
-        elif order.get('unpaid'):
-            stats['payment_status']['unpaid'] += 1
-        else:
-            stats['payment_status']['partially_paid'] += 1
-        
-        # Refunds
-        refunds = order.get('refunds', [])
-        if refunds and len(refunds) > 0:
-            stats['orders_with_refunds'] += 1
-        
-        # Revenue
-        price_set = order.get('currentTotalPriceSet', {})
-        shop_money = price_set.get('shopMoney', {})
-        amount_str = shop_money.get('amount', '0')
-        try:
-            amount = float(amount_str)
-            stats['total_revenue'] += amount
-            
-            # Prendi currency dal primo ordine
-            if stats['currency'] == 'EUR':
-                currency = shop_money.get('currencyCode', 'EUR')
-                stats['currency'] = currency
-        except (ValueError, TypeError):
-            pass
+def calculate_range_stats(orders: list, ranges: Dict[str, tuple]) -> Dict[str, Dict[str, Any]]:
+    """
+    Statistiche di più periodi dagli ordini della loro unione: colonne una
+    volta sola, poi contatori per periodo sul giorno di creazione (UTC, come
+    i rollup giornalieri).
     
+    Args:
+        orders: Lista ordini da Shopify (unione dei periodi)
+        ranges: Dict {nome: (start_date, end_date)} (parse_ranges)
+    
+    Returns:
+        Dict {nome: statistiche complete}
+    """
+    columns = order_frame.order_columns(orders)
+    return {
+        name: finalize_stats(*order_frame.range_counters(columns, start, end), start, end)
+        for name, (start, end) in ranges.items()
+    }
+
+
+def finalize_stats(stats: Dict[str, Any], orders_by_date: Dict[str, int],
+                   start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Completa i contatori (order_frame) con percentuali, consegnati senza
+    problemi, revenue arrotondata e timeline.
+    """
     # Calcola percentuali
     total = stats['total_orders']
     fulfilled = stats['fulfillment_status'].get('FULFILLED', 0)
@@ -15,16 +15,18 @@ from datetime import datetime
 from typing import Dict, Any
 import xml.etree.ElementTree as ET
 
+import metrics
+
 # ============================================================================
 # CONFIGURAZIONE
 # ============================================================================
-GLS_SOAP_ENDPOINT = "https://wsclientes.asmred.com/b2b.asmx"
+GLS_SOAP_ENDPOINT = os.getenv("GLS_SOAP_ENDPOINT", "https://wsclientes.asmred.com/b2b.asmx")
 GLS_UID = os.getenv("GLS_UID")
 
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_SHOP_DOMAIN = os.getenv("SHOPIFY_SHOP_DOMAIN", "db806d-07.myshopify.com")
 SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-04")
-SHOPIFY_GRAPHQL_URL = f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.getenv("SHOPIFY_GRAPHQL_URL") or f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 
 SHOPIFY_HEADERS = {
     'X-Shopify-Access-Token': SHOPIFY_ACCESS_TOKEN,
@@ -36,6 +38,19 @@ SHOPIFY_HEADERS = {
 # ============================================================================
 # GLS SERVICE - CREAZIONE SPEDIZIONE
 # ============================================================================
+def find_first(element, *paths, namespaces=None):
+    """
+    Primo elemento trovato tra i percorsi (con e senza namespace).
+    Non usare `find(a) or find(b)`: un Element senza figli (es. <Resultado
+    return="-70"/>) è falsy e verrebbe scartato.
+    """
+    for path in paths:
+        found = element.find(path, namespaces)
+        if found is not None:
+            return found
+    return None
+
+
 def create_gls_shipment(order_data: Dict[str, Any], _retry: bool = False) -> Dict[str, Any]:
     """
     Crea spedizione GLS tramite SOAP API.
@@ -178,16 +193,10 @@ def create_gls_shipment(order_data: Dict[str, Any], _retry: bool = False) -> Dic
             root = ET.fromstring(response_text)
             
             # Cerca Envio sia con namespace che senza (la risposta SOAP non sempre lo include)
-            envio_elem = (
-                root.find('.//{http://www.asmred.com/}Envio') or
-                root.find('.//Envio')
-            )
+            envio_elem = find_first(root, './/{http://www.asmred.com/}Envio', './/Envio')
             
             # Controlla errori PRIMA di cercare il tracking number
-            resultado = (
-                root.find('.//{http://www.asmred.com/}Resultado') or
-                root.find('.//Resultado')
-            )
+            resultado = find_first(root, './/{http://www.asmred.com/}Resultado', './/Resultado')
             if resultado is not None:
                 return_code = resultado.get('return', '0')
                 if return_code != '0':
@@ -298,10 +307,7 @@ def anular_gls_shipment(albaran: str) -> Dict[str, Any]:
 
         root = ET.fromstring(response_text)
 
-        resultado = (
-            root.find('.//{http://www.asmred.com/}Resultado') or
-            root.find('.//Resultado')
-        )
+        resultado = find_first(root, './/{http://www.asmred.com/}Resultado', './/Resultado')
 
         if resultado is not None:
             return_code = resultado.get('return', '0')
@@ -331,7 +337,7 @@ def anular_gls_shipment(albaran: str) -> Dict[str, Any]:
 # ============================================================================
 # GLS SERVICE - RECUPERO TRACKING (GetExpCli)
 # ============================================================================
-GLS_CUSTOMER_ENDPOINT = "https://ws-customer.gls-spain.es/b2b.asmx"
+GLS_CUSTOMER_ENDPOINT = os.getenv("GLS_CUSTOMER_ENDPOINT", "https://ws-customer.gls-spain.es/b2b.asmx")
 
 def get_gls_tracking_by_reference(order_name: str) -> Dict[str, Any]:
     """
@@ -379,20 +385,17 @@ def get_gls_tracking_by_reference(order_name: str) -> Dict[str, Any]:
 
         # Cerca GetExpCliResult → expediciones/exp/expedicion
         ns = {'asm': 'http://www.asmred.com/'}
-        result_elem = (
-            root.find('.//asm:GetExpCliResult', ns) or
-            root.find('.//GetExpCliResult')
-        )
+        result_elem = find_first(root, './/asm:GetExpCliResult', './/GetExpCliResult', namespaces=ns)
 
         if result_elem is None:
             return {'success': False, 'error': f'GetExpCli: risposta vuota o formato inatteso. Response: {response_text[:400]}'}
 
         # GetExpCliResult può contenere i figli direttamente (child elements) OPPURE come testo XML
-        exp_elem = result_elem.find('.//{http://www.asmred.com/}exp') or result_elem.find('.//exp')
+        exp_elem = find_first(result_elem, './/{http://www.asmred.com/}exp', './/exp')
         if exp_elem is None and result_elem.text and result_elem.text.strip():
             # Fallback: testo XML annidato
             inner_root = ET.fromstring(result_elem.text.strip())
-            exp_elem = inner_root.find('.//{http://www.asmred.com/}exp') or inner_root.find('.//exp')
+            exp_elem = find_first(inner_root, './/{http://www.asmred.com/}exp', './/exp')
 
         if exp_elem is None:
             return {'success': False, 'error': f'GetExpCli: nessun exp trovato per referenza {order_name}. Response: {response_text[:400]}'}
@@ -658,6 +661,7 @@ def create_shopify_fulfillment(
 # ============================================================================
 # LAMBDA HANDLER
 # ============================================================================
+@metrics.instrumented('fulfill-order')
 def lambda_handler(event, context):
     """
     Handler Lambda per fulfill-order.
@@ -725,7 +729,8 @@ def lambda_handler(event, context):
         print("STEP 1: VERIFICA SHOPIFY")
         print("="*60)
         
-        fo_check = get_open_fulfillment_order(body['orderId'])
+        with metrics.stage('shopify_fulfillment_order'):
+            fo_check = get_open_fulfillment_order(body['orderId'])
         
         if not fo_check['success']:
             return {
@@ -750,7 +755,8 @@ def lambda_handler(event, context):
         print("STEP 2: CREAZIONE SPEDIZIONE GLS")
         print("="*60)
         
-        gls_result = create_gls_shipment(body)
+        with metrics.stage('gls_create_shipment'):
+            gls_result = create_gls_shipment(body)
         
         if not gls_result['success']:
             return {
@@ -778,12 +784,13 @@ def lambda_handler(event, context):
         notify_customer = body.get('notifyCustomer', False)
         zip_code = body['shippingAddress'].get('zip', '')
         
-        shopify_result = create_shopify_fulfillment(
-            fulfillment_order_id,
-            tracking_number,
-            zip_code,
-            notify_customer
-        )
+        with metrics.stage('shopify_fulfill'):
+            shopify_result = create_shopify_fulfillment(
+                fulfillment_order_id,
+                tracking_number,
+                zip_code,
+                notify_customer
+            )
         
         if not shopify_result['success']:
             # GLS creato ma Shopify fallito
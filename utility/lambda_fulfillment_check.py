@@ -8,59 +8,45 @@ import requests
 from datetime import datetime, timedelta
 import os
 import sys
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import responses
+import sku_codec
+from stock_allocation import allocate_stock
 
 # Importazioni per Google Sheets
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sheets_client
 
 # CONFIGURAZIONE
 SHOPIFY_ACCESS_TOKEN = os.environ.get('SHOPIFY_ACCESS_TOKEN')
 SHOP_NAME = os.environ.get("SHOPIFY_SHOP_NAME", "db806d-07")
 SHOPIFY_API_VERSION = "2024-04"
-SHOPIFY_GRAPHQL_URL = f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL") or f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 GOOGLE_SHEET_ID = "1mOWYahqRDPK0mqGEOPMsC--WWdq7hsoskQyaSWrR7xY"
 DAYS_BACK_DEFAULT = 4  # Default giorni di ordini da recuperare
+MAX_DAYS_BACK = 90  # Limite superiore per il parametro days
+FETCH_SHARDS_DEFAULT = int(os.environ.get("FETCH_SHARDS", "1"))  # Intervalli scaricati in parallelo
+
+# Paginazione GraphQL (costo query ~ ORDERS_PAGE_SIZE * LINE_ITEMS_PAGE_SIZE, max 1000 punti)
+ORDERS_PAGE_SIZE = int(os.environ.get("ORDERS_PAGE_SIZE", "50"))
+LINE_ITEMS_PAGE_SIZE = 15
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.5
 
 # Mapping taglie per controllo differenza
 SIZE_ORDER = {'XXS': 0, 'XS': 1, 'S': 2, 'M': 3, 'L': 4, 'XL': 5, 'XXL': 6, '3XL': 7}
 
-def get_google_sheets_service():
-    """Crea servizio Google Sheets API"""
-    try:
-        credentials_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
-        
-        if credentials_json:
-            # Da variabile ambiente (per Lambda)
-            credentials_info = json.loads(credentials_json)
-        else:
-            # Da file locale (per test)
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            cred_path = os.path.join(script_dir, 'shopify-lambda-integration-ff8f0760340f.json')
-            with open(cred_path, 'r') as f:
-                credentials_info = json.load(f)
-        
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-        )
-        
-        service = build('sheets', 'v4', credentials=credentials)
-        return service
-    except Exception as e:
-        print(f"Errore Google Sheets: {e}")
-        raise
-
 def load_stock_from_sheets():
     """Carica stock da Google Sheets e ritorna dizionario {(MODELO, TALLA): quantità}"""
-    service = get_google_sheets_service()
-    
-    # Leggi il primo foglio (Magazzino)
-    result = service.spreadsheets().values().get(
-        spreadsheetId=GOOGLE_SHEET_ID,
-        range="Magazzino"
-    ).execute()
-    
-    values = result.get('values', [])
+    # Cache fino a modifica del foglio (vedi sheets_client)
+    return sheets_client.read_parsed(GOOGLE_SHEET_ID, ["Magazzino"], parse_magazzino_values)
+
+
+def parse_magazzino_values(values):
+    """Converte le righe del foglio Magazzino in {(MODELO, TALLA): quantità}"""
     if not values:
         return {}
     
@@ -98,15 +84,9 @@ def load_stock_from_sheets():
     
     return stock_dict
 
-def get_unfulfilled_orders_shopify(days_back=7):
-    """Recupera ordini non evasi da Shopify GraphQL"""
-    start_date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-    
-    query = f"""
-    {{
-      orders(first: 250, query: "fulfillment_status:unfulfilled AND created_at:>={start_date}") {{
-        edges {{
-          node {{
+
+# Campi ordine richiesti a Shopify (lineItems paginati separatamente se > 1 pagina)
+ORDER_NODE_FIELDS = """
             id
             name
             createdAt
@@ -131,7 +111,8 @@ def get_unfulfilled_orders_shopify(days_back=7):
                 amount
               }}
             }}
-            lineItems(first: 100) {{
+            lineItems(first: {line_items_page}) {{
+              pageInfo {{ hasNextPage endCursor }}
               edges {{
                 node {{
                   title
@@ -140,26 +121,191 @@ def get_unfulfilled_orders_shopify(days_back=7):
                 }}
               }}
             }}
-          }}
-        }}
-      }}
-    }}
+"""
+
+
+class QueryCostExceeded(Exception):
+    """Query GraphQL oltre il costo massimo consentito da Shopify"""
+
+
+def shopify_graphql(query, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE):
+    """
+    Esegue una query GraphQL Shopify gestendo il rate limit.
+
+    - THROTTLED: retry con backoff esponenziale (come lambda_dashboard_stats)
+    - throttleStatus: se il bucket non basta per la prossima query, attende
+      il tempo di ricarica invece di farsi rifiutare la richiesta
+
+    Returns:
+        dict: campo 'data' della risposta
     """
-    
     headers = {
         "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
         "Content-Type": "application/json"
     }
-    
-    response = requests.post(SHOPIFY_GRAPHQL_URL, json={'query': query}, headers=headers)
-    response.raise_for_status()
-    
-    data = response.json()
+
+    attempt = 0
+    while True:
+        response = requests.post(SHOPIFY_GRAPHQL_URL, json={'query': query}, headers=headers, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+
+        if 'errors' in data:
+            codes = {err.get('extensions', {}).get('code') for err in data['errors']}
+            if 'THROTTLED' in codes and attempt < max_retries:
+                delay = (backoff_base ** attempt) + random.uniform(0, 0.5)
+                print(f"⚠️ Rate limit Shopify (THROTTLED). Retry {attempt+1}/{max_retries} tra {delay:.2f}s...")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if 'MAX_COST_EXCEEDED' in codes:
+                raise QueryCostExceeded(data['errors'])
+            raise RuntimeError(f"Errore Shopify: {data['errors']}")
+
+        # Attesa preventiva se il bucket è quasi vuoto
+        cost = data.get('extensions', {}).get('cost', {})
+        throttle = cost.get('throttleStatus', {})
+        available = throttle.get('currentlyAvailable')
+        restore_rate = throttle.get('restoreRate')
+        requested = cost.get('requestedQueryCost')
+        if available is not None and requested and restore_rate and available < requested:
+            delay = (requested - available) / restore_rate
+            print(f"⏳ Bucket Shopify basso ({available}/{requested}), attesa {delay:.2f}s")
+            time.sleep(delay)
+
+        return data.get('data') or {}
+
+
+def _fetch_remaining_line_items(order_id, after_cursor):
+    """Recupera le pagine successive di lineItems per ordini con molte righe"""
+    items = []
+    has_next_page = True
+    while has_next_page:
+        query = f"""
+        {{
+          order(id: "{order_id}") {{
+            lineItems(first: {LINE_ITEMS_PAGE_SIZE}, after: "{after_cursor}") {{
+              pageInfo {{ hasNextPage endCursor }}
+              edges {{ node {{ title sku quantity }} }}
+            }}
+          }}
+        }}
+        """
+        data = shopify_graphql(query)
+        line_items = (data.get('order') or {}).get('lineItems', {})
+        items.extend(edge['node'] for edge in line_items.get('edges', []))
+        has_next_page = line_items.get('pageInfo', {}).get('hasNextPage', False)
+        after_cursor = line_items.get('pageInfo', {}).get('endCursor')
+    return items
+
+
+def fetch_unfulfilled_orders_window(start_date, end_date=None):
+    """
+    Scarica con paginazione a cursore tutti gli ordini non evasi creati
+    tra start_date (incluso) e end_date (escluso, opzionale).
+
+    Se Shopify rifiuta la query per costo eccessivo, dimezza la pagina e riprova.
+
+    Returns:
+        Lista di nodi ordine GraphQL con lineItems completi
+    """
+    filter_parts = ["fulfillment_status:unfulfilled", f"created_at:>={start_date}"]
+    if end_date:
+        filter_parts.append(f"created_at:<{end_date}")
+    query_filter = " AND ".join(filter_parts)
+
+    nodes = []
+    page_size = ORDERS_PAGE_SIZE
+    has_next_page = True
+    after_cursor = None
+
+    while has_next_page:
+        cursor_part = f', after: "{after_cursor}"' if after_cursor else ''
+        fields = ORDER_NODE_FIELDS.format(line_items_page=LINE_ITEMS_PAGE_SIZE)
+        query = f"""
+        {{
+          orders(first: {page_size}{cursor_part}, sortKey: CREATED_AT, query: "{query_filter}") {{
+            pageInfo {{ hasNextPage endCursor }}
+            edges {{
+              node {{
+                {fields}
+              }}
+            }}
+          }}
+        }}
+        """
+        try:
+            data = shopify_graphql(query)
+        except QueryCostExceeded:
+            if page_size <= 10:
+                raise
+            page_size //= 2
+            print(f"⚠️ Costo query eccessivo, pagina ridotta a {page_size} ordini")
+            continue
+
+        orders_data = data.get('orders', {})
+        for edge in orders_data.get('edges', []):
+            node = edge['node']
+            line_items = node.get('lineItems', {})
+            if line_items.get('pageInfo', {}).get('hasNextPage'):
+                extra = _fetch_remaining_line_items(node['id'], line_items['pageInfo']['endCursor'])
+                line_items['edges'] = line_items.get('edges', []) + [{'node': item} for item in extra]
+            nodes.append(node)
+
+        has_next_page = orders_data.get('pageInfo', {}).get('hasNextPage', False)
+        after_cursor = orders_data.get('pageInfo', {}).get('endCursor')
+
+    return nodes
+
+
+def split_date_window(start, end, shards):
+    """
+    Divide [start, end] in al massimo `shards` intervalli di giorni consecutivi.
+
+    Returns:
+        Lista di tuple (start_date, end_date) in formato YYYY-MM-DD,
+        con end_date=None per l'ultimo intervallo (fino ad adesso)
+    """
+    total_days = max(1, (end.date() - start.date()).days + 1)
+    shards = max(1, min(shards, total_days))
+    step = total_days / shards
+
+    bounds = [start + timedelta(days=round(i * step)) for i in range(shards)]
+    windows = []
+    for i, shard_start in enumerate(bounds):
+        shard_end = bounds[i + 1].strftime("%Y-%m-%d") if i + 1 < len(bounds) else None
+        windows.append((shard_start.strftime("%Y-%m-%d"), shard_end))
+    return windows
+
+
+def get_unfulfilled_orders_shopify(days_back=7, shards=1):
+    """
+    Recupera ordini non evasi da Shopify GraphQL
+
+    Args:
+        days_back: Giorni indietro da considerare (max MAX_DAYS_BACK)
+        shards: Numero di intervalli di date scaricati in parallelo
+    """
+    days_back = max(1, min(int(days_back), MAX_DAYS_BACK))
+    now = datetime.now()
+    windows = split_date_window(now - timedelta(days=days_back), now, shards)
+
+    if len(windows) == 1:
+        nodes = fetch_unfulfilled_orders_window(*windows[0])
+    else:
+        nodes = []
+        with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+            futures = [executor.submit(fetch_unfulfilled_orders_window, *w) for w in windows]
+            for future in futures:
+                nodes.extend(future.result())
+
+        # Gli intervalli non si sovrappongono, ma per sicurezza deduplica per id
+        unique = {node['id']: node for node in nodes}
+        nodes = sorted(unique.values(), key=lambda n: n.get('createdAt', ''))
+
     orders = []
-    
-    for edge in data.get('data', {}).get('orders', {}).get('edges', []):
-        node = edge['node']
-        
+
+    for node in nodes:
         # Salta ordini REFUNDED e VOIDED
         financial_status = node.get('displayFinancialStatus', '')
         if financial_status in ['REFUNDED', 'VOIDED']:
@@ -188,45 +334,22 @@ def get_unfulfilled_orders_shopify(days_back=7):
             'line_items': line_items
         })
     
+    print(f"📦 Recuperati {len(orders)} ordini non evasi ({days_back} giorni, {len(windows)} shard)")
     return orders
 
 def parse_sku(sku):
     """
-    Estrae MODELO e TALLA dallo SKU
+    Estrae MODELO e TALLA dallo SKU (TALLA come nel foglio Magazzino)
     Formati SKU supportati:
     - SLIP.M.BL -> SLIP BL, M
     - PER.XS.BE -> PER BE, XS
     - SLIP_BE_XL -> SLIP BE, XL
+    - SLIP.XXL.BL -> SLIP BL, 2XL
     """
-    if not sku or sku == 'N/A':
+    parts = sku_codec.parse(sku)
+    if parts is None:
         return None, None
-    
-    sku = str(sku).strip()
-    
-    # Formato con punti: SLIP.M.BL
-    if '.' in sku:
-        parts = sku.split('.')
-        if len(parts) >= 3:
-            modelo = f"{parts[0]} {parts[2]}"  # Es: "SLIP BL"
-            talla = parts[1]  # Es: "M"
-            
-            # Converti taglie speciali
-            if talla == 'XXXL':
-                talla = '3XL'
-            elif talla == 'XXL':
-                talla = '2XL'
-            
-            return modelo, talla
-    
-    # Formato con underscore: SLIP_BE_XL
-    elif '_' in sku:
-        parts = sku.split('_')
-        if len(parts) >= 3:
-            modelo = f"{parts[0]} {parts[1]}"  # Es: "SLIP BE"
-            talla = parts[2]  # Es: "XL"
-            return modelo, talla
-    
-    return None, None
+    return parts.modelo, parts.sheet_talla
 
 def check_size_difference(sizes):
     """Controlla se ci sono almeno 2 taglie con differenza >= 2 (es. S + L, XS + M)"""
@@ -267,13 +390,16 @@ def check_address_issues(address):
     # Indirizzo OK
     return False, ""
 
-def categorize_order(order, stock_dict):
+def categorize_order(order, stock_dict, allocation=None):
     """
     Categorizza ordine in:
     - GREEN: Evadibile senza problemi
     - YELLOW: Evadibile ma con warnings (note, indirizzo, taglie)
     - RED: Non evadibile (stock insufficiente)
     
+    Se `allocation` è fornita (da allocate_stock), disponibilità e sufficienza
+    per riga tengono conto dello stock già assegnato agli ordini precedenti.
+    
     Ritorna: (categoria, dettagli, items_detail)
     """
     warnings = []
@@ -292,7 +418,7 @@ def categorize_order(order, stock_dict):
     # 3. Controlla STOCK e raccogli taglie
     sizes_in_order = []
     
-    for item in order['line_items']:
+    for line_idx, item in enumerate(order['line_items']):
         sku = item['sku']
         quantity = item['quantity']
         title = item['title']
@@ -332,9 +458,12 @@ def categorize_order(order, stock_dict):
         sizes_in_order.append(talla)
         
         # Verifica stock
-        stock_key = (modelo, talla)
-        available = stock_dict.get(stock_key, 0)
-        sufficient = available >= quantity
+        if allocation is not None:
+            available = allocation['available'][line_idx]
+            sufficient = allocation['sufficient'][line_idx]
+        else:
+            available = stock_dict.get((modelo, talla), 0)
+            sufficient = available >= quantity
         
         items_detail.append({
             'sku': sku,
@@ -373,26 +502,35 @@ def categorize_order(order, stock_dict):
         'can_fulfill': can_fulfill
     }, items_detail
 
+@metrics.instrumented('fulfillment-check')
+@responses.shaped(collections=['orders.green', 'orders.yellow', 'orders.red'])
 def lambda_handler(event, context):
     """Handler principale Lambda"""
     try:
         # Leggi days_back dai query parameters, default 4 giorni
         query_params = event.get('queryStringParameters') or {}
         days_back = int(query_params.get('days', DAYS_BACK_DEFAULT))
+        shards = int(query_params.get('shards', FETCH_SHARDS_DEFAULT))
         
         # 1. Carica stock da Google Sheets
-        stock_dict = load_stock_from_sheets()
+        with metrics.stage('sheets_stock'):
+            stock_dict = load_stock_from_sheets()
         
         # 2. Recupera ordini da Shopify
-        orders = get_unfulfilled_orders_shopify(days_back)
+        with metrics.stage('shopify_orders'):
+            orders = get_unfulfilled_orders_shopify(days_back, shards=shards)
         
-        # 3. Categorizza ordini
+        # 3. Alloca stock in ordine di created_at (i primi ordini hanno priorità)
+        with metrics.stage('allocate_stock'):
+            allocations = allocate_stock(orders, stock_dict, parse_sku)
+        
+        # 4. Categorizza ordini
         green_orders = []
         yellow_orders = []
         red_orders = []
         
-        for order in orders:
-            category, details, items = categorize_order(order, stock_dict)
+        for order, allocation in zip(orders, allocations):
+            category, details, items = categorize_order(order, stock_dict, allocation)
             
             # Estrai nome cliente dal campo customer
             customer = order.get('customer') or {}
@@ -427,7 +565,7 @@ def lambda_handler(event, context):
             else:
                 red_orders.append(order_data)
         
-        # 4. Crea risposta
+        # 5. Crea risposta
         response_data = {
             'summary': {
                 'total': len(orders),
@@ -442,14 +580,7 @@ def lambda_handler(event, context):
             }
         }
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(response_data)
-        }
+        return responses.json_response(response_data)
         
     except Exception as e:
         print(f"Errore: {str(e)}")
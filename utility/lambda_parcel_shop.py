@@ -4,17 +4,22 @@ AWS Lambda function per estrarre le spedizioni GLS consegnate in Parcel Shop
 """
 import requests
 import time
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import re
 from collections import defaultdict
-import pandas as pd
 from pathlib import Path
 import json
 import sys
 import os
 import logging
 
+import metrics
+import responses
+import snapshots
+from lazy_imports import lazy_import
+
+bs4 = lazy_import('bs4')
+
 # Configurazione logging per CloudWatch
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -22,6 +27,7 @@ logger.setLevel(logging.INFO)
 # Configurazione Shopify da environment variables
 SHOPIFY_ACCESS_TOKEN = os.environ.get("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL")
+GLS_EXTRANET_URL = os.environ.get("GLS_EXTRANET_URL", "https://extranet.gls-spain.es")
 
 
 class GLSExtranetClient:
@@ -33,7 +39,7 @@ class GLSExtranetClient:
             cookies: Dict con i cookies dalla tua sessione browser (opzionale)
         """
         self.session = requests.Session()
-        self.base_url = "https://extranet.gls-spain.es"
+        self.base_url = GLS_EXTRANET_URL
         self.login_url = f"{self.base_url}/extranet/login.aspx?ReturnUrl=~/default.aspx"
         self.search_url = f"{self.base_url}/Extranet/MiraEnvios/Miraenvios.aspx"
 
@@ -74,14 +80,13 @@ class GLSExtranetClient:
         logger.info(f"🔐 Login con utente: {username}")
 
         # 1. Ottieni la pagina di login per ViewState
-        t_start = time.time()
-        response = self.session.get(self.login_url)
-        logger.info(f"⏱️ GET pagina login: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_login_form'):
+            response = self.session.get(self.login_url)
         if response.status_code != 200:
             logger.error(f"❌ Errore caricamento pagina login: {response.status_code}")
             return False
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = bs4.BeautifulSoup(response.content, 'html.parser')
 
         # Estrai ViewState e altri campi nascosti
         viewstate = {}
@@ -108,13 +113,12 @@ class GLSExtranetClient:
             'Content-Type': 'application/x-www-form-urlencoded'
         })
 
-        t_start = time.time()
-        response = self.session.post(
-            self.login_url,
-            data=login_data,
-            allow_redirects=True
-        )
-        logger.info(f"⏱️ POST login: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_login'):
+            response = self.session.post(
+                self.login_url,
+                data=login_data,
+                allow_redirects=True
+            )
 
         # Verifica se il login è riuscito
         if response.status_code == 200:
@@ -183,13 +187,12 @@ class GLSExtranetClient:
             Response HTML con le spedizioni
         """
         # Ottieni ViewState con una singola richiesta GET
-        t_start = time.time()
-        response = self.session.get(self.search_url)
-        logger.info(f"⏱️ GET ViewState: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_search_form'):
+            response = self.session.get(self.search_url)
         if response.status_code != 200:
             raise Exception(f"Errore caricamento pagina: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = bs4.BeautifulSoup(response.content, 'html.parser')
         
         viewstate = {}
         for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
@@ -220,17 +223,16 @@ class GLSExtranetClient:
         }
 
         logger.info(f"🔍 Ricerca spedizioni dal {date_from} al {date_to}...")
-        t_start = time.time()
-        response = self.session.post(
-            self.search_url,
-            data=form_data,
-            headers={
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Referer': self.search_url,
-                'Origin': self.base_url,
-            }
-        )
-        logger.info(f"⏱️ POST ricerca: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_search'):
+            response = self.session.post(
+                self.search_url,
+                data=form_data,
+                headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Referer': self.search_url,
+                    'Origin': self.base_url,
+                }
+            )
 
         if response.status_code != 200:
             raise Exception(f"Errore ricerca: {response.status_code}")
@@ -249,7 +251,7 @@ class GLSExtranetClient:
             html_content: HTML della risposta
             
         Returns:
-            pandas DataFrame con info spedizioni
+            Lista di dict con info spedizioni
         """
         # OTTIMIZZAZIONE 1: Usa regex per trovare il commento (molto più veloce)
         import re
@@ -257,23 +259,23 @@ class GLSExtranetClient:
         
         if not comment_match:
             logger.warning("⚠️ Tabella nascosta id='gr' non trovata nei commenti")
-            return pd.DataFrame()
+            return []
         
         # Estrai solo il contenuto della tabella dal commento
         comment_html = comment_match.group(0).replace('<!--', '').replace('-->', '')
         
         # Parsa SOLO il commento (non tutto l'HTML)
-        soup = BeautifulSoup(comment_html, 'html.parser')
+        soup = bs4.BeautifulSoup(comment_html, 'html.parser')
         table_gr = soup.find('table', id='gr')
         
         if not table_gr:
             logger.warning("⚠️ Tabella id='gr' non trovata")
-            return pd.DataFrame()
+            return []
         
         rows = table_gr.find_all('tr')
         if len(rows) < 2:
             logger.warning("⚠️ Nessuna riga dati nella tabella gr")
-            return pd.DataFrame()
+            return []
         
         # Estrai nomi colonne
         columns = [th.get_text(strip=True) for th in rows[0].find_all('th')]
@@ -283,7 +285,7 @@ class GLSExtranetClient:
             estado_idx = columns.index('estado')
         except ValueError:
             logger.warning("⚠️ Colonna 'estado' non trovata")
-            return pd.DataFrame()
+            return []
         
         logger.info(f"📋 {len(columns)} colonne - cp_dst: {columns.index('cp_dst') if 'cp_dst' in columns else 'N/A'}")
         
@@ -334,7 +336,7 @@ class GLSExtranetClient:
             })
 
         logger.info(f"✅ Trovate {len(shipments)} spedizioni PARCELSHOP con cp_dst")
-        return pd.DataFrame(shipments)
+        return shipments
 
     def get_phone_from_shopify(self, order_number):
         """
@@ -391,6 +393,9 @@ class GLSExtranetClient:
             return None
 
 
+@metrics.instrumented('parcel-shop')
+@responses.shaped(collections=['shipments'])
+@snapshots.materialized('parcel-shop', variants=[{'days_back': 15}])
 def lambda_handler(event, context):
     """
     Handler principale della Lambda function
@@ -412,7 +417,7 @@ def lambda_handler(event, context):
         
         # Parse del body se proviene da API Gateway
         if isinstance(event.get('body'), str):
-            body = json.loads(event['body'])
+            body = json.loads(responses.request_body(event))
         else:
             body = event
         
@@ -439,11 +444,10 @@ def lambda_handler(event, context):
         html = client.search_shipments(date_from, date_to)
 
         # Parse spedizioni
-        t_start = time.time()
-        df = client.parse_shipments(html)
-        logger.info(f"⏱️ Parsing HTML: {time.time() - t_start:.2f}s")
+        with metrics.stage('gls_parse'):
+            shipments_list = client.parse_shipments(html)
 
-        if df.empty:
+        if not shipments_list:
             logger.warning("⚠️ Nessuna spedizione consegnata in Parcel Shop trovata")
             return {
                 'statusCode': 200,
@@ -459,17 +463,14 @@ def lambda_handler(event, context):
                 })
             }
 
-        logger.info(f"✅ Trovate {len(df)} spedizioni totali")
-
-        # Converti DataFrame a lista di dict per JSON
-        shipments_list = df.to_dict('records')
+        logger.info(f"✅ Trovate {len(shipments_list)} spedizioni totali")
 
         # Restituisci direttamente i dati invece di salvare su S3
         result_data = {
             'metadata': {
                 'extraction_date': datetime.now().isoformat(),
                 'period': f"{date_from} - {date_to}",
-                'total_shipments': len(df),
+                'total_shipments': len(shipments_list),
                 'status_filter': 'ENTREGADO EN PARCELSHOP GLS'
             },
             'shipments': shipments_list
@@ -477,15 +478,7 @@ def lambda_handler(event, context):
 
         logger.info("✅ Estrazione completata con successo")
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-            },
-            'body': json.dumps(result_data, indent=2, ensure_ascii=False)
-        }
+        return responses.json_response(result_data)
 
     except Exception as e:
         logger.error(f"❌ Errore durante l'estrazione: {str(e)}")
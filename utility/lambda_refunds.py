@@ -1,23 +1,52 @@
 """
 Lambda function per ottenere ordini Shopify con tag RESO e DA RIMBORSARE.
 Restituisce ordini da rimborsare con note e informazioni necessarie.
+
+La coda viene tenuta in refund_queue (da pacchettizzare insieme alla Lambda):
+dopo la prima scansione completa dei tag si scaricano solo gli ordini
+modificati dall'ultima sincronizzazione; quelli che hanno perso un tag escono
+dalla coda. Ogni REFUND_QUEUE_FULL_SYNC_HOURS (o con ?full=1) si riscansiona
+tutto. Con ENABLE_REFUND_QUEUE=false si torna alla scansione completa a ogni
+richiesta.
 """
 
 import os
 import json
+import sqlite3
 import time
 import random
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 
+import refund_queue
+import metrics
+import snapshots
+
 # ============================================================================
 # CONFIGURAZIONE SHOPIFY
 # ============================================================================
 SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_SHOP_DOMAIN = os.getenv("SHOPIFY_SHOP_DOMAIN", "db806d-07.myshopify.com")
 SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-01")
-SHOPIFY_GRAPHQL_URL = f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.getenv("SHOPIFY_GRAPHQL_URL") or f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+
+# Coda persistente con sincronizzazione incrementale (refund_queue)
+ENABLE_REFUND_QUEUE = os.getenv("ENABLE_REFUND_QUEUE", "True").lower() == "true"
+
+# Ogni quanto riscansionare tutti gli ordini taggati (ordini eliminati su Shopify)
+REFUND_QUEUE_FULL_SYNC_HOURS = float(os.getenv("REFUND_QUEUE_FULL_SYNC_HOURS", "24"))
+
+# Margine sulla query updated_at (orologi Shopify/Lambda non allineati)
+SYNC_OVERLAP_MINUTES = 10
+
+# Con i webhook attivi (lambda_shopify_webhooks) il polling si fa solo ogni tanto
+WEBHOOK_RECONCILE_MINUTES = float(os.getenv("WEBHOOK_RECONCILE_MINUTES", "60"))
+
+REQUIRED_TAGS = ['RESO', 'DA RIMBORSARE']
+
+# Snapshot della risposta (snapshots): breve, la coda cambia a ogni rimborso fatto
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("REFUNDS_SNAPSHOT_MAX_AGE_SECONDS", "120"))
 
 HEADERS = {
     'X-Shopify-Access-Token': SHOPIFY_ACCESS_TOKEN,
@@ -33,10 +62,6 @@ def fetch_orders_with_tags(tags: List[str], max_retries: int = 6, backoff_base:
     Cerca in tutti gli ordini senza limitazione di data.
     Usa paginazione 250. Gestisce rate limit con backoff esponenziale.
     """
-    all_orders = []
-    has_next_page = True
-    after_cursor = None
-
     # Costruzione filtro query - ordini che hanno tutti i tag richiesti
     tag_filters = []
     for tag in tags:
@@ -47,6 +72,27 @@ def fetch_orders_with_tags(tags: List[str], max_retries: int = 6, backoff_base:
             tag_filters.append(f"tag:{tag}")
     query_filter = f"{' AND '.join(tag_filters)}"
 
+    return fetch_orders(query_filter, max_retries, backoff_base)
+
+
+def fetch_updated_orders(updated_since: str, max_retries: int = 6, backoff_base: float = 1.5) -> List[Dict]:
+    """
+    Scarica gli ordini modificati dopo updated_since (ISO), con o senza tag:
+    servono anche quelli che hanno perso un tag per toglierli dalla coda.
+    """
+    return fetch_orders(f"updated_at:>'{updated_since}'", max_retries, backoff_base)
+
+
+def fetch_orders(query_filter: str, max_retries: int = 6, backoff_base: float = 1.5) -> List[Dict]:
+    """
+    Scarica gli ordini che soddisfano query_filter (sintassi di ricerca Shopify),
+    dal più recente, nel formato restituito dalla Lambda.
+    Usa paginazione 250. Gestisce rate limit con backoff esponenziale.
+    """
+    all_orders = []
+    has_next_page = True
+    after_cursor = None
+
     while has_next_page:
         cursor_part = f', after: "{after_cursor}"' if after_cursor else ''
         query = f"""
@@ -59,6 +105,7 @@ def fetch_orders_with_tags(tags: List[str], max_retries: int = 6, backoff_base:
                 id
                 name
                 createdAt
+                updatedAt
                 tags
                 note
                 customer {{
@@ -122,21 +169,7 @@ def fetch_orders_with_tags(tags: List[str], max_retries: int = 6, backoff_base:
             for edge in edges:
                 order = edge['node']
                 try:
-                    all_orders.append({
-                        'id': order.get('id', ''),
-                        'name': order.get('name', ''),
-                        'created_at': order.get('createdAt', ''),
-                        'tags': order.get('tags', []),
-                        'note': order.get('note'),
-                        'customer': order.get('customer'),
-                        'shipping_address': order.get('shippingAddress'),
-                        'total_price': order.get('currentTotalPriceSet', {}).get('shopMoney', {}).get('amount', '0'),
-                        'currency': order.get('currentTotalPriceSet', {}).get('shopMoney', {}).get('currencyCode', 'EUR'),
-                        'fulfillment_status': order.get('displayFulfillmentStatus', ''),
-                        'financial_status': order.get('displayFinancialStatus', ''),
-                        'fully_paid': order.get('fullyPaid', False),
-                        'refunds': order.get('refunds', [])
-                    })
+                    all_orders.append(refund_queue.order_record(order))
                 except Exception as e:
                     print(f"⚠️ Errore nel processamento ordine {order.get('name', 'N/A')}: {str(e)}")
                     continue
@@ -149,22 +182,105 @@ def fetch_orders_with_tags(tags: List[str], max_retries: int = 6, backoff_base:
 
     return all_orders
 
+# ============================================================================
+# CODA INCREMENTALE
+# ============================================================================
+_refund_queue = None
+
+
+def open_refund_queue():
+    """Coda riusata tra invocazioni; None se disabilitata o non apribile"""
+    global _refund_queue
+    if not ENABLE_REFUND_QUEUE:
+        return None
+    if _refund_queue is None:
+        try:
+            _refund_queue = refund_queue.RefundQueue()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Coda rimborsi non disponibile, scansione completa: {e}")
+            return None
+    return _refund_queue
+
+
+def sync_refund_queue(queue: refund_queue.RefundQueue, tags: List[str], force_full: bool = False,
+                      now: datetime | None = None) -> Dict[str, Any]:
+    """
+    Allinea la coda a Shopify:
+    - completa (primo avvio, ogni REFUND_QUEUE_FULL_SYNC_HOURS o force_full):
+      tutti gli ordini con i tag
+    - incrementale: solo gli ordini modificati dopo l'ultima sincronizzazione
+    - nessuna: i webhook aggiornano la coda e l'ultima sincronizzazione ha
+      meno di WEBHOOK_RECONCILE_MINUTES
+    
+    Returns:
+        Dict con modalità e conteggi della sincronizzazione (per i metadata)
+    """
+    now = now or datetime.utcnow()
+    sync_mark = (now - timedelta(minutes=SYNC_OVERLAP_MINUTES)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    synced_at = queue.get_state('synced_at')
+    full_synced_at = queue.get_state('full_synced_at')
+    full_due = (
+        full_synced_at is None
+        or now - datetime.strptime(full_synced_at, '%Y-%m-%dT%H:%M:%SZ') > timedelta(hours=REFUND_QUEUE_FULL_SYNC_HOURS)
+    )
+    
+    if synced_at is None or force_full or full_due:
+        orders = fetch_orders_with_tags(tags)
+        queue.replace_all(orders)
+        queue.set_state('synced_at', sync_mark)
+        queue.set_state('full_synced_at', now.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        print(f"🗄️ Coda rimborsi: sincronizzazione completa, {len(orders)} ordini")
+        return {'mode': 'full', 'orders_fetched': len(orders), 'updated': len(orders), 'dropped': 0}
+    
+    last_sync = datetime.strptime(synced_at, '%Y-%m-%dT%H:%M:%SZ') + timedelta(minutes=SYNC_OVERLAP_MINUTES)
+    if queue.get_state('webhook_at') and now - last_sync < timedelta(minutes=WEBHOOK_RECONCILE_MINUTES):
+        print("🗄️ Coda rimborsi aggiornata dai webhook, polling saltato")
+        return {'mode': 'webhook', 'orders_fetched': 0, 'updated': 0, 'dropped': 0}
+    
+    orders = fetch_updated_orders(synced_at)
+    updated, dropped = queue.apply_updates(orders, tags)
+    queue.set_state('synced_at', sync_mark)
+    print(f"🗄️ Coda rimborsi: {len(orders)} ordini modificati dal {synced_at}, "
+          f"{updated} in coda aggiornati, {dropped} tolti")
+    return {'mode': 'incremental', 'orders_fetched': len(orders), 'updated': updated, 'dropped': dropped,
+            'since': synced_at}
+
+
 # ============================================================================
 # LAMBDA HANDLER
 # ============================================================================
+@metrics.instrumented('refunds')
+@snapshots.materialized(
+    'refunds', max_age_seconds=SNAPSHOT_MAX_AGE_SECONDS,
+    bypass=lambda event, params: params.get('full') == '1'
+)
 def lambda_handler(event, context):
     """
     Handler principale Lambda.
     Cerca tutti gli ordini con tag RESO e DA RIMBORSARE.
+    
+    Query params opzionali:
+    - full=1: forza la riscansione completa della coda
+    - fresh=1: ignora lo snapshot della risposta
     """
     try:
         # Tag richiesti
-        required_tags = ['RESO', 'DA RIMBORSARE']
+        required_tags = REQUIRED_TAGS
+        params = (event or {}).get('queryStringParameters') or {}
 
-        print(f"🔍 Cercando tutti gli ordini con tag {required_tags}...")
+        queue = open_refund_queue()
+        if queue is not None:
+            # Coda locale aggiornata con i soli ordini modificati
+            with metrics.stage('refund_queue_sync'):
+                sync = sync_refund_queue(queue, required_tags, force_full=params.get('full') == '1')
+            orders = queue.orders()
+        else:
+            print(f"🔍 Cercando tutti gli ordini con tag {required_tags}...")
 
-        # Scarica ordini
-        orders = fetch_orders_with_tags(required_tags)
+            # Scarica ordini
+            with metrics.stage('shopify_orders'):
+                orders = fetch_orders_with_tags(required_tags)
+            sync = {'mode': 'scan', 'orders_fetched': len(orders)}
 
         # Prepara risposta
         response = {
@@ -172,7 +288,8 @@ def lambda_handler(event, context):
                 'extraction_date': datetime.now().isoformat(),
                 'period_days': 'all',
                 'total_orders': len(orders),
-                'required_tags': required_tags
+                'required_tags': required_tags,
+                'sync': sync
             },
             'orders': orders
         }
@@ -5,26 +5,32 @@ Arricchisce con info Shopify (stato pagamento, tag RIFIUTO) senza modificare nul
 
 import json
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import os
-import time
+
+import metrics
+import snapshots
+from lazy_imports import lazy_import
+
+bs4 = lazy_import('bs4')
+etree = lazy_import('lxml.etree')
 
 # CONFIGURAZIONE - Variabili d'ambiente per Lambda
 SHOPIFY_ACCESS_TOKEN = os.environ.get('SHOPIFY_ACCESS_TOKEN')
 SHOP_NAME = os.environ.get("SHOPIFY_SHOP_NAME", "db806d-07")
 SHOPIFY_API_VERSION = "2024-04"
-SHOPIFY_GRAPHQL_URL = f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL") or f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 
 # Credenziali GLS (da variabili ambiente)
 GLS_USERNAME = os.environ.get('GLS_USERNAME')
 GLS_PASSWORD = os.environ.get('GLS_PASSWORD')
+GLS_EXTRANET_URL = os.environ.get('GLS_EXTRANET_URL', 'https://extranet.gls-spain.es')
 
 
 class GLSExtranetClient:
     def __init__(self):
         self.session = requests.Session()
-        self.base_url = "https://extranet.gls-spain.es"
+        self.base_url = GLS_EXTRANET_URL
         self.login_url = f"{self.base_url}/extranet/login.aspx?ReturnUrl=~/default.aspx"
         self.search_url = f"{self.base_url}/Extranet/MiraEnvios/Miraenvios.aspx"
         
@@ -42,7 +48,7 @@ class GLSExtranetClient:
         if response.status_code != 200:
             raise Exception(f"Errore caricamento pagina login: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'lxml')
+        soup = bs4.BeautifulSoup(response.content, 'lxml')
         
         viewstate = {}
         for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
@@ -80,7 +86,7 @@ class GLSExtranetClient:
         if response.status_code != 200:
             raise Exception(f"Errore caricamento pagina ricerca: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'lxml')
+        soup = bs4.BeautifulSoup(response.content, 'lxml')
         
         viewstate = {}
         for field in ['__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION']:
@@ -121,59 +127,103 @@ class GLSExtranetClient:
         
         return response.text
     
-    def parse_shipments(self, html_content):
-        """Estrae spedizioni dalla risposta HTML"""
-        soup = BeautifulSoup(html_content, 'lxml')
-        envios_div = soup.find('div', id='envios')
-        
+    def parse_shipments(self, html_content, servicio=None):
+        """
+        Estrae spedizioni dalla risposta HTML (div "envios", una tabella tb/atb
+        per spedizione).
+
+        Con lxml e XPath compilate invece di BeautifulSoup: con `servicio`
+        (es. DEVOLUCION) le tabelle di altri servizi vengono scartate leggendo
+        solo la cella del servizio, senza estrarre il resto del testo.
+
+        Args:
+            html_content: HTML della ricerca MiraEnvios
+            servicio: Se indicato, solo le spedizioni di questo servizio
+
+        Returns:
+            Lista di dict (expedicion, referencia, estado, fecha, servicio,
+            destinatario, localidad)
+        """
+        xpaths = envios_xpaths()
+        if isinstance(html_content, str):
+            html_content = html_content.encode('utf-8')
+        root = etree.fromstring(html_content, etree.HTMLParser(encoding='utf-8'))
+        envios_div = xpaths['envios'](root) if root is not None else []
+
         if not envios_div:
             print("⚠️ Div 'envios' non trovato")
             return []
-        
-        tables = envios_div.find_all('table', class_=['tb', 'atb'])
+
+        tables = xpaths['tables'](envios_div[0])
         print(f"✅ Trovate {len(tables)} spedizioni")
-        
+
         shipments = []
-        
+
         for table in tables:
             try:
-                rows = table.find_all('tr')
+                rows = xpaths['rows'](table)
                 if len(rows) < 5:
                     continue
-                
+
+                row2_tds = xpaths['tds'](rows[1])
+                if servicio is not None:
+                    if len(row2_tds) < 6 or cell_text(row2_tds[1]).upper() != servicio:
+                        continue
+
                 shipment = {}
-                
-                row1_ths = rows[0].find_all(['th', 'td'])
+
+                row1_ths = xpaths['cells'](rows[0])
                 if len(row1_ths) >= 2:
-                    shipment['expedicion'] = row1_ths[0].get_text(strip=True)
-                    shipment['referencia'] = row1_ths[1].get_text(strip=True)
+                    shipment['expedicion'] = cell_text(row1_ths[0])
+                    shipment['referencia'] = cell_text(row1_ths[1])
                 if len(row1_ths) >= 4:
-                    shipment['estado'] = row1_ths[2].get_text(strip=True)
-                
-                row2_tds = rows[1].find_all('td')
+                    shipment['estado'] = cell_text(row1_ths[2])
+
                 if len(row2_tds) >= 6:
-                    shipment['fecha'] = row2_tds[0].get_text(strip=True)
-                    shipment['servicio'] = row2_tds[1].get_text(strip=True)
-                
-                if len(rows) > 2:
-                    row3_tds = rows[2].find_all('td')
-                    if len(row3_tds) >= 1:
-                        shipment['destinatario'] = row3_tds[0].get_text(strip=True)
-                
-                if len(rows) > 3:
-                    row4_tds = rows[3].find_all('td')
-                    if len(row4_tds) >= 2:
-                        shipment['localidad'] = row4_tds[1].get_text(strip=True)
-                
+                    shipment['fecha'] = cell_text(row2_tds[0])
+                    shipment['servicio'] = cell_text(row2_tds[1])
+
+                row3_tds = xpaths['tds'](rows[2])
+                if len(row3_tds) >= 1:
+                    shipment['destinatario'] = cell_text(row3_tds[0])
+
+                row4_tds = xpaths['tds'](rows[3])
+                if len(row4_tds) >= 2:
+                    shipment['localidad'] = cell_text(row4_tds[1])
+
                 shipments.append(shipment)
-            
+
             except Exception as e:
                 print(f"⚠️ Errore parsing spedizione: {e}")
                 continue
-        
+
         return shipments
 
 
+_envios_xpaths = {}
+
+
+def envios_xpaths():
+    """XPath del div "envios", compilate al primo uso (lxml caricato solo qui)"""
+    if not _envios_xpaths:
+        _envios_xpaths.update({
+            'envios': etree.XPath('(//div[@id="envios"])[1]'),
+            'tables': etree.XPath(
+                './/table[contains(concat(" ", normalize-space(@class), " "), " tb ")'
+                ' or contains(concat(" ", normalize-space(@class), " "), " atb ")]'
+            ),
+            'rows': etree.XPath('.//tr'),
+            'cells': etree.XPath('.//th | .//td'),
+            'tds': etree.XPath('.//td'),
+        })
+    return _envios_xpaths
+
+
+def cell_text(element):
+    """Testo della cella come get_text(strip=True) di BeautifulSoup"""
+    return ''.join(text.strip() for text in element.itertext())
+
+
 def fetch_shopify_orders_by_names(order_names):
     """
     Recupera ordini Shopify specifici per nome usando GraphQL con paginazione
@@ -294,10 +344,11 @@ def enrich_with_shopify(devoluciones):
     return devoluciones
 
 
+@metrics.instrumented('rifiuti')
+@snapshots.materialized('rifiuti', variants=[{'days_back': 4}])
 def lambda_handler(event, context):
     """Handler Lambda"""
     try:
-        start_total = time.time()
         print("🚀 Inizio recupero rientri GLS...")
         
         # Parametro query string: days_back
@@ -314,35 +365,28 @@ def lambda_handler(event, context):
         date_to_str = date_to.strftime("%d/%m/%Y")
         
         # Login e ricerca GLS
-        start_login = time.time()
-        client = GLSExtranetClient()
-        client.login(GLS_USERNAME, GLS_PASSWORD)
-        print(f"⏱️  Login GLS: {time.time() - start_login:.2f}s")
+        with metrics.stage('gls_login'):
+            client = GLSExtranetClient()
+            client.login(GLS_USERNAME, GLS_PASSWORD)
         
-        start_search = time.time()
-        html = client.search_shipments(date_from_str, date_to_str)
-        print(f"⏱️  Ricerca GLS: {time.time() - start_search:.2f}s")
+        with metrics.stage('gls_search'):
+            html = client.search_shipments(date_from_str, date_to_str)
         
-        start_parse = time.time()
-        all_shipments = client.parse_shipments(html)
-        print(f"⏱️  Parsing HTML: {time.time() - start_parse:.2f}s")
-        print(f"✅ Trovate {len(all_shipments)} spedizioni totali")
+        with metrics.stage('gls_parse'):
+            all_devoluciones = client.parse_shipments(html, servicio='DEVOLUCION')
+        print(f"✅ Trovate {len(all_devoluciones)} devoluciones totali")
         
         # Filtra solo DEVOLUCIONES per AdiBody ES
-        start_filter = time.time()
         devoluciones = [
-            s for s in all_shipments
-            if (s.get('servicio', '').upper() == 'DEVOLUCION' and 
-                'ADIBODY ES' in s.get('destinatario', '').upper())
+            s for s in all_devoluciones
+            if 'ADIBODY ES' in s.get('destinatario', '').upper()
         ]
-        print(f"⏱️  Filtro devoluciones: {time.time() - start_filter:.2f}s")
         print(f"📦 Trovate {len(devoluciones)} devoluciones")
         
         # Arricchisci con Shopify (senza modificare tag)
         if devoluciones:
-            start_shopify = time.time()
-            devoluciones = enrich_with_shopify(devoluciones)
-            print(f"⏱️  Arricchimento Shopify: {time.time() - start_shopify:.2f}s")
+            with metrics.stage('shopify_enrich'):
+                devoluciones = enrich_with_shopify(devoluciones)
         
         # Statistiche
         totale = len(devoluciones)
@@ -384,9 +428,6 @@ def lambda_handler(event, context):
             'ordini_da_taggare': ordini_da_taggare
         }
         
-        total_time = time.time() - start_total
-        print(f"\n⏱️  TEMPO TOTALE: {total_time:.2f}s")
-        
         return {
             'statusCode': 200,
             'headers': {
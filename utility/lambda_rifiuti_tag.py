@@ -8,11 +8,13 @@ import json
 import requests
 import os
 
+import metrics
+
 # CONFIGURAZIONE
 SHOPIFY_ACCESS_TOKEN = os.environ.get('SHOPIFY_ACCESS_TOKEN')
 SHOP_NAME = os.environ.get("SHOPIFY_SHOP_NAME", "db806d-07")
 SHOPIFY_API_VERSION = "2024-04"
-SHOPIFY_GRAPHQL_URL = f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL") or f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
 
 
 def add_tag_to_order(order_id, tag):
@@ -64,6 +66,7 @@ def add_tag_to_order(order_id, tag):
         return False, str(e)
 
 
+@metrics.instrumented('rifiuti-tag')
 def lambda_handler(event, context):
     """Handler Lambda - supporta singolo e bulk con preview"""
     try:
@@ -0,0 +1,343 @@
+"""
+Lambda function che riceve i webhook Shopify e aggiorna gli store locali.
+
+Topic gestiti:
+- orders/create, orders/updated, orders/cancelled: il payload è l'ordine completo
+- fulfillments/create: il payload è la spedizione, l'ordine si rilegge da
+  Shopify (una query per webhook)
+
+Ogni webhook viene verificato (HMAC SHA-256 del body con SHOPIFY_WEBHOOK_SECRET,
+header X-Shopify-Hmac-Sha256), convertito nel formato dei nodi GraphQL usati
+dalle Lambda e applicato come delta:
+- rollup giornalieri ordini (order_rollup) della dashboard
+- coda ordini da rimborsare (refund_queue)
+
+Webhook duplicati (stesso X-Shopify-Webhook-Id) o più vecchi dell'ordine già
+salvato (consegne fuori ordine) vengono ignorati.
+
+Gli store vivono in DATA_DIR: perché le altre Lambda leggano i delta, DATA_DIR
+deve essere un volume condiviso (EFS). Finché arrivano webhook, dashboard e
+Rimborsi saltano il polling Shopify e riallineano solo ogni
+WEBHOOK_RECONCILE_MINUTES (consegna dei webhook non garantita).
+
+Con WEBHOOK_RECORD_DIR i webhook verificati vengono anche salvati (JSONL)
+per riprodurli in locale con webhook_replay.py.
+
+Da pacchettizzare insieme a order_rollup, order_frame, refund_queue,
+lazy_imports e numpy.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+import requests
+
+import metrics
+import order_rollup
+import refund_queue
+
+# ============================================================================
+# CONFIGURAZIONE
+# ============================================================================
+SHOPIFY_ACCESS_TOKEN = os.getenv("SHOPIFY_ACCESS_TOKEN")
+SHOPIFY_SHOP_DOMAIN = os.getenv("SHOPIFY_SHOP_DOMAIN", "db806d-07.myshopify.com")
+SHOPIFY_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2024-01")
+SHOPIFY_GRAPHQL_URL = os.getenv("SHOPIFY_GRAPHQL_URL") or f"https://{SHOPIFY_SHOP_DOMAIN}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_WEBHOOK_SECRET = os.getenv("SHOPIFY_WEBHOOK_SECRET", "")
+START_DATE_ORDERS = os.getenv("START_DATE_ORDERS", "2025-02-07")
+
+# Cartella dove registrare i webhook verificati (vuoto = non registrare)
+WEBHOOK_RECORD_DIR = os.getenv("WEBHOOK_RECORD_DIR", "")
+
+ORDER_TOPICS = ('orders/create', 'orders/updated', 'orders/cancelled')
+FULFILLMENT_TOPICS = ('fulfillments/create',)
+
+# Tag della coda rimborsi (come lambda_refunds)
+REFUND_TAGS = ['RESO', 'DA RIMBORSARE']
+
+# Id webhook già visti in questo container (Shopify ritenta e può duplicare)
+SEEN_WEBHOOKS_MAX = 1000
+
+HEADERS = {
+    'X-Shopify-Access-Token': SHOPIFY_ACCESS_TOKEN,
+    'Content-Type': 'application/json'
+}
+
+# Stati REST → display status GraphQL (order_frame)
+FULFILLMENT_STATUS = {
+    None: 'UNFULFILLED',
+    'unfulfilled': 'UNFULFILLED',
+    'partial': 'PARTIALLY_FULFILLED',
+    'fulfilled': 'FULFILLED',
+    'restocked': 'RESTOCKED',
+}
+PAID_STATUSES = ('paid', 'partially_refunded', 'refunded')
+UNPAID_STATUSES = ('pending', 'authorized', 'expired', 'voided')
+
+
+# ============================================================================
+# VERIFICA E CONVERSIONE
+# ============================================================================
+def get_header(event: Dict[str, Any], name: str) -> str | None:
+    """Header della richiesta senza distinzione maiuscole/minuscole (API Gateway v1/v2)"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def raw_body(event: Dict[str, Any]) -> bytes:
+    """Body così come firmato da Shopify"""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    return body.encode('utf-8')
+
+
+def sign(body: bytes, secret: str) -> str:
+    """Firma X-Shopify-Hmac-Sha256 del body"""
+    return base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode('ascii')
+
+
+def verify_hmac(body: bytes, signature: str | None, secret: str) -> bool:
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(body, secret), signature)
+
+
+def utc_timestamp(value: str | None) -> str | None:
+    """Timestamp REST (con offset del negozio) → ISO UTC come i campi GraphQL"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def order_node(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ordine REST del webhook → nodo GraphQL con i campi letti da
+    lambda_dashboard_stats e lambda_refunds.
+
+    Il payload REST non distingue ON_HOLD/SCHEDULED da UNFULFILLED: quegli
+    ordini risultano UNFULFILLED fino al polling di riallineamento.
+    """
+    financial = payload.get('financial_status') or 'pending'
+    shop_money = ((payload.get('current_total_price_set') or {}).get('shop_money') or {})
+    amount = shop_money.get('amount', payload.get('current_total_price', '0'))
+    if payload.get('total_outstanding') is not None:
+        # Da pagare = totale → nessun pagamento; 0 → pagato per intero
+        outstanding = float(payload['total_outstanding'])
+        fully_paid = outstanding <= 0
+        unpaid = outstanding > 0 and outstanding >= float(amount or 0)
+    else:
+        fully_paid = financial in PAID_STATUSES
+        unpaid = financial in UNPAID_STATUSES
+    customer = payload.get('customer')
+    address = payload.get('shipping_address')
+
+    return {
+        'id': payload.get('admin_graphql_api_id') or f"gid://shopify/Order/{payload['id']}",
+        'name': payload.get('name', ''),
+        'createdAt': utc_timestamp(payload.get('created_at')),
+        'updatedAt': utc_timestamp(payload.get('updated_at')),
+        'cancelledAt': utc_timestamp(payload.get('cancelled_at')),
+        'tags': [tag.strip() for tag in (payload.get('tags') or '').split(',') if tag.strip()],
+        'note': payload.get('note'),
+        'customer': {
+            'displayName': ' '.join(filter(None, (customer.get('first_name'), customer.get('last_name')))),
+            'phone': customer.get('phone'),
+        } if customer else None,
+        'shippingAddress': {
+            key: address.get(key) for key in ('name', 'address1', 'city', 'province', 'country', 'phone')
+        } if address else None,
+        'currentTotalPriceSet': {'shopMoney': {
+            'amount': amount,
+            'currencyCode': shop_money.get('currency_code', payload.get('currency', 'EUR')),
+        }},
+        'displayFulfillmentStatus': FULFILLMENT_STATUS.get(payload.get('fulfillment_status'), 'UNFULFILLED'),
+        'displayFinancialStatus': financial.upper(),
+        'fullyPaid': fully_paid,
+        'unpaid': unpaid,
+        'refunds': [
+            {
+                'id': refund.get('admin_graphql_api_id') or f"gid://shopify/Refund/{refund.get('id')}",
+                'createdAt': utc_timestamp(refund.get('created_at')),
+                'note': refund.get('note'),
+            }
+            for refund in payload.get('refunds') or []
+        ],
+    }
+
+
+def fetch_order(order_id: str, max_retries: int = 6, backoff_base: float = 1.5) -> Dict[str, Any] | None:
+    """
+    Rilegge un ordine da Shopify (webhook senza ordine completo).
+    Gestisce rate limit (THROTTLED) con backoff esponenziale.
+    """
+    query = f"""
+    {{
+      order(id: "{order_id}") {{
+        id
+        name
+        createdAt
+        updatedAt
+        cancelledAt
+        tags
+        note
+        customer {{ displayName phone }}
+        shippingAddress {{ name address1 city province country phone }}
+        currentTotalPriceSet {{ shopMoney {{ amount currencyCode }} }}
+        displayFulfillmentStatus
+        displayFinancialStatus
+        fullyPaid
+        unpaid
+        refunds {{ id createdAt note }}
+      }}
+    }}
+    """
+    for attempt in range(max_retries + 1):
+        resp = requests.post(SHOPIFY_GRAPHQL_URL, headers=HEADERS, json={"query": query}, timeout=10)
+        data = resp.json()
+        if 'errors' not in data:
+            return data['data']['order']
+        throttled = any(err.get('extensions', {}).get('code') == 'THROTTLED' for err in data['errors'])
+        if not throttled or attempt == max_retries:
+            raise RuntimeError(f"Errore Shopify: {data['errors']}")
+        delay = (backoff_base ** attempt) + random.uniform(0, 0.5)
+        print(f"⚠️ Rate limit Shopify (THROTTLED). Retry {attempt+1}/{max_retries} tra {delay:.2f}s...")
+        time.sleep(delay)
+
+
+# ============================================================================
+# STORE LOCALI
+# ============================================================================
+_stores = {}
+_seen_webhooks = OrderedDict()
+
+
+def open_stores() -> Dict[str, Any]:
+    """Store riusati tra invocazioni; quelli non apribili vengono saltati"""
+    for name, factory in (('rollup', order_rollup.OrderRollup), ('refund_queue', refund_queue.RefundQueue)):
+        if name not in _stores:
+            try:
+                _stores[name] = factory()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Store {name} non disponibile: {e}")
+    return _stores
+
+
+def seen_before(webhook_id: str | None) -> bool:
+    """True se il webhook è già stato applicato in questo container"""
+    if not webhook_id:
+        return False
+    if webhook_id in _seen_webhooks:
+        return True
+    _seen_webhooks[webhook_id] = True
+    if len(_seen_webhooks) > SEEN_WEBHOOKS_MAX:
+        _seen_webhooks.popitem(last=False)
+    return False
+
+
+def apply_order(node: Dict[str, Any], stores: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Applica l'ordine agli store. Ignorato se più vecchio della versione salvata.
+
+    Returns:
+        Dict con l'esito per store
+    """
+    rollup = stores.get('rollup')
+    queue = stores.get('refund_queue')
+    updated_at = node.get('updatedAt') or ''
+    known = max(
+        (store.updated_at(node['id']) or '' for store in (rollup, queue) if store is not None),
+        default=''
+    )
+    if known and updated_at and updated_at < known:
+        return {'status': 'stale', 'stored_updated_at': known}
+
+    result = {'status': 'applied'}
+    now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+    if rollup is not None:
+        if (node.get('createdAt') or '')[:10] >= START_DATE_ORDERS:
+            result['rollup_days'] = sorted(rollup.upsert_orders([node]))
+        rollup.set_state('webhook_at', now)
+    if queue is not None:
+        queued, dropped = queue.apply_updates([refund_queue.order_record(node)], REFUND_TAGS)
+        result['refund_queue'] = 'queued' if queued else ('dropped' if dropped else 'unchanged')
+        queue.set_state('webhook_at', now)
+    return result
+
+
+def record_webhook(topic: str, webhook_id: str | None, payload: Dict[str, Any]):
+    """Accoda il webhook al file JSONL del giorno in WEBHOOK_RECORD_DIR"""
+    os.makedirs(WEBHOOK_RECORD_DIR, exist_ok=True)
+    path = os.path.join(WEBHOOK_RECORD_DIR, f"webhooks-{datetime.utcnow():%Y-%m-%d}.jsonl")
+    entry = {'topic': topic, 'webhook_id': webhook_id, 'received_at': datetime.utcnow().isoformat(),
+             'payload': payload}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+# ============================================================================
+# LAMBDA HANDLER
+# ============================================================================
+def response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(body, ensure_ascii=False)
+    }
+
+
+@metrics.instrumented('shopify-webhooks')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Handler principale della Lambda (POST da Shopify).
+
+    Risponde 401 se la firma non è valida, 200 anche per topic non gestiti
+    (Shopify non deve ritentare), 500 se l'applicazione fallisce (Shopify ritenta).
+    """
+    try:
+        body = raw_body(event)
+        if not verify_hmac(body, get_header(event, 'X-Shopify-Hmac-Sha256'), SHOPIFY_WEBHOOK_SECRET):
+            print("❌ Webhook con firma HMAC non valida")
+            return response(401, {'error': 'Firma HMAC non valida'})
+
+        topic = get_header(event, 'X-Shopify-Topic') or ''
+        webhook_id = get_header(event, 'X-Shopify-Webhook-Id')
+        payload = json.loads(body)
+
+        if topic not in ORDER_TOPICS + FULFILLMENT_TOPICS:
+            print(f"ℹ️ Topic non gestito: {topic}")
+            return response(200, {'status': 'ignored', 'topic': topic})
+        if seen_before(webhook_id):
+            return response(200, {'status': 'duplicate', 'topic': topic})
+        if WEBHOOK_RECORD_DIR:
+            record_webhook(topic, webhook_id, payload)
+
+        if topic in FULFILLMENT_TOPICS:
+            node = fetch_order(f"gid://shopify/Order/{payload['order_id']}")
+            if node is None:
+                return response(200, {'status': 'ignored', 'topic': topic, 'reason': 'ordine non trovato'})
+        else:
+            node = order_node(payload)
+
+        result = apply_order(node, open_stores())
+        print(f"🔔 {topic} {node.get('name') or node['id']}: {result}")
+        return response(200, {'topic': topic, 'order_id': node['id'], **result})
+
+    except Exception as e:
+        print(f"❌ Errore: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        # Il webhook non è stato applicato: consenti il retry di Shopify
+        _seen_webhooks.pop(get_header(event, 'X-Shopify-Webhook-Id'), None)
+        return response(500, {'error': str(e), 'type': type(e).__name__})
@@ -3,6 +3,20 @@ Lambda API per Dashboard Stock
 Restituisce dati stock da Google Sheets + calcolo ordine fornitore
 
 Endpoint: GET /stock
+         GET /stock?scenarios=<JSON>  oppure  POST /stock {"scenarios": [...]}
+
+Scenari (opzionali, max 20): parametri di riassortimento alternativi valutati
+sugli stessi dati scaricati una volta sola, es.
+  [{"nome": "Nave lenta", "giorni_transito": 35},
+   {"nome": "Crescita +20%", "moltiplicatore_crescita_vendite": 1.2}]
+Parametri: giorni_target_scorta, giorni_transito, soglia_critica,
+soglia_allarme, moltiplicatore_crescita_vendite (mancanti = valori correnti).
+
+Con METODO_PREVISIONE=ses|holt (e il registro vendite attivo) le righe stock
+riportano anche vendite_previste_giornaliere, trend_vendite,
+giorni_autonomia_prevista e fabbisogno_previsto, le righe ordine_fornitore
+quantita_prevista e il summary totale_pezzi_ordine_previsto.
+
 Response:
 {
   "stock": [
@@ -37,25 +51,45 @@ Response:
     "sku_critici": 5,
     "sku_da_ordinare": 15,
     "totale_pezzi_ordine": 1500
-  }
+  },
+  "partial": false,
+  "warnings": [],          // es. ["partial: GLS returns missing"]
+  "sources": {"sheets": {"status": "ok", "ms": 412.3}, ...},
+  "scenari": [             // solo se richiesti
+    {"nome": "Nave lenta", "parametri": {...}, "ordine_fornitore": [...], "summary": {...}}
+  ]
 }
 """
 
 import json
+import math
 import os
 import requests
-import pandas as pd
-import math
+import sqlite3
 import sys
-from datetime import datetime, timedelta
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import demand_forecast
+import fanout
+import json_columns
+import metrics
+import sheets_client
+import sku_codec
+import snapshots
+import stock_engine
+from sales_ledger import SalesLedger
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # Aggiungi path per importare moduli locali
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'GLS'))
 
-# Import GLS per SKU ritorni
-from extract_sku_con_retorno import GLSExtranetClient, extract_sku_from_returns
+# Import GLS per SKU ritorni (caricato solo se ENABLE_GLS_CHECKS)
+gls_returns = lazy_import('extract_sku_con_retorno')
 
 # ==================== CONFIGURAZIONE ====================
 
@@ -68,7 +102,8 @@ SHOPIFY_ACCESS_TOKEN = os.environ.get("SHOPIFY_ACCESS_TOKEN")
 SHOPIFY_API_VERSION = "2024-04"
 
 # Shopify GraphQL
-SHOPIFY_GRAPHQL_URL = f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_GRAPHQL_URL = os.environ.get("SHOPIFY_GRAPHQL_URL") or f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+SHOPIFY_REST_URL = os.environ.get("SHOPIFY_REST_URL") or f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}"
 SHOPIFY_GRAPHQL_TOKEN = os.environ.get("SHOPIFY_GRAPHQL_TOKEN")
 
 # Parametri inventario
@@ -76,9 +111,77 @@ GIORNI_TARGET_SCORTA = 45
 GIORNI_TRANSITO = 21
 SOGLIA_ALLARME = GIORNI_TARGET_SCORTA + GIORNI_TRANSITO
 SOGLIA_CRITICA = 21
-GIORNI_ANALISI_VENDITE = 10
+GIORNI_ANALISI_VENDITE = int(os.environ.get("GIORNI_ANALISI_VENDITE", "10"))
 MOLTIPLICATORE_CRESCITA_VENDITE = 1
 
+# Scenari di parametri valutabili in una sola chiamata (?scenarios=)
+MAX_SCENARI = 20
+# Limite dei parametri di uno scenario (giorni e moltiplicatore): oltre, i
+# fabbisogni non sono più numeri sensati
+MAX_VALORE_SCENARIO = 3650
+
+# Pesi media vendite: linear (1..N giorni) o exponential (decadimento per giorno)
+SCHEMA_PESI_VENDITE = os.environ.get("SCHEMA_PESI_VENDITE", "linear")
+DECADIMENTO_PESI_VENDITE = float(os.environ.get("DECADIMENTO_PESI_VENDITE", "0.8"))
+
+# Log dettagliato del fabbisogno per ogni SKU (di default solo il riepilogo)
+DEBUG_FABBISOGNI = os.environ.get("DEBUG_FABBISOGNI", "False").lower() == "true"
+
+# Registro vendite giornaliero (sales_ledger): scarica solo i giorni non chiusi
+ENABLE_SALES_LEDGER = os.environ.get("ENABLE_SALES_LEDGER", "True").lower() == "true"
+
+# Previsione domanda (demand_forecast, richiede il registro vendite):
+# "" = disattivata, ses = smoothing esponenziale, holt = smoothing con trend
+METODO_PREVISIONE = os.environ.get("METODO_PREVISIONE", "").lower()
+GIORNI_STORICO_PREVISIONE = int(os.environ.get("GIORNI_STORICO_PREVISIONE", "90"))
+ALPHA_PREVISIONE = float(os.environ.get("ALPHA_PREVISIONE", "0.3"))
+BETA_PREVISIONE = float(os.environ.get("BETA_PREVISIONE", "0.1"))
+SMORZAMENTO_TREND_PREVISIONE = float(os.environ.get("SMORZAMENTO_TREND_PREVISIONE", "0.9"))
+
+# Deadline per sorgente in secondi dall'avvio del fan-out; override con
+# SOURCE_DEADLINES='{"gls_returns": 8}'. Una sorgente in ritardo rende la
+# risposta parziale (tranne Google Sheets, indispensabile)
+DEFAULT_SOURCE_DEADLINES = {
+    "sheets": 10,
+    "shopify_orders": 20,
+    "gls_returns": 15,
+    "backorders": 15,
+}
+
+
+def parse_source_deadlines(raw, defaults=DEFAULT_SOURCE_DEADLINES):
+    """
+    Deadline di default aggiornate con l'override JSON raw; JSON non valido o
+    valori non positivi vengono ignorati con un warning (l'init non fallisce)
+    """
+    deadlines = dict(defaults)
+    if not raw:
+        return deadlines
+    try:
+        override = json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️ SOURCE_DEADLINES non è JSON valido, uso i default: {e}")
+        return deadlines
+    if not isinstance(override, dict):
+        print("⚠️ SOURCE_DEADLINES deve essere un oggetto JSON {sorgente: secondi}, uso i default")
+        return deadlines
+    for name, seconds in override.items():
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) \
+                or not math.isfinite(seconds) or seconds <= 0:
+            print(f"⚠️ SOURCE_DEADLINES: deadline {name}={seconds!r} non valida, uso {deadlines.get(name)}")
+            continue
+        deadlines[name] = seconds
+    return deadlines
+
+
+SOURCE_DEADLINES = parse_source_deadlines(os.environ.get("SOURCE_DEADLINES"))
+SOURCE_LABELS = {
+    "sheets": "Google Sheets",
+    "shopify_orders": "Shopify orders",
+    "gls_returns": "GLS returns",
+    "backorders": "Shopify backorders",
+}
+
 # Tags ordini arretrati
 TAGS_ORDINI_ARRETRATI = ["MANCA MODELLO", "MANCA MODELLO 2"]
 
@@ -87,72 +190,56 @@ GOOGLE_SHEET_ID = os.environ.get("GOOGLE_SHEET_ID", "1mOWYahqRDPK0mqGEOPMsC--WWd
 SHEET_MAGAZZINO = "Magazzino"
 SHEET_ARRIVO = "InArrivo"
 
-# Credenziali Google (da variabile ambiente o file)
-GOOGLE_CREDENTIALS_JSON = os.environ.get("GOOGLE_CREDENTIALS_JSON")
-
 # ==================== GOOGLE SHEETS ====================
 
-def get_google_sheets_service():
-    """Crea servizio Google Sheets API"""
-    try:
-        if GOOGLE_CREDENTIALS_JSON:
-            # Da variabile ambiente (per Lambda)
-            credentials_info = json.loads(GOOGLE_CREDENTIALS_JSON)
-        else:
-            # Da file locale (per test)
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            cred_path = os.path.join(script_dir, 'shopify-lambda-integration-ff8f0760340f.json')
-            with open(cred_path, 'r') as f:
-                credentials_info = json.load(f)
-        
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-        )
-        
-        return build('sheets', 'v4', credentials=credentials)
-    except Exception as e:
-        print(f"❌ Errore Google Sheets: {e}")
-        return None
+def parse_sheet_values(values):
+    """Converte le righe di un foglio (colonne A:D) in dict {SKU: quantità}"""
+    if not values:
+        return {}
+    
+    data = {}
+    for row in values[1:]:  # Skip header
+        if len(row) >= 4:
+            sku = str(row[2]).strip()
+            if sku.upper() == "TOTAL" or not sku:
+                continue
+            try:
+                data[sku] = int(row[3])
+            except (ValueError, IndexError):
+                continue
+    
+    return data
 
 
-def read_sheet_data(service, sheet_name):
-    """Legge dati da Google Sheets"""
-    try:
-        result = service.spreadsheets().values().get(
-            spreadsheetId=GOOGLE_SHEET_ID,
-            range=f"{sheet_name}!A:D"
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
-            return {}
-        
-        data = {}
-        for row in values[1:]:  # Skip header
-            if len(row) >= 4:
-                sku = str(row[2]).strip()
-                if sku.upper() == "TOTAL" or not sku:
-                    continue
-                try:
-                    data[sku] = int(row[3])
-                except (ValueError, IndexError):
-                    continue
-        
-        return data
-    except Exception as e:
-        print(f"❌ Errore lettura {sheet_name}: {e}")
-        return {}
+def parse_stock_sheets(magazzino_values, arrivo_values):
+    """Parse dei fogli Magazzino e InArrivo letti con un solo batchGet"""
+    return parse_sheet_values(magazzino_values), parse_sheet_values(arrivo_values)
+
+
+def load_stock_sheets():
+    """
+    Legge Magazzino e InArrivo in una sola chiamata (cache fino a modifica foglio)
+    
+    Returns:
+        tuple (magazzino_attuale, arrivo_fornitore) come dict {SKU: quantità}
+    """
+    return sheets_client.read_parsed(
+        GOOGLE_SHEET_ID,
+        [f"{SHEET_MAGAZZINO}!A:D", f"{SHEET_ARRIVO}!A:D"],
+        parse_stock_sheets
+    )
 
 
 # ==================== SHOPIFY ====================
 
-def fetch_shopify_orders(days_back=10):
-    """Scarica ordini Shopify ultimi N giorni"""
-    today = datetime.utcnow()
-    start_date = (today - timedelta(days=days_back)).isoformat()
+def fetch_shopify_orders(days_back=10, start_day=None):
+    """Scarica ordini Shopify ultimi N giorni (o da mezzanotte UTC di start_day)"""
+    if start_day:
+        start_date = f"{start_day.isoformat()}T00:00:00+00:00"
+    else:
+        start_date = (datetime.utcnow() - timedelta(days=days_back)).isoformat()
     
-    base_url = f"https://{SHOP_NAME}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/orders.json"
+    base_url = f"{SHOPIFY_REST_URL}/orders.json"
     headers = {"X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN}
     params = {
         "status": "any",
@@ -279,189 +366,127 @@ def fetch_backorders():
 
 # ==================== CALCOLI ====================
 
-def calculate_weighted_average(sku_data, days=10):
-    """Calcola media pesata vendite"""
-    df = pd.DataFrame(sku_data).copy()
-    
-    if df.empty:
-        return pd.DataFrame(columns=["sku", "media_pesata"])
+def calculate_weighted_average(sku_data, days=10, scheme=None):
+    """
+    Calcola media pesata vendite sugli ultimi `days` giorni (fino all'ultima vendita)
     
-    # Unifica le date: Shopify usa "created_at" (ISO datetime), GLS usa "date" (YYYY-MM-DD)
-    def extract_date(row):
-        if pd.notna(row.get("created_at")):
-            return pd.to_datetime(row["created_at"], utc=True).date()
-        elif pd.notna(row.get("date")):
-            return pd.to_datetime(row["date"]).date()
-        else:
-            return None
+    Args:
+        sku_data: Lista di dict {sku, current_quantity, created_at | date}
+        days: Ampiezza finestra in giorni
+        scheme: Schema pesi (linear | exponential), default SCHEMA_PESI_VENDITE
     
-    df["date"] = df.apply(extract_date, axis=1)
+    Returns:
+        DataFrame [sku, media_pesata] per gli SKU venduti nella finestra
+    """
+    empty = pd.DataFrame(columns=["sku", "media_pesata"])
+    if not sku_data:
+        return empty
     
-    grouped = (
-        df.groupby(["date", "sku"])
-        .agg(total_quantity=("current_quantity", "sum"))
-        .reset_index()
+    # Unifica le date: Shopify usa "created_at" (ISO datetime), GLS usa "date" (YYYY-MM-DD)
+    day_numbers, valid = stock_engine.iso_day_numbers(
+        [item.get("created_at") or item.get("date") for item in sku_data]
     )
+    skus = np.array([item.get("sku") for item in sku_data], dtype=object)
+    valid &= pd.notna(skus)
+    if not valid.any():
+        return empty
     
-    end_date = max(grouped["date"])
-    start_date = end_date - timedelta(days=days - 1)
-    date_range = pd.date_range(start=start_date, end=end_date).date
-    
-    grouped_window = grouped[(grouped["date"] >= start_date) & (grouped["date"] <= end_date)].copy()
-    all_skus = grouped_window["sku"].dropna().astype(str).unique()
-    
-    full_index = pd.MultiIndex.from_product([date_range, all_skus], names=["date", "sku"])
+    # Finestra: ultimi `days` giorni fino all'ultima vendita
+    end_day = day_numbers[valid].max()
+    day_offsets = day_numbers - (end_day - days + 1)
+    in_window = valid & (day_offsets >= 0)
     
-    full_df = (
-        grouped_window
-        .assign(sku=lambda x: x["sku"].astype(str))
-        .set_index(["date", "sku"])
-        .reindex(full_index, fill_value=0)
-        .reset_index()
-    )
-    
-    full_df["weight"] = full_df["date"].apply(lambda d: (d - start_date).days + 1)
+    sku_ids, sku_names = pd.factorize(skus[in_window].astype(str), sort=True)
+    # Quantità mancanti (None) contano 0
+    quantities = np.nan_to_num(np.array([item.get("current_quantity") for item in sku_data], dtype=float))
     
-    weighted_avg = (
-        full_df.assign(weighted_quantity=lambda x: x["total_quantity"] * x["weight"])
-        .groupby("sku", as_index=False)
-        .agg(
-            weighted_sum=("weighted_quantity", "sum"),
-            total_weight=("weight", "sum")
-        )
+    media = stock_engine.weighted_average(
+        sku_ids,
+        day_offsets[in_window],
+        quantities[in_window],
+        n_skus=len(sku_names),
+        days=days,
+        scheme=scheme or SCHEMA_PESI_VENDITE,
+        decay=DECADIMENTO_PESI_VENDITE
     )
     
-    weighted_avg["media_pesata"] = weighted_avg["weighted_sum"] / weighted_avg["total_weight"]
-    
-    return weighted_avg[["sku", "media_pesata"]]
+    return pd.DataFrame({"sku": sku_names, "media_pesata": media})
 
 
 def parse_sku(sku):
     """Estrae MODELO e TALLA da SKU (es: SLIP.XS.BE -> SLIP BE, XS)"""
-    parts = sku.split('.')
-    if len(parts) >= 3:
-        modelo_base = parts[0]
-        talla = parts[1]
-        color = parts[2]
-        modelo = f"{modelo_base} {color}"
-        return modelo, talla
+    parts = sku_codec.parse(sku)
+    if parts:
+        return parts.modelo, parts.talla
     return sku, ""
 
 
 def is_valid_sku(sku):
     """Verifica se uno SKU ha il formato valido (almeno 3 parti separate da punto).
     Esclude SKU con talla placeholder come 'XXX'."""
-    if not sku or not isinstance(sku, str):
-        return False
-    parts = sku.split('.')
-    if not (len(parts) >= 3 and all(part.strip() for part in parts)):
-        return False
-    talla = parts[1].strip().upper()
-    # Escludi talle placeholder/invalide
-    INVALID_TALLAS = {"XXX", "XX", "TEST", "PLACEHOLDER", "NA", "N/A"}
-    if talla in INVALID_TALLAS:
-        return False
-    return True
+    return sku_codec.is_valid(sku)
 
 
 def build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders):
-    """Costruisce dati completi stock + ordine fornitore"""
+    """
+    Costruisce dati completi stock + ordine fornitore
     
-    # Tutti gli SKU validi (filtra quelli con formato non valido)
-    all_skus = set()
-    for sku in set(arrivo_fornitore.keys()) | set(magazzino_attuale.keys()):
-        if is_valid_sku(sku):
-            all_skus.add(sku)
+    Returns:
+        dict di colonne (vedi stock_engine.build_columns), nell'ordine del
+        foglio Magazzino; gli SKU fuori dal foglio in coda
+    """
+    registry = sku_codec.registry
     
-    # Filtra anche i dati di input per rimuovere SKU non validi
+    # Filtra i dati di input per rimuovere SKU non validi
     arrivo_fornitore = {sku: qty for sku, qty in arrivo_fornitore.items() if is_valid_sku(sku)}
     magazzino_attuale = {sku: qty for sku, qty in magazzino_attuale.items() if is_valid_sku(sku)}
     backorders = {sku: qty for sku, qty in backorders.items() if is_valid_sku(sku)}
     
-    # Filtra weighted_avg per SKU validi
+    media_pesata = {}
     if not weighted_avg.empty:
-        weighted_avg = weighted_avg[weighted_avg["sku"].apply(is_valid_sku)].copy()
-    
-    # DataFrame base
-    df = weighted_avg.copy()
-    
-    # Aggiungi SKU non venduti recentemente
-    existing_skus = set(df["sku"])
-    missing_skus = all_skus - existing_skus
-    
-    if missing_skus:
-        new_rows = pd.DataFrame([
-            {"sku": sku, "media_pesata": 0}
-            for sku in missing_skus
-        ])
-        df = pd.concat([df, new_rows], ignore_index=True)
-    
-    # Aggiungi dati inventario
-    df["magazzino_attuale"] = df["sku"].map(magazzino_attuale).fillna(0).astype(int)
-    df["in_arrivo"] = df["sku"].map(arrivo_fornitore).fillna(0).astype(int)
-    df["totale_disponibile"] = df["magazzino_attuale"] + df["in_arrivo"]
-    df["ordini_arretrati"] = df["sku"].map(backorders).fillna(0).astype(int)
-    df["magazzino_netto"] = df["totale_disponibile"] - df["ordini_arretrati"]
-    
-    # Calcola autonomia
-    df["giorni_autonomia"] = df.apply(
-        lambda row: row["magazzino_netto"] / row["media_pesata"] 
-        if row["media_pesata"] > 0 else float('inf'), 
-        axis=1
+        media_pesata = {
+            sku: media
+            for sku, media in zip(weighted_avg["sku"].tolist(), weighted_avg["media_pesata"].tolist())
+            if is_valid_sku(sku)
+        }
+    
+    # Ordine del foglio Excel (Magazzino), poi SKU venduti o in arrivo non presenti nel foglio
+    sku_ids = registry.intern_many([*magazzino_attuale, *media_pesata, *arrivo_fornitore])
+    sku_ids = sku_ids[np.sort(np.unique(sku_ids, return_index=True)[1])]
+    
+    columns = stock_engine.build_columns(
+        sku_ids,
+        registry.dense(media_pesata, dtype=float),
+        registry.dense(magazzino_attuale),
+        registry.dense(arrivo_fornitore),
+        registry.dense(backorders),
+        giorni_target=GIORNI_TARGET_SCORTA,
+        giorni_transito=GIORNI_TRANSITO,
+        soglia_critica=SOGLIA_CRITICA,
+        soglia_allarme=SOGLIA_ALLARME,
+        moltiplicatore=MOLTIPLICATORE_CRESCITA_VENDITE,
     )
     
-    # Calcola fabbisogno
-    df["autonomia_tra_transito"] = df["giorni_autonomia"] - GIORNI_TRANSITO
-    
-    def calcola_fabbisogno(row):
-        if row["media_pesata"] <= 0:
-            return 0
-        vendite_previste = row["media_pesata"] * MOLTIPLICATORE_CRESCITA_VENDITE
-        giorni_mancanti = GIORNI_TARGET_SCORTA - row["autonomia_tra_transito"]
-        fabbisogno_grezzo = max(0, giorni_mancanti * vendite_previste)
-        
-        # Log debug per SKU con fabbisogno > 0
-        if fabbisogno_grezzo > 0:
-            arrotondato = max(10, math.ceil(fabbisogno_grezzo / 10) * 10)
-            print(f"🔍 DEBUG {row['sku']}:")
-            print(f"   Magazzino netto: {row['magazzino_netto']} | Media vendite: {row['media_pesata']:.2f}/giorno")
-            print(f"   Autonomia attuale: {row['giorni_autonomia']:.1f} giorni")
-            print(f"   Autonomia tra transito: {row['autonomia_tra_transito']:.1f} giorni")
-            print(f"   Giorni da coprire: {giorni_mancanti:.1f}")
-            print(f"   Fabbisogno grezzo: {fabbisogno_grezzo:.2f} → arrotondato: {arrotondato}")
-            return arrotondato
-        return 0
-    
-    df["fabbisogno"] = df.apply(calcola_fabbisogno, axis=1).astype(int)
-    
-    # Debug: riepilogo fabbisogni
-    df_con_fabbisogno = df[df["fabbisogno"] > 0]
-    print(f"\n📋 RIEPILOGO FABBISOGNI (Stock API):")
-    print(f"   SKU da ordinare: {len(df_con_fabbisogno)}")
-    print(f"   Totale pezzi: {df_con_fabbisogno['fabbisogno'].sum()}")
-    print(f"\n   Dettaglio:")
-    for _, row in df_con_fabbisogno.iterrows():
-        print(f"   {row['sku']}: {row['fabbisogno']} pz (autonomia: {row['giorni_autonomia']:.1f}gg, media: {row['media_pesata']:.2f}/gg)")
-    
-    # Urgenza
-    def urgenza(giorni):
-        if giorni < SOGLIA_CRITICA:
-            return "CRITICO"
-        elif giorni < SOGLIA_ALLARME:
-            return "ORDINARE"
-        return "OK"
-    
-    df["urgenza"] = df["giorni_autonomia"].apply(urgenza)
-    
-    # Parse SKU
-    df[["modelo", "talla"]] = df["sku"].apply(lambda x: pd.Series(parse_sku(x)))
-    
-    # Mantieni ordine originale del foglio Excel (Magazzino)
-    sku_order = list(magazzino_attuale.keys())
-    df["order"] = df["sku"].map({sku: i for i, sku in enumerate(sku_order)})
-    df = df.sort_values("order", na_position='last').drop(columns=["order"])
-    
-    return df
+    log_fabbisogni(columns)
+    
+    return columns
+
+
+def log_fabbisogni(columns):
+    """Riepilogo fabbisogni; dettaglio per SKU solo con DEBUG_FABBISOGNI=true"""
+    da_ordinare = np.flatnonzero(columns["fabbisogno"] > 0)
+    print(f"📋 Fabbisogni: {len(da_ordinare)} SKU da ordinare, "
+          f"{int(columns['fabbisogno'][da_ordinare].sum())} pezzi totali")
+    
+    if not DEBUG_FABBISOGNI:
+        return
+    
+    for i in da_ordinare.tolist():
+        print(f"🔍 DEBUG {columns['sku'][i]}:")
+        print(f"   Magazzino netto: {columns['magazzino_netto'][i]} | Media vendite: {columns['media_pesata'][i]:.2f}/giorno")
+        print(f"   Autonomia attuale: {columns['giorni_autonomia'][i]:.1f} giorni")
+        print(f"   Autonomia tra transito: {columns['autonomia_tra_transito'][i]:.1f} giorni")
+        print(f"   Fabbisogno arrotondato: {columns['fabbisogno'][i]}")
 
 
 def get_gls_returns_skus(days_back=7):
@@ -473,16 +498,17 @@ def get_gls_returns_skus(days_back=7):
         
     Returns:
         List di dict con formato: [{"sku": "SLIP.XL.BL", "quantity": 2, "date": "2026-01-15"}, ...]
+        [] se i cookies GLS non sono configurati (sorgente saltata);
+        None se login, ricerca o timeout falliscono (i giorni non vanno registrati come vuoti)
     """
-    import time
     try:
         # Carica cookies GLS
-        cookies = GLSExtranetClient.load_cookies()
+        cookies = gls_returns.GLSExtranetClient.load_cookies()
         if not cookies:
             print("⚠️ Cookies GLS non trovati, skip GLS sales")
             return []
         
-        client = GLSExtranetClient(cookies)
+        client = gls_returns.GLSExtranetClient(cookies)
         
         # Calcola date
         today = datetime.now()
@@ -490,34 +516,28 @@ def get_gls_returns_skus(days_back=7):
         date_to = today.strftime("%d/%m/%Y")
         
         # Cerca spedizioni (HTTP request)
-        t_http = time.time()
-        html = client.search_shipments(date_from, date_to)
-        http_time = time.time() - t_http
-        print(f"   ⏱️ HTTP request GLS: {http_time:.2f}s")
+        with metrics.stage('gls_search'):
+            html = client.search_shipments(date_from, date_to)
         
         if not html:
-            return []
+            return None
         
         # Parse spedizioni (CPU-intensive)
-        t_parse = time.time()
-        df = client.parse_shipments(html)
-        parse_time = time.time() - t_parse
-        print(f"   ⏱️ Parsing HTML: {parse_time:.2f}s")
+        with metrics.stage('gls_parse'):
+            df = client.parse_shipments(html)
         
         if df.empty:
             return []
         
         # Estrai SKU da spedizioni CON RETORNO con date
-        t_extract = time.time()
-        sku_sales_with_dates = extract_sku_from_returns_with_dates(df)
-        extract_time = time.time() - t_extract
-        print(f"   ⏱️ Elaborazione dati: {extract_time:.2f}s")
+        with metrics.stage('gls_extract_sku'):
+            sku_sales_with_dates = extract_sku_from_returns_with_dates(df)
         
         return sku_sales_with_dates
         
     except Exception as e:
         print(f"⚠️ Errore recupero GLS sales: {e}")
-        return []
+        return None
 
 
 def extract_sku_from_returns_with_dates(df):
@@ -530,140 +550,431 @@ def extract_sku_from_returns_with_dates(df):
     Returns:
         List di dict con formato: [{"sku": "SLIP.XL.BL", "quantity": 2, "date": "2026-01-15"}, ...]
     """
-    from collections import defaultdict
+    lines = gls_returns.extract_sku_lines(df)
+    print(f"🔄 {lines['shipment'].nunique()} spedizioni 'CON RETORNO' con SKU, {len(lines)} righe")
+    return json_columns.Records.from_frame(lines, ["sku", "quantity", "date"]).rows()
+
+
+# ==================== REGISTRO VENDITE ====================
+
+# Giorno 0 dei numeri di giorno di stock_engine.iso_day_numbers
+EPOCH = date(1970, 1, 1)
+
+_sales_ledger = None
+
+# Un aggiornamento del registro per sorgente alla volta: una sorgente oltre la
+# deadline continua a girare e non deve sovrapporsi all'invocazione successiva
+_ledger_refresh_locks = {'shopify': threading.Lock(), 'gls': threading.Lock()}
+
+
+def open_sales_ledger():
+    """Registro vendite riusato tra invocazioni; None se disabilitato o non apribile"""
+    global _sales_ledger
+    if not ENABLE_SALES_LEDGER:
+        return None
+    if _sales_ledger is None:
+        try:
+            _sales_ledger = SalesLedger()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Registro vendite non disponibile, download completo: {e}")
+            return None
+    return _sales_ledger
+
+
+def gls_sales_lines(days_back):
+    """Vendite GLS come righe; eccezione se GLS non è raggiungibile (sorgente mancante)"""
+    lines = get_gls_returns_skus(days_back=days_back)
+    if lines is None:
+        raise RuntimeError("GLS non raggiungibile")
+    return lines
+
+
+def merge_sales_lines(shopify_lines, gls_lines):
+    """Righe Shopify + GLS nel formato di calculate_weighted_average (solo SKU validi)"""
+    sku_data = list(shopify_lines)
+    for item in gls_lines:
+        sku_data.append({
+            "created_at": item['date'],
+            "sku": item['sku'],
+            "current_quantity": item['quantity']
+        })
     
-    sku_sales_list = []
+    # Filtra SKU non validi dai dati di vendita
+    return [item for item in sku_data if is_valid_sku(item.get('sku'))]
+
+
+def daily_totals(lines, qty_field):
+    """
+    Somma le righe vendita per (giorno UTC ISO, SKU), scartando SKU non validi
     
-    # Filtra spedizioni con "CON RETORNO"
-    returns_df = df[df['retorno'].str.upper().str.contains('CON RETORNO', na=False)].copy()
+    Args:
+        lines: Righe con "sku", `qty_field` e "created_at" o "date"
+    """
+    day_numbers, valid = stock_engine.iso_day_numbers(
+        [line.get("created_at") or line.get("date") for line in lines]
+    )
+    day_names = {}
+    totals = {}
+    for line, day_number, ok in zip(lines, day_numbers.tolist(), valid.tolist()):
+        sku = line.get("sku")
+        if not ok or not is_valid_sku(sku):
+            continue
+        day = day_names.get(day_number)
+        if day is None:
+            day = day_names[day_number] = (EPOCH + timedelta(days=day_number)).isoformat()
+        totals[(day, sku)] = totals.get((day, sku), 0) + (line.get(qty_field) or 0)
+    return totals
+
+
+def ledger_window_days():
+    """Giorni di storico da tenere nel registro (analisi vendite o previsione)"""
+    if METODO_PREVISIONE:
+        return max(GIORNI_ANALISI_VENDITE, GIORNI_STORICO_PREVISIONE)
+    return GIORNI_ANALISI_VENDITE
+
+
+@contextmanager
+def ledger_refresh(source):
+    """
+    Lock dell'aggiornamento del registro per source; se un aggiornamento
+    precedente (sorgente oltre la deadline) è ancora in corso solleva
+    RuntimeError e la sorgente risulta mancante (risposta parziale)
+    """
+    lock = _ledger_refresh_locks[source]
+    if not lock.acquire(blocking=False):
+        raise RuntimeError(f"aggiornamento registro vendite {source} ancora in corso")
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def refresh_shopify_sales(ledger, today):
+    """
+    Scarica e registra solo i giorni Shopify non chiusi della finestra di analisi
+    (di norma oggi e ieri; tutta la finestra al primo avvio).
+    """
+    with ledger_refresh('shopify'):
+        start_day = today - timedelta(days=ledger_window_days() - 1)
+        days = ledger.missing_days('shopify', start_day, today)
+        if days:
+            print(f"🧾 Registro vendite Shopify: aggiorno {len(days)} giorni dal {days[0]}")
+            lines = fetch_shopify_orders(start_day=days[0])
+            ledger.replace_days('shopify', days, daily_totals(lines, "current_quantity"), today)
+
+
+def refresh_gls_sales(ledger, today):
+    """
+    Come refresh_shopify_sales per le vendite GLS CON RETORNO; senza cookies
+    GLS non registra nulla, così i giorni restano da scaricare
+    """
+    with ledger_refresh('gls'):
+        start_day = today - timedelta(days=ledger_window_days() - 1)
+        days = ledger.missing_days('gls', start_day, today)
+        if days and not gls_returns.GLSExtranetClient.load_cookies():
+            print("⚠️ Cookies GLS non trovati, registro vendite GLS non aggiornato")
+            return
+        if days:
+            print(f"🧾 Registro vendite GLS: aggiorno {len(days)} giorni dal {days[0]}")
+            lines = gls_sales_lines(days_back=(today - days[0]).days)
+            ledger.replace_days('gls', days, daily_totals(lines, "quantity"), today)
+
+
+def weighted_average_from_ledger(ledger, days=10, scheme=None, today=None):
+    """
+    Media pesata vendite dalla matrice SKU × giorno del registro; la finestra
+    termina all'ultimo giorno con vendite, come calculate_weighted_average
     
-    print(f"🔄 Analisi di {len(returns_df)} spedizioni con 'CON RETORNO'...\n")
+    Returns:
+        DataFrame [sku, media_pesata] per gli SKU venduti nella finestra
+    """
+    sources = ('shopify', 'gls') if ENABLE_GLS_CHECKS else ('shopify',)
+    end_day = ledger.last_sale_day(sources, until=today or datetime.utcnow().date())
+    if end_day is None:
+        return pd.DataFrame(columns=["sku", "media_pesata"])
     
-    for idx, row in returns_df.iterrows():
-        observacion = str(row.get('observacion', '')).strip()
-        fecha = row.get('Fecha', '')
-        
-        # Converti data da formato DD/MM/YYYY a YYYY-MM-DD
+    skus, matrix = ledger.daily_matrix(end_day - timedelta(days=days - 1), end_day, sources)
+    media = stock_engine.weighted_matrix_average(
+        matrix,
+        scheme=scheme or SCHEMA_PESI_VENDITE,
+        decay=DECADIMENTO_PESI_VENDITE
+    )
+    return pd.DataFrame({"sku": skus, "media_pesata": media})
+
+
+def forecast_from_ledger(ledger, columns, today=None):
+    """
+    Previsione domanda (METODO_PREVISIONE) per gli SKU di `columns` sullo
+    storico del registro; la finestra termina all'ultimo giorno con vendite
+    
+    Returns:
+        dict di demand_forecast.forecast allineato a columns, oppure None
+    """
+    if not METODO_PREVISIONE:
+        return None
+    if ledger is None:
+        print("⚠️ Previsione domanda saltata: registro vendite non disponibile")
+        return None
+    
+    sources = ('shopify', 'gls') if ENABLE_GLS_CHECKS else ('shopify',)
+    end_day = ledger.last_sale_day(sources, until=today or datetime.utcnow().date())
+    if end_day is None:
+        return None
+    
+    skus, matrix = ledger.daily_matrix(end_day - timedelta(days=GIORNI_STORICO_PREVISIONE - 1), end_day, sources)
+    registry = sku_codec.registry
+    ids = registry.intern_many(skus)
+    by_id = np.zeros((len(registry), matrix.shape[1]))
+    np.add.at(by_id, ids[ids >= 0], matrix[ids >= 0])
+    
+    return demand_forecast.forecast(
+        by_id[columns['sku_id']],
+        columns['magazzino_netto'],
+        giorni_target=GIORNI_TARGET_SCORTA,
+        giorni_transito=GIORNI_TRANSITO,
+        moltiplicatore=MOLTIPLICATORE_CRESCITA_VENDITE,
+        method=METODO_PREVISIONE,
+        alpha=ALPHA_PREVISIONE,
+        beta=BETA_PREVISIONE,
+        phi=SMORZAMENTO_TREND_PREVISIONE,
+    )
+
+
+def attach_forecast(stock_list, ordine_list, columns, previsione):
+    """Aggiunge ai Records stock e ordine fornitore le colonne dei valori previsti"""
+    stock_list.add("vendite_previste_giornaliere", np.round(previsione['livello'], 2))
+    stock_list.add("trend_vendite", np.round(previsione['trend'], 3))
+    stock_list.add("giorni_autonomia_prevista", stock_engine.autonomy_for_json(previsione['giorni_autonomia']))
+    stock_list.add("fabbisogno_previsto", previsione['fabbisogno'])
+    
+    ordine_list.add("quantita_prevista", previsione['fabbisogno'][stock_engine.supplier_order_index(columns)])
+
+
+# ==================== SCENARI ====================
+
+class InvalidScenario(ValueError):
+    pass
+
+
+def default_scenario():
+    """Parametri di riassortimento correnti (costanti del modulo)"""
+    return {
+        "giorni_target_scorta": GIORNI_TARGET_SCORTA,
+        "giorni_transito": GIORNI_TRANSITO,
+        "soglia_critica": SOGLIA_CRITICA,
+        "soglia_allarme": SOGLIA_ALLARME,
+        "moltiplicatore_crescita_vendite": MOLTIPLICATORE_CRESCITA_VENDITE,
+    }
+
+
+def parse_scenarios(event):
+    """
+    Scenari richiesti dal client, da query string (?scenarios=<JSON>) o dal
+    body POST {"scenarios": [...]}
+    
+    Ogni scenario è un dict con "nome" e uno o più parametri di
+    default_scenario(); quelli mancanti restano ai valori correnti.
+    soglia_allarme, se non indicata, è giorni_target_scorta + giorni_transito.
+    
+    Returns:
+        Lista di dict con "nome" e tutti i parametri (vuota se nessuno scenario)
+    
+    Raises:
+        InvalidScenario: JSON non valido, parametro sconosciuto, non numerico,
+            non finito, negativo o oltre MAX_VALORE_SCENARIO, oppure
+            soglia_critica > soglia_allarme
+    """
+    raw = (event.get('queryStringParameters') or {}).get('scenarios')
+    if raw is None and isinstance(event.get('body'), str) and event['body'].strip():
         try:
-            if fecha:
-                date_obj = datetime.strptime(str(fecha), "%d/%m/%Y")
-                date_str = date_obj.strftime("%Y-%m-%d")
-            else:
-                date_str = datetime.now().strftime("%Y-%m-%d")
-        except:
-            date_str = datetime.now().strftime("%Y-%m-%d")
-        
-        if not observacion:
-            continue
-        
-        # Parse SKU dalla osservazione - crea un mini-df per la funzione esistente
-        mini_df = pd.DataFrame([row])
-        skus_in_shipment = extract_sku_from_returns(mini_df)
-        
-        for sku, qty in skus_in_shipment.items():
-            if sku:
-                sku_sales_list.append({
-                    "sku": sku,
-                    "quantity": qty,
-                    "date": date_str
-                })
+            raw = json.loads(event['body']).get('scenarios')
+        except (ValueError, AttributeError):
+            raise InvalidScenario("Body non valido: atteso JSON {\"scenarios\": [...]}")
+    if raw is None:
+        return []
+    
+    try:
+        requested = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        raise InvalidScenario("scenarios non è JSON valido")
+    if not isinstance(requested, list) or not all(isinstance(item, dict) for item in requested):
+        raise InvalidScenario("scenarios deve essere una lista di oggetti")
+    if len(requested) > MAX_SCENARI:
+        raise InvalidScenario(f"Massimo {MAX_SCENARI} scenari per richiesta")
+    
+    defaults = default_scenario()
+    scenarios = []
+    for i, item in enumerate(requested, start=1):
+        unknown = set(item) - set(defaults) - {"nome"}
+        if unknown:
+            raise InvalidScenario(f"Scenario {i}: parametri sconosciuti {', '.join(sorted(unknown))}")
+        scenario = {**defaults, "nome": str(item.get("nome") or f"Scenario {i}")}
+        for key in defaults:
+            if key in item:
+                value = item[key]
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise InvalidScenario(f"Scenario {i}: {key} deve essere numerico")
+                if not math.isfinite(value) or value < 0 or value > MAX_VALORE_SCENARIO:
+                    raise InvalidScenario(
+                        f"Scenario {i}: {key} deve essere un numero tra 0 e {MAX_VALORE_SCENARIO}"
+                    )
+                scenario[key] = value
+        if "soglia_allarme" not in item:
+            scenario["soglia_allarme"] = scenario["giorni_target_scorta"] + scenario["giorni_transito"]
+        if scenario["soglia_critica"] > scenario["soglia_allarme"]:
+            raise InvalidScenario(f"Scenario {i}: soglia_critica maggiore di soglia_allarme")
+        scenarios.append(scenario)
+    return scenarios
+
+
+def scenario_results(columns, scenarios):
+    """Proposta ordine fornitore + summary per ogni scenario (matrice scenario × SKU)"""
+    evaluated = stock_engine.evaluate_scenarios(columns, [
+        {
+            "giorni_target": scenario["giorni_target_scorta"],
+            "giorni_transito": scenario["giorni_transito"],
+            "soglia_critica": scenario["soglia_critica"],
+            "soglia_allarme": scenario["soglia_allarme"],
+            "moltiplicatore": scenario["moltiplicatore_crescita_vendite"],
+        }
+        for scenario in scenarios
+    ])
+    return [
+        {
+            "nome": scenario["nome"],
+            "parametri": {key: value for key, value in scenario.items() if key != "nome"},
+            "ordine_fornitore": stock_engine.supplier_order_records(scenario_columns),
+            "summary": stock_engine.summarize(scenario_columns),
+        }
+        for scenario, scenario_columns in zip(scenarios, evaluated)
+    ]
+
+
+# ==================== FAN-OUT SORGENTI ====================
+
+def load_sources(ledger, today=None):
+    """
+    Carica in parallelo Google Sheets, vendite Shopify, vendite GLS e ordini
+    arretrati, ognuna con la sua deadline (SOURCE_DEADLINES)
+    
+    Con il registro vendite le sorgenti vendite aggiornano il registro;
+    senza, restituiscono le righe vendita.
+    
+    Returns:
+        Dict {nome: fanout.SourceResult}
+    """
+    today = today or datetime.utcnow().date()
+    sources = {"sheets": load_stock_sheets}
+    
+    if ledger is not None:
+        sources["shopify_orders"] = lambda: refresh_shopify_sales(ledger, today)
+        if ENABLE_GLS_CHECKS:
+            sources["gls_returns"] = lambda: refresh_gls_sales(ledger, today)
+    else:
+        sources["shopify_orders"] = lambda: fetch_shopify_orders(days_back=GIORNI_ANALISI_VENDITE)
+        if ENABLE_GLS_CHECKS:
+            sources["gls_returns"] = lambda: gls_sales_lines(days_back=GIORNI_ANALISI_VENDITE)
+    
+    sources["backorders"] = fetch_backorders
     
-    return sku_sales_list
+    return fanout.fan_out(sources, SOURCE_DEADLINES)
+
+
+def weighted_average_from_sources(ledger, results):
+    """Media pesata vendite dal registro, o dalle righe scaricate se il registro non c'è"""
+    if ledger is not None:
+        return weighted_average_from_ledger(ledger, days=GIORNI_ANALISI_VENDITE)
+    
+    shopify = results["shopify_orders"]
+    gls = results.get("gls_returns")
+    sku_data = merge_sales_lines(
+        shopify.value if shopify.ok else [],
+        gls.value if gls is not None and gls.ok else []
+    )
+    return calculate_weighted_average(sku_data, days=GIORNI_ANALISI_VENDITE)
 
 
 # ==================== LAMBDA HANDLER ====================
 
+def stock_snapshot_complete(response):
+    """Risposte parziali (una sorgente non disponibile) non vanno negli snapshot"""
+    return not json.loads(response['body']).get('partial')
+
+
+@metrics.instrumented('stock')
+@snapshots.materialized('stock', should_store=stock_snapshot_complete)
 def lambda_handler(event, context):
     """Handler Lambda - restituisce stock + ordine fornitore"""
     
     try:
         print("🚀 Inizio elaborazione stock...")
         
-        # 1. Google Sheets
-        service = get_google_sheets_service()
-        if not service:
-            raise Exception("Impossibile connettersi a Google Sheets")
-        
-        magazzino_attuale = read_sheet_data(service, SHEET_MAGAZZINO)
-        arrivo_fornitore = read_sheet_data(service, SHEET_ARRIVO)
-        
-        # 2. Shopify
-        sku_data = fetch_shopify_orders(days_back=GIORNI_ANALISI_VENDITE)
+        # 0. Scenari di parametri richiesti (prima di scaricare i dati)
+        try:
+            scenarios = parse_scenarios(event or {})
+        except InvalidScenario as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': str(e)}, ensure_ascii=False)
+            }
         
-        # 2.5. Aggiungi vendite GLS esterne (se abilitato)
-        if ENABLE_GLS_CHECKS:
-            gls_sales_list = get_gls_returns_skus(days_back=GIORNI_ANALISI_VENDITE)
-            if gls_sales_list:
-                # Aggiungi le vendite GLS
-                for item in gls_sales_list:
-                    sku_data.append({
-                        "created_at": item['date'],
-                        "sku": item['sku'],
-                        "current_quantity": item['quantity']
-                    })
+        # 1. Sorgenti in parallelo: Sheets, vendite Shopify/GLS, ordini arretrati
+        ledger = open_sales_ledger()
+        results = load_sources(ledger)
         
-        # Filtra SKU non validi dai dati di vendita
-        sku_data = [item for item in sku_data if is_valid_sku(item.get('sku'))]
+        # Senza magazzino non c'è nulla da calcolare
+        if not results["sheets"].ok:
+            raise RuntimeError(f"Google Sheets non disponibile: {results['sheets'].error}")
+        magazzino_attuale, arrivo_fornitore = results["sheets"].value
+        missing = [name for name, result in results.items() if not result.ok]
         
-        weighted_avg = calculate_weighted_average(sku_data, days=GIORNI_ANALISI_VENDITE)
-        backorders = fetch_backorders()
+        # 2. Vendite (registro giornaliero) e ordini arretrati
+        weighted_avg = weighted_average_from_sources(ledger, results)
+        backorders = results["backorders"].value if results["backorders"].ok else {}
         
         # Filtra backorders per SKU validi
         backorders = {sku: qty for sku, qty in backorders.items() if is_valid_sku(sku)}
         
         # 3. Calcola tutto
-        df = build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders)
+        columns = build_stock_data(weighted_avg, arrivo_fornitore, magazzino_attuale, backorders)
         
         # 4. Prepara response
-        stock_list = []
-        for _, row in df.iterrows():
-            stock_list.append({
-                "sku": row["sku"],
-                "modelo": row["modelo"],
-                "talla": row["talla"],
-                "magazzino_attuale": int(row["magazzino_attuale"]),
-                "in_arrivo": int(row["in_arrivo"]),
-                "totale_disponibile": int(row["totale_disponibile"]),
-                "ordini_arretrati": int(row["ordini_arretrati"]),
-                "magazzino_netto": int(row["magazzino_netto"]),
-                "media_vendite_giornaliere": round(float(row["media_pesata"]), 2),
-                "giorni_autonomia": round(float(row["giorni_autonomia"]), 1) if row["giorni_autonomia"] != float('inf') else 999,
-                "urgenza": row["urgenza"]
-            })
+        stock_list = stock_engine.stock_records(columns)
         
         # 5. Ordine fornitore (solo da ordinare) - ordinato per autonomia crescente (più critici prima)
-        df_ordine = df[df["urgenza"].isin(["CRITICO", "ORDINARE"])].copy()
-        df_ordine = df_ordine.sort_values("giorni_autonomia", ascending=True)
-        
-        ordine_list = []
-        for _, row in df_ordine.iterrows():
-            ordine_list.append({
-                "sku": row["sku"],
-                "modelo": row["modelo"],
-                "talla": row["talla"],
-                "quantita": int(row["fabbisogno"]),
-                "urgenza": row["urgenza"],
-                "giorni_autonomia": round(float(row["giorni_autonomia"]), 1)
-            })
+        ordine_list = stock_engine.supplier_order_records(columns)
         
         # 6. Summary
-        summary = {
-            "totale_sku": len(df),
-            "totale_pezzi_stock": int(df["totale_disponibile"].sum()),
-            "totale_magazzino_attuale": int(df["magazzino_attuale"].sum()),
-            "totale_in_arrivo": int(df["in_arrivo"].sum()),
-            "sku_critici": int((df["urgenza"] == "CRITICO").sum()),
-            "sku_da_ordinare": int((df["urgenza"] == "ORDINARE").sum()),
-            "totale_pezzi_ordine": int(df_ordine["fabbisogno"].sum()) if not df_ordine.empty else 0
-        }
+        summary = stock_engine.summarize(columns)
+        
+        # 6b. Previsione domanda (se attiva) accanto alla media pesata
+        previsione = forecast_from_ledger(ledger, columns)
+        if previsione is not None:
+            attach_forecast(stock_list, ordine_list, columns, previsione)
+            summary["totale_pezzi_ordine_previsto"] = int(
+                previsione['fabbisogno'][columns['urgenza'] != stock_engine.OK].sum()
+            )
         
         response_data = {
             "stock": stock_list,
             "ordine_fornitore": ordine_list,
             "summary": summary,
+            "partial": bool(missing),
+            "warnings": [f"partial: {SOURCE_LABELS.get(name, name)} missing" for name in missing],
+            "sources": {name: result.metrics() for name, result in results.items()},
             "timestamp": datetime.now().isoformat()
         }
         
+        # 7. Scenari alternativi sugli stessi dati
+        if scenarios:
+            response_data["scenari"] = scenario_results(columns, scenarios)
+        
+        if missing:
+            print(f"⚠️ Risposta parziale, sorgenti mancanti: {', '.join(missing)}")
         print(f"✅ Completato: {len(stock_list)} SKU, {len(ordine_list)} da ordinare")
         
         return {
@@ -672,9 +983,9 @@ def lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
+                'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
             },
-            'body': json.dumps(response_data, ensure_ascii=False)
+            'body': json_columns.dumps(response_data)
         }
         
     except Exception as e:
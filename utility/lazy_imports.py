@@ -0,0 +1,50 @@
+"""
+Import ritardati per ridurre il cold start delle Lambda.
+
+pandas, numpy, bs4 e le librerie Google costano centinaia di ms all'import;
+con lazy_import il modulo viene caricato solo al primo accesso a un suo
+attributo, quindi i percorsi che non lo usano (azioni leggere, errori,
+OPTIONS) non pagano il costo.
+
+    pd = lazy_import('pandas')       # nessun import qui
+    df = pd.DataFrame(rows)          # pandas importato ora
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Proxy di un modulo, importato al primo accesso a un attributo"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'caricato' if self.__dict__['_module'] is not None else 'non caricato'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def lazy_import(name):
+    """Restituisce un proxy per il modulo `name` senza importarlo"""
+    return LazyModule(name)
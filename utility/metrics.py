@@ -0,0 +1,301 @@
+"""
+Metriche strutturate delle Lambda in CloudWatch Embedded Metric Format (EMF).
+
+I tempi erano print/logger.info sparsi ("⏱️ POST ricerca: 1.23s"), leggibili
+ma non aggregabili. Ogni handler si registra con @instrumented: a fine
+invocazione viene scritta su stdout una riga JSON EMF per gruppo di
+dimensioni, che CloudWatch trasforma in metriche (p50/p99 per stage senza
+filtri sui log).
+
+    @metrics.instrumented('rifiuti')
+    @snapshots.materialized('rifiuti', variants=[{'days_back': 4}])
+    def lambda_handler(event, context):
+        with metrics.stage('gls_search'):
+            html = client.search_shipments(...)
+
+Raccolto per invocazione:
+- Duration, Errors (status >= 500 o eccezione)                 [Function]
+- StageDuration (un valore per ogni esecuzione dello stage)     [Function, Stage]
+- UpstreamCalls, UpstreamBytes, UpstreamDuration, Upstream2xx/3xx/4xx/5xx,
+  UpstreamErrors (eccezioni di rete), UpstreamThrottled, UpstreamRetries
+                                                                [Function, Upstream]
+- ShopifyRequestedCost, ShopifyActualCost, ShopifyThrottled,
+  ShopifyAvailable (minimo del bucket nell'invocazione)         [Function]
+
+Le chiamate HTTP sono contate da un hook su requests.Session.send (anche
+requests.get/post passano da lì), installato da @instrumented; i client
+non requests (googleapiclient) vanno misurati con stage(). Un retry è una
+chiamata allo stesso host dopo una risposta 429/5xx/THROTTLED o un errore
+di rete, più i retry interni di urllib3. Il costo Shopify viene letto da
+extensions.cost in coda alle risposte GraphQL, senza riparsare il JSON.
+
+Le chiamate fatte da thread senza contesto (ThreadPoolExecutor) vengono
+attribuite all'invocazione attiva se è una sola, come in Lambda.
+
+Con ENABLE_METRICS=false non viene scritto nulla e stage() non misura.
+Namespace CloudWatch: METRICS_NAMESPACE (default Adibody/Lambda).
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+ENABLE_METRICS = os.environ.get("ENABLE_METRICS", "True").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Adibody/Lambda")
+
+# EMF accetta al massimo 100 valori per metrica in un documento
+MAX_VALUES = 100
+# extensions.cost è in fondo alla risposta GraphQL di Shopify
+COST_TAIL_BYTES = 1024
+COST_RE = re.compile(rb'"(requestedQueryCost|actualQueryCost|currentlyAvailable)"\s*:\s*(\d+(?:\.\d+)?)')
+THROTTLED_MARKER = b'"THROTTLED"'
+
+UPSTREAM_METRICS = [
+    ('UpstreamCalls', 'Count'),
+    ('UpstreamBytes', 'Bytes'),
+    ('UpstreamDuration', 'Milliseconds'),
+    ('Upstream2xx', 'Count'),
+    ('Upstream3xx', 'Count'),
+    ('Upstream4xx', 'Count'),
+    ('Upstream5xx', 'Count'),
+    ('UpstreamErrors', 'Count'),
+    ('UpstreamThrottled', 'Count'),
+    ('UpstreamRetries', 'Count'),
+]
+
+_current = contextvars.ContextVar('metrics_invocation', default=None)
+_active = []
+_active_lock = threading.Lock()
+_hook_lock = threading.Lock()
+_original_send = None
+_local = threading.local()
+
+
+class Invocation:
+    """Metriche raccolte durante una invocazione (thread-safe)"""
+
+    def __init__(self, function):
+        self.function = function
+        self.started = time.perf_counter()
+        self.stages = defaultdict(list)
+        self.upstreams = defaultdict(Counter)
+        self.shopify = Counter()
+        self.shopify_available = None
+        self._failed_hosts = set()
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, ms):
+        with self._lock:
+            self.stages[name].append(ms)
+
+    def add_call(self, url, response, ms, stream=False, error=None):
+        """Una richiesta HTTP (response=None se è fallita con un'eccezione)"""
+        parts = urlsplit(url)
+        host = parts.netloc.rsplit('@', 1)[-1]
+        graphql = parts.path.endswith('/graphql.json')
+        status, size, retries, throttled, body = None, 0, 0, False, b''
+        if response is not None:
+            # Con i redirect `response` è quella finale, già contata dal send
+            # annidato: qui si conta la prima risposta della catena
+            response = response.history[0] if response.history else response
+            status = response.status_code
+            if stream:
+                size = int(response.headers.get('Content-Length') or 0)
+            else:
+                body = response.content or b''
+                size = len(body)
+            retry_state = getattr(response.raw, 'retries', None)
+            retries = len(getattr(retry_state, 'history', None) or ())
+            throttled = status == 429 or (graphql and THROTTLED_MARKER in body[:COST_TAIL_BYTES])
+
+        failed = error is not None or throttled or (status is not None and status >= 500)
+        with self._lock:
+            counter = self.upstreams[host]
+            if host in self._failed_hosts:
+                retries += 1
+            counter['UpstreamCalls'] += 1
+            counter['UpstreamBytes'] += size
+            counter['UpstreamDuration'] += ms
+            counter['UpstreamRetries'] += retries
+            if status is not None:
+                counter[f"Upstream{status // 100}xx"] += 1
+            if error is not None:
+                counter['UpstreamErrors'] += 1
+            if throttled:
+                counter['UpstreamThrottled'] += 1
+            if failed:
+                self._failed_hosts.add(host)
+            else:
+                self._failed_hosts.discard(host)
+
+        if body and graphql:
+            self.add_shopify_cost(body, throttled)
+
+    def add_shopify_cost(self, body, throttled=False):
+        values = {name.decode(): float(value) for name, value in COST_RE.findall(body[-COST_TAIL_BYTES:])}
+        with self._lock:
+            self.shopify['ShopifyRequestedCost'] += values.get('requestedQueryCost', 0)
+            self.shopify['ShopifyActualCost'] += values.get('actualQueryCost', 0)
+            self.shopify['ShopifyThrottled'] += int(throttled)
+            available = values.get('currentlyAvailable')
+            if available is not None and (self.shopify_available is None or available < self.shopify_available):
+                self.shopify_available = available
+
+    def documents(self, status_code=None, error=False, properties=None):
+        """Documenti EMF dell'invocazione (uno per gruppo di dimensioni)"""
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        common = {'Function': self.function}
+        properties = properties or {}
+        docs = []
+
+        shopify = dict(self.shopify)
+        if self.shopify_available is not None:
+            shopify['ShopifyAvailable'] = self.shopify_available
+        docs.append(_emf(
+            common,
+            [('Duration', 'Milliseconds'), ('Errors', 'Count')] + [(name, 'Count') for name in shopify],
+            {'Duration': round(duration_ms, 1), 'Errors': int(error or (status_code or 0) >= 500),
+             **shopify, 'StatusCode': status_code, **properties}
+        ))
+        for name, values in self.stages.items():
+            docs.append(_emf(
+                {**common, 'Stage': name}, [('StageDuration', 'Milliseconds')],
+                {'StageDuration': [round(value, 1) for value in values[:MAX_VALUES]]}
+            ))
+        for host, counter in self.upstreams.items():
+            docs.append(_emf(
+                {**common, 'Upstream': host}, UPSTREAM_METRICS,
+                {name: round(counter[name], 1) for name, _ in UPSTREAM_METRICS}
+            ))
+        return docs
+
+
+def _emf(dimensions, metrics, values):
+    return {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, unit in metrics],
+            }],
+        },
+        **dimensions,
+        **values,
+    }
+
+
+def current():
+    """Invocazione in corso nel contesto (o l'unica attiva nel processo)"""
+    invocation = _current.get()
+    if invocation is None:
+        with _active_lock:
+            if len(_active) == 1:
+                invocation = _active[0]
+    return invocation
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Misura il blocco come StageDuration[name] dell'invocazione in corso"""
+    invocation = current()
+    if invocation is None:
+        yield
+        return
+    t_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation.add_stage(name, (time.perf_counter() - t_start) * 1000)
+
+
+def _instrumented_send(session, request, **kwargs):
+    invocation = current()
+    if invocation is None:
+        return _original_send(session, request, **kwargs)
+
+    # I redirect richiamano send() nello stesso thread: il tempo dei send
+    # annidati va tolto da quello della chiamata esterna
+    parent_nested = getattr(_local, 'nested_ms', None)
+    _local.nested_ms = 0.0
+    response = error = None
+    t_start = time.perf_counter()
+    try:
+        response = _original_send(session, request, **kwargs)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        total_ms = (time.perf_counter() - t_start) * 1000
+        own_ms = total_ms - _local.nested_ms
+        _local.nested_ms = None if parent_nested is None else parent_nested + total_ms
+        invocation.add_call(request.url, response, own_ms, kwargs.get('stream', False), error)
+
+
+def install_http_hook():
+    """Aggancia il conteggio delle chiamate a requests (una volta per processo)"""
+    global _original_send
+    with _hook_lock:
+        if _original_send is not None:
+            return
+        import requests
+
+        _original_send = requests.Session.send
+
+        @functools.wraps(_original_send)
+        def send(self, request, **kwargs):
+            return _instrumented_send(self, request, **kwargs)
+
+        requests.Session.send = send
+
+
+def emit(invocation, status_code=None, error=False, properties=None):
+    for doc in invocation.documents(status_code, error, properties):
+        print(json.dumps(doc, separators=(',', ':'), default=str))
+
+
+def instrumented(function):
+    """
+    Decoratore degli handler Lambda: apre un'invocazione, installa l'hook
+    HTTP e a fine esecuzione scrive le righe EMF.
+
+    Args:
+        function: Valore della dimensione Function (es. 'stock')
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if not ENABLE_METRICS:
+                return handler(event, context)
+
+            install_http_hook()
+            invocation = Invocation(function)
+            token = _current.set(invocation)
+            with _active_lock:
+                _active.append(invocation)
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                _current.reset(token)
+                with _active_lock:
+                    _active.remove(invocation)
+                status_code = response.get('statusCode') if isinstance(response, dict) else None
+                headers = (response.get('headers') or {}) if isinstance(response, dict) else {}
+                properties = {
+                    'RequestId': getattr(context, 'aws_request_id', None),
+                    'Snapshot': 'X-Snapshot-Age' in headers,
+                }
+                emit(invocation, status_code, error=response is None, properties=properties)
+
+        return wrapper
+
+    return decorator
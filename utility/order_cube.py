@@ -0,0 +1,205 @@
+"""
+Cubo OLAP in memoria degli ordini (lambda_dashboard_stats).
+
+Dimensioni: giorno di creazione × classe di tag × fulfillment status ×
+financial status × flag di pagamento; misure: numero ordini e fatturato.
+Contiene solo gli ordini conteggiati nelle statistiche (niente cancellati né
+test), quindi i totali coincidono con total_orders / orders_by_tag /
+total_revenue di order_frame.counters.
+
+Il cubo è un array denso per misura (giorni × 4 × 6 × 8 × 3, meno di 600
+celle per giorno): una query taglia l'intervallo di giorni, seleziona i
+valori filtrati, somma le dimensioni non raggruppate e accorpa i giorni per
+settimana o mese con np.add.reduceat. Niente nuovo download per un nuovo
+raggruppamento.
+
+    cube = OrderCube()
+    cube.replace_days(days, columns)  # colonne order_frame di quei giorni
+    cube.query(group_by=['financial'], granularity='week')
+
+Stati fulfillment/financial non previsti finiscono nel valore OTHER.
+Il fatturato è sommato senza conversioni di valuta, come total_revenue.
+"""
+from datetime import date
+
+import order_frame
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+UNKNOWN = 'OTHER'
+
+# Dimensioni in ordine di asse (dopo il giorno) con i valori ammessi
+DIMENSIONS = {
+    'tag': order_frame.TAG_CLASSES,
+    'fulfillment': order_frame.FULFILLMENT_STATUSES + (UNKNOWN,),
+    'financial': order_frame.FINANCIAL_STATUSES + (UNKNOWN,),
+    'payment': order_frame.PAYMENT_FLAGS,
+}
+GRANULARITIES = ('day', 'week', 'month')
+
+
+class InvalidCubeQuery(ValueError):
+    pass
+
+
+def _cell_codes(columns, name):
+    """Codici della colonna come indici d'asse: -1 (non previsto) va in OTHER"""
+    codes = columns[name].astype(np.int64)
+    return np.where(codes < 0, len(DIMENSIONS[name]) - 1, codes)
+
+
+def _period_keys(day_numbers, granularity):
+    """Chiave del periodo per ogni giorno (crescente come i giorni)"""
+    if granularity == 'week':
+        # 1970-01-01 era giovedì: lunedì della settimana ISO
+        return day_numbers - (day_numbers + 3) % 7
+    if granularity == 'month':
+        return day_numbers.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return day_numbers
+
+
+def _period_label(key, granularity):
+    if granularity == 'month':
+        return str(np.datetime64(int(key), 'M'))
+    return date.fromordinal(order_frame.EPOCH_ORDINAL + int(key)).isoformat()
+
+
+class OrderCube:
+    def __init__(self):
+        self.first_day = None
+        shape = (0,) + tuple(len(values) for values in DIMENSIONS.values())
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.revenue = np.zeros(shape, dtype=np.float64)
+
+    @property
+    def n_days(self):
+        return self.count.shape[0]
+
+    def day_span(self):
+        """(primo giorno, ultimo giorno) ISO coperti dal cubo, None se vuoto"""
+        if not self.n_days:
+            return None
+        return (_period_label(self.first_day, 'day'), _period_label(self.first_day + self.n_days - 1, 'day'))
+
+    def _cover(self, first, last):
+        """Allarga l'asse giorni a [first, last] (numeri giorno) con celle vuote"""
+        if self.first_day is None:
+            self.first_day = first
+        before = max(0, self.first_day - first)
+        after = max(0, last - (self.first_day + self.n_days - 1))
+        if before or after:
+            padding = [(before, after)] + [(0, 0)] * (self.count.ndim - 1)
+            self.count = np.pad(self.count, padding)
+            self.revenue = np.pad(self.revenue, padding)
+            self.first_day -= before
+
+    def replace_days(self, days, columns):
+        """
+        Ricalcola le celle dei giorni `days` (ISO) dagli ordini in `columns`
+        (order_frame); ordini di altri giorni ignorati.
+        """
+        day_numbers = np.array(sorted(order_frame.day_number(day) for day in days), dtype=np.int64)
+        if len(day_numbers) == 0:
+            return
+        self._cover(int(day_numbers[0]), int(day_numbers[-1]))
+        self.count[day_numbers - self.first_day] = 0
+        self.revenue[day_numbers - self.first_day] = 0.0
+
+        day = columns['day']
+        keep = (columns['status'] == order_frame.COUNTED) & np.isin(day, day_numbers)
+        if not keep.any():
+            return
+        cells = np.ravel_multi_index(
+            [day[keep] - self.first_day] + [_cell_codes(columns, name)[keep] for name in DIMENSIONS],
+            self.count.shape
+        )
+        revenue = columns['revenue'][keep]
+        size = self.count.size
+        self.count += np.bincount(cells, minlength=size).reshape(self.count.shape)
+        self.revenue += np.bincount(
+            cells, weights=np.where(np.isnan(revenue), 0.0, revenue), minlength=size
+        ).reshape(self.count.shape)
+
+    def query(self, group_by=(), filters=None, granularity=None, start_date=None, end_date=None):
+        """
+        Conteggi e fatturato raggruppati.
+
+        Args:
+            group_by: Dimensioni di raggruppamento (chiavi di DIMENSIONS)
+            filters: Dict {dimensione: valori ammessi}
+            granularity: day / week (lunedì ISO) / month, None = tutto il periodo
+            start_date, end_date: Giorni ISO inclusi (default tutto il cubo)
+
+        Returns:
+            Lista di dict {period?, <dimensioni>..., count, revenue}, solo
+            combinazioni con almeno un ordine, ordinate per periodo e valori
+
+        Raises:
+            InvalidCubeQuery: dimensione, valore o granularità sconosciuti
+        """
+        group_by = list(group_by)
+        filters = filters or {}
+        for name in list(group_by) + list(filters):
+            if name not in DIMENSIONS:
+                raise InvalidCubeQuery(f"Dimensione sconosciuta '{name}' (ammesse: {', '.join(DIMENSIONS)})")
+        if len(set(group_by)) != len(group_by):
+            raise InvalidCubeQuery("group_by: dimensione ripetuta")
+        if granularity is not None and granularity not in GRANULARITIES:
+            raise InvalidCubeQuery(f"Granularità sconosciuta '{granularity}' (ammesse: {', '.join(GRANULARITIES)})")
+
+        # Intervallo di giorni
+        first = self.first_day if self.first_day is not None else 0
+        try:
+            start = order_frame.day_number(start_date) - first if start_date else 0
+            stop = order_frame.day_number(end_date) - first + 1 if end_date else self.n_days
+        except ValueError:
+            raise InvalidCubeQuery(f"Date non valide: {start_date} / {end_date} (formato YYYY-MM-DD)")
+        start, stop = max(start, 0), min(stop, self.n_days)
+        if stop <= start:
+            return []
+        count = self.count[start:stop]
+        revenue = self.revenue[start:stop]
+
+        # Filtri: solo i valori ammessi lungo l'asse della dimensione
+        for axis, name in enumerate(DIMENSIONS, start=1):
+            if name in filters:
+                values = DIMENSIONS[name]
+                unknown = set(filters[name]) - set(values)
+                if unknown:
+                    raise InvalidCubeQuery(f"{name}: valori sconosciuti {', '.join(sorted(unknown))}")
+                indices = sorted(values.index(value) for value in set(filters[name]))
+                count = np.take(count, indices, axis=axis)
+                revenue = np.take(revenue, indices, axis=axis)
+            if name not in group_by:
+                count = count.sum(axis=axis, keepdims=True)
+                revenue = revenue.sum(axis=axis, keepdims=True)
+
+        # Asse tempo: accorpato per periodo o sommato
+        labels = None
+        if granularity is None:
+            count = count.sum(axis=0, keepdims=True)
+            revenue = revenue.sum(axis=0, keepdims=True)
+        else:
+            keys = _period_keys(np.arange(first + start, first + stop, dtype=np.int64), granularity)
+            bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            count = np.add.reduceat(count, bounds, axis=0)
+            revenue = np.add.reduceat(revenue, bounds, axis=0)
+            labels = [_period_label(key, granularity) for key in keys[bounds].tolist()]
+
+        # Valori lungo gli assi raggruppati (i filtri possono averne tolti alcuni)
+        axis_values = {
+            name: [value for value in values if name not in filters or value in filters[name]]
+            for name, values in DIMENSIONS.items() if name in group_by
+        }
+        axes = {name: axis for axis, name in enumerate(DIMENSIONS, start=1)}
+
+        rows = []
+        for cell, n in zip(zip(*np.nonzero(count)), count[count > 0].tolist()):
+            row = {'period': labels[cell[0]]} if labels is not None else {}
+            for name in group_by:
+                row[name] = axis_values[name][cell[axes[name]]]
+            row['count'] = n
+            row['revenue'] = round(float(revenue[cell]), 2)
+            rows.append(row)
+        return rows
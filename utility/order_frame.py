@@ -0,0 +1,389 @@
+"""
+Ordini Shopify in colonne NumPy e statistiche per gruppo (lambda_dashboard_stats,
+order_rollup).
+
+order_columns converte gli edge/nodi GraphQL una volta sola in array:
+giorno di creazione, stato (conteggiato / cancellato / test), classe di tag,
+codici fulfillment/financial/pagamento, rimborso e fatturato. La
+classificazione dei tag è memorizzata per combinazione di tag (poche
+decine in tutto il negozio), quindi niente split/upper/substring per ordine.
+
+counters / range_counters / daily_counters ricavano da quelle colonne i
+contatori delle statistiche (empty_counters) con np.bincount, sul totale, su
+un periodo o per giorno.
+Gli ordini cancellati contano solo in cancelled_orders, quelli di test
+(tag TEST) non contano.
+"""
+import gc
+import math
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+TAG_CLASSES = ('RESO', 'CAMBIO', 'RIFIUTO', 'other')
+FULFILLMENT_STATUSES = ('FULFILLED', 'UNFULFILLED', 'PARTIALLY_FULFILLED', 'SCHEDULED', 'ON_HOLD')
+FINANCIAL_STATUSES = (
+    'PAID', 'PARTIALLY_PAID', 'PENDING', 'REFUNDED', 'VOIDED', 'AUTHORIZED', 'PARTIALLY_REFUNDED'
+)
+PAYMENT_FLAGS = ('fully_paid', 'unpaid', 'partially_paid')
+
+# Stato ordine
+COUNTED, CANCELLED, TEST = range(3)
+
+TAG_CODES = {name: code for code, name in enumerate(TAG_CLASSES)}
+OTHER_TAG = TAG_CODES['other']
+FULFILLMENT_CODES = {name: code for code, name in enumerate(FULFILLMENT_STATUSES)}
+FINANCIAL_CODES = {name: code for code, name in enumerate(FINANCIAL_STATUSES)}
+FULLY_PAID, UNPAID, PARTIALLY_PAID = range(3)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def empty_counters():
+    """Contatori a zero (stessa struttura delle statistiche della dashboard)"""
+    return {
+        'total_orders': 0,
+        'orders_by_tag': dict.fromkeys(TAG_CLASSES, 0),
+        'fulfillment_status': dict.fromkeys(FULFILLMENT_STATUSES, 0),
+        'financial_status': dict.fromkeys(FINANCIAL_STATUSES, 0),
+        'payment_status': dict.fromkeys(PAYMENT_FLAGS, 0),
+        'cancelled_orders': 0,
+        'orders_with_refunds': 0,
+        'total_revenue': 0.0,
+        'currency': 'EUR'
+    }
+
+
+def merge_counters(total, counters):
+    """Somma `counters` in `total` (in place)"""
+    for key, value in counters.items():
+        if isinstance(value, dict):
+            bucket = total[key]
+            for sub_key, count in value.items():
+                bucket[sub_key] = bucket.get(sub_key, 0) + count
+        elif key == 'currency':
+            if total['currency'] == 'EUR':
+                total['currency'] = value
+        else:
+            total[key] += value
+    return total
+
+
+def order_day(order):
+    """Giorno di creazione (YYYY-MM-DD) oppure None"""
+    created_at = order.get('createdAt') or ''
+    return created_at.split('T')[0] or None
+
+
+@lru_cache(maxsize=4096)
+def tag_info(tags):
+    """
+    (è test, codice classe) per una combinazione di tag.
+
+    Args:
+        tags: Tuple di tag, o stringa "a, b" come in alcune risposte Shopify
+    """
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(',')]
+    upper = [t.upper() for t in tags]
+    if any(t == 'TEST' for t in upper):
+        return True, OTHER_TAG
+    # Tag: la prima classe trovata vince (RIFIUT copre RIFIUTO, RIFIUTI...)
+    for tag in upper:
+        if 'RESO' in tag:
+            return False, TAG_CODES['RESO']
+        if 'CAMBIO' in tag:
+            return False, TAG_CODES['CAMBIO']
+        if 'RIFIUT' in tag:
+            return False, TAG_CODES['RIFIUTO']
+    return False, OTHER_TAG
+
+
+def _revenue(amounts):
+    """Importi testuali -> float; nan per quelli non leggibili"""
+    try:
+        return np.array(amounts, dtype=float)
+    except (ValueError, TypeError):
+        return np.array([_safe_amount(a) for a in amounts], dtype=float)
+
+
+def _safe_amount(amount):
+    try:
+        return float(amount)
+    except (ValueError, TypeError):
+        return float('nan')
+
+
+def _day_numbers(dates):
+    """Giorni dal 1970-01-01 di stringhe YYYY-MM-DD; -1 se vuote o non valide"""
+    try:
+        parsed = np.array(dates, dtype='datetime64[D]')
+    except ValueError:
+        parsed = np.array([_safe_day(d) for d in dates], dtype='datetime64[D]')
+    days = parsed.astype(np.int64)
+    return np.where(np.isnat(parsed), -1, days)
+
+
+def _safe_day(text):
+    try:
+        return np.datetime64(text, 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+
+class _Codes(dict):
+    """Codici per valore; -1 per i valori non previsti"""
+
+    def __missing__(self, key):
+        return -1
+
+
+_FULFILLMENT_LOOKUP = _Codes(FULFILLMENT_CODES)
+_FINANCIAL_LOOKUP = _Codes(FINANCIAL_CODES)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Sospende il garbage collector: le tuple di tag create in blocco farebbero
+    scattare collezioni complete che rivisitano tutti i nodi ordine.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def order_columns(orders):
+    """
+    Colonne NumPy degli ordini.
+
+    Una sola visita per nodo che accoda valori Python a liste (niente
+    assegnazioni elemento per elemento su array NumPy), poi conversione in
+    blocco.
+
+    Args:
+        orders: Edge GraphQL ({"node": ...}) o nodi
+
+    Returns:
+        dict OrderColumns con array di lunghezza n_ordini: day (giorni dal
+        1970-01-01, -1 senza data), status, tag, fulfillment, financial
+        (-1 se stato non previsto), payment, refund (bool), revenue (nan se
+        importo non leggibile), foreign (valuta diversa da EUR), currency (lista)
+    """
+    dates, tag_infos, cancelled, fulfillment, financial = [], [], [], [], []
+    payment, refund, amounts, currency = [], [], [], []
+
+    with _gc_paused():
+        for edge in orders:
+            order = edge.get('node', edge)
+            dates.append((order.get('createdAt') or '').split('T')[0])
+            tags = order.get('tags', [])
+            tag_infos.append(tag_info(tags if isinstance(tags, str) else tuple(tags or ())))
+            cancelled.append(bool(order.get('cancelledAt')))
+            fulfillment.append(_FULFILLMENT_LOOKUP[order.get('displayFulfillmentStatus', 'UNFULFILLED')])
+            financial.append(_FINANCIAL_LOOKUP[order.get('displayFinancialStatus', 'PENDING')])
+            payment.append(FULLY_PAID if order.get('fullyPaid') else (UNPAID if order.get('unpaid') else PARTIALLY_PAID))
+            refund.append(bool(order.get('refunds')))
+            shop_money = (order.get('currentTotalPriceSet') or {}).get('shopMoney', {})
+            amounts.append(shop_money.get('amount', '0'))
+            currency.append(shop_money.get('currencyCode', 'EUR'))
+
+    infos = np.array(tag_infos, dtype=np.int8).reshape(-1, 2)
+    status = np.where(cancelled, CANCELLED, np.where(infos[:, 0] == 1, TEST, COUNTED)).astype(np.int8)
+
+    return {
+        'day': _day_numbers(dates),
+        'status': status,
+        'tag': infos[:, 1].copy(),
+        'fulfillment': np.array(fulfillment, dtype=np.int8),
+        'financial': np.array(financial, dtype=np.int8),
+        'payment': np.array(payment, dtype=np.int8),
+        'refund': np.array(refund, dtype=bool),
+        'revenue': _revenue(amounts),
+        'foreign': np.array([code != 'EUR' for code in currency], dtype=bool),
+        'currency': currency,
+    }
+
+
+# Campi di una riga salvata (order_rollup): giorno ISO + colonne
+RECORD_FIELDS = ('day', 'status', 'tag', 'fulfillment', 'financial', 'payment', 'refund', 'revenue', 'currency')
+
+
+def column_records(columns):
+    """
+    Colonne -> righe (tuple RECORD_FIELDS) da salvare; giorno None se mancante,
+    revenue None se non leggibile.
+    """
+    days = columns['day']
+    iso = np.datetime_as_string(np.maximum(days, 0).astype('datetime64[D]'), unit='D').tolist()
+    revenue = columns['revenue'].tolist()
+    return [
+        (day if day_number >= 0 else None, *codes, bool(refund), None if math.isnan(amount) else amount, currency)
+        for day, day_number, *codes, refund, amount, currency in zip(
+            iso, days.tolist(),
+            columns['status'].tolist(), columns['tag'].tolist(), columns['fulfillment'].tolist(),
+            columns['financial'].tolist(), columns['payment'].tolist(),
+            columns['refund'].tolist(), revenue, columns['currency'],
+        )
+    ]
+
+
+def columns_from_records(records):
+    """Righe salvate (tuple RECORD_FIELDS) -> colonne, senza rileggere i nodi"""
+    if not records:
+        return order_columns([])
+    with _gc_paused():
+        days, status, tag, fulfillment, financial, payment, refund, revenue, currency = zip(*records)
+    currency = list(currency)
+    return {
+        'day': _day_numbers([day or '' for day in days]),
+        'status': np.array(status, dtype=np.int8),
+        'tag': np.array(tag, dtype=np.int8),
+        'fulfillment': np.array(fulfillment, dtype=np.int8),
+        'financial': np.array(financial, dtype=np.int8),
+        'payment': np.array(payment, dtype=np.int8),
+        'refund': np.array(refund, dtype=bool),
+        'revenue': np.array(revenue, dtype=float),
+        'foreign': np.array([code != 'EUR' for code in currency], dtype=bool),
+        'currency': currency,
+    }
+
+
+def _iso_day(day_number):
+    return date.fromordinal(EPOCH_ORDINAL + day_number).isoformat()
+
+
+def _currencies(columns, groups, n_groups):
+    """
+    Valuta per gruppo come nel conteggio ordine per ordine: la prima diversa
+    da EUR tra gli ordini conteggiati con importo valido, altrimenti EUR.
+    """
+    result = ['EUR'] * n_groups
+    currency = columns['currency']
+    candidates = np.flatnonzero(
+        (columns['status'] == COUNTED) & ~np.isnan(columns['revenue']) & columns['foreign']
+    )
+    for i in candidates.tolist():
+        if currency[i] != 'EUR' and result[groups[i]] == 'EUR':
+            result[groups[i]] = currency[i]
+    return result
+
+
+def _grouped(codes, groups, n_groups, n_codes):
+    """Matrice (n_groups, n_codes) dei conteggi; codici negativi ignorati"""
+    known = codes >= 0
+    flat = groups[known].astype(np.int64) * n_codes + codes[known]
+    return np.bincount(flat, minlength=n_groups * n_codes).reshape(n_groups, n_codes)
+
+
+def _counters_matrix(columns, groups, n_groups):
+    """Contatori per gruppo come array (n_groups, ...)"""
+    counted = columns['status'] == COUNTED
+    g = groups[counted]
+
+    def by_code(name, n_codes):
+        return _grouped(columns[name][counted].astype(np.int64), g, n_groups, n_codes)
+
+    revenue = columns['revenue'][counted]
+    valid_revenue = ~np.isnan(revenue)
+    return {
+        'total_orders': np.bincount(g, minlength=n_groups),
+        'orders_by_tag': by_code('tag', len(TAG_CLASSES)),
+        'fulfillment_status': by_code('fulfillment', len(FULFILLMENT_STATUSES)),
+        'financial_status': by_code('financial', len(FINANCIAL_STATUSES)),
+        'payment_status': by_code('payment', len(PAYMENT_FLAGS)),
+        'cancelled_orders': np.bincount(groups[columns['status'] == CANCELLED], minlength=n_groups),
+        'orders_with_refunds': np.bincount(g[columns['refund'][counted]], minlength=n_groups),
+        'total_revenue': np.bincount(g[valid_revenue], weights=revenue[valid_revenue], minlength=n_groups),
+    }
+
+
+def _counters_row(matrix, row, currency):
+    """dict contatori (struttura di empty_counters) per un gruppo"""
+    def named(names, values):
+        return dict(zip(names, values.tolist()))
+
+    return {
+        'total_orders': int(matrix['total_orders'][row]),
+        'orders_by_tag': named(TAG_CLASSES, matrix['orders_by_tag'][row]),
+        'fulfillment_status': named(FULFILLMENT_STATUSES, matrix['fulfillment_status'][row]),
+        'financial_status': named(FINANCIAL_STATUSES, matrix['financial_status'][row]),
+        'payment_status': named(PAYMENT_FLAGS, matrix['payment_status'][row]),
+        'cancelled_orders': int(matrix['cancelled_orders'][row]),
+        'orders_with_refunds': int(matrix['orders_with_refunds'][row]),
+        'total_revenue': float(matrix['total_revenue'][row]),
+        'currency': currency,
+    }
+
+
+def counters(columns):
+    """
+    Contatori di tutti gli ordini e ordini conteggiati per giorno.
+
+    Returns:
+        tuple (contatori, {giorno ISO: ordini nel totale})
+    """
+    groups = np.zeros(len(columns['status']), dtype=np.int64)
+    matrix = _counters_matrix(columns, groups, 1)
+    totals = _counters_row(matrix, 0, _currencies(columns, groups, 1)[0])
+
+    days = columns['day'][(columns['status'] == COUNTED) & (columns['day'] >= 0)]
+    if len(days) == 0:
+        return totals, {}
+    first = days.min()
+    per_day = np.bincount(days - first)
+    orders_by_date = {
+        _iso_day(int(first) + offset): count
+        for offset, count in zip(np.flatnonzero(per_day).tolist(), per_day[per_day > 0].tolist())
+    }
+    return totals, orders_by_date
+
+
+def _subset(columns, mask):
+    """Colonne dei soli ordini in `mask` (currency è una lista Python)"""
+    subset = {name: values[mask] for name, values in columns.items() if name != 'currency'}
+    subset['currency'] = np.asarray(columns['currency'], dtype=object)[mask]
+    return subset
+
+
+def day_number(iso_day):
+    """Giorno ISO (YYYY-MM-DD) come numero di giorni dal 1970-01-01 (colonna day)"""
+    return date.fromisoformat(iso_day).toordinal() - EPOCH_ORDINAL
+
+
+def range_counters(columns, start_day, end_day):
+    """
+    Come counters, ma solo per gli ordini creati in [start_day, end_day]
+    (ISO, inclusi; ordini senza data esclusi). Serve a calcolare più periodi
+    (corrente, precedente, anno scorso) dalle colonne di un solo download.
+    """
+    day = columns['day']
+    return counters(_subset(columns, (day >= day_number(start_day)) & (day <= day_number(end_day))))
+
+
+def daily_counters(columns):
+    """
+    Contatori per giorno di creazione (ordini senza data esclusi).
+
+    Returns:
+        dict {giorno ISO: contatori}
+    """
+    dated = columns['day'] >= 0
+    if not dated.any():
+        return {}
+    unique_days, groups = np.unique(columns['day'][dated], return_inverse=True)
+    subset = _subset(columns, dated)
+    matrix = _counters_matrix(subset, groups, len(unique_days))
+    currencies = _currencies(subset, groups, len(unique_days))
+    return {
+        _iso_day(day_number): _counters_row(matrix, row, currencies[row])
+        for row, day_number in enumerate(unique_days.tolist())
+    }
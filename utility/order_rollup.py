@@ -0,0 +1,210 @@
+"""
+Rollup giornalieri delle statistiche ordini (lambda_dashboard_stats).
+
+Una riga per giorno (data di creazione UTC) con gli stessi contatori di
+calculate_order_stats (order_frame): classi di tag, fulfillment e financial status, flag di
+pagamento, rimborsi, fatturato e ordini cancellati. Una richiesta su un
+intervallo somma le righe giorno invece di riscaricare e riaggregare tutti
+gli ordini dal START_DATE_ORDERS.
+
+Gli ordini restano salvati come righe di colonne già classificate
+(order_frame.RECORD_FIELDS: stato, classe tag, codici...) per ricalcolare un
+giorno quando uno dei suoi ordini cambia, senza riconvertire i nodi GraphQL:
+- gli ultimi MUTABLE_DAYS giorni vengono riscaricati e sostituiti a ogni refresh
+- i giorni più vecchi si aggiornano con uno sweep su updated_at (ordini
+  modificati dopo l'ultimo sweep: rimborsi, tag RESO/CAMBIO aggiunti dopo...)
+
+Il file vive in DATA_DIR come il registro vendite (sales_ledger).
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import order_frame
+
+DATA_DIR = os.environ.get("DATA_DIR", "/tmp/adibody-data")
+ROLLUP_FILE = "order_rollup.sqlite3"
+
+# Giorni (oggi incluso) sempre riscaricati: ordini nuovi, pagamenti, fulfillment
+MUTABLE_DAYS = int(os.environ.get("ROLLUP_MUTABLE_DAYS", "3"))
+
+# Versione dello schema (PRAGMA user_version): se cambia, lo store si ricrea
+# da zero e il refresh successivo ricarica tutto lo storico
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    updated_at TEXT,
+    status INTEGER NOT NULL,
+    tag INTEGER NOT NULL,
+    fulfillment INTEGER NOT NULL,
+    financial INTEGER NOT NULL,
+    payment INTEGER NOT NULL,
+    refund INTEGER NOT NULL,
+    revenue REAL,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_day ON orders (day);
+CREATE TABLE IF NOT EXISTS days (
+    day TEXT PRIMARY KEY,
+    counters TEXT NOT NULL,
+    refreshed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+INSERT_ORDER = (
+    f"INSERT OR REPLACE INTO orders (id, updated_at, {', '.join(order_frame.RECORD_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(order_frame.RECORD_FIELDS) + 2))})"
+)
+
+
+class OrderRollup:
+    def __init__(self, path=None):
+        """
+        Args:
+            path: File SQLite (default DATA_DIR/order_rollup.sqlite3, ":memory:" per test)
+        """
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, ROLLUP_FILE)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS orders; DROP TABLE IF EXISTS days; DROP TABLE IF EXISTS state;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def updated_at(self, order_id):
+        """updatedAt dell'ordine salvato (None se assente)"""
+        with self._lock:
+            row = self._conn.execute("SELECT updated_at FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return row[0] if row else None
+
+    def _order_rows(self, nodes):
+        """Righe (id, updated_at, *RECORD_FIELDS) degli ordini con id e data"""
+        records = order_frame.column_records(order_frame.order_columns(nodes))
+        return [
+            (node['id'], node.get('updatedAt'), *record)
+            for node, record in zip(nodes, records)
+            if node.get('id') and record[0]
+        ]
+
+    def replace_days(self, days, nodes):
+        """
+        Sostituisce tutti gli ordini dei giorni `days` (ISO) con `nodes` e
+        ricalcola le loro righe; ordini di altri giorni ignorati.
+        """
+        wanted = set(days)
+        rows = [row for row in self._order_rows(nodes) if row[2] in wanted]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM orders WHERE day = ?", [(day,) for day in wanted])
+            self._conn.executemany(INSERT_ORDER, rows)
+            self._rebuild(wanted)
+
+    def upsert_orders(self, nodes):
+        """
+        Inserisce/aggiorna ordini singoli (sweep updated_at) e ricalcola i
+        giorni toccati.
+
+        Returns:
+            Insieme dei giorni ricalcolati
+        """
+        rows = self._order_rows(nodes)
+        with self._lock, self._conn:
+            touched = {row[2] for row in rows}
+            # Un ordine può cambiare giorno solo in teoria, ma il vecchio va ricalcolato
+            for order_id, *_ in rows:
+                old = self._conn.execute("SELECT day FROM orders WHERE id = ?", (order_id,)).fetchone()
+                if old:
+                    touched.add(old[0])
+            self._conn.executemany(INSERT_ORDER, rows)
+            self._rebuild(touched)
+        return touched
+
+    def _records(self, days):
+        """Righe RECORD_FIELDS salvate dei giorni `days` (lock del chiamante)"""
+        records = []
+        for start in range(0, len(days), 500):
+            chunk = days[start:start + 500]
+            records.extend(self._conn.execute(
+                f"SELECT {', '.join(order_frame.RECORD_FIELDS)} FROM orders "
+                f"WHERE day IN ({','.join('?' * len(chunk))})",
+                chunk
+            ))
+        return records
+
+    def _rebuild(self, days):
+        """Ricalcola le righe giorno dagli ordini salvati (lock e transazione del chiamante)"""
+        days = sorted(days)
+        if not days:
+            return
+        by_day = order_frame.daily_counters(order_frame.columns_from_records(self._records(days)))
+
+        refreshed_at = datetime.utcnow().isoformat()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO days (day, counters, refreshed_at) VALUES (?, ?, ?)",
+            [(day, json.dumps(by_day.get(day) or order_frame.empty_counters()), refreshed_at) for day in days]
+        )
+
+    def counters(self, start_day, end_day):
+        """
+        Somma delle righe giorno in [start_day, end_day] (ISO, inclusi).
+
+        Returns:
+            tuple (contatori totali, {giorno: ordini nel totale})
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, counters FROM days WHERE day BETWEEN ? AND ? ORDER BY day",
+                (start_day, end_day)
+            ).fetchall()
+
+        total = order_frame.empty_counters()
+        orders_by_date = {}
+        for day, data in rows:
+            counters = json.loads(data)
+            order_frame.merge_counters(total, counters)
+            if counters['total_orders']:
+                orders_by_date[day] = counters['total_orders']
+        return total, orders_by_date
+
+    def days_refreshed_after(self, mark=None):
+        """
+        Giorni ricalcolati dopo `mark` (refreshed_at ISO; None = tutti), per
+        chi tiene una copia derivata aggiornata (order_cube).
+
+        Returns:
+            tuple (giorni ISO ordinati, nuovo mark)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, refreshed_at FROM days WHERE refreshed_at > ? ORDER BY day", (mark or '',)
+            ).fetchall()
+        return [day for day, _ in rows], max((refreshed for _, refreshed in rows), default=mark)
+
+    def order_columns(self, days):
+        """Colonne order_frame degli ordini salvati nei giorni `days` (ISO)"""
+        with self._lock:
+            records = self._records(sorted(days))
+        return order_frame.columns_from_records(records)
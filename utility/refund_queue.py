@@ -0,0 +1,138 @@
+"""
+Coda degli ordini da rimborsare (lambda_refunds).
+
+Copia locale degli ordini con tutti i tag richiesti (RESO + DA RIMBORSARE),
+nel formato restituito dalla Lambda. Invece di riscansionare tutto lo
+storico taggato a ogni apertura della pagina Rimborsi, la Lambda scarica solo
+gli ordini modificati dopo l'ultima sincronizzazione e li applica alla coda:
+- con ancora tutti i tag: inseriti o aggiornati
+- senza uno dei tag (rimborso fatto, tag rimosso): tolti dalla coda
+
+Gli ordini eliminati su Shopify non compaiono tra i modificati: una
+sincronizzazione completa periodica (replace_all) riallinea la coda.
+
+Il file vive in DATA_DIR come il registro vendite (sales_ledger).
+"""
+import json
+import os
+import sqlite3
+import threading
+
+DATA_DIR = os.environ.get("DATA_DIR", "/tmp/adibody-data")
+QUEUE_FILE = "refund_queue.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def order_record(order):
+    """Nodo GraphQL ordine → record restituito da lambda_refunds"""
+    return {
+        'id': order.get('id', ''),
+        'name': order.get('name', ''),
+        'created_at': order.get('createdAt', ''),
+        'updated_at': order.get('updatedAt', ''),
+        'tags': order.get('tags', []),
+        'note': order.get('note'),
+        'customer': order.get('customer'),
+        'shipping_address': order.get('shippingAddress'),
+        'total_price': order.get('currentTotalPriceSet', {}).get('shopMoney', {}).get('amount', '0'),
+        'currency': order.get('currentTotalPriceSet', {}).get('shopMoney', {}).get('currencyCode', 'EUR'),
+        'fulfillment_status': order.get('displayFulfillmentStatus', ''),
+        'financial_status': order.get('displayFinancialStatus', ''),
+        'fully_paid': order.get('fullyPaid', False),
+        'refunds': order.get('refunds', [])
+    }
+
+
+def has_tags(order, tags):
+    """True se l'ordine ha tutti i tag (confronto senza maiuscole/spazi, come la ricerca Shopify)"""
+    order_tags = order.get('tags') or []
+    if isinstance(order_tags, str):
+        order_tags = order_tags.split(',')
+    present = {tag.strip().upper() for tag in order_tags}
+    return all(tag.strip().upper() in present for tag in tags)
+
+
+class RefundQueue:
+    def __init__(self, path=None):
+        """
+        Args:
+            path: File SQLite (default DATA_DIR/refund_queue.sqlite3, ":memory:" per test)
+        """
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, QUEUE_FILE)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def updated_at(self, order_id):
+        """updated_at dell'ordine in coda (None se non in coda)"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]).get('updated_at') if row else None
+
+    @staticmethod
+    def _rows(orders):
+        return [(order['id'], order.get('created_at') or '', json.dumps(order, default=str)) for order in orders]
+
+    def replace_all(self, orders):
+        """Sostituisce l'intera coda (sincronizzazione completa)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM orders")
+            self._conn.executemany("INSERT OR REPLACE INTO orders (id, created_at, data) VALUES (?, ?, ?)",
+                                   self._rows(orders))
+
+    def apply_updates(self, orders, tags):
+        """
+        Applica gli ordini modificati dopo l'ultima sincronizzazione.
+
+        Args:
+            orders: Ordini modificati (con o senza i tag)
+            tags: Tag richiesti per restare in coda
+
+        Returns:
+            tuple (ordini inseriti/aggiornati, ordini tolti dalla coda)
+        """
+        tagged = [order for order in orders if has_tags(order, tags)]
+        untagged = [(order['id'],) for order in orders if not has_tags(order, tags)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO orders (id, created_at, data) VALUES (?, ?, ?)",
+                                   self._rows(tagged))
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM orders WHERE id = ?", untagged)
+            dropped = self._conn.total_changes - before
+        return len(tagged), dropped
+
+    def orders(self):
+        """Ordini in coda, dal più recente (come la ricerca Shopify per CREATED_AT reverse)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM orders ORDER BY created_at DESC, id DESC").fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
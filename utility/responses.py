@@ -0,0 +1,347 @@
+"""
+Risposte API Gateway compatte: JSON senza spazi, proiezione dei campi,
+paginazione a cursore e compressione negoziata.
+
+Gli handler delle dashboard restituiscono liste intere con tutti i campi
+(spedizioni GLS, ordini da evadere); il frontend ne usa una parte. Con
+@shaped l'handler continua a produrre la risposta completa (che resta
+quella salvata negli snapshot) e ogni richiesta ne riceve solo la parte
+chiesta:
+
+    @metrics.instrumented('parcel-shop')
+    @responses.shaped(collections=['shipments'])
+    @snapshots.materialized('parcel-shop', variants=[{'days_back': 15}])
+    def lambda_handler(event, context):
+        ...
+        return responses.json_response(result_data)
+
+Parametri (query string o body JSON), tolti dall'evento prima di chiamare
+l'handler, quindi non cambiano la chiave dello snapshot:
+- fields=expedicion,referencia,phone   campi di ogni elemento delle collezioni
+- limit=100                            elementi per pagina (per collezione)
+- cursor=<next_cursor>                 pagina successiva
+
+Con limit la risposta riporta `page: {limit, next_cursor, total}` (total per
+collezione); next_cursor è null all'ultima pagina. Il cursore porta la data
+dello snapshot servito: se nel frattempo lo snapshot è cambiato la risposta
+è 409 e il client deve ripartire dalla prima pagina. limit e cursor valgono
+solo per risposte servite da snapshot (header X-Snapshot-Created-At): su
+handler senza @snapshots.materialized, o se lo snapshot non c'è, la risposta
+è 400 (ogni pagina ricalcolerebbe una lista viva, con elementi saltati o
+ripetuti tra una pagina e l'altra). fields vale sempre.
+
+Compressione: con Accept-Encoding br (se il modulo brotli è installato) o
+gzip, i body oltre COMPRESS_MIN_BYTES sono compressi e codificati in base64
+(isBase64Encoded). Solo dove API Gateway decodifica il base64 prima di
+rispondere:
+- HTTP API (eventi payload 2.0): sempre
+- REST API (payload 1.0, stage /prod): solo con COMPRESS_REST_RESPONSES=true,
+  da attivare insieme a binaryMediaTypes "*/*"; senza, il browser riceve il
+  base64 e non riesce a decodificare la risposta
+ENABLE_RESPONSE_COMPRESSION=false la disattiva del tutto.
+
+Con binaryMediaTypes anche i body delle richieste POST arrivano in base64:
+request_body li decodifica, e @shaped passa all'handler l'evento con il body
+già in chiaro.
+"""
+import base64
+import binascii
+import functools
+import gzip
+import json
+import os
+
+import json_columns
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLE_RESPONSE_COMPRESSION = os.environ.get("ENABLE_RESPONSE_COMPRESSION", "True").lower() == "true"
+# REST API: solo se lo stage ha binaryMediaTypes (altrimenti il base64 arriva al client)
+COMPRESS_REST_RESPONSES = os.environ.get("COMPRESS_REST_RESPONSES", "False").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+MAX_PAGE_LIMIT = 1000
+
+SHAPE_PARAMS = ('fields', 'limit', 'cursor')
+SNAPSHOT_VERSION_HEADER = 'X-Snapshot-Created-At'
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
+
+class InvalidShapeRequest(ValueError):
+    """Parametri fields/limit/cursor non validi (risposta 400)"""
+
+
+class PaginationUnavailable(InvalidShapeRequest):
+    """limit/cursor su una risposta che non viene da uno snapshot (risposta 400)"""
+
+    def __init__(self):
+        super().__init__("limit e cursor richiedono una risposta da snapshot: usare solo fields")
+
+
+class StaleCursor(ValueError):
+    """Il cursore si riferisce a uno snapshot non più servito (risposta 409)"""
+
+
+def dumps(data):
+    """JSON compatto (niente indent né spazi dopo i separatori), con orjson se disponibile"""
+    return json_columns.dumps(data)
+
+
+def json_response(data, status_code=200, headers=None):
+    """Risposta API Gateway con body JSON compatto e header CORS"""
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', **CORS_HEADERS, **(headers or {})},
+        'body': dumps(data)
+    }
+
+
+def request_headers(event):
+    """Header della richiesta con nomi minuscoli (API Gateway v1 e v2)"""
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items() if value is not None}
+    for name, values in (event.get('multiValueHeaders') or {}).items():
+        if values:
+            headers.setdefault(name.lower(), ','.join(values))
+    return headers
+
+
+def request_body(event):
+    """Body della richiesta come testo (decodificato se isBase64Encoded)"""
+    body = event.get('body')
+    if isinstance(body, str) and event.get('isBase64Encoded'):
+        try:
+            return base64.b64decode(body).decode('utf-8')
+        except (binascii.Error, ValueError):
+            return body
+    return body
+
+
+def compression_supported(event):
+    """True se API Gateway decodificherà una risposta isBase64Encoded"""
+    return event.get('version') == '2.0' or COMPRESS_REST_RESPONSES
+
+
+def accepted_encoding(event):
+    """'br', 'gzip' o None secondo Accept-Encoding (q=0 escluso)"""
+    accepted = set()
+    for part in request_headers(event).get('accept-encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(response, encoding):
+    """Body compresso in base64 se conviene (risposte già binarie restano invariate)"""
+    body = response.get('body')
+    if encoding is None or not isinstance(body, str) or response.get('isBase64Encoded'):
+        return response
+    raw = body.encode('utf-8')
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        compressed = brotli.compress(raw, quality=5)
+    else:
+        compressed = gzip.compress(raw, compresslevel=6, mtime=0)
+    headers = dict(response.get('headers') or {})
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True,
+    }
+
+
+def split_shape_params(event):
+    """
+    Toglie fields/limit/cursor da query string e body JSON (un body in
+    base64 viene prima decodificato).
+
+    Returns:
+        (evento senza i parametri, dict dei parametri trovati)
+    """
+    shape = {}
+    query = dict(event.get('queryStringParameters') or {})
+    for name in SHAPE_PARAMS:
+        if name in query:
+            shape[name] = query.pop(name)
+
+    decoded = request_body(event)
+    if decoded is not event.get('body'):
+        event = {**event, 'body': decoded, 'isBase64Encoded': False}
+    body = event.get('body')
+    if isinstance(body, str) and body.strip():
+        try:
+            parsed = json.loads(body)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict) and any(name in parsed for name in SHAPE_PARAMS):
+            for name in SHAPE_PARAMS:
+                if name in parsed:
+                    shape.setdefault(name, parsed.pop(name))
+            body = json.dumps(parsed)
+
+    if not shape:
+        return event, shape
+    event = {**event, 'body': body}
+    if event.get('queryStringParameters') is not None or query:
+        event['queryStringParameters'] = query or None
+    return event, shape
+
+
+def parse_shape(shape):
+    """fields/limit/cursor → (lista campi o None, limit o None, cursore decodificato o None)"""
+    fields = shape.get('fields')
+    if isinstance(fields, str):
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(name, str) for name in fields)):
+        raise InvalidShapeRequest("fields deve essere una lista di nomi separati da virgola")
+
+    limit = shape.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise InvalidShapeRequest("limit deve essere un intero")
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            raise InvalidShapeRequest(f"limit deve essere tra 1 e {MAX_PAGE_LIMIT}")
+
+    cursor = shape.get('cursor')
+    if cursor:
+        cursor = decode_cursor(cursor)
+        if limit is None:
+            limit = cursor.get('limit')
+    return fields or None, limit, cursor or None
+
+
+def encode_cursor(offset, limit, version):
+    payload = dumps({'offset': offset, 'limit': limit, 'version': version}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        int(decoded['offset'])
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError, UnicodeError):
+        raise InvalidShapeRequest("cursor non valido")
+    return decoded
+
+
+def project(items, fields):
+    """Solo i campi richiesti di ogni elemento (gli elementi non dict restano invariati)"""
+    return [
+        {name: item[name] for name in fields if name in item} if isinstance(item, dict) else item
+        for item in items
+    ]
+
+
+def resolve(data, path):
+    """(contenitore, chiave) della collezione `a.b.c` (None se assente)"""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        data = data.get(key) if isinstance(data, dict) else None
+    if isinstance(data, dict) and isinstance(data.get(keys[-1]), list):
+        return data, keys[-1]
+    return None
+
+
+def shape_data(data, collections, fields=None, limit=None, cursor=None, version=None):
+    """
+    Applica proiezione e paginazione alle collezioni di `data` (in place).
+
+    Ogni pagina contiene fino a `limit` elementi di ogni collezione a partire
+    dallo stesso offset; next_cursor esiste finché una collezione ha altri
+    elementi.
+    """
+    offset = 0
+    if cursor is not None:
+        if cursor.get('version') != version:
+            raise StaleCursor("lo snapshot è cambiato: ricaricare dalla prima pagina")
+        offset = int(cursor['offset'])
+
+    totals = {}
+    for path in collections:
+        found = resolve(data, path)
+        if found is None:
+            continue
+        container, key = found
+        items = container[key]
+        totals[path] = len(items)
+        if limit is not None:
+            items = items[offset:offset + limit]
+        if fields:
+            items = project(items, fields)
+        container[key] = items
+
+    if limit is not None:
+        has_more = any(offset + limit < total for total in totals.values())
+        data['page'] = {
+            'limit': limit,
+            'offset': offset,
+            'next_cursor': encode_cursor(offset + limit, limit, version) if has_more else None,
+            'total': totals,
+        }
+    return data
+
+
+def shaped(collections):
+    """
+    Decoratore per lambda_handler: fields/limit/cursor sulle collezioni
+    indicate (chiavi o percorsi puntati, es. 'orders.green') e compressione
+    della risposta. limit/cursor solo se l'handler è @snapshots.materialized.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def lambda_handler(event, context):
+            event = event or {}
+            event, shape = split_shape_params(event)
+            try:
+                fields, limit, cursor = parse_shape(shape)
+                if limit is not None and getattr(handler, 'snapshot', None) is None:
+                    raise PaginationUnavailable()
+            except InvalidShapeRequest as e:
+                return json_response({'error': str(e)}, status_code=400)
+
+            response = handler(event, context)
+            if not isinstance(response, dict):
+                return response
+
+            if (fields or limit) and response.get('statusCode') == 200 and not response.get('isBase64Encoded'):
+                try:
+                    data = json.loads(response.get('body') or 'null')
+                except ValueError:
+                    data = None
+                if isinstance(data, dict):
+                    version = (response.get('headers') or {}).get(SNAPSHOT_VERSION_HEADER)
+                    if limit is not None and version is None:
+                        # Snapshot disattivati o risposta non salvata (es. parziale)
+                        return json_response({'error': str(PaginationUnavailable())}, status_code=400)
+                    try:
+                        data = shape_data(data, collections, fields, limit, cursor, version)
+                    except StaleCursor as e:
+                        return json_response({'error': str(e)}, status_code=409)
+                    response = {**response, 'body': dumps(data)}
+
+            if ENABLE_RESPONSE_COMPRESSION and compression_supported(event):
+                response = compress(response, accepted_encoding(event))
+            return response
+
+        return lambda_handler
+
+    return decorator
@@ -0,0 +1,149 @@
+"""
+Registro vendite giornaliero per SKU (lambda_stock_api).
+
+Tabella SQLite (giorno, sku, fonte, quantità) con fonte shopify | gls. I giorni
+chiusi (prima di ieri) non cambiano più: una volta registrati non vengono
+riscaricati, quindi ogni invocazione aggiorna solo oggi e ieri (più eventuali
+giorni mancanti nella finestra di analisi).
+
+Il file vive in DATA_DIR (default /tmp, che in Lambda sopravvive finché il
+container resta caldo); puntando DATA_DIR a un volume persistente (EFS) lo
+storico resta tra un container e l'altro.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+DATA_DIR = os.environ.get("DATA_DIR", "/tmp/adibody-data")
+LEDGER_FILE = "sales_ledger.sqlite3"
+
+SOURCES = ('shopify', 'gls')
+
+# Oggi e ieri restano modificabili (ordini tardivi, fuso orario, scraping GLS)
+MUTABLE_DAYS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales (
+    day TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    source TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    PRIMARY KEY (day, sku, source)
+);
+CREATE TABLE IF NOT EXISTS days (
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    closed INTEGER NOT NULL,
+    refreshed_at TEXT NOT NULL,
+    PRIMARY KEY (day, source)
+);
+"""
+
+
+def day_range(start_day, end_day):
+    """Lista di date da start_day a end_day inclusi"""
+    return [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+
+
+class SalesLedger:
+    def __init__(self, path=None):
+        """
+        Args:
+            path: File SQLite (default DATA_DIR/sales_ledger.sqlite3, ":memory:" per test)
+        """
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, LEDGER_FILE)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def missing_days(self, source, start_day, today):
+        """
+        Giorni da (ri)scaricare per `source` in [start_day, today]: quelli non
+        ancora chiusi (mai registrati, oppure oggi/ieri).
+        """
+        with self._lock:
+            closed = {
+                row[0] for row in self._conn.execute(
+                    "SELECT day FROM days WHERE source = ? AND closed = 1 AND day BETWEEN ? AND ?",
+                    (source, start_day.isoformat(), today.isoformat())
+                )
+            }
+        return [d for d in day_range(start_day, today) if d.isoformat() not in closed]
+
+    def replace_days(self, source, days, totals, today):
+        """
+        Sostituisce le vendite di `source` per i giorni `days`.
+
+        Args:
+            days: Giorni coperti dal download (anche quelli senza vendite)
+            totals: Dict {(giorno ISO, sku): quantità}; giorni fuori da `days` ignorati
+            today: Data odierna; i giorni prima di ieri vengono chiusi
+        """
+        wanted = {d.isoformat() for d in days}
+        first_mutable = (today - timedelta(days=MUTABLE_DAYS - 1)).isoformat()
+        refreshed_at = datetime.utcnow().isoformat()
+        rows = [(day, sku, source, int(qty)) for (day, sku), qty in totals.items() if day in wanted and qty]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM sales WHERE source = ? AND day = ?",
+                [(source, day) for day in wanted]
+            )
+            self._conn.executemany("INSERT INTO sales (day, sku, source, qty) VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO days (day, source, closed, refreshed_at) VALUES (?, ?, ?, ?)",
+                [(day, source, int(day < first_mutable), refreshed_at) for day in wanted]
+            )
+
+    def last_sale_day(self, sources=SOURCES, until=None):
+        """Ultimo giorno con vendite (date) oppure None"""
+        placeholders = ','.join('?' * len(sources))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MAX(day) FROM sales WHERE source IN ({placeholders}) AND day <= ?",
+                (*sources, (until or date.max).isoformat())
+            ).fetchone()
+        return date.fromisoformat(row[0]) if row and row[0] else None
+
+    def daily_matrix(self, start_day, end_day, sources=SOURCES):
+        """
+        Matrice densa SKU × giorno delle vendite in [start_day, end_day].
+
+        Returns:
+            tuple (lista SKU ordinata, array int64 (n_sku, n_giorni)); colonna 0 = start_day
+        """
+        placeholders = ','.join('?' * len(sources))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT sku, day, SUM(qty) FROM sales
+                WHERE source IN ({placeholders}) AND day BETWEEN ? AND ?
+                GROUP BY sku, day
+                ORDER BY sku
+                """,
+                (*sources, start_day.isoformat(), end_day.isoformat())
+            ).fetchall()
+
+        skus = list(dict.fromkeys(row[0] for row in rows))
+        sku_index = {sku: i for i, sku in enumerate(skus)}
+        n_days = (end_day - start_day).days + 1
+        matrix = np.zeros((len(skus), n_days), dtype=np.int64)
+        if rows:
+            sku_ids = np.fromiter((sku_index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+            offsets = np.fromiter(
+                ((date.fromisoformat(row[1]) - start_day).days for row in rows),
+                dtype=np.int64, count=len(rows)
+            )
+            matrix[sku_ids, offsets] = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+        return skus, matrix
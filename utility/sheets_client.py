@@ -0,0 +1,147 @@
+"""
+Client Google Sheets condiviso (lambda_stock_api, lambda_fulfillment_check).
+
+- Servizio Sheets/Drive costruito una sola volta per container (cache a livello
+  di modulo) dal documento di discovery statico incluso in google-api-python-client,
+  senza scaricarlo a ogni invocazione
+- Più range letti con una sola chiamata values().batchGet
+- Dati già parsati riusati finché la revisione del foglio (Drive version /
+  modifiedTime) non cambia
+
+Per test locali GOOGLE_SHEETS_API_ENDPOINT / GOOGLE_DRIVE_API_ENDPOINT puntano
+il client a un endpoint finto (vedi fakes/fake_google_sheets.py); l'endpoint
+Drive deve includere il path del servizio (es. http://127.0.0.1:8080/drive/v3/).
+"""
+import json
+import os
+import threading
+
+import metrics
+from lazy_imports import lazy_import
+
+# Librerie Google caricate solo alla prima lettura del foglio
+service_account = lazy_import('google.oauth2.service_account')
+google_credentials = lazy_import('google.auth.credentials')
+discovery = lazy_import('googleapiclient.discovery')
+
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    # Solo metadati (version/modifiedTime) per invalidare la cache
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+]
+CREDENTIALS_FILE = 'shopify-lambda-integration-ff8f0760340f.json'
+
+SHEETS_API_ENDPOINT = os.environ.get("GOOGLE_SHEETS_API_ENDPOINT")
+DRIVE_API_ENDPOINT = os.environ.get("GOOGLE_DRIVE_API_ENDPOINT")
+
+# Cache a livello di modulo: sopravvive tra invocazioni nello stesso container
+_services = {}
+_parsed_cache = {}
+_lock = threading.Lock()
+
+
+def _load_credentials():
+    """Credenziali service account da GOOGLE_CREDENTIALS_JSON o da file locale"""
+    credentials_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
+    if credentials_json:
+        # Da variabile ambiente (per Lambda)
+        credentials_info = json.loads(credentials_json)
+    else:
+        # Da file locale (per test)
+        cred_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CREDENTIALS_FILE)
+        if not os.path.exists(cred_path) and (SHEETS_API_ENDPOINT or DRIVE_API_ENDPOINT):
+            # Endpoint finto locale: nessuna autenticazione
+            return google_credentials.AnonymousCredentials()
+        with open(cred_path, 'r') as f:
+            credentials_info = json.load(f)
+
+    return service_account.Credentials.from_service_account_info(credentials_info, scopes=SCOPES)
+
+
+def _get_service(api, version, endpoint):
+    with _lock:
+        service = _services.get(api)
+        if service is None:
+            client_options = {'api_endpoint': endpoint} if endpoint else None
+            service = discovery.build(
+                api, version,
+                credentials=_load_credentials(),
+                static_discovery=True,
+                cache_discovery=False,
+                client_options=client_options,
+            )
+            _services[api] = service
+        return service
+
+
+def get_sheets_service():
+    """Servizio Google Sheets API v4 (cache per container)"""
+    return _get_service('sheets', 'v4', SHEETS_API_ENDPOINT)
+
+
+def get_drive_service():
+    """Servizio Google Drive API v3, usato solo per la revisione del foglio"""
+    return _get_service('drive', 'v3', DRIVE_API_ENDPOINT)
+
+
+def get_sheet_revision(sheet_id):
+    """
+    Revisione corrente del foglio.
+
+    Returns:
+        tuple (version, modifiedTime) oppure None se non disponibile
+        (es. permessi Drive mancanti): in quel caso la cache non viene usata
+    """
+    try:
+        meta = get_drive_service().files().get(
+            fileId=sheet_id,
+            fields='version,modifiedTime',
+            supportsAllDrives=True
+        ).execute()
+        return (meta.get('version'), meta.get('modifiedTime'))
+    except Exception as e:
+        print(f"⚠️ Revisione foglio non disponibile: {e}")
+        return None
+
+
+def batch_get(sheet_id, ranges):
+    """
+    Legge più range con una sola chiamata values().batchGet
+
+    Returns:
+        Lista di liste di righe, nello stesso ordine di `ranges`
+    """
+    with metrics.stage('sheets_batch_get'):
+        result = get_sheets_service().spreadsheets().values().batchGet(
+            spreadsheetId=sheet_id,
+            ranges=list(ranges)
+        ).execute()
+    return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+
+def read_parsed(sheet_id, ranges, parse):
+    """
+    Legge `ranges` e applica `parse(*values_per_range)`, riusando il risultato
+    finché la revisione del foglio non cambia.
+
+    Il risultato è condiviso tra invocazioni: i chiamanti non devono modificarlo.
+    """
+    key = (sheet_id, tuple(ranges), parse.__module__, parse.__qualname__)
+    revision = get_sheet_revision(sheet_id)
+
+    cached = _parsed_cache.get(key)
+    if revision is not None and cached is not None and cached[0] == revision:
+        print(f"📄 Foglio invariato (revisione {revision[0]}), uso cache")
+        return cached[1]
+
+    parsed = parse(*batch_get(sheet_id, ranges))
+    if revision is not None:
+        _parsed_cache[key] = (revision, parsed)
+    return parsed
+
+
+def clear_cache():
+    """Svuota servizi e dati in cache (utile nei test)"""
+    with _lock:
+        _services.clear()
+        _parsed_cache.clear()
@@ -0,0 +1,172 @@
+"""
+Codec SKU condiviso (lambda_stock_api, lambda_fulfillment_check,
+extract_sku_con_retorno).
+
+Formati riconosciuti:
+- SLIP.M.BL  -> MODELO.TALLA.COLOR
+- SLIP_BL_M  -> MODELO_COLOR_TALLA (vecchi prodotti Shopify)
+
+Ogni SKU viene parsato una volta sola (cache) e ridotto alla forma canonica:
+maiuscola, con punti (il formato con underscore diventa MODELO.TALLA.COLOR).
+SkuRegistry assegna a ogni SKU canonico un id intero piccolo e stabile per
+tutta la vita del container, così i motori lavorano su array NumPy
+indicizzati per id invece che su dict per stringa.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Il foglio Magazzino usa 2XL/3XL dove lo SKU usa XXL/XXXL
+SHEET_TALLAS = {'XXL': '2XL', 'XXXL': '3XL'}
+
+# Talle placeholder/invalide
+INVALID_TALLAS = {"XXX", "XX", "TEST", "PLACEHOLDER", "NA", "N/A"}
+
+# SLIP/PER seguito direttamente dalla taglia, tipico dei testi scritti a mano
+# (SLIPM.BE -> SLIP.M.BE)
+MISSING_DOT_PATTERN = re.compile(r'(SLIP|PER)(XS|S|M|L|XL|XXL|XXXL)\.')
+
+
+class SkuParts(NamedTuple):
+    sku: str          # forma canonica (es. SLIP.M.BL)
+    modelo_base: str  # SLIP
+    talla: str        # XS, M, XXL...
+    color: str        # BE, BL...
+
+    @property
+    def modelo(self):
+        """MODELO come nel foglio Magazzino (es. "SLIP BE")"""
+        return f"{self.modelo_base} {self.color}"
+
+    @property
+    def sheet_talla(self):
+        """TALLA come nel foglio Magazzino (XXL -> 2XL)"""
+        return SHEET_TALLAS.get(self.talla, self.talla)
+
+
+@lru_cache(maxsize=65536)
+def parse(sku):
+    """
+    Scompone uno SKU.
+
+    Returns:
+        SkuParts oppure None se lo SKU non ha almeno 3 parti
+    """
+    if not sku or not isinstance(sku, str):
+        return None
+    text = sku.strip().upper()
+
+    if '.' in text:
+        parts = text.split('.')
+        if len(parts) >= 3:
+            return SkuParts(text, parts[0], parts[1], parts[2])
+    elif '_' in text:
+        parts = text.split('_')
+        if len(parts) >= 3:
+            modelo_base, color, talla = parts[0], parts[1], parts[2]
+            return SkuParts(f"{modelo_base}.{talla}.{color}", modelo_base, talla, color)
+    return None
+
+
+@lru_cache(maxsize=65536)
+def is_valid(sku):
+    """
+    SKU valido: almeno 3 parti non vuote separate da punto, talla non placeholder
+    (esclude es. 'SLIP.XXX.BE', 'SLIP..BE', 'SLIP.')
+    """
+    if not sku or not isinstance(sku, str):
+        return False
+    parts = sku.split('.')
+    if not (len(parts) >= 3 and all(part.strip() for part in parts)):
+        return False
+    return parts[1].strip().upper() not in INVALID_TALLAS
+
+
+@lru_cache(maxsize=65536)
+def normalize(text):
+    """
+    Ripulisce uno SKU scritto a mano: maiuscolo, senza spazi, punto mancante
+    dopo il modello (es. "slip m .be" -> "SLIP.M.BE", "SLIPXL.BL" -> "SLIP.XL.BL")
+    """
+    if not text:
+        return text
+    return MISSING_DOT_PATTERN.sub(r'\1.\2.', text.upper().replace(' ', ''))
+
+
+class SkuRegistry:
+    """Id interi stabili per SKU canonici, con MODELO/TALLA/COLOR per id"""
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.skus = []
+        self._modelo_base = []
+        self._tallas = []
+        self._colors = []
+
+    def __len__(self):
+        return len(self.skus)
+
+    def intern(self, sku):
+        """Id dello SKU (creato se nuovo); -1 se lo SKU non è parsabile"""
+        sku_id = self._ids.get(sku)
+        if sku_id is not None:
+            return sku_id
+        parts = parse(sku)
+        if parts is None:
+            return -1
+        with self._lock:
+            sku_id = self._ids.get(parts.sku)
+            if sku_id is None:
+                sku_id = len(self.skus)
+                self._ids[parts.sku] = sku_id
+                self.skus.append(parts.sku)
+                self._modelo_base.append(parts.modelo_base)
+                self._tallas.append(parts.talla)
+                self._colors.append(parts.color)
+            # Anche la forma originale punta allo stesso id
+            self._ids[sku] = sku_id
+        return sku_id
+
+    def intern_many(self, skus):
+        """Array int64 di id (uno per SKU, -1 per SKU non parsabili)"""
+        return np.fromiter((self.intern(sku) for sku in skus), dtype=np.int64, count=len(skus))
+
+    def dense(self, values, dtype=None):
+        """
+        Dict {SKU: valore} -> array indicizzato per id (0 per gli SKU assenti).
+        Gli SKU del dict vengono registrati se nuovi.
+        """
+        dtype = dtype or np.int64
+        ids = self.intern_many(list(values))
+        data = np.fromiter(values.values(), dtype=dtype, count=len(values))
+        out = np.zeros(len(self), dtype=dtype)
+        known = ids >= 0
+        # Più SKU originali possono condividere la forma canonica: si sommano
+        np.add.at(out, ids[known], data[known])
+        return out
+
+    def modelo_base_array(self):
+        return np.asarray(self._modelo_base, dtype=object)
+
+    def talla_array(self):
+        return np.asarray(self._tallas, dtype=object)
+
+    def color_array(self):
+        return np.asarray(self._colors, dtype=object)
+
+    def modelo_array(self):
+        """MODELO come nel foglio Magazzino ("SLIP BE") per ogni id"""
+        return np.asarray(
+            [f"{base} {color}" for base, color in zip(self._modelo_base, self._colors)],
+            dtype=object
+        )
+
+
+# Registro condiviso nel container
+registry = SkuRegistry()
@@ -0,0 +1,296 @@
+"""
+Snapshot materializzati delle risposte delle dashboard.
+
+/stock, /almacenado, /parcel-shop, /rifiuti, /refunds e /order-stats
+ricalcolano tutto dai sistemi a monte (Sheets, GLS, Shopify) a ogni GET,
+mentre i dati cambiano nell'ordine dei minuti. Ogni handler si registra con
+@materialized: la risposta 200 viene salvata in uno store (cartella locale o
+bucket S3-compatibile) e le richieste con gli stessi parametri la ricevono
+dallo store finché ha meno di max_age_seconds, con l'età negli header
+X-Snapshot-Age / X-Snapshot-Created-At.
+
+    @snapshots.materialized('rifiuti', variants=[{'days_back': 4}])
+    def lambda_handler(event, context):
+        ...
+
+- ?fresh=1 (o "fresh": true nel body POST) ricalcola e aggiorna lo snapshot
+- un evento {"snapshot_refresh": true} (regola EventBridge programmata)
+  ricalcola le varianti registrate, cioè le viste di default del frontend,
+  così la prima apertura della pagina trova già lo snapshot; l'evento
+  passato all'handler ha anche lui la chiave, riconoscibile con is_refresh()
+  (lavori lunghi da fare fuori dal percorso delle richieste API Gateway)
+- invocazioni dirette (senza queryStringParameters/body/httpMethod), OPTIONS
+  e richieste escluse da `bypass` passano sempre dall'handler
+
+Store: SNAPSHOT_STORE="s3://bucket/prefisso" (endpoint S3-compatibile con
+SNAPSHOT_S3_ENDPOINT) oppure una cartella; default DATA_DIR/snapshots.
+Con ENABLE_SNAPSHOTS=false gli handler ricalcolano sempre.
+"""
+import functools
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from lazy_imports import lazy_import
+
+boto3 = lazy_import('boto3')
+
+DATA_DIR = os.environ.get("DATA_DIR", "/tmp/adibody-data")
+ENABLE_SNAPSHOTS = os.environ.get("ENABLE_SNAPSHOTS", "True").lower() == "true"
+SNAPSHOT_STORE = os.environ.get("SNAPSHOT_STORE", "")
+SNAPSHOT_S3_ENDPOINT = os.environ.get("SNAPSHOT_S3_ENDPOINT")
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get("SNAPSHOT_MAX_AGE_SECONDS", "600"))
+
+REFRESH_EVENT_KEY = 'snapshot_refresh'
+FRESH_PARAM = 'fresh'
+AGE_HEADERS = ('X-Snapshot-Age', 'X-Snapshot-Created-At')
+
+# Snapshot registrati in questo processo (nome → Snapshot)
+SNAPSHOTS = {}
+
+
+class LocalSnapshotStore:
+    """Snapshot come file JSON in una cartella (DATA_DIR, EFS o /tmp)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def read(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Scrittura atomica: chi legge vede il vecchio o il nuovo snapshot
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class S3SnapshotStore:
+    """Snapshot come oggetti JSON in un bucket S3 (o compatibile)"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _object_key(self, key):
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def read(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response['Body'].read())
+
+    def write(self, key, record):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=json.dumps(record, ensure_ascii=False).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+
+def open_store(location=None):
+    """Store indicato da SNAPSHOT_STORE (s3://bucket/prefisso o cartella)"""
+    location = location if location is not None else SNAPSHOT_STORE
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        return S3SnapshotStore(bucket, prefix, endpoint_url=SNAPSHOT_S3_ENDPOINT)
+    return LocalSnapshotStore(location or os.path.join(DATA_DIR, 'snapshots'))
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = open_store()
+    return _store
+
+
+def is_refresh(event):
+    """True se l'evento viene dal refresh programmato (non da API Gateway)"""
+    return bool((event or {}).get(REFRESH_EVENT_KEY))
+
+
+def canonical_params(params):
+    """Parametri come stringhe: days_back=14 nel body e ?days_back=14 coincidono"""
+    return {
+        str(name): value if isinstance(value, str) else json.dumps(value, sort_keys=True, separators=(',', ':'))
+        for name, value in params.items()
+    }
+
+
+def request_params(event):
+    """
+    Parametri della richiesta API Gateway (query string + body JSON).
+
+    Returns:
+        dict canonico, None se la richiesta non va servita da snapshot
+        (invocazione diretta, OPTIONS, body non JSON)
+    """
+    if not any(field in event for field in ('queryStringParameters', 'body', 'httpMethod', 'requestContext')):
+        return None
+    if event.get('httpMethod') == 'OPTIONS':
+        return None
+
+    params = dict(event.get('queryStringParameters') or {})
+    body = event.get('body')
+    if isinstance(body, str) and body.strip():
+        if event.get('isBase64Encoded'):
+            return None
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return None
+    if isinstance(body, dict):
+        params.update(body)
+    elif body not in (None, ''):
+        return None
+    return canonical_params(params)
+
+
+def snapshot_key(name, params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return f"{name}/{digest}"
+
+
+def with_age(response, created_ts, now=None):
+    """Risposta con l'età dello snapshot negli header (esposti al frontend via CORS)"""
+    age = max(0, int((now or time.time()) - created_ts))
+    headers = dict(response.get('headers') or {})
+    headers[AGE_HEADERS[0]] = str(age)
+    headers[AGE_HEADERS[1]] = datetime.fromtimestamp(created_ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    headers['Access-Control-Expose-Headers'] = ', '.join(AGE_HEADERS)
+    return {**response, 'headers': headers}
+
+
+class Snapshot:
+    def __init__(self, name, compute, variants=None, bypass=None, should_store=None, max_age_seconds=None):
+        """
+        Args:
+            name: Nome dello snapshot (prefisso delle chiavi nello store)
+            compute: Handler originale (event, context) → risposta API Gateway
+            variants: Parametri delle viste da ricalcolare al refresh
+                programmato (lista di dict o funzione che la restituisce)
+            bypass: Funzione (event, params) → True se la richiesta va sempre
+                calcolata (azioni, sincronizzazioni forzate, viste veloci)
+            should_store: Funzione (risposta 200) → False se non va salvata
+                (es. risposta parziale per una sorgente non disponibile)
+            max_age_seconds: Età massima per servire lo snapshot
+                (default SNAPSHOT_MAX_AGE_SECONDS)
+        """
+        self.name = name
+        self.compute = compute
+        self.variants = variants if variants is not None else [{}]
+        self.bypass = bypass
+        self.should_store = should_store
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else SNAPSHOT_MAX_AGE_SECONDS
+
+    def store(self, params, response, now=None):
+        """Salva la risposta se è un 200 da conservare; True se salvata"""
+        if response.get('statusCode') != 200:
+            return False
+        if self.should_store is not None and not self.should_store(response):
+            return False
+        record = {
+            'name': self.name,
+            'params': params,
+            'created_ts': now or time.time(),
+            'response': response,
+        }
+        try:
+            get_store().write(snapshot_key(self.name, params), record)
+        except Exception as e:
+            print(f"⚠️ Snapshot {self.name} non salvato: {e}")
+            return False
+        return True
+
+    def latest(self, params):
+        """Ultimo snapshot salvato per i parametri (None se assente o store non leggibile)"""
+        try:
+            return get_store().read(snapshot_key(self.name, params))
+        except Exception as e:
+            print(f"⚠️ Snapshot {self.name} non leggibile: {e}")
+            return None
+
+    def serve(self, event, context):
+        params = request_params(event) if ENABLE_SNAPSHOTS else None
+        if params is None or (self.bypass is not None and self.bypass(event, params)):
+            return self.compute(event, context)
+
+        fresh = params.pop(FRESH_PARAM, '').lower() in ('1', 'true')
+        if not fresh:
+            record = self.latest(params)
+            if record and time.time() - record['created_ts'] <= self.max_age_seconds:
+                print(f"📸 Snapshot {self.name} ({int(time.time() - record['created_ts'])}s)")
+                return with_age(record['response'], record['created_ts'])
+
+        now = time.time()
+        response = self.compute(event, context)
+        if self.store(params, response, now=now):
+            return with_age(response, now, now=now)
+        return response
+
+    def refresh(self, context=None):
+        """Ricalcola e salva le varianti registrate (trigger programmato)"""
+        variants = self.variants() if callable(self.variants) else self.variants
+        refreshed = []
+        for variant in variants:
+            params = canonical_params(variant)
+            event = {'httpMethod': 'GET', 'queryStringParameters': params, 'body': json.dumps(variant),
+                     REFRESH_EVENT_KEY: True}
+            t_start = time.time()
+            stored = self.store(params, self.compute(event, context), now=t_start)
+            refreshed.append({'params': params, 'stored': stored, 'seconds': round(time.time() - t_start, 2)})
+            print(f"📸 Refresh {self.name} {params}: {'salvato' if stored else 'non salvato'} "
+                  f"in {time.time() - t_start:.2f}s")
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'snapshot': self.name, 'refreshed': refreshed})
+        }
+
+
+def materialized(name, variants=None, bypass=None, should_store=None, max_age_seconds=None):
+    """
+    Decoratore per lambda_handler: registra lo snapshot `name` e serve le
+    richieste dallo store (vedi Snapshot per gli argomenti).
+    """
+    def decorator(handler):
+        snapshot = Snapshot(name, handler, variants, bypass, should_store, max_age_seconds)
+        SNAPSHOTS[name] = snapshot
+
+        @functools.wraps(handler)
+        def lambda_handler(event, context):
+            event = event or {}
+            if event.get(REFRESH_EVENT_KEY):
+                return snapshot.refresh(context)
+            return snapshot.serve(event, context)
+
+        lambda_handler.snapshot = snapshot
+        return lambda_handler
+
+    return decorator
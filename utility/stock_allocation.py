@@ -0,0 +1,124 @@
+"""
+Motore di allocazione stock per il triage ordini (lambda_fulfillment_check).
+
+Gli ordini vengono processati in ordine di priorità (created_at crescente) e
+ogni ordine evadibile scala lo stock disponibile, così GREEN/YELLOW/RED
+riflettono quello che si può spedire davvero: se restano 3 SLIP.M.BL, solo
+i primi ordini che li richiedono risultano evadibili.
+
+Le chiavi (MODELO, TALLA) sono mappate su id interi e lo stock vive in un
+array NumPy; il costo è lineare nel numero totale di righe ordine.
+"""
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Id per SKU non presenti nel foglio Magazzino (disponibilità 0)
+UNKNOWN_KEY = -1
+
+
+class StockAllocator:
+    def __init__(self, stock_dict):
+        """
+        Args:
+            stock_dict: Dict {(MODELO, TALLA): quantità} da load_stock_from_sheets
+        """
+        self.key_ids = {key: i for i, key in enumerate(stock_dict)}
+        # Una cella in più in fondo per UNKNOWN_KEY, sempre a 0
+        self.stock = np.zeros(len(stock_dict) + 1, dtype=np.int64)
+        self.stock[:-1] = np.fromiter(stock_dict.values(), dtype=np.int64, count=len(stock_dict))
+
+    def key_id(self, modelo, talla):
+        return self.key_ids.get((modelo, talla), UNKNOWN_KEY)
+
+    def allocate(self, orders, parse_sku):
+        """
+        Alloca lo stock agli ordini in ordine di created_at.
+
+        Un ordine scala lo stock solo se tutte le sue righe sono coperte
+        (tutto o niente): un ordine bloccato non sottrae pezzi ai successivi.
+
+        Args:
+            orders: Lista ordini con 'created_at' e 'line_items' [{sku, quantity}]
+            parse_sku: Funzione sku -> (modelo, talla), (None, None) se non valido
+
+        Returns:
+            Lista (stesso ordine di `orders`) di dict:
+            {
+                'allocated': bool,
+                'available': [int | None per riga],   # stock prima dell'ordine
+                'sufficient': [bool | None per riga]
+            }
+            None indica righe senza SKU o con SKU non parsabile.
+        """
+        priority = sorted(range(len(orders)), key=lambda i: orders[i].get('created_at') or '')
+
+        # 1. Appiattisci le righe in array: id chiave, quantità, domanda totale
+        #    della stessa chiave nell'ordine (per SKU ripetuti su più righe)
+        key_ids, quantities, needs = [], [], []
+        offsets = [0]
+        line_positions = []   # (indice ordine, indice riga) per ogni elemento appiattito
+        blocked = np.zeros(len(orders), dtype=bool)
+
+        unknown_slot = len(self.stock) - 1
+        for order_idx in priority:
+            demand = {}
+            start = len(key_ids)
+            for line_idx, item in enumerate(orders[order_idx]['line_items']):
+                sku = item.get('sku')
+                if not sku:
+                    continue
+                modelo, talla = parse_sku(sku)
+                if not modelo or not talla:
+                    blocked[order_idx] = True
+                    continue
+                kid = self.key_id(modelo, talla)
+                if kid == UNKNOWN_KEY:
+                    kid = unknown_slot
+                qty = int(item.get('quantity') or 0)
+                demand[kid] = demand.get(kid, 0) + qty
+                key_ids.append(kid)
+                quantities.append(qty)
+                line_positions.append((order_idx, line_idx))
+            needs.extend(demand[kid] for kid in key_ids[start:])
+            offsets.append(len(key_ids))
+
+        key_ids = np.asarray(key_ids, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        needs = np.asarray(needs, dtype=np.int64)
+        available = np.empty_like(key_ids)
+        allocated = np.zeros(len(orders), dtype=bool)
+
+        # 2. Allocazione in priorità: snapshot disponibilità, poi scala se evadibile
+        for pos, order_idx in enumerate(priority):
+            a, b = offsets[pos], offsets[pos + 1]
+            if a == b:
+                allocated[order_idx] = not blocked[order_idx]
+                continue
+            ids = key_ids[a:b]
+            available[a:b] = self.stock[ids]
+            if not blocked[order_idx] and (available[a:b] >= needs[a:b]).all():
+                np.subtract.at(self.stock, ids, quantities[a:b])
+                allocated[order_idx] = True
+
+        sufficient = available >= needs
+
+        # 3. Riporta i risultati sulle righe originali
+        results = [
+            {
+                'allocated': bool(allocated[i]),
+                'available': [None] * len(order['line_items']),
+                'sufficient': [None] * len(order['line_items']),
+            }
+            for i, order in enumerate(orders)
+        ]
+        for (order_idx, line_idx), avail, ok in zip(line_positions, available.tolist(), sufficient.tolist()):
+            results[order_idx]['available'][line_idx] = avail
+            results[order_idx]['sufficient'][line_idx] = ok
+
+        return results
+
+
+def allocate_stock(orders, stock_dict, parse_sku):
+    """Scorciatoia: alloca `stock_dict` agli ordini, vedi StockAllocator.allocate"""
+    return StockAllocator(stock_dict).allocate(orders, parse_sku)
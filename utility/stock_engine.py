@@ -0,0 +1,390 @@
+"""
+Motore di riassortimento per la Stock API (lambda_stock_api).
+
+Calcola autonomia, fabbisogno e urgenza per tutti gli SKU in blocco, su array
+NumPy invece che riga per riga con DataFrame.apply. Le funzioni di calcolo
+accettano anche parametri array (broadcasting), così più scenari si valutano
+in un colpo solo.
+
+Il risultato è un dict di colonne (StockColumns): array NumPy per i numeri,
+liste per le stringhe. stock_records / supplier_order_records lo
+serializzano per colonne (json_columns.Records), summarize ne fa il blocco
+summary, senza passare da iterrows.
+
+weighted_average è il kernel della media pesata delle vendite: una sola
+passata np.bincount su (sku, giorno), lineare nel numero di righe vendita;
+iso_day_numbers converte le date ISO in giorni interi senza parsing per riga.
+"""
+import json_columns
+import sku_codec
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Classi di urgenza, indicizzate dal codice restituito da urgency_codes
+URGENZE = ('CRITICO', 'ORDINARE', 'OK')
+CRITICO, ORDINARE, OK = range(3)
+
+# Valore di giorni_autonomia nella response per SKU senza vendite
+AUTONOMIA_INFINITA = 999
+
+# Arrotondamento del fabbisogno: multipli di 10, minimo 10 pezzi
+ARROTONDAMENTO = 10
+
+# Schemi di peso per la media vendite (giorni più recenti pesano di più)
+SCHEMI_PESI = ('linear', 'exponential')
+
+
+def day_weights(days, scheme='linear', decay=0.8):
+    """
+    Peso di ogni giorno della finestra, dal più vecchio (indice 0) al più recente.
+
+    - linear: 1, 2, ..., days
+    - exponential: decay^(days-1), ..., decay, 1
+    """
+    offsets = np.arange(days)
+    if scheme == 'linear':
+        return (offsets + 1).astype(float)
+    if scheme == 'exponential':
+        return np.power(float(decay), days - 1 - offsets)
+    raise ValueError(f"Schema pesi non valido: {scheme} (ammessi: {', '.join(SCHEMI_PESI)})")
+
+
+def _digits(chars, start, end):
+    value = np.zeros(len(chars), dtype=np.int64)
+    for col in range(start, end):
+        value = value * 10 + (chars[:, col].astype(np.int64) - ord('0'))
+    return value
+
+
+def _days_from_civil(year, month, day):
+    """Giorni dal 1970-01-01 per date del calendario gregoriano (vettoriale)"""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def iso_day_numbers(values):
+    """
+    Giorno UTC (giorni dal 1970-01-01) di date ISO 8601.
+
+    Il formato delle date di Shopify ("YYYY-MM-DDTHH:MM:SS" con "Z" o
+    "+HH:MM") e GLS ("YYYY-MM-DD") è a larghezza fissa: viene letto
+    byte per byte su tutto l'array. Gli altri formati (frazioni di secondo,
+    senza fuso) passano da pd.to_datetime, solo per quelle righe.
+
+    Args:
+        values: Lista di stringhe ISO (None o "" per date mancanti)
+
+    Returns:
+        tuple (array int64 giorni, array bool valido)
+    """
+    n = len(values)
+    try:
+        raw = np.array([v or '' for v in values], dtype='S32')
+    except UnicodeEncodeError:
+        raw = None
+    if raw is None or n == 0:
+        fixed = np.zeros(n, dtype=bool)
+        chars = np.zeros((n, 32), dtype=np.uint8)
+    else:
+        chars = raw.view(np.uint8).reshape(n, 32)
+        is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+        date_ok = (
+            is_digit[:, [0, 1, 2, 3, 5, 6, 8, 9]].all(axis=1)
+            & (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-'))
+        )
+        date_only = date_ok & (chars[:, 10] == 0)
+        datetime_ok = (
+            date_ok & (chars[:, 10] == ord('T'))
+            & is_digit[:, [11, 12, 14, 15]].all(axis=1)
+            & (chars[:, 13] == ord(':')) & (chars[:, 16] == ord(':'))
+        )
+        utc = datetime_ok & (chars[:, 19] == ord('Z')) & (chars[:, 20] == 0)
+        offset = (
+            datetime_ok & np.isin(chars[:, 19], [ord('+'), ord('-')])
+            & is_digit[:, [20, 21, 23, 24]].all(axis=1) & (chars[:, 22] == ord(':'))
+            & (chars[:, 25] == 0)
+        )
+        fixed = date_only | utc | offset
+
+    days = np.zeros(n, dtype=np.int64)
+    if fixed.any():
+        minutes = np.where(date_only, 0, _digits(chars, 11, 13) * 60 + _digits(chars, 14, 16))
+        sign = np.where(chars[:, 19] == ord('-'), -1, 1)
+        minutes -= np.where(offset, sign * (_digits(chars, 20, 22) * 60 + _digits(chars, 23, 25)), 0)
+        civil = _days_from_civil(_digits(chars, 0, 4), _digits(chars, 5, 7), _digits(chars, 8, 10))
+        days = civil + np.floor_divide(minutes, 1440)
+
+    valid = fixed.copy()
+    others = np.flatnonzero(~fixed)
+    if len(others):
+        parsed = pd.to_datetime(
+            pd.Series([values[i] for i in others], dtype=object),
+            utc=True, format='ISO8601', errors='coerce'
+        )
+        ok = parsed.notna().to_numpy()
+        days[others[ok]] = (
+            parsed[ok].dt.tz_localize(None).to_numpy().astype('datetime64[D]').astype(np.int64)
+        )
+        valid[others[ok]] = True
+    return days, valid
+
+
+def weighted_average(sku_ids, day_offsets, quantities, n_skus, days, scheme='linear', decay=0.8):
+    """
+    Media giornaliera pesata delle vendite per SKU.
+
+    I giorni senza vendite contano come 0, quindi il denominatore è la somma
+    dei pesi dell'intera finestra.
+
+    Args:
+        sku_ids: Array id SKU (0..n_skus-1) per riga vendita
+        day_offsets: Array giorno della riga nella finestra (0 = più vecchio);
+            righe fuori da 0..days-1 ignorate
+        quantities: Array quantità per riga
+        n_skus: Numero di SKU
+        days: Ampiezza finestra in giorni
+
+    Returns:
+        Array float (n_skus,) con la media pesata
+    """
+    sku_ids = np.asarray(sku_ids, dtype=np.int64)
+    day_offsets = np.asarray(day_offsets, dtype=np.int64)
+    quantities = np.asarray(quantities, dtype=float)
+
+    weights = day_weights(days, scheme, decay)
+    in_window = (day_offsets >= 0) & (day_offsets < days)
+    weighted_sum = np.bincount(
+        sku_ids[in_window],
+        weights=quantities[in_window] * weights[day_offsets[in_window]],
+        minlength=n_skus
+    )
+    return weighted_sum / weights.sum()
+
+
+def weighted_matrix_average(matrix, scheme='linear', decay=0.8):
+    """
+    Media pesata da una matrice densa SKU × giorno (colonna 0 = giorno più
+    vecchio), come weighted_average ma su dati già aggregati per giorno.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    weights = day_weights(matrix.shape[1], scheme, decay)
+    return matrix @ weights / weights.sum()
+
+
+def autonomy_days(magazzino_netto, media_pesata):
+    """Giorni di autonomia = netto / media; inf se lo SKU non vende"""
+    magazzino_netto = np.asarray(magazzino_netto, dtype=float)
+    media_pesata = np.asarray(media_pesata, dtype=float)
+    shape = np.broadcast_shapes(magazzino_netto.shape, media_pesata.shape)
+    out = np.full(shape, np.inf)
+    np.divide(magazzino_netto, media_pesata, out=out, where=media_pesata > 0)
+    return out
+
+
+def round_need(grezzo):
+    """Fabbisogno grezzo -> pezzi: multiplo di 10 per eccesso, minimo 10; 0 se <= 0"""
+    grezzo = np.asarray(grezzo, dtype=float)
+    arrotondato = np.maximum(ARROTONDAMENTO, np.ceil(grezzo / ARROTONDAMENTO) * ARROTONDAMENTO)
+    return np.where(grezzo > 0, arrotondato, 0).astype(np.int64)
+
+
+def replenishment_need(media_pesata, giorni_autonomia, giorni_target, giorni_transito, moltiplicatore=1):
+    """
+    Pezzi da ordinare per coprire `giorni_target` dopo l'arrivo della merce.
+
+    fabbisogno grezzo = (target - (autonomia - transito)) * media * moltiplicatore,
+    arrotondato per eccesso al multiplo di 10 (minimo 10); 0 se non serve
+    o se lo SKU non vende.
+    """
+    media_pesata = np.asarray(media_pesata, dtype=float)
+    giorni_autonomia = np.asarray(giorni_autonomia, dtype=float)
+    selling = media_pesata > 0
+
+    # Per gli SKU senza vendite autonomia = inf: inf * 0 darebbe nan
+    with np.errstate(invalid='ignore'):
+        giorni_mancanti = giorni_target - (giorni_autonomia - giorni_transito)
+        grezzo = np.where(selling, giorni_mancanti * media_pesata * moltiplicatore, 0.0)
+
+    return round_need(grezzo)
+
+
+def urgency_codes(giorni_autonomia, soglia_critica, soglia_allarme):
+    """Codici urgenza (CRITICO/ORDINARE/OK) da giorni di autonomia"""
+    giorni_autonomia = np.asarray(giorni_autonomia, dtype=float)
+    return np.where(
+        giorni_autonomia < soglia_critica, CRITICO,
+        np.where(giorni_autonomia < soglia_allarme, ORDINARE, OK)
+    ).astype(np.int8)
+
+
+def build_columns(sku_ids, media_pesata, magazzino_attuale, in_arrivo, ordini_arretrati,
+                  giorni_target, giorni_transito, soglia_critica, soglia_allarme, moltiplicatore=1,
+                  registry=None):
+    """
+    Calcola tutte le colonne stock per gli SKU `sku_ids`.
+
+    Args:
+        sku_ids: Array id SKU di sku_codec (ordine di output)
+        media_pesata, magazzino_attuale, in_arrivo, ordini_arretrati: Array
+            indicizzati per id (SkuRegistry.dense)
+        giorni_target, giorni_transito, soglia_critica, soglia_allarme, moltiplicatore:
+            Parametri di riassortimento
+        registry: SkuRegistry degli id (default quello condiviso)
+
+    Returns:
+        dict StockColumns {nome_colonna: array/lista}, una posizione per SKU
+    """
+    registry = registry or sku_codec.registry
+    sku_ids = np.asarray(sku_ids, dtype=np.int64)
+
+    def gather(values, dtype):
+        out = np.zeros(len(sku_ids), dtype=dtype)
+        present = sku_ids < len(values)
+        out[present] = values[sku_ids[present]]
+        return out
+
+    media = gather(media_pesata, float)
+    magazzino = gather(magazzino_attuale, np.int64)
+    arrivo = gather(in_arrivo, np.int64)
+    arretrati = gather(ordini_arretrati, np.int64)
+
+    totale = magazzino + arrivo
+    netto = totale - arretrati
+    autonomia = autonomy_days(netto, media)
+
+    return {
+        'sku_id': sku_ids,
+        'sku': [registry.skus[i] for i in sku_ids.tolist()],
+        'modelo': registry.modelo_array()[sku_ids].tolist(),
+        'talla': registry.talla_array()[sku_ids].tolist(),
+        'media_pesata': media,
+        'magazzino_attuale': magazzino,
+        'in_arrivo': arrivo,
+        'totale_disponibile': totale,
+        'ordini_arretrati': arretrati,
+        'magazzino_netto': netto,
+        'giorni_autonomia': autonomia,
+        'autonomia_tra_transito': autonomia - giorni_transito,
+        'fabbisogno': replenishment_need(media, autonomia, giorni_target, giorni_transito, moltiplicatore),
+        'urgenza': urgency_codes(autonomia, soglia_critica, soglia_allarme),
+    }
+
+
+def evaluate_scenarios(columns, scenarios):
+    """
+    Ricalcola fabbisogno e urgenza per più scenari di parametri in un colpo
+    solo, come matrice scenario × SKU sugli stessi dati.
+
+    Args:
+        columns: StockColumns da build_columns
+        scenarios: Lista di dict con giorni_target, giorni_transito,
+            soglia_critica, soglia_allarme, moltiplicatore
+
+    Returns:
+        Lista di StockColumns, una per scenario (stessi array di input
+        tranne fabbisogno, urgenza e autonomia_tra_transito)
+    """
+    if not scenarios:
+        return []
+
+    def param(key):
+        return np.array([scenario[key] for scenario in scenarios], dtype=float)[:, None]
+
+    media = columns['media_pesata'][None, :]
+    autonomia = columns['giorni_autonomia'][None, :]
+    giorni_transito = param('giorni_transito')
+
+    fabbisogno = replenishment_need(
+        media, autonomia, param('giorni_target'), giorni_transito, param('moltiplicatore')
+    )
+    urgenza = urgency_codes(autonomia, param('soglia_critica'), param('soglia_allarme'))
+    autonomia_tra_transito = autonomia - giorni_transito
+
+    return [
+        {
+            **columns,
+            'fabbisogno': fabbisogno[i],
+            'urgenza': urgenza[i],
+            'autonomia_tra_transito': autonomia_tra_transito[i],
+        }
+        for i in range(len(scenarios))
+    ]
+
+
+def urgency_labels(codes):
+    """Etichette urgenza (lista di stringhe) dai codici"""
+    return np.asarray(URGENZE, dtype=object)[codes].tolist()
+
+
+def autonomy_for_json(giorni_autonomia):
+    """Giorni di autonomia per la response: 1 decimale, AUTONOMIA_INFINITA se lo SKU non vende"""
+    rounded = np.round(giorni_autonomia, 1).tolist()
+    infinite = np.isinf(giorni_autonomia).tolist()
+    return [AUTONOMIA_INFINITA if inf else value for value, inf in zip(rounded, infinite)]
+
+
+def stock_records(columns):
+    """Righe "stock" della response come json_columns.Records, nell'ordine delle colonne"""
+    return json_columns.Records({
+        "sku": columns['sku'],
+        "modelo": columns['modelo'],
+        "talla": columns['talla'],
+        "magazzino_attuale": columns['magazzino_attuale'],
+        "in_arrivo": columns['in_arrivo'],
+        "totale_disponibile": columns['totale_disponibile'],
+        "ordini_arretrati": columns['ordini_arretrati'],
+        "magazzino_netto": columns['magazzino_netto'],
+        "media_vendite_giornaliere": np.round(columns['media_pesata'], 2),
+        "giorni_autonomia": autonomy_for_json(columns['giorni_autonomia']),
+        "urgenza": urgency_labels(columns['urgenza']),
+    })
+
+
+def stock_rows(columns):
+    """Righe "stock" della response come lista di dict"""
+    return stock_records(columns).rows()
+
+
+def supplier_order_index(columns):
+    """Indici degli SKU da ordinare (CRITICO/ORDINARE), per autonomia crescente"""
+    idx = np.flatnonzero(columns['urgenza'] != OK)
+    return idx[np.argsort(columns['giorni_autonomia'][idx], kind='stable')]
+
+
+def supplier_order_records(columns):
+    """Righe "ordine_fornitore" della response come json_columns.Records (più critici prima)"""
+    idx = supplier_order_index(columns)
+    skus, modelos, tallas = columns['sku'], columns['modelo'], columns['talla']
+    return json_columns.Records({
+        "sku": [skus[i] for i in idx.tolist()],
+        "modelo": [modelos[i] for i in idx.tolist()],
+        "talla": [tallas[i] for i in idx.tolist()],
+        "quantita": columns['fabbisogno'][idx],
+        "urgenza": urgency_labels(columns['urgenza'][idx]),
+        "giorni_autonomia": np.round(columns['giorni_autonomia'][idx], 1),
+    })
+
+
+def supplier_order_rows(columns):
+    """Righe "ordine_fornitore" della response come lista di dict"""
+    return supplier_order_records(columns).rows()
+
+
+def summarize(columns):
+    """Blocco "summary" della response"""
+    urgenza = columns['urgenza']
+    return {
+        "totale_sku": len(columns['sku']),
+        "totale_pezzi_stock": int(columns['totale_disponibile'].sum()),
+        "totale_magazzino_attuale": int(columns['magazzino_attuale'].sum()),
+        "totale_in_arrivo": int(columns['in_arrivo'].sum()),
+        "sku_critici": int((urgenza == CRITICO).sum()),
+        "sku_da_ordinare": int((urgenza == ORDINARE).sum()),
+        "totale_pezzi_ordine": int(columns['fabbisogno'][urgenza != OK].sum()),
+    }
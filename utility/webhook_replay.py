@@ -0,0 +1,108 @@
+"""
+Riproduce in locale webhook Shopify registrati (lambda_shopify_webhooks).
+
+Legge file .jsonl (una riga per webhook, come li scrive WEBHOOK_RECORD_DIR) o
+.json (un webhook o una lista) con {"topic", "webhook_id"?, "payload"}, firma
+ogni body con il segreto indicato e chiama lambda_handler come farebbe API
+Gateway. Gli store vengono scritti in --data-dir (default una cartella
+temporanea), così i test non toccano i dati veri.
+
+Uso:
+    python webhook_replay.py registrazioni/webhooks-2025-06-01.jsonl
+    python webhook_replay.py registrazioni/ --data-dir /tmp/replay --verbose
+    python webhook_replay.py casi/ --tamper      # verifica che le firme errate diano 401
+
+I webhook fulfillments/create rileggono l'ordine da Shopify: senza accesso
+reale vanno puntati alla Shopify finta (SHOPIFY_GRAPHQL_URL, vedi fakes/fake_shopify.py).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+REPLAY_SECRET = 'replay-secret'
+
+
+def load_webhooks(paths):
+    """Webhook registrati dai file/cartelle indicati, in ordine di nome file"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(('.json', '.jsonl'))
+            )
+        else:
+            files.append(path)
+
+    webhooks = []
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                webhooks.extend(json.loads(line) for line in f if line.strip())
+            else:
+                data = json.load(f)
+                webhooks.extend(data if isinstance(data, list) else [data])
+    return webhooks
+
+
+def webhook_event(webhook, secret, sign, tamper=False):
+    """Evento API Gateway firmato per un webhook registrato"""
+    body = json.dumps(webhook['payload'], ensure_ascii=False).encode('utf-8')
+    signature = sign(body, secret + ('-errato' if tamper else ''))
+    headers = {
+        'X-Shopify-Topic': webhook['topic'],
+        'X-Shopify-Hmac-Sha256': signature,
+        'Content-Type': 'application/json',
+    }
+    if webhook.get('webhook_id'):
+        headers['X-Shopify-Webhook-Id'] = webhook['webhook_id']
+    return {'headers': headers, 'body': body.decode('utf-8'), 'isBase64Encoded': False}
+
+
+def replay(webhooks, secret=REPLAY_SECRET, tamper=False, verbose=False):
+    """
+    Invia i webhook all'handler (già importato con DATA_DIR e segreto impostati).
+
+    Returns:
+        Counter degli esiti ("200 applied", "401", ...)
+    """
+    import lambda_shopify_webhooks as webhooks_lambda
+
+    outcomes = Counter()
+    for webhook in webhooks:
+        result = webhooks_lambda.lambda_handler(webhook_event(webhook, secret, webhooks_lambda.sign, tamper), None)
+        body = json.loads(result['body'])
+        outcome = f"{result['statusCode']} {body.get('status', '')}".strip()
+        outcomes[outcome] += 1
+        if verbose:
+            print(f"   {webhook['topic']:<22} {outcome:<14} {body.get('order_id', '')}")
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='+', help='File .json/.jsonl o cartelle di webhook registrati')
+    parser.add_argument('--data-dir', help='DATA_DIR degli store (default: cartella temporanea)')
+    parser.add_argument('--tamper', action='store_true', help='Firma con un segreto errato (attesi 401)')
+    parser.add_argument('--verbose', action='store_true', help='Esito di ogni webhook')
+    args = parser.parse_args()
+
+    # Prima dell'import: gli store leggono DATA_DIR, l'handler il segreto
+    os.environ['DATA_DIR'] = args.data_dir or tempfile.mkdtemp(prefix='webhook-replay-')
+    os.environ['SHOPIFY_WEBHOOK_SECRET'] = REPLAY_SECRET
+    os.environ.pop('WEBHOOK_RECORD_DIR', None)
+
+    webhooks = load_webhooks(args.paths)
+    print(f"🔁 Replay di {len(webhooks)} webhook in {os.environ['DATA_DIR']}")
+    outcomes = replay(webhooks, tamper=args.tamper, verbose=args.verbose)
+    for outcome, count in outcomes.most_common():
+        print(f"   {outcome}: {count}")
+    expected = '401' if args.tamper else '200'
+    return 0 if all(outcome.startswith(expected) for outcome in outcomes) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())